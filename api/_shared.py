@@ -5,17 +5,18 @@ from __future__ import annotations
 import json
 from functools import lru_cache
 from http import HTTPStatus
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
 
-from app.config import load_registry
+from app.catalog import PreparedResponse, load_catalog
 from app.services.token_service import ModelNotFoundError, TokenService
 from app.tokenizers.registry import TokenizerRegistry
 
 
 _CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
-    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match",
     "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Expose-Headers": "ETag",
 }
 
 
@@ -23,9 +24,8 @@ _CORS_HEADERS = {
 def get_service() -> TokenService:
     """Return a cached :class:`TokenService` instance for serverless handlers."""
 
-    models = load_registry()
     registry = TokenizerRegistry()
-    return TokenService(models=models, registry=registry)
+    return TokenService(models=load_catalog(), registry=registry)
 
 
 def send_json(handler, status: HTTPStatus, payload: Dict[str, Any]) -> None:
@@ -41,6 +41,39 @@ def send_json(handler, status: HTTPStatus, payload: Dict[str, Any]) -> None:
     handler.wfile.write(body)
 
 
+def send_ndjson(handler, items: Iterable[Dict[str, Any]]) -> None:
+    """Write *items* as a newline-delimited JSON response with CORS headers.
+
+    Serverless responses are buffered by the platform, so the body is built
+    in full and sent with a ``Content-Length``.
+    """
+
+    body = b"".join(
+        json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n" for item in items
+    )
+    handler.send_response(HTTPStatus.OK.value)
+    for header, value in _CORS_HEADERS.items():
+        handler.send_header(header, value)
+    handler.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def send_prepared(handler, response: PreparedResponse) -> None:
+    """Write a pre-serialised :class:`~app.catalog.PreparedResponse`."""
+
+    handler.send_response(response.status.value)
+    for header, value in _CORS_HEADERS.items():
+        handler.send_header(header, value)
+    for header, value in response.headers.items():
+        handler.send_header(header, value)
+    handler.send_header("Content-Length", str(len(response.body)))
+    handler.end_headers()
+    if response.body:
+        handler.wfile.write(response.body)
+
+
 def send_empty(handler, status: HTTPStatus = HTTPStatus.NO_CONTENT) -> None:
     """Send an empty response body with CORS headers."""
 
@@ -51,4 +84,11 @@ def send_empty(handler, status: HTTPStatus = HTTPStatus.NO_CONTENT) -> None:
     handler.end_headers()
 
 
-__all__ = ["ModelNotFoundError", "get_service", "send_json", "send_empty"]
+__all__ = [
+    "ModelNotFoundError",
+    "get_service",
+    "send_json",
+    "send_ndjson",
+    "send_prepared",
+    "send_empty",
+]
@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
-from http import HTTPStatus
+import urllib.parse
 from http.server import BaseHTTPRequestHandler
 
-from ._shared import get_service, send_empty, send_json
+from ._shared import get_service, send_empty, send_prepared
+from app.catalog import models_response
 
 
 class handler(BaseHTTPRequestHandler):  # noqa: N801 - Vercel naming requirement
@@ -17,5 +18,10 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801 - Vercel naming requirement
 
     def do_GET(self):  # noqa: N802 - required by BaseHTTPRequestHandler
         service = get_service()
-        payload = {"models": service.list_models()}
-        send_json(self, HTTPStatus.OK, payload)
+        response = models_response(
+            service.catalog,
+            urllib.parse.parse_qs(self.path.partition("?")[2]),
+            if_none_match=self.headers.get("If-None-Match"),
+            accept_encoding=self.headers.get("Accept-Encoding"),
+        )
+        send_prepared(self, response)
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import json
+import urllib.parse
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler
 
@@ -31,16 +32,24 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801 - Vercel naming requirement
 
         model_id = payload.get("model") or payload.get("model_id")
         text = payload.get("text", "")
+        query = urllib.parse.parse_qs(self.path.partition("?")[2])
+        mode = query.get("mode", [payload.get("mode", "exact")])[0]
+        include_tokens = bool(payload.get("include_tokens", True))
         if not model_id:
             send_json(self, HTTPStatus.BAD_REQUEST, {"error": "'model' is required"})
             return
 
         service = get_service()
         try:
-            result = service.calculate(model_id=model_id, text=text)
+            result = service.calculate(
+                model_id=model_id, text=text, mode=mode, include_tokens=include_tokens
+            )
         except ModelNotFoundError:
             send_json(self, HTTPStatus.NOT_FOUND, {"error": f"unknown model '{model_id}'"})
             return
+        except ValueError as exc:
+            send_json(self, HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            return
         except (MissingDependencyError, TokenizerDownloadError) as exc:
             send_json(self, HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)})
             return
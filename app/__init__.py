@@ -1,10 +1,15 @@
 """Core package for the LLM token counter service."""
 
+from .catalog import ModelCatalog, load_catalog
 from .config import load_registry
+from .services.async_service import AsyncTokenService
 from .services.token_service import TokenService
 from .tokenizers.registry import TokenizerRegistry
 
 __all__ = [
+    "AsyncTokenService",
+    "ModelCatalog",
+    "load_catalog",
     "load_registry",
     "TokenService",
     "TokenizerRegistry",
@@ -4,19 +4,62 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import sys
+import tracemalloc
+import urllib.parse
+import urllib.request
 from pathlib import Path
 
-from .config import load_registry
+from .bundle import build_bundle
+from .catalog import load_catalog
+from .config import update_registry_entry
+from .mirror import serve_mirror
+from .models import TokenizerSpec
 from .server import serve
-from .services.token_service import TokenService
-from .tokenizers.registry import TokenizerRegistry
+from .services.admission import AdmissionLimits
+from .services.capture import TEXT_MODES, CaptureWriter, iter_capture
+from .services.chunking import SNAP_MODES
+from .services.cost_accounting import (
+    CostFields,
+    CostPipeline,
+    detect_format,
+    iter_log_records,
+    jsonl_writer,
+)
+from .services.corpus_stats import (
+    CorpusStats,
+    collect_stats,
+    collect_stats_parallel,
+    iter_documents,
+)
+from .services.count_index import CountIndex
+from .services.estimation import calibrate
+from .services.memory import DEFAULT_MIN_GROWTH, leak_check, memory_report
+from .services.replay import HTTPTarget, ServiceTarget, replay
+from .services.token_service import COUNTING_MODES, TRUNCATION_STRATEGIES, TokenService
+from .tokenizers.cache import (
+    cache_bytes,
+    dedupe_cache,
+    prune_cache,
+    scan_cache,
+    verify_cache,
+    warm_cache,
+)
+from .tokenizers.huggingface_tokenizer import default_cache_dir
+from .tokenizers.registry import TokenizerRegistry, get_tokenizer_for_model
+from .tokenizers.segmentation import DEFAULT_MAX_RUN
 
 
-def _create_service(registry_path: str | None = None) -> TokenService:
-    models = load_registry(Path(registry_path) if registry_path else None)
+_MIB = 1024 * 1024
+
+
+def _create_service(
+    registry_path: str | None = None, count_index: CountIndex | None = None
+) -> TokenService:
+    catalog = load_catalog(Path(registry_path) if registry_path else None)
     registry = TokenizerRegistry()
-    return TokenService(models=models, registry=registry)
+    return TokenService(models=catalog, registry=registry, count_index=count_index)
 
 
 def _cmd_list_models(args) -> int:
@@ -28,20 +71,347 @@ def _cmd_list_models(args) -> int:
 
 
 def _cmd_count(args) -> int:
+    index = CountIndex(args.index) if args.index else None
+    service = _create_service(args.registry, index)
+    text = args.text
+    if args.file:
+        text = Path(args.file).read_text(encoding="utf-8")
+    try:
+        result = service.calculate(
+            model_id=args.model, text=text, mode=args.mode, include_tokens=index is None
+        )
+    finally:
+        if index is not None:
+            index.close()
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_truncate(args) -> int:
     service = _create_service(args.registry)
     text = args.text
     if args.file:
         text = Path(args.file).read_text(encoding="utf-8")
-    result = service.calculate(model_id=args.model, text=text)
+    result = service.truncate(
+        model_id=args.model,
+        text=text,
+        max_tokens=args.max_tokens,
+        strategy=args.strategy,
+    )
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_chunk(args) -> int:
+    service = _create_service(args.registry)
+    if args.text is not None:
+        source = None
+        blocks = (args.text,)
+    else:
+        source = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8")
+        blocks = iter(lambda: source.read(_MIB), "")
+    try:
+        chunks = service.chunk(
+            model_id=args.model,
+            text=blocks,
+            max_tokens=args.max_tokens,
+            overlap=args.overlap,
+            snap=args.snap,
+        )
+        for chunk in chunks:
+            sys.stdout.write(json.dumps(chunk, ensure_ascii=False))
+            sys.stdout.write("\n")
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+    return 0
+
+
+def _cmd_cost(args) -> int:
+    index = CountIndex(args.index) if args.index else None
+    service = _create_service(args.registry, index)
+    fields = CostFields(
+        model=args.model_field,
+        prompt=args.prompt_field,
+        completion=args.completion_field,
+        timestamp=args.timestamp_field,
+        key=args.key_field,
+    )
+    pipeline = CostPipeline(
+        service,
+        fields=fields,
+        registry_path=args.registry,
+        count_index_path=args.index,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_groups=args.max_groups,
+    )
+    fmt = args.format or detect_format(args.log)
+    source = sys.stdin if args.log == "-" else open(args.log, "r", encoding="utf-8", newline="")
+    annotate_stream = open(args.annotate, "w", encoding="utf-8") if args.annotate else None
+    try:
+        summary = pipeline.run(
+            iter_log_records(source, fmt),
+            annotate=jsonl_writer(annotate_stream) if annotate_stream else None,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if annotate_stream:
+            annotate_stream.close()
+        if index is not None:
+            index.close()
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_index(args) -> int:
+    index = CountIndex(args.path, max_bytes=int(args.max_mb * 1024 * 1024))
+    result = index.compact() if args.action == "compact" else index.stats()
+    index.close()
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_stats(args) -> int:
+    service = _create_service(args.registry)
+    model = service.get_model(args.model)
+    tokenizer = get_tokenizer_for_model(model, TokenizerRegistry())
+    options = {
+        "batch_size": args.batch_size,
+        "ngram": args.ngram,
+        "capacity": args.capacity,
+        "max_length": args.max_length,
+    }
+    partials = [CorpusStats.load(path) for path in args.merge or ()]
+    if args.corpus:
+        if args.workers > 1:
+            if "-" in args.corpus:
+                raise ValueError("reading the corpus from stdin requires --workers 1")
+            partials.append(
+                collect_stats_parallel(
+                    args.registry,
+                    model.model_id,
+                    args.corpus,
+                    workers=args.workers,
+                    field=args.field,
+                    whole_files=args.whole_files,
+                    **options,
+                )
+            )
+        else:
+            paths = ["/dev/stdin" if path == "-" else path for path in args.corpus]
+            documents = iter_documents(paths, field=args.field, whole_files=args.whole_files)
+            partials.append(collect_stats(tokenizer, documents, **options))
+    if not partials:
+        raise ValueError("give corpus files and/or --merge partial statistics")
+    stats = partials[0]
+    for partial in partials[1:]:
+        stats.merge(partial)
+    if args.save:
+        stats.save(args.save)
+    result = {"model": model.model_id, **stats.summary(tokenizer, top_k=args.top_k)}
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_calibrate(args) -> int:
+    service = _create_service(args.registry)
+    model = service.get_model(args.model)
+    tokenizer = get_tokenizer_for_model(model, TokenizerRegistry())
+    texts = (Path(path).read_text(encoding="utf-8") for path in args.corpus)
+    estimator = calibrate(tokenizer, texts, sample_chars=args.sample_chars)
+    result = {"model": model.model_id, "estimator": estimator.to_dict(), "written": None}
+    if args.write:
+        path = update_registry_entry(
+            model.model_id,
+            "estimator",
+            estimator.to_dict(),
+            path=Path(args.registry) if args.registry else None,
+        )
+        result["written"] = str(path)
     json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
     sys.stdout.write("\n")
     return 0
 
 
+def _cmd_bundle(args) -> int:
+    catalog = load_catalog(Path(args.registry) if args.registry else None)
+    manifest = build_bundle(
+        catalog,
+        Path(args.output),
+        model_ids=args.model or None,
+        allow_missing=args.allow_missing,
+    )
+    json.dump(manifest, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_cache(args) -> int:
+    root = Path(args.cache_dir).expanduser() if args.cache_dir else default_cache_dir()
+    if args.action == "list":
+        entries = scan_cache(root)
+        result = {
+            "root": str(root),
+            "files": len(entries),
+            "bytes": cache_bytes(entries),
+            "entries": [entry.to_dict() for entry in entries],
+        }
+    elif args.action == "verify":
+        checked = verify_cache(root, workers=args.workers, remove=args.remove)
+        result = {
+            "root": str(root),
+            "files": len(checked),
+            "corrupt": [item for item in checked if not item["ok"]],
+        }
+    elif args.action == "dedupe":
+        result = dedupe_cache(root, workers=args.workers)
+    elif args.action == "prune":
+        if args.max_mb is None and args.max_age_days is None:
+            raise ValueError("give --max-mb and/or --max-age-days")
+        result = prune_cache(
+            root,
+            max_bytes=None if args.max_mb is None else int(args.max_mb * _MIB),
+            max_age=None if args.max_age_days is None else args.max_age_days * 86400,
+            dry_run=args.dry_run,
+        )
+    else:
+        catalog = load_catalog(Path(args.registry) if args.registry else None)
+        wanted = set(args.model) if args.model else None
+        registry = TokenizerRegistry()
+        tokenizers = {}
+        for model in catalog:
+            if wanted is not None and model.model_id not in wanted:
+                continue
+            spec = model.tokenizer
+            if args.cache_dir:
+                spec = TokenizerSpec(spec.type, {**spec.options, "cache_dir": str(root)})
+            tokenizers[model.model_id] = registry.get_tokenizer(spec)
+        result = {"root": str(root), "models": warm_cache(tokenizers, load=args.load)}
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_mirror(args) -> int:
+    serve_mirror(
+        host=args.host,
+        port=int(args.port),
+        cache_dir=args.cache_dir,
+        bundle_dir=args.bundle_dir,
+        upstream=args.upstream,
+    )
+    return 0
+
+
+def _cmd_replay(args) -> int:
+    if args.uds:
+        target = HTTPTarget(uds=args.uds)
+    elif args.url:
+        target = HTTPTarget(args.url)
+    else:
+        target = ServiceTarget(_create_service(args.registry))
+    report = replay(
+        iter_capture(args.capture),
+        target,
+        speed=args.speed,
+        concurrency=args.concurrency,
+        limit=args.limit,
+    )
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_memory(args) -> int:
+    if args.url:
+        query = urllib.parse.urlencode({"top": args.top})
+        url = f"{args.url.rstrip('/')}/debug/memory?{query}"
+        token = args.admin_token or os.getenv("TOKEN_COUNTER_ADMIN_TOKEN", "")
+        request = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            result = json.load(response)
+    else:
+        if args.top:
+            tracemalloc.start()
+        service = _create_service(args.registry)
+        for model_id in args.model or ():
+            service.warm(model_id)
+        if args.leak_check:
+            result = leak_check(
+                service,
+                args.leak_check,
+                [args.text] if args.text else None,
+                iterations=args.iterations,
+                rounds=args.rounds,
+                min_growth=int(args.min_growth_kb * 1024),
+            )
+            result["memory"] = memory_report(service, top=args.top)
+        else:
+            result = memory_report(service, top=args.top)
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if result.get("leak_suspected") else 0
+
+
+def _admission_limits(args) -> AdmissionLimits | None:
+    if not args.admission:
+        return None
+    weights = {}
+    for item in args.model_weight or ():
+        model_id, _, weight = item.partition("=")
+        if not model_id or not weight:
+            raise ValueError(f"--model-weight expects MODEL=WEIGHT, got {item!r}")
+        weights[model_id] = float(weight)
+    return AdmissionLimits(
+        max_inflight_cost=args.max_inflight_mb * _MIB,
+        max_body_bytes=int(args.max_body_mb * _MIB),
+        client_concurrency=args.client_concurrency,
+        client_bytes_per_second=args.client_mb_per_second * _MIB,
+        client_burst_bytes=args.client_burst_mb * _MIB,
+        model_weights=weights,
+    )
+
+
 def _cmd_serve(args) -> int:
     host = args.host
     port = int(args.port)
-    serve(host=host, port=port)
+    if args.tracemalloc:
+        tracemalloc.start()
+    capture = None
+    if args.capture:
+        capture = CaptureWriter(
+            args.capture,
+            sample_rate=args.capture_sample,
+            text_mode=args.capture_text,
+            truncate_chars=args.capture_truncate_chars,
+        )
+    serve(
+        host=host,
+        port=port,
+        registry_path=args.registry,
+        reload_interval=args.reload_interval,
+        admin_token=args.admin_token or os.getenv("TOKEN_COUNTER_ADMIN_TOKEN"),
+        coalesce_window_ms=args.coalesce_window_ms,
+        coalesce_max_batch=args.coalesce_max_batch,
+        uds=args.uds,
+        uds_mode=args.uds_mode,
+        count_index=args.count_index,
+        count_index_max_bytes=int(args.count_index_max_mb * 1024 * 1024),
+        admission=_admission_limits(args),
+        client_header=args.client_header,
+        cpu_budget_ms=args.cpu_budget_ms,
+        max_run=args.max_run,
+        warm=None if args.warm_all else args.warm or (),
+        ready_max_inflight=args.ready_max_inflight,
+        capture=capture,
+    )
     return 0
 
 
@@ -58,11 +428,350 @@ def main(argv: list[str] | None = None) -> int:
     sp_count.add_argument("--model", required=True, help="Model identifier")
     sp_count.add_argument("--text", help="Text to tokenize", default="")
     sp_count.add_argument("--file", help="Path to file with text content")
+    sp_count.add_argument(
+        "--mode",
+        choices=COUNTING_MODES,
+        default="exact",
+        help="'chunked' sums memoized per-chunk counts, 'estimate' skips the tokenizer,"
+        " 'auto' estimates only long inputs",
+    )
+    sp_count.add_argument(
+        "--index",
+        help="Persistent count index (SQLite) to reuse counts across runs; omits the token list",
+    )
     sp_count.set_defaults(func=_cmd_count)
 
+    sp_truncate = subparsers.add_parser("truncate", help="Cut input text to a token budget")
+    sp_truncate.add_argument("--model", required=True, help="Model identifier")
+    sp_truncate.add_argument("--max-tokens", required=True, type=int, help="Token budget to fit")
+    sp_truncate.add_argument(
+        "--strategy",
+        choices=TRUNCATION_STRATEGIES,
+        default="head",
+        help="Which part of the text to keep",
+    )
+    sp_truncate.add_argument("--text", help="Text to truncate", default="")
+    sp_truncate.add_argument("--file", help="Path to file with text content")
+    sp_truncate.set_defaults(func=_cmd_truncate)
+
+    sp_chunk = subparsers.add_parser(
+        "chunk", help="Split text into token-budget chunks, streamed as NDJSON"
+    )
+    sp_chunk.add_argument("--model", required=True, help="Model identifier")
+    sp_chunk.add_argument("--max-tokens", type=int, default=512, help="Token budget per chunk")
+    sp_chunk.add_argument(
+        "--overlap", type=int, default=0, help="Tokens repeated from the previous chunk"
+    )
+    sp_chunk.add_argument(
+        "--snap",
+        choices=SNAP_MODES,
+        default="none",
+        help="End chunks at a sentence or paragraph break in the second half of the budget",
+    )
+    source = sp_chunk.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text", help="Text to split")
+    source.add_argument("--file", help="UTF-8 file to split ('-' for stdin), read in blocks")
+    sp_chunk.set_defaults(func=_cmd_chunk)
+
+    sp_cost = subparsers.add_parser("cost", help="Aggregate token usage and cost over request logs")
+    sp_cost.add_argument("log", help="JSONL or CSV log file ('-' for stdin)")
+    sp_cost.add_argument("--format", choices=("jsonl", "csv"), help="Log format (default: by extension)")
+    sp_cost.add_argument("--model-field", default="model")
+    sp_cost.add_argument("--prompt-field", default="prompt")
+    sp_cost.add_argument("--completion-field", default="completion")
+    sp_cost.add_argument("--timestamp-field", default="timestamp")
+    sp_cost.add_argument("--key-field", help="Extra field to group costs by (e.g. a customer id)")
+    sp_cost.add_argument("--workers", type=int, default=1, help="Processes used for counting")
+    sp_cost.add_argument("--batch-size", type=int, default=256)
+    sp_cost.add_argument("--max-groups", type=int, default=100_000, help="Cap on distinct groups kept")
+    sp_cost.add_argument("--annotate", help="Write per-record token counts and costs as JSONL")
+    sp_cost.add_argument("--index", help="Persistent count index shared by all workers")
+    sp_cost.set_defaults(func=_cmd_cost)
+
+    sp_index = subparsers.add_parser("index", help="Inspect or compact a persistent count index")
+    sp_index.add_argument("action", choices=("stats", "compact"))
+    sp_index.add_argument("path", help="Index database file")
+    sp_index.add_argument(
+        "--max-mb", type=float, default=256, help="Size limit enforced by 'compact'"
+    )
+    sp_index.set_defaults(func=_cmd_index)
+
+    sp_stats = subparsers.add_parser(
+        "stats", help="Token frequencies, length percentiles and top n-grams of a corpus"
+    )
+    sp_stats.add_argument("--model", required=True, help="Model identifier")
+    sp_stats.add_argument(
+        "corpus", nargs="*", help="UTF-8 files, one document per line ('-' for stdin)"
+    )
+    sp_stats.add_argument("--field", help="Read documents from this field of JSONL lines")
+    sp_stats.add_argument(
+        "--whole-files", action="store_true", help="Treat every file as a single document"
+    )
+    sp_stats.add_argument("--batch-size", type=int, default=256)
+    sp_stats.add_argument("--workers", type=int, default=1, help="Processes used for encoding")
+    sp_stats.add_argument("--ngram", type=int, default=2, help="N-gram order (0 disables)")
+    sp_stats.add_argument("--top-k", type=int, default=20, help="Tokens and n-grams reported")
+    sp_stats.add_argument(
+        "--capacity", type=int, default=4096, help="N-grams tracked by the bounded sketch"
+    )
+    sp_stats.add_argument(
+        "--max-length", type=int, default=65536, help="Largest exact document length bin"
+    )
+    sp_stats.add_argument("--save", help="Write the raw statistics to this .npz file")
+    sp_stats.add_argument(
+        "--merge", nargs="+", help="Combine statistics saved by earlier --save runs"
+    )
+    sp_stats.set_defaults(func=_cmd_stats)
+
+    sp_calibrate = subparsers.add_parser(
+        "calibrate", help="Fit a model's fast token estimator against its tokenizer"
+    )
+    sp_calibrate.add_argument("--model", required=True, help="Model identifier")
+    sp_calibrate.add_argument(
+        "--corpus", required=True, nargs="+", help="UTF-8 text files to calibrate on"
+    )
+    sp_calibrate.add_argument(
+        "--sample-chars", type=int, default=2048, help="Approximate size of each sample"
+    )
+    sp_calibrate.add_argument(
+        "--write", action="store_true", help="Store the fitted estimator in the registry file"
+    )
+    sp_calibrate.set_defaults(func=_cmd_calibrate)
+
+    sp_bundle = subparsers.add_parser(
+        "bundle", help="Copy registry tokenizer files into a deployable bundle directory"
+    )
+    sp_bundle.add_argument("--output", default="tokenizer_bundle", help="Bundle directory")
+    sp_bundle.add_argument(
+        "--model", action="append", help="Only bundle this model (repeatable; default: all)"
+    )
+    sp_bundle.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="Record tokenizers that cannot be fetched instead of failing",
+    )
+    sp_bundle.set_defaults(func=_cmd_bundle)
+
+    sp_cache = subparsers.add_parser(
+        "cache", help="List, verify, prune or pre-fill the tokenizer download cache"
+    )
+    sp_cache.add_argument("action", choices=("list", "verify", "dedupe", "prune", "warm"))
+    sp_cache.add_argument("--cache-dir", help="Cache directory (default: the download cache)")
+    sp_cache.add_argument("--workers", type=int, default=4, help="Hashing threads")
+    sp_cache.add_argument(
+        "--remove", action="store_true", help="Delete corrupt files found by 'verify'"
+    )
+    sp_cache.add_argument("--max-mb", type=float, help="Size budget enforced by 'prune'")
+    sp_cache.add_argument(
+        "--max-age-days", type=float, help="'prune' removes files idle for longer than this"
+    )
+    sp_cache.add_argument(
+        "--dry-run", action="store_true", help="Report what 'prune' would remove"
+    )
+    sp_cache.add_argument(
+        "--model", action="append", help="Only warm this model (repeatable; default: all)"
+    )
+    sp_cache.add_argument(
+        "--load", action="store_true", help="Also parse the warmed tokenizers"
+    )
+    sp_cache.set_defaults(func=_cmd_cache)
+
+    sp_mirror = subparsers.add_parser(
+        "mirror", help="Serve cached tokenizer files with the Hugging Face hub URL layout"
+    )
+    sp_mirror.add_argument("--host", default="127.0.0.1")
+    sp_mirror.add_argument("--port", default=8080, type=int)
+    sp_mirror.add_argument(
+        "--cache-dir", help="Cache directory to serve and fill (default: the download cache)"
+    )
+    sp_mirror.add_argument("--bundle-dir", help="Bundle directory served before the cache")
+    sp_mirror.add_argument(
+        "--upstream",
+        help="Hub or peer mirror to fetch missing files from, e.g. https://huggingface.co",
+    )
+    sp_mirror.set_defaults(func=_cmd_mirror)
+
+    sp_memory = subparsers.add_parser(
+        "memory", help="Report memory use by tokenizers and caches, or check for leaks"
+    )
+    sp_memory.add_argument("--url", help="Ask this running server instead of a local service")
+    sp_memory.add_argument(
+        "--admin-token",
+        default=None,
+        help="Bearer token for the server's /debug/memory (default: $TOKEN_COUNTER_ADMIN_TOKEN)",
+    )
+    sp_memory.add_argument(
+        "--model", action="append", help="Load this model's tokenizer first (repeatable)"
+    )
+    sp_memory.add_argument(
+        "--top", type=int, default=0, help="Also list the N largest Python allocation sites"
+    )
+    sp_memory.add_argument(
+        "--leak-check",
+        metavar="MODEL",
+        help="Count tokens with MODEL repeatedly and flag memory that keeps growing",
+    )
+    sp_memory.add_argument("--text", help="Text counted by --leak-check (default: a sample)")
+    sp_memory.add_argument(
+        "--iterations", type=int, default=1000, help="Calls per --leak-check round"
+    )
+    sp_memory.add_argument("--rounds", type=int, default=5, help="Measured --leak-check rounds")
+    sp_memory.add_argument(
+        "--min-growth-kb",
+        type=float,
+        default=DEFAULT_MIN_GROWTH / 1024,
+        help="Growth below this is not reported as a leak",
+    )
+    sp_memory.set_defaults(func=_cmd_memory)
+
+    sp_replay = subparsers.add_parser(
+        "replay", help="Re-send a captured workload and report latencies"
+    )
+    sp_replay.add_argument("capture", help="Capture log written by serve --capture")
+    sp_replay.add_argument(
+        "--url", help="Server to replay against (default: an in-process service)"
+    )
+    sp_replay.add_argument("--uds", help="Replay against a server on this Unix domain socket")
+    sp_replay.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Scale the captured timing (2 = twice as fast, 0 = as fast as possible)",
+    )
+    sp_replay.add_argument(
+        "--concurrency", type=int, default=8, help="Requests in flight at most"
+    )
+    sp_replay.add_argument("--limit", type=int, help="Stop after this many requests")
+    sp_replay.set_defaults(func=_cmd_replay)
+
     sp_serve = subparsers.add_parser("serve", help="Start HTTP API server")
     sp_serve.add_argument("--host", default="127.0.0.1")
     sp_serve.add_argument("--port", default="8000")
+    sp_serve.add_argument(
+        "--reload-interval",
+        type=float,
+        default=None,
+        help="Poll the registry file every N seconds and reload it when it changes",
+    )
+    sp_serve.add_argument(
+        "--admin-token",
+        default=None,
+        help="Enable POST /admin/reload guarded by this bearer token"
+        " (default: $TOKEN_COUNTER_ADMIN_TOKEN)",
+    )
+    sp_serve.add_argument(
+        "--coalesce-window-ms",
+        type=float,
+        default=None,
+        help="Micro-batch concurrent /tokenize calls arriving within this window",
+    )
+    sp_serve.add_argument(
+        "--coalesce-max-batch",
+        type=int,
+        default=32,
+        help="Flush a micro-batch as soon as it holds this many requests",
+    )
+    sp_serve.add_argument(
+        "--uds", default=None, help="Listen on this Unix domain socket instead of host/port"
+    )
+    sp_serve.add_argument(
+        "--uds-mode",
+        type=lambda value: int(value, 8),
+        default=0o660,
+        help="Octal permissions of the --uds socket (default: 660)",
+    )
+    sp_serve.add_argument(
+        "--count-index", default=None, help="Persistent count index for count-only requests"
+    )
+    sp_serve.add_argument(
+        "--count-index-max-mb",
+        type=float,
+        default=256,
+        help="Evict least recently used counts beyond this size",
+    )
+    sp_serve.add_argument(
+        "--admission",
+        action="store_true",
+        help="Weigh tokenization requests by body size and model and shed excess load",
+    )
+    sp_serve.add_argument(
+        "--max-inflight-mb", type=float, default=64, help="Global cap on in-flight weighted MB"
+    )
+    sp_serve.add_argument(
+        "--max-body-mb", type=float, default=64, help="Reject larger bodies with 413"
+    )
+    sp_serve.add_argument(
+        "--client-concurrency", type=int, default=8, help="Concurrent requests per client"
+    )
+    sp_serve.add_argument(
+        "--client-mb-per-second", type=float, default=16, help="Per-client weighted byte rate"
+    )
+    sp_serve.add_argument(
+        "--client-burst-mb", type=float, default=64, help="Per-client byte-rate burst size"
+    )
+    sp_serve.add_argument(
+        "--model-weight",
+        action="append",
+        metavar="MODEL=WEIGHT",
+        help="Cost multiplier for a model's requests (repeatable; default 1)",
+    )
+    sp_serve.add_argument(
+        "--client-header",
+        default=None,
+        help="Identify clients by this header (set by a trusted gateway) instead of address",
+    )
+    sp_serve.add_argument(
+        "--cpu-budget-ms",
+        type=float,
+        default=None,
+        help="Stop counting a request's text once it used this much CPU time",
+    )
+    sp_serve.add_argument(
+        "--max-run",
+        type=int,
+        default=DEFAULT_MAX_RUN,
+        help="Count single-class runs longer than this many characters in pieces",
+    )
+    sp_serve.add_argument(
+        "--warm",
+        action="append",
+        metavar="MODEL",
+        help="Load this model's tokenizer at startup; /readyz waits for it (repeatable)",
+    )
+    sp_serve.add_argument(
+        "--warm-all", action="store_true", help="Load every model's tokenizer at startup"
+    )
+    sp_serve.add_argument(
+        "--ready-max-inflight",
+        type=int,
+        help="Report not ready while this many tokenization requests are running",
+    )
+    sp_serve.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="Trace Python allocations so /debug/memory?top=N can list them",
+    )
+    sp_serve.add_argument(
+        "--capture", metavar="PATH", help="Log sampled requests here for the replay command"
+    )
+    sp_serve.add_argument(
+        "--capture-sample",
+        type=float,
+        default=1.0,
+        help="Fraction of requests to capture (default: 1)",
+    )
+    sp_serve.add_argument(
+        "--capture-text",
+        choices=TEXT_MODES,
+        default="full",
+        help="Log texts in full, cut to a prefix, or as a hash with length and script",
+    )
+    sp_serve.add_argument(
+        "--capture-truncate-chars",
+        type=int,
+        default=256,
+        help="Characters kept per text with --capture-text truncate",
+    )
     sp_serve.set_defaults(func=_cmd_serve)
 
     args = parser.parse_args(argv)
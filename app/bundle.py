@@ -0,0 +1,97 @@
+"""Build-time bundling of tokenizer files into a deployment artifact.
+
+Serverless instances start with an empty, often read-only, home directory,
+so the first request would otherwise spend its time budget downloading
+``tokenizer.json``. ``python -m app bundle`` copies every registry
+tokenizer into a directory that ships with the deployment and that
+:class:`~app.tokenizers.huggingface_tokenizer.HuggingFaceTokenizer` checks
+before any cache or network access.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from .models import ModelSpec
+from .tokenizers.huggingface_tokenizer import (
+    HuggingFaceTokenizer,
+    MissingDependencyError,
+    TokenizerDownloadError,
+    repo_cache_path,
+)
+from .tokenizers.registry import TokenizerRegistry
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as stream:
+        for block in iter(lambda: stream.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_bundle(
+    models: Iterable[ModelSpec],
+    output: Path,
+    *,
+    model_ids: Iterable[str] | None = None,
+    allow_missing: bool = False,
+) -> Dict[str, object]:
+    """Copy the tokenizer files of *models* into *output* and write a manifest.
+
+    Files are laid out as ``<output>/<repo>/<revision>/<file>``, the same
+    layout as the download cache. Models sharing a tokenizer file are stored
+    once. With *allow_missing*, tokenizers that cannot be fetched (gated
+    repositories without a token, no network) are reported instead of
+    failing the build.
+    """
+
+    wanted = set(model_ids) if model_ids else None
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    registry = TokenizerRegistry()
+
+    files: Dict[str, Dict[str, object]] = {}
+    missing: List[Dict[str, str]] = []
+    for model in models:
+        if wanted is not None and model.model_id not in wanted:
+            continue
+        tokenizer = registry.get_tokenizer(model.tokenizer, cache_key=model.model_id)
+        if not isinstance(tokenizer, HuggingFaceTokenizer):  # pragma: no cover - only HF exists
+            continue
+        source = tokenizer.source
+        relative = repo_cache_path(
+            Path(), source["repo_id"], source["revision"], source["tokenizer_file"]
+        ).as_posix()
+        if relative in files:
+            files[relative]["models"].append(model.model_id)
+            continue
+        try:
+            origin = tokenizer.resolve_tokenizer_file()
+        except (TokenizerDownloadError, MissingDependencyError, FileNotFoundError) as exc:
+            if not allow_missing:
+                raise
+            missing.append({"model": model.model_id, "error": str(exc)})
+            continue
+        target = output / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if origin.resolve() != target.resolve():
+            shutil.copyfile(origin, target)
+        files[relative] = {
+            **source,
+            "sha256": _sha256(target),
+            "size": target.stat().st_size,
+            "models": [model.model_id],
+        }
+
+    manifest = {"files": files, "missing": missing}
+    (output / MANIFEST_NAME).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    return manifest
@@ -0,0 +1,234 @@
+"""Model registry compiled into lookup indexes and pre-serialised payloads."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from .config import _DEFAULT_REGISTRY_PATH, load_registry
+from .models import ModelSpec
+
+_MAX_CACHED_FILTERS = 256
+
+
+@dataclass(frozen=True)
+class ModelsPayload:
+    """Serialised ``{"models": [...]}`` body together with its validators."""
+
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    gzip_etag: str
+
+    @classmethod
+    def build(cls, models: Sequence[Dict[str, object]]) -> "ModelsPayload":
+        body = json.dumps({"models": list(models)}, ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        return cls(
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+            etag=f'"{digest}"',
+            gzip_etag=f'"{digest}-gzip"',
+        )
+
+
+@dataclass(frozen=True)
+class PreparedResponse:
+    """Status, headers and body ready to be written by an HTTP handler."""
+
+    status: HTTPStatus
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+
+class ModelCatalog:
+    """Immutable view of the registry indexed by id, family and provider.
+
+    Everything derived from the registry (``to_dict`` output, the ``/models``
+    body, its gzip encoding and ETag) is computed once when the catalog is
+    built. Filtered payloads are built on first use and memoized.
+    """
+
+    def __init__(self, models: Iterable[ModelSpec]) -> None:
+        self._models: Dict[str, ModelSpec] = {}
+        for model in models:
+            self._models[model.model_id] = model
+        self._dicts: Dict[str, Dict[str, object]] = {
+            model_id: model.to_dict() for model_id, model in self._models.items()
+        }
+        self._order = {model_id: index for index, model_id in enumerate(self._models)}
+        self._by_family = self._index(lambda model: model.family)
+        self._by_provider = self._index(lambda model: model.provider)
+        self.payload = ModelsPayload.build(list(self._dicts.values()))
+        self._filtered: Dict[Tuple[Tuple[str, ...], ...], ModelsPayload] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, key) -> Dict[str, Tuple[str, ...]]:
+        index: Dict[str, List[str]] = {}
+        for model_id, model in self._models.items():
+            index.setdefault(str(key(model)).lower(), []).append(model_id)
+        return {name: tuple(ids) for name, ids in index.items()}
+
+    # ------------------------------------------------------------------
+    # Lookups
+    def __iter__(self) -> Iterator[ModelSpec]:
+        return iter(self._models.values())
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __contains__(self, model_id: object) -> bool:
+        return model_id in self._models
+
+    def get(self, model_id: str) -> Optional[ModelSpec]:
+        return self._models.get(model_id)
+
+    def model_dict(self, model_id: str) -> Dict[str, object]:
+        """Return a shallow copy of the pre-computed ``to_dict`` output."""
+
+        return dict(self._dicts[model_id])
+
+    def to_dicts(self, model_ids: Iterable[str] | None = None) -> List[Dict[str, object]]:
+        ids = self._models if model_ids is None else model_ids
+        return [dict(self._dicts[model_id]) for model_id in ids]
+
+    def select(
+        self,
+        ids: Sequence[str] = (),
+        families: Sequence[str] = (),
+        providers: Sequence[str] = (),
+    ) -> List[str]:
+        """Return model ids matching every non-empty filter, in registry order.
+
+        Values within one filter are alternatives; family and provider match
+        case-insensitively.
+        """
+
+        selected: set[str] | None = None
+        if ids:
+            selected = {model_id for model_id in ids if model_id in self._models}
+        for index, values in ((self._by_family, families), (self._by_provider, providers)):
+            if not values:
+                continue
+            matches = {model_id for value in values for model_id in index.get(value.lower(), ())}
+            selected = matches if selected is None else selected & matches
+        if selected is None:
+            return list(self._models)
+        return sorted(selected, key=self._order.__getitem__)
+
+    def filtered_payload(
+        self,
+        ids: Sequence[str] = (),
+        families: Sequence[str] = (),
+        providers: Sequence[str] = (),
+    ) -> ModelsPayload:
+        """Return the ``/models`` payload restricted by the given filters."""
+
+        if not (ids or families or providers):
+            return self.payload
+        key = (
+            tuple(sorted(ids)),
+            tuple(sorted(value.lower() for value in families)),
+            tuple(sorted(value.lower() for value in providers)),
+        )
+        with self._lock:
+            cached = self._filtered.get(key)
+        if cached is not None:
+            return cached
+        payload = ModelsPayload.build(
+            [self._dicts[model_id] for model_id in self.select(ids, families, providers)]
+        )
+        with self._lock:
+            if len(self._filtered) >= _MAX_CACHED_FILTERS:
+                self._filtered.clear()
+            self._filtered[key] = payload
+        return payload
+
+
+def _split_values(values: Sequence[str] | None) -> List[str]:
+    result: List[str] = []
+    for value in values or ():
+        result.extend(part.strip() for part in value.split(",") if part.strip())
+    return result
+
+
+def _etag_matches(if_none_match: str | None, etags: Sequence[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    if "*" in candidates:
+        return True
+    # Weak comparison is what If-None-Match uses, so ignore a W/ prefix.
+    candidates = {value[2:] if value.startswith("W/") else value for value in candidates}
+    return any(etag in candidates for etag in etags)
+
+
+def _accepts_gzip(accept_encoding: str | None) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in {"gzip", "*"}:
+            quality = params.strip().lower()
+            return quality not in {"q=0", "q=0.0", "q=0.00", "q=0.000"}
+    return False
+
+
+def models_response(
+    catalog: ModelCatalog,
+    query: Mapping[str, Sequence[str]],
+    if_none_match: str | None = None,
+    accept_encoding: str | None = None,
+) -> PreparedResponse:
+    """Build the ``GET /models`` response from pre-serialised catalog payloads.
+
+    *query* is the output of :func:`urllib.parse.parse_qs`; ``id``,
+    ``family`` and ``provider`` accept repeated or comma-separated values.
+    """
+
+    payload = catalog.filtered_payload(
+        ids=_split_values(query.get("id")),
+        families=_split_values(query.get("family")),
+        providers=_split_values(query.get("provider")),
+    )
+    use_gzip = _accepts_gzip(accept_encoding)
+    headers = {
+        "ETag": payload.gzip_etag if use_gzip else payload.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(if_none_match, (payload.etag, payload.gzip_etag)):
+        return PreparedResponse(HTTPStatus.NOT_MODIFIED, headers)
+
+    headers["Content-Type"] = "application/json; charset=utf-8"
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return PreparedResponse(HTTPStatus.OK, headers, payload.gzip_body)
+    return PreparedResponse(HTTPStatus.OK, headers, payload.body)
+
+
+_CATALOG_CACHE: Dict[Path, Tuple[Tuple[int, int], ModelCatalog]] = {}
+_CATALOG_LOCK = threading.Lock()
+
+
+def load_catalog(path: Path | None = None) -> ModelCatalog:
+    """Return the compiled catalog for *path*, re-parsing only when the file changes."""
+
+    target = (Path(path) if path else _DEFAULT_REGISTRY_PATH).resolve()
+    try:
+        stat = target.stat()
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"Model registry file not found: {target}") from exc
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _CATALOG_LOCK:
+        cached = _CATALOG_CACHE.get(target)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    catalog = ModelCatalog(load_registry(target))
+    with _CATALOG_LOCK:
+        _CATALOG_CACHE[target] = (signature, catalog)
+    return catalog
@@ -0,0 +1,772 @@
+"""Python clients for the token counter HTTP API.
+
+:class:`TokenCounterClient` (threads) and :class:`AsyncTokenCounterClient`
+(asyncio) expose the same calls and share the same behaviour:
+
+* connections to a TCP or Unix socket endpoint are pooled and kept alive;
+* concurrent ``count``/``tokenize`` calls for the same model that arrive
+  while a request for that model is in flight are sent together as one
+  ``POST /tokenize/batch`` request, so sequential callers never wait;
+* responses are requested gzip-compressed and without the token list unless
+  the caller asks for it, and ``/models`` is revalidated with its ETag;
+* every call is a pure computation, so all of them are retried with
+  exponential backoff on connection errors and ``429``/``502``/``503``/``504``
+  responses, honouring ``Retry-After``.
+
+Servers that predate ``/tokenize/batch`` are detected on the first ``404``
+and served one request per text. Passing ``service=`` instead of a URL calls
+a :class:`~app.services.token_service.TokenService` in-process, without HTTP.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import urllib.parse
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from .services.token_service import ModelNotFoundError, TokenService
+from .tokenizers.huggingface_tokenizer import MissingDependencyError, TokenizerDownloadError
+
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+_MAX_RETRY_AFTER = 5.0
+_RETRY_ERRORS = (OSError, http.client.HTTPException, asyncio.IncompleteReadError)
+
+
+class TokenCounterError(Exception):
+    """Raised when the service answers with an error status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+@dataclass(frozen=True)
+class _Response:
+    status: int
+    data: Any = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def _decode(status: int, headers: Dict[str, str], body: bytes) -> _Response:
+    if headers.get("content-encoding", "").lower() == "gzip":
+        body = gzip.decompress(body)
+    data = json.loads(body.decode("utf-8")) if body else None
+    return _Response(status, data, headers)
+
+
+def _check(response: _Response) -> Any:
+    if response.status >= 400:
+        data = response.data if isinstance(response.data, dict) else {}
+        raise TokenCounterError(response.status, str(data.get("error", "request failed")))
+    return response.data
+
+
+def _retry_delay(attempt: int, backoff: float, response: _Response | None) -> float:
+    if response is not None and "retry-after" in response.headers:
+        try:
+            return min(max(float(response.headers["retry-after"]), 0.0), _MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+    return backoff * (2**attempt) * (0.5 + random.random())
+
+
+def _is_missing_batch_route(response: _Response) -> bool:
+    return response.status == 404 and (response.data or {}).get("error") == "unknown endpoint"
+
+
+def _model_header(payload: Any) -> Dict[str, str]:
+    """``X-Model`` for a request body naming a model.
+
+    Admission control weighs a request by its model before reading the body.
+    """
+
+    model = payload.get("model") if isinstance(payload, dict) else None
+    return {"X-Model": model} if isinstance(model, str) and model else {}
+
+
+def _parse_base_url(base_url: str) -> Tuple[str, str, int, str]:
+    parsed = urllib.parse.urlsplit(base_url)
+    if parsed.scheme not in {"http", "https"}:
+        raise ValueError(f"Unsupported URL scheme in {base_url!r}; expected http or https.")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return parsed.scheme, parsed.hostname or "localhost", port, parsed.path.rstrip("/")
+
+
+def _models_path(family: str | None, provider: str | None) -> str:
+    query = {key: value for key, value in (("family", family), ("provider", provider)) if value}
+    return "/models" + (f"?{urllib.parse.urlencode(query)}" if query else "")
+
+
+# ----------------------------------------------------------------------
+# In-process dispatch shared by both clients
+def _local_call(service: TokenService, method: str, path: str, payload: Any) -> _Response:
+    route, _, query = path.partition("?")
+    model_id = (payload or {}).get("model", "")
+    try:
+        if method == "GET" and route == "/models":
+            params = urllib.parse.parse_qs(query)
+            catalog = service.catalog
+            selected = catalog.select(
+                families=params.get("family", ()), providers=params.get("provider", ())
+            )
+            return _Response(200, {"models": catalog.to_dicts(selected)})
+        if route == "/tokenize":
+            data = service.calculate(
+                model_id,
+                payload.get("text", ""),
+                payload.get("mode", "exact"),
+                payload.get("include_tokens", True),
+            )
+        elif route == "/tokenize/batch":
+            data = {
+                "results": service.calculate_many(
+                    model_id,
+                    payload["texts"],
+                    payload.get("mode", "exact"),
+                    payload.get("include_tokens", True),
+                )
+            }
+        elif route == "/tokenize/chat":
+            data = service.calculate_chat(
+                model_id, payload["messages"], payload.get("add_generation_prompt", True)
+            )
+        elif route == "/truncate":
+            data = service.truncate(
+                model_id,
+                payload.get("text", ""),
+                payload["max_tokens"],
+                payload.get("strategy", "head"),
+            )
+        else:
+            return _Response(404, {"error": "unknown endpoint"})
+    except ModelNotFoundError:
+        return _Response(404, {"error": f"unknown model '{model_id}'"})
+    except ValueError as exc:
+        return _Response(400, {"error": str(exc)})
+    except (MissingDependencyError, TokenizerDownloadError) as exc:
+        return _Response(503, {"error": str(exc)})
+    return _Response(200, data)
+
+
+# ----------------------------------------------------------------------
+# Synchronous client
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class _ConnectionPool:
+    """At most *size* concurrent ``http.client`` connections, reused LIFO."""
+
+    def __init__(self, factory: Callable[[], http.client.HTTPConnection], size: int) -> None:
+        self._factory = factory
+        self._idle: Deque[http.client.HTTPConnection] = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(int(size), 1))
+
+    def request(
+        self, method: str, path: str, body: bytes | None, headers: Dict[str, str]
+    ) -> _Response:
+        with self._slots:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            reused = conn is not None
+            while True:
+                if conn is None:
+                    conn = self._factory()
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    raw = conn.getresponse()
+                    payload = raw.read()
+                except _RETRY_ERRORS:
+                    conn.close()
+                    if not reused:
+                        raise
+                    # The server closed an idle kept-alive connection; retry on a fresh one.
+                    conn, reused = None, False
+                    continue
+                break
+            response_headers = {name.lower(): value for name, value in raw.getheaders()}
+            if raw.will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        return _decode(raw.status, response_headers, payload)
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+
+class _Call:
+    __slots__ = ("text", "event", "lead", "result", "error")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.event = threading.Event()
+        self.lead = False
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class _Lane:
+    __slots__ = ("pending", "busy")
+
+    def __init__(self) -> None:
+        self.pending: List[Any] = []
+        self.busy = False
+
+
+class _InflightBatcher:
+    """Batch calls per key while an earlier batch for that key is in flight.
+
+    The first caller sends its request immediately. Calls arriving meanwhile
+    queue up; when the in-flight batch returns, the oldest queued caller is
+    woken to send everything queued so far (up to *max_batch*) as the next
+    batch.
+    """
+
+    def __init__(self, max_batch: int) -> None:
+        self._max_batch = max(int(max_batch), 1)
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, text: str, send: Callable[[List[str]], List[Any]]) -> Any:
+        call = _Call(text)
+        with self._lock:
+            lane = self._lanes.setdefault(key, _Lane())
+            lane.pending.append(call)
+            if not lane.busy:
+                lane.busy = True
+                call.lead = True
+        if not call.lead:
+            call.event.wait()
+        if call.lead:
+            self._flush(lane, send)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _flush(self, lane: _Lane, send: Callable[[List[str]], List[Any]]) -> None:
+        with self._lock:
+            batch = lane.pending[: self._max_batch]
+            del lane.pending[: self._max_batch]
+        try:
+            results = send([call.text for call in batch])
+        except BaseException as exc:  # noqa: BLE001 - every waiter must be released
+            for call in batch:
+                call.error = exc
+        else:
+            for call, result in zip(batch, results):
+                call.result = result
+        with self._lock:
+            for call in batch:
+                call.lead = False
+                call.event.set()
+            if lane.pending:
+                successor = lane.pending[0]
+                successor.lead = True
+                successor.event.set()
+            else:
+                lane.busy = False
+
+
+class TokenCounterClient:
+    """Thread-safe client for the token counter API.
+
+    Connect with ``base_url`` (``http://host:port``), a Unix socket path via
+    ``uds``, or pass a :class:`TokenService` as ``service`` to skip HTTP.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        *,
+        uds: str | None = None,
+        service: TokenService | None = None,
+        pool_size: int = 8,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff: float = 0.05,
+        max_batch: int = 64,
+    ) -> None:
+        self._service = service
+        self._retries = max(int(retries), 0)
+        self._backoff = backoff
+        self._max_batch = max(int(max_batch), 1)
+        self._batcher = _InflightBatcher(self._max_batch)
+        self._batch_supported = True
+        self._models_cache: Dict[str, Tuple[str, Any]] = {}
+        self._pool: _ConnectionPool | None = None
+        if service is not None:
+            return
+        scheme, host, port, self._prefix = _parse_base_url(base_url)
+        if uds is not None:
+            factory = lambda: _UnixHTTPConnection(uds, timeout)  # noqa: E731
+        elif scheme == "https":
+            factory = lambda: http.client.HTTPSConnection(host, port, timeout=timeout)  # noqa: E731
+        else:
+            factory = lambda: http.client.HTTPConnection(host, port, timeout=timeout)  # noqa: E731
+        self._pool = _ConnectionPool(factory, pool_size)
+
+    @classmethod
+    def in_process(cls, registry_path: str | None = None, **kwargs) -> "TokenCounterClient":
+        """Return a client backed by a local :class:`TokenService`."""
+
+        from .catalog import load_catalog
+
+        return cls(service=TokenService(models=load_catalog(registry_path)), **kwargs)
+
+    # ------------------------------------------------------------------
+    # Public API
+    def models(
+        self, *, family: str | None = None, provider: str | None = None
+    ) -> List[Dict[str, Any]]:
+        path = _models_path(family, provider)
+        cached = self._models_cache.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = self._request("GET", path, headers=headers)
+        if response.status == 304 and cached:
+            return cached[1]
+        models = _check(response)["models"]
+        if "etag" in response.headers:
+            self._models_cache[path] = (response.headers["etag"], models)
+        return models
+
+    def tokenize(
+        self, model: str, text: str, *, mode: str = "exact", include_tokens: bool = False
+    ) -> Dict[str, Any]:
+        """Return the ``/tokenize`` result, batched with concurrent calls for *model*."""
+
+        return self._batcher.submit(
+            (model, mode, include_tokens),
+            text,
+            lambda texts: self._send_batch(model, texts, mode, include_tokens),
+        )
+
+    def count(self, model: str, text: str, *, mode: str = "exact") -> int:
+        return int(self.tokenize(model, text, mode=mode)["token_count"])
+
+    def tokenize_many(
+        self,
+        model: str,
+        texts: Sequence[str],
+        *,
+        mode: str = "exact",
+        include_tokens: bool = False,
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(texts), self._max_batch):
+            chunk = list(texts[start : start + self._max_batch])
+            results.extend(self._send_batch(model, chunk, mode, include_tokens))
+        return results
+
+    def chat(
+        self,
+        model: str,
+        messages: Sequence[Mapping[str, Any]],
+        *,
+        add_generation_prompt: bool = True,
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "messages": list(messages),
+            "add_generation_prompt": add_generation_prompt,
+        }
+        return _check(self._request("POST", "/tokenize/chat", payload))
+
+    def truncate(
+        self, model: str, text: str, max_tokens: int, *, strategy: str = "head"
+    ) -> Dict[str, Any]:
+        payload = {"model": model, "text": text, "max_tokens": max_tokens, "strategy": strategy}
+        return _check(self._request("POST", "/truncate", payload))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+
+    def __enter__(self) -> "TokenCounterClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Transport
+    def _send_batch(
+        self, model: str, texts: List[str], mode: str, include_tokens: bool
+    ) -> List[Dict[str, Any]]:
+        if len(texts) > 1 and self._batch_supported:
+            payload = {
+                "model": model,
+                "texts": texts,
+                "mode": mode,
+                "include_tokens": include_tokens,
+            }
+            response = self._request("POST", "/tokenize/batch", payload)
+            if not _is_missing_batch_route(response):
+                return _check(response)["results"]
+            self._batch_supported = False
+        return [
+            _check(
+                self._request(
+                    "POST",
+                    "/tokenize",
+                    {"model": model, "text": text, "mode": mode, "include_tokens": include_tokens},
+                )
+            )
+            for text in texts
+        ]
+
+    def _request(
+        self, method: str, path: str, payload: Any = None, headers: Dict[str, str] | None = None
+    ) -> _Response:
+        if self._service is not None:
+            return _local_call(self._service, method, path, payload)
+        assert self._pool is not None
+        body = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request_headers = {"Accept-Encoding": "gzip", **_model_header(payload), **(headers or {})}
+        if body is not None:
+            request_headers["Content-Type"] = "application/json"
+        for attempt in range(self._retries + 1):
+            response = None
+            try:
+                response = self._pool.request(method, self._prefix + path, body, request_headers)
+            except _RETRY_ERRORS:
+                if attempt == self._retries:
+                    raise
+            else:
+                if response.status not in _RETRY_STATUSES or attempt == self._retries:
+                    return response
+            time.sleep(_retry_delay(attempt, self._backoff, response))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+# ----------------------------------------------------------------------
+# Asyncio client
+class _AsyncConnection:
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    parts = []
+    while True:
+        size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+async def _exchange(conn: _AsyncConnection, request: bytes) -> Tuple[_Response, bool]:
+    conn.writer.write(request)
+    await conn.writer.drain()
+    status_line = await conn.reader.readline()
+    if not status_line:
+        raise ConnectionResetError("server closed the connection")
+    version, status, _ = status_line.decode("latin-1").split(" ", 2)
+    headers: Dict[str, str] = {}
+    while True:
+        line = await conn.reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    connection = headers.get("connection", "").lower()
+    will_close = connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive")
+    if "content-length" in headers:
+        body = await conn.reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        body = await _read_chunked(conn.reader)
+    else:
+        body = await conn.reader.read()
+        will_close = True
+    return _decode(int(status), headers, body), will_close
+
+
+class AsyncTokenCounterClient:
+    """Asyncio counterpart of :class:`TokenCounterClient`.
+
+    A client instance must only be used from the event loop it was first
+    used on.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        *,
+        uds: str | None = None,
+        service: TokenService | None = None,
+        pool_size: int = 8,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff: float = 0.05,
+        max_batch: int = 64,
+    ) -> None:
+        self._service = service
+        self._uds = uds
+        self._timeout = timeout
+        self._retries = max(int(retries), 0)
+        self._backoff = backoff
+        self._max_batch = max(int(max_batch), 1)
+        self._batch_supported = True
+        self._lanes: Dict[Hashable, _Lane] = {}
+        # Running drain tasks; the event loop only keeps weak references to tasks.
+        self._drains: Set[asyncio.Task] = set()
+        self._models_cache: Dict[str, Tuple[str, Any]] = {}
+        self._idle: List[_AsyncConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pool_size = max(int(pool_size), 1)
+        self._scheme, self._host, self._port, self._prefix = (
+            ("http", "localhost", 0, "") if service is not None else _parse_base_url(base_url)
+        )
+
+    @classmethod
+    def in_process(cls, registry_path: str | None = None, **kwargs) -> "AsyncTokenCounterClient":
+        """Return a client backed by a local :class:`TokenService`."""
+
+        from .catalog import load_catalog
+
+        return cls(service=TokenService(models=load_catalog(registry_path)), **kwargs)
+
+    # ------------------------------------------------------------------
+    # Public API
+    async def models(
+        self, *, family: str | None = None, provider: str | None = None
+    ) -> List[Dict[str, Any]]:
+        path = _models_path(family, provider)
+        cached = self._models_cache.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = await self._request("GET", path, headers=headers)
+        if response.status == 304 and cached:
+            return cached[1]
+        models = _check(response)["models"]
+        if "etag" in response.headers:
+            self._models_cache[path] = (response.headers["etag"], models)
+        return models
+
+    async def tokenize(
+        self, model: str, text: str, *, mode: str = "exact", include_tokens: bool = False
+    ) -> Dict[str, Any]:
+        """Return the ``/tokenize`` result, batched with concurrent calls for *model*."""
+
+        key = (model, mode, include_tokens)
+        lane = self._lanes.setdefault(key, _Lane())
+        future = asyncio.get_running_loop().create_future()
+        lane.pending.append((text, future))
+        if not lane.busy:
+            lane.busy = True
+            drain = asyncio.ensure_future(self._drain(key, lane))
+            self._drains.add(drain)
+            drain.add_done_callback(self._drains.discard)
+        return await future
+
+    async def count(self, model: str, text: str, *, mode: str = "exact") -> int:
+        return int((await self.tokenize(model, text, mode=mode))["token_count"])
+
+    async def tokenize_many(
+        self,
+        model: str,
+        texts: Sequence[str],
+        *,
+        mode: str = "exact",
+        include_tokens: bool = False,
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(texts), self._max_batch):
+            chunk = list(texts[start : start + self._max_batch])
+            results.extend(await self._send_batch(model, chunk, mode, include_tokens))
+        return results
+
+    async def chat(
+        self,
+        model: str,
+        messages: Sequence[Mapping[str, Any]],
+        *,
+        add_generation_prompt: bool = True,
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "messages": list(messages),
+            "add_generation_prompt": add_generation_prompt,
+        }
+        return _check(await self._request("POST", "/tokenize/chat", payload))
+
+    async def truncate(
+        self, model: str, text: str, max_tokens: int, *, strategy: str = "head"
+    ) -> Dict[str, Any]:
+        payload = {"model": model, "text": text, "max_tokens": max_tokens, "strategy": strategy}
+        return _check(await self._request("POST", "/truncate", payload))
+
+    async def close(self) -> None:
+        """Finish the calls already queued, then close the idle connections."""
+
+        if self._drains:
+            await asyncio.gather(*self._drains, return_exceptions=True)
+        while self._idle:
+            self._idle.pop().close()
+
+    async def __aenter__(self) -> "AsyncTokenCounterClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    # ------------------------------------------------------------------
+    # Batching and transport
+    async def _drain(self, key: Tuple[str, str, bool], lane: _Lane) -> None:
+        """Send everything queued on *lane*, one batch at a time."""
+
+        model, mode, include_tokens = key
+        try:
+            while lane.pending:
+                batch = lane.pending[: self._max_batch]
+                del lane.pending[: self._max_batch]
+                try:
+                    results = await self._send_batch(
+                        model, [text for text, _ in batch], mode, include_tokens
+                    )
+                except BaseException as exc:  # noqa: BLE001 - every waiter must be released
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+                    if isinstance(exc, asyncio.CancelledError):
+                        raise
+                    continue
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            lane.busy = False
+
+    async def _send_batch(
+        self, model: str, texts: List[str], mode: str, include_tokens: bool
+    ) -> List[Dict[str, Any]]:
+        if len(texts) > 1 and self._batch_supported:
+            payload = {
+                "model": model,
+                "texts": texts,
+                "mode": mode,
+                "include_tokens": include_tokens,
+            }
+            response = await self._request("POST", "/tokenize/batch", payload)
+            if not _is_missing_batch_route(response):
+                return _check(response)["results"]
+            self._batch_supported = False
+        results = []
+        for text in texts:
+            payload = {"model": model, "text": text, "mode": mode, "include_tokens": include_tokens}
+            results.append(_check(await self._request("POST", "/tokenize", payload)))
+        return results
+
+    async def _connect(self) -> _AsyncConnection:
+        if self._uds is not None:
+            reader, writer = await asyncio.open_unix_connection(self._uds)
+        else:
+            reader, writer = await asyncio.open_connection(
+                self._host, self._port, ssl=True if self._scheme == "https" else None
+            )
+        return _AsyncConnection(reader, writer)
+
+    async def _exchange(self, request: bytes) -> _Response:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            reused = conn is not None
+            while True:
+                if conn is None:
+                    conn = await self._connect()
+                try:
+                    response, will_close = await asyncio.wait_for(
+                        _exchange(conn, request), self._timeout
+                    )
+                except _RETRY_ERRORS:
+                    conn.close()
+                    if not reused:
+                        raise
+                    conn, reused = None, False
+                    continue
+                except BaseException:
+                    conn.close()
+                    raise
+                break
+            if will_close:
+                conn.close()
+            else:
+                self._idle.append(conn)
+            return response
+
+    async def _request(
+        self, method: str, path: str, payload: Any = None, headers: Dict[str, str] | None = None
+    ) -> _Response:
+        if self._service is not None:
+            return await asyncio.to_thread(_local_call, self._service, method, path, payload)
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request_headers = {
+            "Host": self._host,
+            "Accept-Encoding": "gzip",
+            "Content-Length": str(len(body)),
+            **_model_header(payload),
+            **(headers or {}),
+        }
+        if payload is not None:
+            request_headers["Content-Type"] = "application/json"
+        head = f"{method} {self._prefix}{path} HTTP/1.1\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in request_headers.items()
+        )
+        request = head.encode("latin-1") + b"\r\n" + body
+        for attempt in range(self._retries + 1):
+            response = None
+            try:
+                response = await self._exchange(request)
+            except (*_RETRY_ERRORS, asyncio.TimeoutError):
+                if attempt == self._retries:
+                    raise
+            else:
+                if response.status not in _RETRY_STATUSES or attempt == self._retries:
+                    return response
+            await asyncio.sleep(_retry_delay(attempt, self._backoff, response))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+__all__ = ["AsyncTokenCounterClient", "TokenCounterClient", "TokenCounterError"]
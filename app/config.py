@@ -3,10 +3,11 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 from typing import Iterable, List
 
-from .models import ModelSpec, Pricing, TokenizerSpec
+from .models import ChatTemplate, EstimatorSpec, ModelSpec, Pricing, TokenizerSpec
 
 _DEFAULT_REGISTRY_PATH = Path(__file__).resolve().parent / "resources" / "model_registry.json"
 
@@ -30,6 +31,42 @@ def _parse_tokenizer(spec):
     return TokenizerSpec(type=type_name, options=options)
 
 
+def _parse_chat_template(data):
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise ValueError("Chat template must be a mapping.")
+    message = data.get("message", ChatTemplate.message)
+    roles = data.get("roles", {})
+    if not isinstance(roles, dict):
+        raise ValueError("Chat template roles must be a mapping.")
+    for template in (message, *roles.values()):
+        if not isinstance(template, str) or "{content}" not in template:
+            raise ValueError("Chat message templates must contain a '{content}' placeholder.")
+    return ChatTemplate(
+        message=message,
+        roles=dict(roles),
+        prefix=data.get("prefix", ""),
+        generation_prompt=data.get("generation_prompt", ""),
+    )
+
+
+def _parse_estimator(data):
+    if data is None:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("coefficients"), dict):
+        raise ValueError("Estimator must define a 'coefficients' mapping.")
+    coefficients = {str(name): float(value) for name, value in data["coefficients"].items()}
+    relative_error = float(data.get("relative_error", 0.0))
+    if relative_error < 0:
+        raise ValueError("Estimator 'relative_error' must be non-negative.")
+    return EstimatorSpec(
+        coefficients=coefficients,
+        relative_error=relative_error,
+        samples=int(data.get("samples", 0)),
+    )
+
+
 def load_registry(path: Path | None = None) -> List[ModelSpec]:
     """Load model specifications from a JSON file."""
 
@@ -50,6 +87,8 @@ def load_registry(path: Path | None = None) -> List[ModelSpec]:
             raise ValueError("Model entry must include an 'id'.")
         tokenizer_spec = _parse_tokenizer(item.get("tokenizer"))
         pricing = _parse_pricing(item.get("pricing"))
+        chat_template = _parse_chat_template(item.get("chat_template"))
+        estimator = _parse_estimator(item.get("estimator"))
         models.append(
             ModelSpec(
                 model_id=model_id,
@@ -60,6 +99,30 @@ def load_registry(path: Path | None = None) -> List[ModelSpec]:
                 tokenizer=tokenizer_spec,
                 description=item.get("description"),
                 pricing=pricing,
+                chat_template=chat_template,
+                estimator=estimator,
             )
         )
     return models
+
+
+def update_registry_entry(model_id: str, key: str, value, path: Path | None = None) -> Path:
+    """Set ``key`` on the *model_id* entry of the registry file and rewrite it.
+
+    The file is replaced atomically and keeps the two-space JSON layout of
+    the shipped registry, so the diff only shows the changed entry.
+    """
+
+    target = Path(path) if path else _DEFAULT_REGISTRY_PATH
+    with target.open("r", encoding="utf-8") as stream:
+        raw_data = json.load(stream)
+    for item in raw_data:
+        if isinstance(item, dict) and item.get("id") == model_id:
+            item[key] = value
+            break
+    else:
+        raise KeyError(model_id)
+    partial = target.with_name(target.name + ".partial")
+    partial.write_text(json.dumps(raw_data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(partial, target)
+    return target
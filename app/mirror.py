@@ -0,0 +1,292 @@
+"""Serve cached tokenizer files with the Hugging Face hub URL layout.
+
+``python -m app mirror`` exposes the bundle and download cache directories
+as ``GET /{repo}/resolve/{revision}/{file}``, the URLs
+:class:`~app.tokenizers.huggingface_tokenizer.HuggingFaceTokenizer` and
+other hub clients download from. Point nodes at it with the ``endpoint``
+tokenizer option or ``HF_ENDPOINT`` and the fleet fetches each file from
+huggingface.co once; with no upstream it is an offline stand-in for the hub
+in build sandboxes, tests and benchmarks.
+
+Responses carry a strong ``ETag`` (the SHA-256 of the file) and honour
+``If-None-Match``, single ``Range`` requests and ``If-Range``. With an
+*upstream*, files missing locally are fetched from it, stored in the cache
+and then served, so mirrors can be chained.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from .tokenizers.huggingface_tokenizer import (
+    default_bundle_dir,
+    default_cache_dir,
+    repo_cache_path,
+)
+
+_BLOCK_BYTES = 1 << 20
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+_USER_AGENT = "token-counter-llm-mirror/0.1"
+
+
+class _ETagCache:
+    """SHA-256 ETags of served files, recomputed when a file changes."""
+
+    def __init__(self) -> None:
+        self._tags: Dict[Path, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, stat: os.stat_result) -> str:
+        with self._lock:
+            cached = self._tags.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = hashlib.sha256()
+        with path.open("rb") as stream:
+            for block in iter(lambda: stream.read(_BLOCK_BYTES), b""):
+                digest.update(block)
+        tag = f'"{digest.hexdigest()}"'
+        with self._lock:
+            self._tags[path] = (stat.st_mtime_ns, stat.st_size, tag)
+        return tag
+
+
+def parse_resolve_path(path: str) -> Tuple[str, str, str] | None:
+    """Split ``/{repo}/resolve/{revision}/{file}`` into its parts.
+
+    Returns ``None`` for other paths and for components that could escape
+    the served directories.
+    """
+
+    path = urllib.parse.unquote(path.partition("?")[0]).lstrip("/")
+    repo_id, marker, rest = path.partition("/resolve/")
+    revision, _, filename = rest.partition("/")
+    if not marker or not revision or not filename:
+        return None
+    repo_parts = repo_id.split("/")
+    parts = [*repo_parts, revision, *filename.split("/")]
+    if len(repo_parts) > 2 or any(part in {"", ".", ".."} or "\\" in part for part in parts):
+        return None
+    return repo_id, revision, filename
+
+
+def parse_range(header: str | None, size: int) -> Tuple[int, int] | None | bool:
+    """Return the inclusive byte range of a single-range *header*.
+
+    ``None`` means the whole file (no header, or a form this server does not
+    handle such as multiple ranges); ``False`` means the range cannot be
+    satisfied.
+    """
+
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _fetch_upstream(
+    upstream: str, repo_id: str, revision: str, filename: str, target: Path, timeout: float
+) -> bool:
+    """Download a file from *upstream* into *target*; ``False`` when it does not exist."""
+
+    path = "/".join(urllib.parse.quote(part) for part in (repo_id, "resolve", revision, filename))
+    url = f"{upstream.rstrip('/')}/{path}"
+    headers = {"User-Agent": _USER_AGENT}
+    token = next(
+        (
+            os.getenv(name)
+            for name in ("HUGGINGFACE_TOKEN", "HUGGINGFACEHUB_API_TOKEN", "HF_TOKEN")
+            if os.getenv(name)
+        ),
+        None,
+    )
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(url, headers=headers)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.partial")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            with partial.open("wb") as stream:
+                shutil.copyfileobj(response, stream, _BLOCK_BYTES)
+    except urllib.error.HTTPError as exc:
+        partial.unlink(missing_ok=True)
+        if exc.code in {401, 403, 404}:
+            return False
+        raise
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, target)
+    return True
+
+
+def _build_mirror_handler(
+    roots: Sequence[Path],
+    *,
+    cache_root: Path | None = None,
+    upstream: str | None = None,
+    upstream_timeout: float = 30.0,
+) -> Callable[..., BaseHTTPRequestHandler]:
+    """Return a request handler serving files found under *roots*.
+
+    Upstream downloads are stored under *cache_root* (the first root by
+    default); concurrent requests for the same missing file share one
+    download.
+    """
+
+    roots = [Path(root) for root in roots]
+    store = Path(cache_root) if cache_root else roots[0]
+    etags = _ETagCache()
+    fetch_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+    fetch_guard = threading.Lock()
+
+    def locate(repo_id: str, revision: str, filename: str) -> Optional[Path]:
+        for root in roots:
+            candidate = repo_cache_path(root, repo_id, revision, filename)
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def fetch(repo_id: str, revision: str, filename: str) -> Optional[Path]:
+        key = (repo_id, revision, filename)
+        with fetch_guard:
+            lock = fetch_locks.setdefault(key, threading.Lock())
+        with lock:
+            found = locate(repo_id, revision, filename)
+            if found is not None:
+                return found
+            target = repo_cache_path(store, repo_id, revision, filename)
+            found = _fetch_upstream(
+                upstream, repo_id, revision, filename, target, upstream_timeout
+            )
+            return target if found else None
+
+    class MirrorHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # pragma: no cover - quieter tests
+            return
+
+        def _send_status(self, status: HTTPStatus, headers: dict | None = None) -> None:
+            self.send_response(status.value)
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            if status == HTTPStatus.NOT_MODIFIED:  # no body allowed
+                self.end_headers()
+                return
+            body = f"{status.value} {status.phrase}\n".encode("utf-8")
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_HEAD(self):  # noqa: N802 - required by BaseHTTPRequestHandler
+            self.do_GET()
+
+        def do_GET(self):  # noqa: N802 - required by BaseHTTPRequestHandler
+            parts = parse_resolve_path(self.path)
+            if parts is None:
+                self._send_status(HTTPStatus.NOT_FOUND)
+                return
+            path = locate(*parts)
+            if path is None and upstream:
+                try:
+                    path = fetch(*parts)
+                except (OSError, urllib.error.URLError):
+                    self._send_status(HTTPStatus.BAD_GATEWAY)
+                    return
+            if path is None:
+                self._send_status(HTTPStatus.NOT_FOUND)
+                return
+
+            stat = path.stat()
+            etag = etags.get(path, stat)
+            headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+            if etag in {tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")}:
+                self._send_status(HTTPStatus.NOT_MODIFIED, headers)
+                return
+            size = stat.st_size
+            if_range = self.headers.get("If-Range")
+            byte_range = None if if_range and if_range != etag else parse_range(
+                self.headers.get("Range"), size
+            )
+            if byte_range is False:
+                headers["Content-Range"] = f"bytes */{size}"
+                self._send_status(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers)
+                return
+
+            start, end = byte_range or (0, size - 1)
+            length = end - start + 1
+            status = HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK
+            self.send_response(status.value)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(max(length, 0)))
+            self.end_headers()
+            if self.command == "HEAD" or length <= 0:
+                return
+            with path.open("rb") as stream:
+                stream.seek(start)
+                remaining = length
+                while remaining:
+                    block = stream.read(min(remaining, _BLOCK_BYTES))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+
+    return MirrorHandler
+
+
+def serve_mirror(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    *,
+    cache_dir: str | Path | None = None,
+    bundle_dir: str | Path | None = None,
+    upstream: str | None = None,
+) -> None:
+    """Serve the bundle and cache directories until interrupted.
+
+    Files are looked up in the bundle directory first, then the cache
+    directory, which also receives files fetched from *upstream*.
+    """
+
+    cache_root = Path(cache_dir).expanduser() if cache_dir else default_cache_dir()
+    bundle_root = Path(bundle_dir).expanduser() if bundle_dir else default_bundle_dir()
+    handler = _build_mirror_handler(
+        [bundle_root, cache_root], cache_root=cache_root, upstream=upstream
+    )
+    handler.disable_nagle_algorithm = True
+    with ThreadingHTTPServer((host, port), handler) as httpd:
+        httpd.serve_forever()
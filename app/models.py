@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 
@@ -23,6 +24,20 @@ class Pricing:
             "output_per_1k": self.output_per_1k,
         }
 
+    def input_cost(self, tokens: int) -> Optional[float]:
+        """Return the cost of *tokens* prompt tokens, or ``None`` if unpriced."""
+
+        if self.input_per_1k is None:
+            return None
+        return (tokens / 1000) * self.input_per_1k
+
+    def output_cost(self, tokens: int) -> Optional[float]:
+        """Return the cost of *tokens* completion tokens, or ``None`` if unpriced."""
+
+        if self.output_per_1k is None:
+            return None
+        return (tokens / 1000) * self.output_per_1k
+
 
 @dataclass(frozen=True)
 class TokenizerSpec:
@@ -34,6 +49,65 @@ class TokenizerSpec:
     def to_dict(self) -> Dict[str, Any]:
         return {"type": self.type, "options": dict(self.options)}
 
+    def identity(self) -> str:
+        """Return a canonical string identifying this tokenizer configuration."""
+
+        return json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False, default=str)
+
+
+@dataclass(frozen=True)
+class ChatTemplate:
+    """Prompt format used to render chat messages for a model.
+
+    ``message`` is applied to every message unless ``roles`` declares a
+    role-specific format. Formats use ``{role}`` and ``{content}``
+    placeholders. ``prefix`` is emitted once before the first message and
+    ``generation_prompt`` once after the last one.
+    """
+
+    message: str = "{role}: {content}\n"
+    roles: Dict[str, str] = field(default_factory=dict)
+    prefix: str = ""
+    generation_prompt: str = ""
+
+    def render_message(self, role: str, content: str) -> str:
+        template = self.roles.get(role, self.message)
+        # Substitute the role first so placeholders inside user content are left untouched.
+        head, _, tail = template.replace("{role}", role).partition("{content}")
+        return f"{head}{content}{tail}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"message": self.message}
+        if self.roles:
+            data["roles"] = dict(self.roles)
+        if self.prefix:
+            data["prefix"] = self.prefix
+        if self.generation_prompt:
+            data["generation_prompt"] = self.generation_prompt
+        return data
+
+
+@dataclass(frozen=True)
+class EstimatorSpec:
+    """Calibrated coefficients for fast token count estimation.
+
+    ``coefficients`` maps character-class feature names (see
+    :mod:`app.services.estimation`) plus ``intercept`` to weights;
+    ``relative_error`` is the standard deviation of the relative error
+    observed during calibration.
+    """
+
+    coefficients: Dict[str, float]
+    relative_error: float
+    samples: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "coefficients": dict(self.coefficients),
+            "relative_error": self.relative_error,
+            "samples": self.samples,
+        }
+
 
 @dataclass(frozen=True)
 class ModelSpec:
@@ -47,6 +121,8 @@ class ModelSpec:
     tokenizer: TokenizerSpec
     description: Optional[str] = None
     pricing: Optional[Pricing] = None
+    chat_template: Optional[ChatTemplate] = None
+    estimator: Optional[EstimatorSpec] = None
 
     def to_dict(self) -> Dict[str, Any]:
         data = {
@@ -61,4 +137,8 @@ class ModelSpec:
             data["description"] = self.description
         if self.pricing:
             data["pricing"] = self.pricing.to_dict()
+        if self.chat_template:
+            data["chat_template"] = self.chat_template.to_dict()
+        if self.estimator:
+            data["estimator"] = self.estimator.to_dict()
         return data
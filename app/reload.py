@@ -0,0 +1,117 @@
+"""Hot reloading of the model registry into a running :class:`TokenService`."""
+
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .catalog import load_catalog
+from .config import _DEFAULT_REGISTRY_PATH
+from .services.token_service import TokenService
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryReloader:
+    """Re-read ``model_registry.json`` and swap it into *service*.
+
+    Parsing and validation happen in the caller's thread (the polling
+    thread, the SIGHUP worker or the admin request), never on the regular
+    request path. A file that fails to parse leaves the current registry in
+    place.
+    """
+
+    def __init__(self, service: TokenService, path: str | Path | None = None) -> None:
+        self._service = service
+        self._path = Path(path) if path else _DEFAULT_REGISTRY_PATH
+        self._lock = threading.Lock()
+        self._signature = self._current_signature()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_result: Dict[str, object] | None = None
+        self.last_error: str | None = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _current_signature(self) -> Tuple[int, int] | None:
+        try:
+            stat = self._path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self) -> Dict[str, object]:
+        """Parse the registry file and swap it in; raises if the file is invalid."""
+
+        with self._lock:
+            signature = self._current_signature()
+            try:
+                catalog = load_catalog(self._path)
+            except (OSError, ValueError, TypeError, KeyError) as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                raise
+            result = self._service.reload(catalog)
+            self._signature = signature
+            self.last_result = result
+            self.last_error = None
+            logger.info("Reloaded model registry from %s: %s", self._path, result)
+            return result
+
+    def reload_if_changed(self) -> Dict[str, object] | None:
+        """Reload when the file's mtime or size changed since the last reload."""
+
+        if self._current_signature() == self._signature:
+            return None
+        try:
+            return self.reload()
+        except (OSError, ValueError, TypeError, KeyError):
+            logger.exception("Ignoring invalid model registry %s", self._path)
+            # Remember the broken version so it is not re-parsed every poll.
+            self._signature = self._current_signature()
+            return None
+
+    def start_polling(self, interval: float = 2.0) -> None:
+        """Check the registry file for changes every *interval* seconds."""
+
+        if self._thread is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._thread = threading.Thread(target=run, name="registry-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def install_signal_handler(self, signum: int | None = None) -> bool:
+        """Reload on SIGHUP (or *signum*); returns ``False`` where unsupported."""
+
+        signum = signum if signum is not None else getattr(signal, "SIGHUP", None)
+        if signum is None or threading.current_thread() is not threading.main_thread():
+            return False
+
+        def handle(_signum, _frame) -> None:
+            # Keep the signal handler short: parse in a worker thread.
+            threading.Thread(
+                target=self._reload_logged, name="registry-reload", daemon=True
+            ).start()
+
+        signal.signal(signum, handle)
+        return True
+
+    def _reload_logged(self) -> None:
+        try:
+            self.reload()
+        except (OSError, ValueError, TypeError, KeyError):
+            logger.exception("Ignoring invalid model registry %s", self._path)
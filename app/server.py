@@ -2,19 +2,43 @@
 
 from __future__ import annotations
 
+import codecs
+import gzip
+import hmac
+import itertools
 import json
+import os
+import socket
+import socketserver
+import stat
+import urllib.parse
 from http import HTTPStatus
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterable, Iterator, Optional
 
-from .config import load_registry
+from .catalog import _accepts_gzip, load_catalog, models_response
+from .reload import RegistryReloader
+from .services.admission import AdmissionController, AdmissionLimits, Rejection
+from .services.capture import CaptureWriter
+from .services.coalescer import BatchCoalescer
+from .services.count_index import CountIndex
+from .services.memory import memory_report
+from .services.readiness import Readiness
 from .services.token_service import ModelNotFoundError, TokenService
 from .tokenizers.huggingface_tokenizer import (
     MissingDependencyError,
     TokenizerDownloadError,
 )
 from .tokenizers.registry import TokenizerRegistry
+from .tokenizers.segmentation import DEFAULT_MAX_RUN
+
+_SERVICE_ERRORS = (
+    ModelNotFoundError,
+    ValueError,
+    MissingDependencyError,
+    TokenizerDownloadError,
+)
 
 
 def _load_frontend_html() -> str:
@@ -31,26 +55,66 @@ INDEX_HTML = _load_frontend_html()
 
 _CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
-    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match, X-Model",
     "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Expose-Headers": "ETag, Retry-After",
 }
 
+# JSON bodies smaller than this are not worth compressing.
+_GZIP_MIN_BYTES = 1024
+# Rejected bodies up to this size are drained to keep the connection alive;
+# larger ones are never read and the connection is closed instead.
+_DRAIN_MAX_BYTES = 64 * 1024
+# Routes whose work is weighed by admission control.
+_ADMITTED_ROUTES = {"/tokenize", "/tokenize/batch", "/tokenize/chat", "/truncate", "/chunk"}
+# Plain-text ``/chunk`` bodies are read and decoded in blocks of this size.
+_STREAM_BLOCK_BYTES = 256 * 1024
+
+
+def _build_handler(
+    service: TokenService,
+    *,
+    reloader: Optional[RegistryReloader] = None,
+    admin_token: str | None = None,
+    admission: Optional[AdmissionController] = None,
+    client_header: str | None = None,
+    readiness: Optional[Readiness] = None,
+    capture: Optional[CaptureWriter] = None,
+) -> Callable[..., BaseHTTPRequestHandler]:
+    if readiness is None:
+        readiness = Readiness(service, admission=admission)
 
-def _build_handler(service: TokenService) -> Callable[..., BaseHTTPRequestHandler]:
     class TokenCounterHandler(BaseHTTPRequestHandler):
         def _write_common_headers(self) -> None:
             for header, value in _CORS_HEADERS.items():
                 self.send_header(header, value)
 
-        def _send_json(self, status: HTTPStatus, payload) -> None:
+        def _send_json(self, status: HTTPStatus, payload, headers: dict | None = None) -> None:
             body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
             self.send_response(status.value)
             self._write_common_headers()
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
             self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Vary", "Accept-Encoding")
+            accept_encoding = self.headers.get("Accept-Encoding")
+            if len(body) >= _GZIP_MIN_BYTES and _accepts_gzip(accept_encoding):
+                body = gzip.compress(body, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
             self.send_header("Content-Length", str(len(body)))
             self.end_headers()
             self.wfile.write(body)
 
+        def _send_bytes(self, status: HTTPStatus, headers: dict, body: bytes) -> None:
+            self.send_response(status.value)
+            self._write_common_headers()
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
         def _send_html(self, status: HTTPStatus, body: str) -> None:
             payload = body.encode("utf-8")
             self.send_response(status.value)
@@ -70,53 +134,538 @@ def _build_handler(service: TokenService) -> Callable[..., BaseHTTPRequestHandle
             self.end_headers()
 
         def do_GET(self):  # noqa: N802 - required by BaseHTTPRequestHandler
-            path = self.path.split("?", 1)[0]
+            path, _, query = self.path.partition("?")
             if path in {"", "/", "/index.html"}:
                 self._send_html(HTTPStatus.OK, INDEX_HTML)
+            elif path.rstrip("/") == "/metrics":
+                metrics = service.metrics()
+                if admission is not None:
+                    metrics["admission"] = admission.metrics()
+                if capture is not None:
+                    metrics["capture"] = capture.stats()
+                self._send_json(HTTPStatus.OK, metrics)
+            elif path.rstrip("/") == "/healthz":
+                self._send_json(HTTPStatus.OK, {"status": "ok"})
+            elif path.rstrip("/") == "/readyz":
+                report = readiness.readiness()
+                status = HTTPStatus.OK if report["ready"] else HTTPStatus.SERVICE_UNAVAILABLE
+                self._send_json(status, report)
+            elif path.rstrip("/") == "/status":
+                self._send_json(HTTPStatus.OK, readiness.status())
+            elif path.rstrip("/") == "/debug/memory":
+                if not self._admin_authorized():
+                    return
+                try:
+                    top = _int_param(urllib.parse.parse_qs(query).get("top", ["0"])[-1], "top")
+                except ValueError as exc:
+                    self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+                    return
+                self._send_json(HTTPStatus.OK, memory_report(service, top=max(top, 0)))
             elif path.rstrip("/") == "/models":
-                self._send_json(HTTPStatus.OK, {"models": service.list_models()})
+                response = models_response(
+                    service.catalog,
+                    urllib.parse.parse_qs(query),
+                    if_none_match=self.headers.get("If-None-Match"),
+                    accept_encoding=self.headers.get("Accept-Encoding"),
+                )
+                self._send_bytes(response.status, response.headers, response.body)
             else:
                 self._send_json(HTTPStatus.NOT_FOUND, {"error": "unknown endpoint"})
 
-        def do_POST(self):  # noqa: N802 - required by BaseHTTPRequestHandler
-            if self.path.rstrip("/") != "/tokenize":
-                self._send_json(HTTPStatus.NOT_FOUND, {"error": "unknown endpoint"})
-                return
+        def _body_length(self) -> int | None:
+            """Return the declared ``Content-Length`` (0 when absent), ``None`` if invalid."""
 
-            content_length = int(self.headers.get("Content-Length", "0"))
+            value = self.headers.get("Content-Length", "0").strip()
+            if not (value.isascii() and value.isdigit()):
+                return None
+            return int(value)
+
+        def _read_json_body(self):
+            content_length = self._length
             raw_body = self.rfile.read(content_length) if content_length else b""
             try:
-                payload = json.loads(raw_body.decode("utf-8")) if raw_body else {}
+                return json.loads(raw_body.decode("utf-8")) if raw_body else {}
             except json.JSONDecodeError:
                 self._send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid json"})
+                return None
+
+        def _text_blocks(self):
+            """Yield the unread request body as UTF-8 text, one block at a time."""
+
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            while self._unread > 0:
+                data = self.rfile.read(min(self._unread, _STREAM_BLOCK_BYTES))
+                if not data:
+                    break
+                self._unread -= len(data)
+                yield decoder.decode(data, final=self._unread == 0)
+
+        def _send_error(self, model_id: str, exc: Exception) -> None:
+            if isinstance(exc, ModelNotFoundError):
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"unknown model '{model_id}'"})
+            elif isinstance(exc, ValueError):
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            else:
+                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)})
+
+        def _run(self, model_id: str, operation: Callable[[], dict]) -> None:
+            try:
+                result = operation()
+            except _SERVICE_ERRORS as exc:
+                self._send_error(model_id, exc)
                 return
 
+            self._send_json(HTTPStatus.OK, result)
+
+        def _run_stream(self, model_id: str, operation: Callable[[], Iterator[dict]]) -> None:
+            """Stream the items of *operation* as NDJSON.
+
+            The first item is produced before the status line is sent, so
+            validation and tokenizer errors still map to their status codes;
+            a later failure ends the stream with an ``{"error": ...}`` line.
+            """
+
+            try:
+                items = operation()
+                first = next(items, None)
+            except _SERVICE_ERRORS as exc:
+                self._send_error(model_id, exc)
+                return
+
+            chunked = self.request_version == "HTTP/1.1"
+            self.send_response(HTTPStatus.OK.value)
+            self._write_common_headers()
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            if chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+            else:
+                self.close_connection = True
+                self.send_header("Connection", "close")
+            self.end_headers()
+
+            def write(item: dict) -> None:
+                line = json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+                if chunked:
+                    line = b"%x\r\n%s\r\n" % (len(line), line)
+                self.wfile.write(line)
+
+            try:
+                for item in itertools.chain(() if first is None else (first,), items):
+                    write(item)
+            except _SERVICE_ERRORS as exc:
+                write({"error": str(exc)})
+            finally:
+                if chunked:
+                    self.wfile.write(b"0\r\n\r\n")
+
+        def _handle_tokenize(self, payload) -> None:
             model_id = payload.get("model") or payload.get("model_id")
             text = payload.get("text", "")
+            query = urllib.parse.parse_qs(self.path.partition("?")[2])
+            mode = query.get("mode", [payload.get("mode", "exact")])[0]
+            include_tokens = bool(payload.get("include_tokens", True))
             if not model_id:
                 self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'model' is required"})
                 return
 
-            try:
-                result = service.calculate(model_id=model_id, text=text)
-            except ModelNotFoundError:
-                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"unknown model '{model_id}'"})
+            self._run(
+                model_id,
+                lambda: service.calculate(
+                    model_id=model_id, text=text, mode=mode, include_tokens=include_tokens
+                ),
+            )
+
+        def _handle_tokenize_batch(self, payload) -> None:
+            model_id = payload.get("model") or payload.get("model_id")
+            texts = payload.get("texts")
+            mode = payload.get("mode", "exact")
+            include_tokens = bool(payload.get("include_tokens", True))
+            if not model_id:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'model' is required"})
                 return
-            except (MissingDependencyError, TokenizerDownloadError) as exc:
-                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)})
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                self._send_json(
+                    HTTPStatus.BAD_REQUEST, {"error": "'texts' must be a list of strings"}
+                )
                 return
 
+            self._run(
+                model_id,
+                lambda: {
+                    "results": service.calculate_many(
+                        model_id=model_id, texts=texts, mode=mode, include_tokens=include_tokens
+                    )
+                },
+            )
+
+        def _handle_chat(self, payload) -> None:
+            model_id = payload.get("model") or payload.get("model_id")
+            messages = payload.get("messages")
+            add_generation_prompt = bool(payload.get("add_generation_prompt", True))
+            if not model_id:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'model' is required"})
+                return
+            if not isinstance(messages, list):
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'messages' must be a list"})
+                return
+
+            self._run(
+                model_id,
+                lambda: service.calculate_chat(
+                    model_id=model_id,
+                    messages=messages,
+                    add_generation_prompt=add_generation_prompt,
+                ),
+            )
+
+        def _handle_truncate(self, payload) -> None:
+            model_id = payload.get("model") or payload.get("model_id")
+            text = payload.get("text", "")
+            max_tokens = payload.get("max_tokens")
+            strategy = payload.get("strategy", "head")
+            if not model_id:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'model' is required"})
+                return
+            if not isinstance(max_tokens, int) or isinstance(max_tokens, bool):
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'max_tokens' must be an integer"})
+                return
+
+            self._run(
+                model_id,
+                lambda: service.truncate(
+                    model_id=model_id, text=text, max_tokens=max_tokens, strategy=strategy
+                ),
+            )
+
+        def _handle_chunk(self, payload) -> None:
+            model_id = payload.get("model") or payload.get("model_id")
+            text = payload.get("text", "")
+            snap = payload.get("snap", "none")
+            if not model_id:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "'model' is required"})
+                return
+            try:
+                max_tokens = _int_param(payload.get("max_tokens", 512), "max_tokens")
+                overlap = _int_param(payload.get("overlap", 0), "overlap")
+            except ValueError as exc:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+                return
+
+            self._run_stream(
+                model_id,
+                lambda: service.chunk(
+                    model_id=model_id,
+                    text=text,
+                    max_tokens=max_tokens,
+                    overlap=overlap,
+                    snap=snap,
+                ),
+            )
+
+        def _admin_authorized(self, available: bool = True) -> bool:
+            """Check the bearer admin token, answering 404/401 when it does not match."""
+
+            if not available or not admin_token:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": "unknown endpoint"})
+                return False
+            supplied = self.headers.get("Authorization", "").encode("utf-8")
+            if not hmac.compare_digest(supplied, f"Bearer {admin_token}".encode("utf-8")):
+                self._send_json(HTTPStatus.UNAUTHORIZED, {"error": "invalid admin token"})
+                return False
+            return True
+
+        def _handle_admin_reload(self, _payload) -> None:
+            if not self._admin_authorized(reloader is not None):
+                return
+            try:
+                result = reloader.reload()
+            except (OSError, ValueError, TypeError, KeyError) as exc:
+                self._send_json(
+                    HTTPStatus.UNPROCESSABLE_ENTITY, {"error": f"registry not reloaded: {exc}"}
+                )
+                return
             self._send_json(HTTPStatus.OK, result)
 
+        def do_POST(self):  # noqa: N802 - required by BaseHTTPRequestHandler
+            routes = {
+                "/admin/reload": self._handle_admin_reload,
+                "/tokenize": self._handle_tokenize,
+                "/tokenize/batch": self._handle_tokenize_batch,
+                "/tokenize/chat": self._handle_chat,
+                "/truncate": self._handle_truncate,
+                "/chunk": self._handle_chunk,
+            }
+            path, _, query = self.path.partition("?")
+            route = routes.get(path.rstrip("/"))
+            if route is None:
+                # Drain a small body so a kept-alive connection stays in sync.
+                length = self._body_length()
+                if length is not None and length <= _DRAIN_MAX_BYTES:
+                    self.rfile.read(length)
+                else:
+                    self.close_connection = True
+                headers = {"Connection": "close"} if self.close_connection else {}
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": "unknown endpoint"}, headers)
+                return
+
+            ticket = None
+            admitted_route = path.rstrip("/") in _ADMITTED_ROUTES
+            length = self._body_length()
+            if length is None or (admitted_route and "Content-Length" not in self.headers):
+                # The body cannot be skipped without its size; drop the connection.
+                self.close_connection = True
+                status = HTTPStatus.BAD_REQUEST if length is None else HTTPStatus.LENGTH_REQUIRED
+                self._send_json(
+                    status,
+                    {"error": "a valid Content-Length header is required"},
+                    {"Connection": "close"},
+                )
+                return
+            self._length = length
+            if admission is not None and admitted_route:
+                ticket = admission.admit(
+                    self._client_id(),
+                    length,
+                    urllib.parse.parse_qs(query).get("model", [self.headers.get("X-Model")])[0],
+                )
+                if isinstance(ticket, Rejection):
+                    self._send_rejection(ticket)
+                    return
+            self._unread = 0
+            if admitted_route:
+                readiness.enter()
+            try:
+                content_type = self.headers.get("Content-Type", "")
+                if path.rstrip("/") == "/chunk" and content_type.startswith("text/plain"):
+                    # Raw text is chunked while it is read; options come from the query.
+                    payload = {
+                        key: values[-1] for key, values in urllib.parse.parse_qs(query).items()
+                    }
+                    self._unread = length
+                    if capture is not None and admitted_route:
+                        # The streamed text is not kept; replay fills in its size.
+                        capture.record(path.rstrip("/"), {**payload, "text": {"n": self._unread}})
+                    payload["text"] = self._text_blocks()
+                else:
+                    payload = self._read_json_body()
+                    if capture is not None and admitted_route and isinstance(payload, dict):
+                        # Query options (``?mode=``) win over the body, as in the handlers.
+                        params = {
+                            key: values[0] for key, values in urllib.parse.parse_qs(query).items()
+                        }
+                        capture.record(path.rstrip("/"), {**payload, **params})
+                if payload is None:
+                    return
+                route(payload)
+            finally:
+                if admitted_route:
+                    readiness.leave()
+                if ticket is not None:
+                    admission.release(ticket)
+                if self._unread:
+                    # The handler stopped before the body ended (an error).
+                    if self._unread <= _DRAIN_MAX_BYTES:
+                        self.rfile.read(self._unread)
+                    else:
+                        self.close_connection = True
+
+        def _client_id(self) -> str:
+            if client_header:
+                supplied = self.headers.get(client_header)
+                if supplied:
+                    return supplied
+            return str(self.client_address[0])
+
+        def _send_rejection(self, rejection: Rejection) -> None:
+            length = self._length
+            if length <= _DRAIN_MAX_BYTES:
+                self.rfile.read(length)
+            else:
+                self.close_connection = True
+            headers = {"Connection": "close"} if self.close_connection else {}
+            if rejection.retry_after is not None:
+                headers["Retry-After"] = str(rejection.retry_after)
+            self._send_json(
+                rejection.status,
+                {"error": rejection.message, "reason": rejection.reason},
+                headers,
+            )
+
     return TokenCounterHandler
 
 
-def serve(host: str = "127.0.0.1", port: int = 8000) -> None:
-    """Start a blocking HTTP server."""
+def _int_param(value, name: str) -> int:
+    """Accept JSON integers and the decimal strings of query parameters."""
+
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'{name}' must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer") from None
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Unlink *path* if it is a socket nobody is listening on.
+
+    Raises :class:`OSError` when another server still accepts connections on
+    it and :class:`FileExistsError` when the path is not a socket at all.
+    """
+
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"{path} is in use by another server")
+
+
+class UnixSocketHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server listening on a Unix domain socket.
+
+    A stale socket file left behind by a crashed server is removed before
+    binding; the socket is created with *mode* permissions and unlinked
+    again on :meth:`server_close`.
+    """
+
+    address_family = socket.AF_UNIX
+
+    def __init__(self, path: str | Path, handler, *, mode: int = 0o660) -> None:
+        self._socket_mode = mode
+        path = os.fspath(path)
+        _remove_stale_socket(path)
+        super().__init__(path, handler)
+
+    def server_bind(self) -> None:
+        # HTTPServer.server_bind resolves the host name, which is meaningless here.
+        previous = os.umask(0o777 & ~self._socket_mode)
+        try:
+            socketserver.TCPServer.server_bind(self)
+        finally:
+            os.umask(previous)
+        os.chmod(self.server_address, self._socket_mode)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def get_request(self):
+        request, _ = self.socket.accept()
+        # AF_UNIX peers have no address; give handlers a (host, port) pair.
+        return request, (self.server_address, 0)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    *,
+    registry_path: str | Path | None = None,
+    reload_interval: float | None = None,
+    admin_token: str | None = None,
+    coalesce_window_ms: float | None = None,
+    coalesce_max_batch: int = 32,
+    uds: str | Path | None = None,
+    uds_mode: int = 0o660,
+    count_index: str | Path | None = None,
+    count_index_max_bytes: int = 256 * 1024 * 1024,
+    admission: AdmissionLimits | None = None,
+    client_header: str | None = None,
+    cpu_budget_ms: float | None = None,
+    max_run: int = DEFAULT_MAX_RUN,
+    warm: Iterable[str] | None = (),
+    ready_max_inflight: int | None = None,
+    capture: CaptureWriter | None = None,
+) -> None:
+    """Start a blocking HTTP server handling each request in its own thread.
+
+    Connections are kept alive (HTTP/1.1). With *uds*, the server listens
+    on that Unix domain socket, created with *uds_mode* permissions, instead
+    of *host*/*port*.
+
+    The registry is reloaded on SIGHUP, every *reload_interval* seconds when
+    the file changed, and on ``POST /admin/reload`` when *admin_token* is set.
+    With *coalesce_window_ms*, concurrent ``/tokenize`` calls for the same
+    tokenizer are micro-batched (see :class:`BatchCoalescer`). With
+    *count_index*, count-only requests reuse counts stored in that SQLite
+    file by earlier runs and other processes (see :class:`CountIndex`).
+    With *admission*, tokenization requests are weighed against those limits
+    before their body is read (see :class:`AdmissionController`); clients are
+    identified by their address, or by the *client_header* set by a trusted
+    gateway. Single-class runs longer than *max_run* characters are counted
+    in pieces (see :func:`split_long_runs`), and with *cpu_budget_ms*,
+    piecewise counting stops with a 400 once a request used that much CPU.
+
+    The tokenizers of the *warm* models (``None`` for all of them) are loaded
+    in the background from startup; ``/readyz`` answers 503 until they are,
+    and while *ready_max_inflight* tokenization requests are running or the
+    admission budget is nearly spent (see :class:`Readiness`). With
+    *capture*, a sample of tokenization requests is logged for
+    ``python -m app replay`` (see :class:`CaptureWriter`); the log is
+    flushed when the server stops.
+    """
 
     registry = TokenizerRegistry()
-    models = load_registry()
-    service = TokenService(models=models, registry=registry)
-    handler = _build_handler(service)
-    with HTTPServer((host, port), handler) as httpd:
-        httpd.serve_forever()
+    path = Path(registry_path) if registry_path else None
+    coalescer = None
+    if coalesce_window_ms is not None:
+        coalescer = BatchCoalescer(window_ms=coalesce_window_ms, max_batch=coalesce_max_batch)
+    index = CountIndex(count_index, max_bytes=count_index_max_bytes) if count_index else None
+    service = TokenService(
+        models=load_catalog(path),
+        registry=registry,
+        coalescer=coalescer,
+        count_index=index,
+        max_run=max_run,
+        cpu_budget=cpu_budget_ms / 1000 if cpu_budget_ms else None,
+    )
+    reloader = RegistryReloader(service, path)
+    reloader.install_signal_handler()
+    if reload_interval:
+        reloader.start_polling(reload_interval)
+    for model_id in warm or ():
+        service.get_model(model_id)  # fail at startup on a misspelt warm-up model
+    controller = AdmissionController(admission) if admission is not None else None
+    readiness = Readiness(
+        service, warm=warm, admission=controller, max_inflight=ready_max_inflight
+    )
+    readiness.start_warming()
+    handler = _build_handler(
+        service,
+        reloader=reloader,
+        admin_token=admin_token,
+        admission=controller,
+        client_header=client_header,
+        readiness=readiness,
+        capture=capture,
+    )
+    handler.protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY a kept-alive
+    # TCP connection stalls on delayed ACKs.
+    handler.disable_nagle_algorithm = uds is None
+    try:
+        if uds is not None:
+            httpd = UnixSocketHTTPServer(uds, handler, mode=uds_mode)
+        else:
+            httpd = ThreadingHTTPServer((host, port), handler)
+        with httpd:
+            httpd.serve_forever()
+    finally:
+        reloader.stop()
+        if index is not None:
+            index.close()
+        if capture is not None:
+            capture.close()
@@ -1,5 +1,6 @@
 """Service layer for the LLM token counter."""
 
+from .async_service import AsyncTokenService
 from .token_service import ModelNotFoundError, TokenService
 
-__all__ = ["ModelNotFoundError", "TokenService"]
+__all__ = ["AsyncTokenService", "ModelNotFoundError", "TokenService"]
@@ -0,0 +1,219 @@
+"""Cost-aware admission control for the HTTP server.
+
+Every request is weighed before its body is read: the cost is the declared
+``Content-Length`` times a per-model weight. A request is rejected when it
+would push the server's total in-flight cost over a global cap (503), when
+its client already has too many requests running or has spent its byte-rate
+budget (429), or when the body alone exceeds the size limit (413). Rejections
+carry a ``Retry-After`` hint so well-behaved callers back off instead of
+piling on.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Callable, Dict, Optional
+
+_MIB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class AdmissionLimits:
+    """Budgets enforced by :class:`AdmissionController`.
+
+    Costs are measured in weighted body bytes. ``model_weights`` scales the
+    cost of models whose tokenizers are slower than average; unknown models
+    weigh ``default_weight``.
+    """
+
+    max_inflight_cost: float = 64 * _MIB
+    max_body_bytes: int = 64 * _MIB
+    client_concurrency: int = 8
+    client_bytes_per_second: float = 16 * _MIB
+    client_burst_bytes: float = 64 * _MIB
+    model_weights: Dict[str, float] = field(default_factory=dict)
+    default_weight: float = 1.0
+    retry_after: float = 1.0
+    max_clients: int = 10_000
+
+    def __post_init__(self) -> None:
+        if self.max_inflight_cost <= 0 or self.max_body_bytes <= 0:
+            raise ValueError("admission byte limits must be positive")
+        if self.client_concurrency <= 0:
+            raise ValueError("'client_concurrency' must be positive")
+        if self.client_bytes_per_second <= 0 or self.client_burst_bytes <= 0:
+            raise ValueError("client byte-rate budgets must be positive")
+        if any(weight <= 0 for weight in self.model_weights.values()):
+            raise ValueError("model weights must be positive")
+
+
+@dataclass(frozen=True)
+class Ticket:
+    """Work admitted by :meth:`AdmissionController.admit`; pass it to ``release``."""
+
+    client: str
+    cost: float
+
+
+@dataclass(frozen=True)
+class Rejection:
+    """Why a request was turned away and when it may be retried."""
+
+    status: HTTPStatus
+    reason: str
+    retry_after: Optional[int]
+
+    @property
+    def message(self) -> str:
+        return _MESSAGES[self.reason]
+
+
+_MESSAGES = {
+    "invalid_length": "Content-Length must be a non-negative integer",
+    "too_large": "request body exceeds the size limit",
+    "overloaded": "server is at capacity, retry later",
+    "client_concurrency": "too many concurrent requests from this client",
+    "client_rate": "client byte-rate budget exhausted",
+}
+
+
+class _Client:
+    __slots__ = ("active", "tokens", "updated")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.active = 0
+        self.tokens = tokens
+        self.updated = now
+
+
+class AdmissionController:
+    """Admit or reject requests against global and per-client budgets.
+
+    Each client has a token bucket refilled at ``client_bytes_per_second``
+    up to ``client_burst_bytes``; admitting a request takes its cost from the
+    bucket, which may go negative for a single oversized request so that it
+    is admitted once the bucket is full and later requests wait out the debt.
+    A request is always admitted when nothing else is in flight, so a single
+    body within ``max_body_bytes`` can never be rejected as overload forever.
+    """
+
+    def __init__(
+        self,
+        limits: AdmissionLimits | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limits = limits or AdmissionLimits()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._clients: Dict[str, _Client] = {}
+        self._inflight = 0
+        self._inflight_cost = 0.0
+        self._peak_cost = 0.0
+        self._admitted = 0
+        self._admitted_bytes = 0
+        self._rejected: Dict[str, int] = dict.fromkeys(_MESSAGES, 0)
+        self._rejected_bytes = 0
+
+    def cost(self, body_bytes: int, model_id: str | None) -> float:
+        weight = self.limits.model_weights.get(model_id or "", self.limits.default_weight)
+        return int(body_bytes) * weight
+
+    def admit(
+        self, client: str, body_bytes: int, model_id: str | None = None
+    ) -> Ticket | Rejection:
+        """Return a :class:`Ticket` for admitted work or a :class:`Rejection`."""
+
+        limits = self.limits
+        if body_bytes < 0:
+            return self._reject("invalid_length", HTTPStatus.BAD_REQUEST, None, 0)
+        if body_bytes > limits.max_body_bytes:
+            too_large = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+            return self._reject("too_large", too_large, None, body_bytes)
+        cost = self.cost(body_bytes, model_id)
+        with self._lock:
+            now = self._clock()
+            state = self._client(client, now)
+            retry_after = limits.retry_after
+            if self._inflight and self._inflight_cost + cost > limits.max_inflight_cost:
+                rejection = ("overloaded", HTTPStatus.SERVICE_UNAVAILABLE, retry_after)
+            elif state.active >= limits.client_concurrency:
+                rejection = ("client_concurrency", HTTPStatus.TOO_MANY_REQUESTS, retry_after)
+            elif state.tokens < min(cost, limits.client_burst_bytes):
+                wait = min(cost, limits.client_burst_bytes) - state.tokens
+                rejection = (
+                    "client_rate",
+                    HTTPStatus.TOO_MANY_REQUESTS,
+                    wait / limits.client_bytes_per_second,
+                )
+            else:
+                state.active += 1
+                state.tokens -= cost
+                self._inflight += 1
+                self._inflight_cost += cost
+                self._peak_cost = max(self._peak_cost, self._inflight_cost)
+                self._admitted += 1
+                self._admitted_bytes += body_bytes
+                return Ticket(client=client, cost=cost)
+        return self._reject(*rejection, body_bytes)
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            self._inflight -= 1
+            self._inflight_cost = max(self._inflight_cost - ticket.cost, 0.0)
+            state = self._clients.get(ticket.client)
+            if state is not None:
+                state.active -= 1
+
+    def metrics(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "inflight_cost": self._inflight_cost,
+                "peak_inflight_cost": self._peak_cost,
+                "max_inflight_cost": self.limits.max_inflight_cost,
+                "admitted": self._admitted,
+                "admitted_bytes": self._admitted_bytes,
+                "rejected": dict(self._rejected),
+                "rejected_bytes": self._rejected_bytes,
+                "clients": len(self._clients),
+            }
+
+    # ------------------------------------------------------------------
+    # Helpers
+    def _client(self, client: str, now: float) -> _Client:
+        limits = self.limits
+        state = self._clients.get(client)
+        if state is None:
+            if len(self._clients) >= limits.max_clients:
+                self._forget_idle_clients()
+            state = self._clients[client] = _Client(limits.client_burst_bytes, now)
+            return state
+        state.tokens = min(
+            state.tokens + (now - state.updated) * limits.client_bytes_per_second,
+            limits.client_burst_bytes,
+        )
+        state.updated = now
+        return state
+
+    def _forget_idle_clients(self) -> None:
+        # Idle clients with a full bucket carry no state worth keeping.
+        burst = self.limits.client_burst_bytes
+        now = self._clock()
+        rate = self.limits.client_bytes_per_second
+        for name, state in list(self._clients.items()):
+            if not state.active and state.tokens + (now - state.updated) * rate >= burst:
+                del self._clients[name]
+
+    def _reject(
+        self, reason: str, status: HTTPStatus, retry_after: float | None, body_bytes: int
+    ) -> Rejection:
+        with self._lock:
+            self._rejected[reason] += 1
+            self._rejected_bytes += max(int(body_bytes), 0)
+        seconds = None if retry_after is None else max(math.ceil(retry_after), 1)
+        return Rejection(status=status, reason=reason, retry_after=seconds)
@@ -0,0 +1,259 @@
+"""Awaitable :class:`TokenService` API for asyncio applications.
+
+Encoding a long prompt or loading a tokenizer for the first time takes tens
+of milliseconds to seconds of blocking work. :class:`AsyncTokenService` runs
+that work on its own thread pool, so an event loop embedding the service
+keeps serving other coroutines meanwhile.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Sequence
+
+from .token_service import TokenService
+
+
+class AsyncTokenService:
+    """Run :class:`TokenService` calls on a bounded executor and await them.
+
+    At most *max_workers* calls run at once; further calls wait on the
+    event loop, where cancelling them costs nothing. A call that already
+    started cannot be interrupted: cancelling or timing it out returns
+    control at once, while the worker finishes in the background and only
+    then frees its slot, so the bound holds. *timeout* is the default
+    limit, in seconds, for every call including its wait for a slot.
+
+    Tokenizers are loaded before the first call that needs them, once per
+    model however many calls arrive together (see :meth:`load`). An
+    instance must only be used from the event loop it was first used on.
+    """
+
+    def __init__(
+        self,
+        service: TokenService,
+        *,
+        max_workers: int | None = None,
+        timeout: float | None = None,
+        batch_size: int = 64,
+    ) -> None:
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        if max_workers < 1:
+            raise ValueError("'max_workers' must be at least 1")
+        self._service = service
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._batch_size = max(int(batch_size), 1)
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="token-counter-async")
+        self._slots: asyncio.Semaphore | None = None
+        self._loads: Dict[str, asyncio.Future] = {}
+
+    @property
+    def service(self) -> TokenService:
+        return self._service
+
+    # ------------------------------------------------------------------
+    # Public API
+    async def load(self, model_id: str, *, timeout: float | None = None) -> None:
+        """Load the tokenizer of *model_id*; concurrent callers share one load.
+
+        Giving up on the wait (cancellation or *timeout*) leaves the load
+        running for the other callers. A failed load is retried by the next
+        call, and so is the load of a tokenizer replaced by
+        :meth:`TokenService.reload`.
+        """
+
+        load = self._loads.get(model_id)
+        if load is None:
+            if self._service.is_loaded(model_id):
+                return
+            load = asyncio.ensure_future(self._submit(self._service.warm, model_id))
+            self._loads[model_id] = load
+            load.add_done_callback(functools.partial(self._load_done, model_id))
+        await self._wait(asyncio.shield(load), timeout)
+
+    async def calculate(
+        self,
+        model_id: str,
+        text: str,
+        mode: str = "exact",
+        include_tokens: bool = True,
+        *,
+        timeout: float | None = None,
+    ) -> Dict[str, object]:
+        """Awaitable :meth:`TokenService.calculate`."""
+
+        return await self._call(
+            model_id,
+            mode,
+            timeout,
+            self._service.calculate,
+            model_id,
+            text,
+            mode,
+            include_tokens,
+        )
+
+    async def count_tokens(
+        self, model_id: str, text: str, *, timeout: float | None = None
+    ) -> int:
+        """Awaitable :meth:`TokenService.count_tokens`."""
+
+        return await self._call(
+            model_id, "exact", timeout, self._service.count_tokens, model_id, text
+        )
+
+    async def calculate_many(
+        self,
+        model_id: str,
+        texts: Sequence[str],
+        mode: str = "exact",
+        include_tokens: bool = True,
+        *,
+        timeout: float | None = None,
+    ) -> List[Dict[str, object]]:
+        """Awaitable :meth:`TokenService.calculate_many`.
+
+        Texts are sent to the workers in slices of *batch_size*, which run
+        in parallel; cancelling the call drops the slices not yet started.
+        """
+
+        async def run() -> List[Dict[str, object]]:
+            await self._load_for(model_id, mode)
+            size = self._batch_size
+            slices = [
+                self._submit(
+                    self._service.calculate_many,
+                    model_id,
+                    list(texts[start : start + size]),
+                    mode,
+                    include_tokens,
+                )
+                for start in range(0, len(texts), size)
+            ]
+            results = await asyncio.gather(*slices)
+            return [result for part in results for result in part]
+
+        return await self._wait(run(), timeout)
+
+    async def calculate_chat(
+        self,
+        model_id: str,
+        messages: Sequence[Mapping[str, object]],
+        add_generation_prompt: bool = True,
+        *,
+        timeout: float | None = None,
+    ) -> Dict[str, object]:
+        """Awaitable :meth:`TokenService.calculate_chat`."""
+
+        return await self._call(
+            model_id,
+            "exact",
+            timeout,
+            self._service.calculate_chat,
+            model_id,
+            messages,
+            add_generation_prompt,
+        )
+
+    async def truncate(
+        self,
+        model_id: str,
+        text: str,
+        max_tokens: int,
+        strategy: str = "head",
+        *,
+        timeout: float | None = None,
+    ) -> Dict[str, object]:
+        """Awaitable :meth:`TokenService.truncate`."""
+
+        return await self._call(
+            model_id,
+            "exact",
+            timeout,
+            self._service.truncate,
+            model_id,
+            text,
+            max_tokens,
+            strategy,
+        )
+
+    async def chunk(
+        self,
+        model_id: str,
+        text: str,
+        max_tokens: int = 512,
+        overlap: int = 0,
+        snap: str = "none",
+        *,
+        timeout: float | None = None,
+    ) -> List[Dict[str, object]]:
+        """Awaitable :meth:`TokenService.chunk`, returning every chunk at once."""
+
+        def chunks() -> List[Dict[str, object]]:
+            return list(self._service.chunk(model_id, text, max_tokens, overlap, snap))
+
+        return await self._call(model_id, "exact", timeout, chunks)
+
+    async def close(self) -> None:
+        """Wait for running calls, then stop the workers."""
+
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self) -> "AsyncTokenService":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    # ------------------------------------------------------------------
+    # Internals
+    async def _call(
+        self, model_id: str, mode: str, timeout: float | None, func: Callable, *args: Any
+    ):
+        async def run():
+            await self._load_for(model_id, mode)
+            return await self._submit(func, *args)
+
+        return await self._wait(run(), timeout)
+
+    async def _load_for(self, model_id: str, mode: str) -> None:
+        if mode == "estimate":  # estimates never touch the tokenizer
+            return
+        self._service.get_model(model_id)  # unknown models fail here, without a worker
+        await self.load(model_id)
+
+    async def _wait(self, awaitable, timeout: float | None):
+        timeout = self._timeout if timeout is None else timeout
+        if timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, timeout)
+
+    async def _submit(self, func: Callable, *args: Any):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_workers)
+        slots = self._slots
+        await slots.acquire()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        loop = asyncio.get_running_loop()
+        # The slot is freed when the worker is done, not when the caller gives up.
+        future.add_done_callback(lambda _: _call_soon(loop, slots.release))
+        return await asyncio.wrap_future(future)
+
+    def _load_done(self, model_id: str, load: asyncio.Future) -> None:
+        self._loads.pop(model_id, None)
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:  # the loop was closed meanwhile
+        pass
@@ -0,0 +1,277 @@
+"""Opt-in sampling of live requests into a compact log for later replay.
+
+``serve --capture PATH`` records a sample of the tokenization requests the
+server receives. The request handler only draws the sampling decision and
+puts ``(arrival time, route, payload)`` on a bounded queue; a background
+thread redacts the text, serialises the record and appends it to the log
+in batches, so capturing never blocks a request. When the queue is full
+the record is dropped and counted instead.
+
+The log is JSON lines (gzip-compressed when the path ends in ``.gz``), one
+``{"t": seconds since the first record, "route": ..., "payload": ...}``
+object per request; a server restarted on the same path appends a new
+session whose times start again from zero. Depending on *text_mode*, text
+fields are kept, cut to a prefix, or replaced by an HMAC keyed with a
+secret that lives only as long as the capture, so logged digests cannot be
+matched against guessed texts. The replaced forms keep the length and
+writing system so :func:`restore_text` can rebuild a deterministic
+stand-in of the same size for ``python -m app replay``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import queue
+import random
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+TEXT_MODES = ("full", "truncate", "hash")
+
+# Characters sampled to guess the writing system of a text.
+_SCRIPT_SAMPLE = 2048
+_SCRIPTS = {
+    "latin": "abcdefghijklmnopqrstuvwxyz",
+    "cyrillic": "абвгдежзийклмнопрстуфхцчшщыэюя",
+    "arabic": "ابتثجحخدذرزسشصضطظعغفقكلمنهوي",
+    "cjk": "的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年得就那要下以生会",
+}
+
+
+def text_script(text: str) -> str:
+    """Return the dominant writing system of *text* (``latin`` when unsure)."""
+
+    counts = dict.fromkeys(_SCRIPTS, 0)
+    for char in text[:_SCRIPT_SAMPLE]:
+        code = ord(char)
+        if 0x3040 <= code <= 0x30FF or 0x3400 <= code <= 0x9FFF or 0xAC00 <= code <= 0xD7AF:
+            counts["cjk"] += 1
+        elif 0x0400 <= code <= 0x04FF:
+            counts["cyrillic"] += 1
+        elif 0x0600 <= code <= 0x06FF:
+            counts["arabic"] += 1
+        elif char.isalpha():
+            counts["latin"] += 1
+    best = max(counts, key=counts.get)
+    return best if counts[best] else "latin"
+
+
+def redact_text(
+    text: str, mode: str, truncate_chars: int = 256, key: bytes | None = None
+) -> Any:
+    """Return the logged form of *text* under *mode* (see :data:`TEXT_MODES`).
+
+    ``hash`` keys the digest with *key*; without one a fresh random key is
+    drawn, so the digest only seeds the replayed stand-in.
+    """
+
+    if mode == "full":
+        return text
+    if mode == "truncate" and len(text) <= truncate_chars:
+        return text
+    stub: Dict[str, Any] = {"n": len(text), "script": text_script(text)}
+    if mode == "truncate":
+        stub["head"] = text[:truncate_chars]
+    else:
+        key = secrets.token_bytes(32) if key is None else key
+        data = text.encode("utf-8", "surrogatepass")
+        stub["sha"] = hmac.new(key, data, hashlib.sha256).hexdigest()[:16]
+    return stub
+
+
+def restore_text(value: Any) -> Any:
+    """Rebuild request text from its logged form.
+
+    Redacted texts are the logged prefix followed by filler words drawn from
+    the same writing system, seeded by the record so every replay of a log
+    sends identical text of the original length. Other values (plain text,
+    ``null`` message content) are returned unchanged.
+    """
+
+    if not isinstance(value, dict):
+        return value
+    head = value.get("head", "")
+    length = int(value.get("n", len(head)))
+    rng = random.Random(value.get("sha") or head or length)
+    alphabet = _SCRIPTS.get(value.get("script"), _SCRIPTS["latin"])
+    spaced = value.get("script") != "cjk"
+    parts = [head]
+    size = len(head)
+    while size < length:
+        word = "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 9)))
+        word = f" {word}" if spaced else word
+        if not spaced and rng.random() < 0.1:
+            word += "。"
+        parts.append(word)
+        size += len(word)
+    return "".join(parts)[:length]
+
+
+def _map_texts(payload: Mapping[str, Any], convert) -> Dict[str, Any]:
+    """Apply *convert* to the text fields of a request payload."""
+
+    result = dict(payload)
+    if "text" in result:
+        result["text"] = convert(result["text"])
+    if isinstance(result.get("texts"), list):
+        result["texts"] = [convert(text) for text in result["texts"]]
+    if isinstance(result.get("messages"), list):
+        result["messages"] = [
+            {**message, "content": convert(message["content"])}
+            if isinstance(message, dict) and "content" in message
+            else message
+            for message in result["messages"]
+        ]
+    return result
+
+
+def restore_payload(payload: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return a logged payload with every text field restored."""
+
+    return _map_texts(payload, restore_text)
+
+
+def _open_log(path: Path, mode: str) -> io.TextIOBase:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def iter_capture(path: str | Path) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a capture log in order."""
+
+    with _open_log(Path(path), "r") as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class CaptureWriter:
+    """Sample requests and append them to a capture log from a background thread.
+
+    *sample_rate* is the fraction of requests recorded. Up to *queue_size*
+    records wait for the writer; the log is flushed every *flush_interval*
+    seconds and on :meth:`close`.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        sample_rate: float = 1.0,
+        text_mode: str = "full",
+        truncate_chars: int = 256,
+        queue_size: int = 10_000,
+        flush_interval: float = 1.0,
+    ) -> None:
+        if not 0 < sample_rate <= 1:
+            raise ValueError("'sample_rate' must be in (0, 1]")
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"Unknown text mode {text_mode!r}; expected one of {TEXT_MODES}.")
+        self.path = Path(path)
+        self._sample_rate = sample_rate
+        self._text_mode = text_mode
+        self._truncate_chars = int(truncate_chars)
+        self._hash_key = secrets.token_bytes(32)
+        self._flush_interval = flush_interval
+        self._queue: "queue.Queue[Tuple[float, str, Any] | None]" = queue.Queue(queue_size)
+        self._origin: float | None = None
+        self._lock = threading.Lock()
+        self._offered = 0
+        self._dropped = 0
+        self._written = 0
+        self._stream = _open_log(self.path, "a")
+        self._thread = threading.Thread(
+            target=self._run, name="token-counter-capture", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, route: str, payload: Any) -> None:
+        """Offer one request; cheap and non-blocking."""
+
+        if self._sample_rate < 1 and random.random() >= self._sample_rate:
+            return
+        try:
+            self._queue.put_nowait((time.monotonic(), route, payload))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return
+        with self._lock:
+            self._offered += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "sample_rate": self._sample_rate,
+                "text_mode": self._text_mode,
+                "captured": self._offered,
+                "written": self._written,
+                "dropped": self._dropped,
+                "queued": self._queue.qsize(),
+            }
+
+    def close(self) -> None:
+        """Write everything still queued and close the log."""
+
+        self._queue.put(None)
+        self._thread.join()
+        self._stream.close()
+
+    def _encode(self, item: Tuple[float, str, Any]) -> str:
+        arrived, route, payload = item
+        if self._origin is None:
+            self._origin = arrived
+        if isinstance(payload, Mapping):
+            payload = _map_texts(
+                payload,
+                lambda text: redact_text(
+                    text, self._text_mode, self._truncate_chars, self._hash_key
+                )
+                if isinstance(text, str)
+                else text,
+            )
+        record = {"t": round(arrived - self._origin, 6), "route": route, "payload": payload}
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def _run(self) -> None:
+        dirty = False
+        last_flush = time.monotonic()
+        while True:
+            items: List[Tuple[float, str, Any] | None] = []
+            try:
+                items.append(self._queue.get(timeout=self._flush_interval))
+                while len(items) < 1024:  # take whatever else is already queued
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            lines = []
+            for item in items:
+                if item is None:
+                    continue
+                try:
+                    lines.append(self._encode(item))
+                except (TypeError, ValueError):  # unserialisable payload; skip it
+                    with self._lock:
+                        self._dropped += 1
+            if lines:
+                self._stream.write("".join(lines))
+                dirty = True
+                with self._lock:
+                    self._written += len(lines)
+            stop = None in items
+            now = time.monotonic()
+            if dirty and (stop or now - last_flush >= self._flush_interval):
+                self._stream.flush()
+                dirty = False
+                last_flush = now
+            if stop:
+                return
@@ -0,0 +1,232 @@
+"""Split documents into chunks of at most N tokens for retrieval pipelines.
+
+The input is consumed as a stream of text blocks and encoded window by
+window. Windows end at pre-tokenizer-safe boundaries (see
+:mod:`app.tokenizers.segmentation`), so the concatenated encodings equal a
+single pass over the whole document while only the current window and the
+tokens of the chunk being assembled are held in memory; tokenizers whose
+pre-tokenizer does not allow such splits get the whole input as one window.
+Chunk edges fall on token offsets of that encoding; with ``overlap`` each
+chunk repeats the last tokens of the previous one, and ``snap`` moves the
+edge back to the nearest sentence or paragraph break when one is close
+enough.
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from ..tokenizers.base import TokenizerAdapter
+from ..tokenizers.segmentation import (
+    DEFAULT_MAX_RUN,
+    long_runs,
+    next_safe_boundary,
+    split_long_runs,
+)
+
+SNAP_MODES = ("none", "sentence", "paragraph")
+DEFAULT_WINDOW = 64 * 1024
+
+# Boundaries sit where the break ends and before any indentation or space,
+# which byte-level pre-tokenizers attach to the following word.
+_PARAGRAPH_BREAK = re.compile(r"\n(?:[^\S\n]*\n)+")
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)|[。！？]+[」』”’]*")
+
+
+class _Boundaries:
+    """Sorted character positions after which a chunk may end."""
+
+    def __init__(self) -> None:
+        self.positions: List[int] = []
+
+    def extend(self, text: str, base: int, *patterns: re.Pattern) -> None:
+        """Add the match ends of *patterns* in *text*, which starts at *base*."""
+
+        found = {match.end() for pattern in patterns for match in pattern.finditer(text)}
+        self.positions.extend(base + position for position in sorted(found))
+
+    def between(self, low: int, high: int) -> bool:
+        """Whether a boundary lies in ``(low, high]``."""
+
+        index = bisect.bisect_right(self.positions, low)
+        return index < len(self.positions) and self.positions[index] <= high
+
+    def discard_before(self, position: int) -> None:
+        del self.positions[: bisect.bisect_left(self.positions, position)]
+
+
+def iter_windows(blocks: Iterable[str], window: int = DEFAULT_WINDOW) -> Iterator[Tuple[int, str]]:
+    """Yield ``(start, text)`` windows of about *window* characters from *blocks*.
+
+    Each window ends at a safe boundary, or is cut hard after ``4 * window``
+    characters when the text has none (a token may then straddle the cut).
+    """
+
+    pending = ""
+    start = 0
+    for block in blocks:
+        pending += block
+        while len(pending) >= window:
+            cut = next_safe_boundary(pending, window)
+            if cut is None:
+                if len(pending) < 4 * window:
+                    break
+                cut = window
+            yield start, pending[:cut]
+            start += cut
+            pending = pending[cut:]
+    if pending:
+        yield start, pending
+
+
+def iter_chunks(
+    tokenizer: TokenizerAdapter,
+    blocks: Iterable[str],
+    max_tokens: int,
+    overlap: int = 0,
+    snap: str = "none",
+    window: int = DEFAULT_WINDOW,
+    max_run: int = DEFAULT_MAX_RUN,
+) -> Iterator[Dict[str, object]]:
+    """Yield chunk dictionaries covering the text of *blocks*.
+
+    ``start``/``end`` are character offsets into the whole input and
+    ``token_start`` is the index of the chunk's first token. Special tokens
+    added by the tokenizer are not part of any chunk. Single-class runs
+    longer than *max_run* characters are encoded in pieces; a chunk holding
+    such a forced cut has a ``guard`` block, as its token count may differ
+    from a single-pass encode.
+    """
+
+    offsets: List[Tuple[int, int]] = []  # tokens from ``first`` on, absolute offsets
+    first = 0  # absolute index of offsets[0]
+    emitted = 0  # absolute index of the first token not yet in any chunk
+    text = ""  # input from ``text_base`` on
+    text_base = 0
+    sentences = _Boundaries()
+    paragraphs = _Boundaries()
+    cuts: List[int] = []  # forced cuts inside long runs, absolute positions
+    index = 0
+
+    def take(final: bool) -> Dict[str, object] | None:
+        nonlocal offsets, first, emitted, text, text_base, index
+        available = len(offsets)
+        if available == 0 or first + available <= emitted:
+            return None
+        if available <= max_tokens:
+            if not final:
+                return None
+            count = available
+        else:
+            count = _cut(offsets, max_tokens, overlap, snap, sentences, paragraphs)
+        start, end = offsets[0][0], offsets[count - 1][1]
+        chunk = {
+            "index": index,
+            "text": text[start - text_base : end - text_base],
+            "start": start,
+            "end": end,
+            "token_start": first,
+            "token_count": count,
+        }
+        forced = bisect.bisect_left(cuts, end) - bisect.bisect_right(cuts, start)
+        if forced:
+            chunk["guard"] = {"forced_cuts": forced, "exact": False}
+        index += 1
+        emitted = first + count
+        if count == available:
+            offsets = []
+            first = emitted
+        else:
+            keep = _clean_start(offsets, max(count - overlap, 1))
+            offsets = offsets[keep:]
+            first += keep
+            if not offsets:
+                return chunk
+            trim = offsets[0][0] - text_base
+            text = text[trim:]
+            text_base += trim
+            sentences.discard_before(text_base)
+            paragraphs.discard_before(text_base)
+            del cuts[: bisect.bisect_left(cuts, text_base)]
+        return chunk
+
+    if not tokenizer.splits_at_safe_boundaries():
+        window = sys.maxsize
+    for base, piece in iter_windows(blocks, window):
+        if not offsets:
+            text, text_base = "", base
+        text += piece
+        if snap != "none":
+            sentences.extend(piece, base, _SENTENCE_END, _PARAGRAPH_BREAK)
+            paragraphs.extend(piece, base, _PARAGRAPH_BREAK)
+        parts = [(0, len(piece), False)]
+        if len(piece) > max_run and long_runs(piece, max_run):
+            parts = split_long_runs(piece, [(0, len(piece))], max_run)
+        for part_start, part_end, forced in parts:
+            encoding = tokenizer.encode(piece[part_start:part_end])
+            shift = base + part_start
+            offsets.extend(
+                (shift + start, shift + end)
+                for position, (start, end) in enumerate(encoding.offsets)
+                if not encoding.is_special(position)
+            )
+            if forced:
+                cuts.append(base + part_end)
+        while True:
+            chunk = take(final=False)
+            if chunk is None:
+                break
+            yield chunk
+    while True:
+        chunk = take(final=True)
+        if chunk is None:
+            break
+        yield chunk
+
+
+def _cut(
+    offsets: List[Tuple[int, int]],
+    max_tokens: int,
+    overlap: int,
+    snap: str,
+    sentences: _Boundaries,
+    paragraphs: _Boundaries,
+) -> int:
+    """Number of leading tokens forming the next chunk (``len(offsets) > max_tokens``)."""
+
+    if snap == "paragraph":
+        preferred = (paragraphs, sentences)
+    elif snap == "sentence":
+        preferred = (sentences,)
+    else:
+        preferred = ()
+    # Snapping never shrinks a chunk below half the budget.
+    lowest = max(overlap + 1, max_tokens // 2)
+    for boundaries in preferred:
+        for count in range(max_tokens, lowest - 1, -1):
+            low, high = offsets[count - 1][0], offsets[count][0]
+            if boundaries.between(low, high) and _clean(offsets, count):
+                return count
+    count = max_tokens
+    while count > overlap + 1 and not _clean(offsets, count):
+        count -= 1
+    return count
+
+
+def _clean(offsets: List[Tuple[int, int]], count: int) -> bool:
+    """Whether a cut before token *count* does not split a character.
+
+    Byte-level tokenizers may split one character across several tokens
+    that share its offsets.
+    """
+
+    return offsets[count][0] >= offsets[count - 1][1]
+
+
+def _clean_start(offsets: List[Tuple[int, int]], start: int) -> int:
+    while 0 < start < len(offsets) and not _clean(offsets, start):
+        start += 1
+    return start
@@ -0,0 +1,161 @@
+"""Micro-batching of concurrent tokenization calls.
+
+Under high concurrency each handler thread would call ``backend.encode`` for
+its own tiny prompt. :class:`BatchCoalescer` lets the first caller for a
+tokenizer wait for a short window, collects every request for the same
+tokenizer that arrives meanwhile and runs them as one ``encode_batch`` call.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Hashable, List, Sequence
+
+from ..tokenizers.base import TokenizerAdapter
+
+# Upper bounds of the batch size histogram buckets.
+_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class _Request:
+    __slots__ = ("text", "enqueued", "done", "result", "error")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result: Sequence[object] | None = None
+        self.error: BaseException | None = None
+
+
+class _Lane:
+    """Pending requests for one tokenizer."""
+
+    __slots__ = ("condition", "pending")
+
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.pending: List[_Request] = []
+
+
+class CoalescerMetrics:
+    """Batch size and queueing delay counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.bypassed = 0
+        self.batch_sizes = [0] * (len(_BATCH_BUCKETS) + 1)
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+
+    def record(self, size: int, delays: Sequence[float]) -> None:
+        bucket = next(
+            (index for index, bound in enumerate(_BATCH_BUCKETS) if size <= bound),
+            len(_BATCH_BUCKETS),
+        )
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.batch_sizes[bucket] += 1
+            self.delay_total += sum(delays)
+            self.delay_max = max(self.delay_max, *delays)
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            labels = [f"<={bound}" for bound in _BATCH_BUCKETS] + [f">{_BATCH_BUCKETS[-1]}"]
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "bypassed": self.bypassed,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": dict(zip(labels, self.batch_sizes)),
+                "mean_queue_delay_ms": (self.delay_total / self.items * 1000) if self.items else 0.0,
+                "max_queue_delay_ms": self.delay_max * 1000,
+            }
+
+
+class BatchCoalescer:
+    """Group concurrent ``tokenize`` calls for the same tokenizer into batches.
+
+    A batch is flushed once *window_ms* has elapsed since its first request
+    or as soon as it holds *max_batch* requests. Texts longer than
+    *max_text_chars* gain nothing from batching and are tokenized directly.
+    """
+
+    def __init__(
+        self,
+        window_ms: float = 1.0,
+        max_batch: int = 32,
+        max_text_chars: int = 4096,
+    ) -> None:
+        if window_ms < 0 or max_batch < 1:
+            raise ValueError("Coalescer window must be >= 0 ms and max_batch >= 1.")
+        self._window = window_ms / 1000.0
+        self._max_batch = int(max_batch)
+        self._max_text_chars = int(max_text_chars)
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._lanes_lock = threading.Lock()
+        self.metrics = CoalescerMetrics()
+
+    def _lane(self, key: Hashable) -> _Lane:
+        lane = self._lanes.get(key)
+        if lane is None:
+            with self._lanes_lock:
+                lane = self._lanes.setdefault(key, _Lane())
+        return lane
+
+    def tokenize(self, key: Hashable, tokenizer: TokenizerAdapter, text: str) -> Sequence[object]:
+        """Tokenize *text*, possibly batched with concurrent calls sharing *key*.
+
+        *key* must identify the tokenizer configuration: every request in a
+        batch is encoded by the tokenizer of the request that opened it.
+        """
+
+        if not text or len(text) > self._max_text_chars:
+            self.metrics.record_bypass()
+            return tokenizer.tokenize(text)
+
+        lane = self._lane(key)
+        request = _Request(text)
+        with lane.condition:
+            lane.pending.append(request)
+            leader = len(lane.pending) == 1
+            if len(lane.pending) >= self._max_batch:
+                lane.condition.notify_all()
+            if leader:
+                deadline = request.enqueued + self._window
+                while len(lane.pending) < self._max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    lane.condition.wait(remaining)
+                batch = lane.pending
+                lane.pending = []
+
+        if leader:
+            self._run_batch(tokenizer, batch)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result  # type: ignore[return-value]
+
+    def _run_batch(self, tokenizer: TokenizerAdapter, batch: List[_Request]) -> None:
+        started = time.perf_counter()
+        try:
+            results = tokenizer.tokenize_batch([request.text for request in batch])
+        except BaseException as exc:  # noqa: BLE001 - every waiter must be released
+            for request in batch:
+                request.error = exc
+                request.done.set()
+            raise
+        self.metrics.record(len(batch), [started - request.enqueued for request in batch])
+        for request, result in zip(batch, results):
+            request.result = result
+            request.done.set()
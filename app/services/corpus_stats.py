@@ -0,0 +1,430 @@
+"""Corpus-level token statistics accumulated in fixed-size NumPy arrays.
+
+Documents are encoded to vocabulary ids in batches. Token frequencies are
+added with ``numpy.bincount`` into one array sized to the vocabulary, and
+document lengths into a fixed histogram, so memory does not grow with the
+corpus. Frequent n-grams are tracked with a Space-Saving sketch of bounded
+capacity. Every part is additive: statistics computed by separate workers
+(or separate runs, via :meth:`CorpusStats.save`) are combined with
+:meth:`CorpusStats.merge`.
+
+NumPy is an optional dependency and is imported on first use.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..tokenizers.base import TokenizerAdapter
+from ..tokenizers.huggingface_tokenizer import MissingDependencyError
+
+PERCENTILES = (50, 90, 99)
+
+
+def _import_numpy():
+    """Import the optional :mod:`numpy` dependency."""
+
+    try:
+        import numpy  # type: ignore
+    except ModuleNotFoundError as exc:  # pragma: no cover - depends on the environment
+        raise MissingDependencyError(
+            "The 'numpy' package is required for corpus statistics."
+            " Install it via 'pip install numpy'."
+        ) from exc
+    return numpy
+
+
+class NGramSketch:
+    """Space-Saving summary of the most frequent n-gram keys.
+
+    At most *capacity* keys are monitored. Each carries an estimated count
+    that never undercounts and an ``error`` bounding the overcount; any key
+    not monitored occurred at most :attr:`floor` times. Two sketches merge
+    into one with the same guarantees.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("'capacity' must be positive")
+        self.capacity = int(capacity)
+        self.counts: Dict[int, int] = {}
+        self.errors: Dict[int, int] = {}
+        self.floor = 0
+
+    def add(self, keys, counts) -> None:
+        """Add exact *counts* of the distinct *keys* seen in one batch."""
+
+        np = _import_numpy()
+        floor = 0
+        if len(keys) > self.capacity:
+            keep = np.argpartition(counts, -self.capacity)[-self.capacity :]
+            dropped = np.ones(len(keys), dtype=bool)
+            dropped[keep] = False
+            floor = int(counts[dropped].max())
+            keys, counts = keys[keep], counts[keep]
+        batch = NGramSketch(self.capacity)
+        batch.counts = dict(zip(keys.tolist(), counts.tolist()))
+        batch.errors = dict.fromkeys(batch.counts, 0)
+        batch.floor = floor
+        self.merge(batch)
+
+    def merge(self, other: "NGramSketch") -> None:
+        counts: Dict[int, int] = {}
+        errors: Dict[int, int] = {}
+        for key in self.counts.keys() | other.counts.keys():
+            counts[key] = self.counts.get(key, self.floor) + other.counts.get(key, other.floor)
+            errors[key] = self.errors.get(key, self.floor) + other.errors.get(key, other.floor)
+        floor = self.floor + other.floor
+        if len(counts) > self.capacity:
+            ranked = sorted(counts, key=counts.__getitem__, reverse=True)
+            floor = max(floor, counts[ranked[self.capacity]])
+            for key in ranked[self.capacity :]:
+                del counts[key], errors[key]
+        self.counts, self.errors, self.floor = counts, errors, floor
+
+    def top(self, k: int) -> List[Tuple[int, int, int]]:
+        """Return up to *k* ``(key, count, error)`` triples, most frequent first."""
+
+        ranked = sorted(self.counts, key=self.counts.__getitem__, reverse=True)[:k]
+        return [(key, self.counts[key], self.errors[key]) for key in ranked]
+
+
+class CorpusStats:
+    """Token frequencies, document lengths and n-gram counts of a corpus.
+
+    Lengths of *max_length* tokens or more share the histogram's last bin;
+    percentiles falling there are reported as the longest document seen.
+    Set *ngram* to ``0`` to skip n-gram tracking.
+    """
+
+    def __init__(
+        self,
+        vocab_size: int,
+        *,
+        ngram: int = 2,
+        capacity: int = 4096,
+        max_length: int = 65536,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        np = _import_numpy()
+        if vocab_size <= 0:
+            raise ValueError("'vocab_size' must be positive")
+        if ngram == 1 or ngram < 0:
+            raise ValueError("'ngram' must be 0 (disabled) or at least 2")
+        if ngram and vocab_size**ngram >= 2**63:
+            raise ValueError(f"{ngram}-grams over {vocab_size} ids do not fit a 64-bit key")
+        self.vocab_size = int(vocab_size)
+        self.ngram = int(ngram)
+        self.max_length = int(max_length)
+        self.fingerprint = fingerprint
+        self.token_counts = np.zeros(self.vocab_size, dtype=np.int64)
+        self.length_counts = np.zeros(self.max_length + 1, dtype=np.int64)
+        self.ngrams = NGramSketch(capacity) if self.ngram else None
+        self.documents = 0
+        self.tokens = 0
+        self.chars = 0
+        self.longest = 0
+
+    # ------------------------------------------------------------------
+    # Accumulation
+    def add_batch(self, ids: Sequence[Sequence[int]], chars: int = 0) -> None:
+        """Add the token ids of a batch of documents totalling *chars* characters."""
+
+        np = _import_numpy()
+        lengths = np.fromiter((len(doc) for doc in ids), dtype=np.int64, count=len(ids))
+        self.documents += len(ids)
+        self.chars += int(chars)
+        self.length_counts += np.bincount(
+            np.minimum(lengths, self.max_length), minlength=self.max_length + 1
+        )
+        total = int(lengths.sum())
+        if not total:
+            return
+        flat = np.concatenate([np.asarray(doc, dtype=np.int64) for doc in ids])
+        if flat.min() < 0 or flat.max() >= self.vocab_size:
+            raise ValueError(f"token id outside the vocabulary of size {self.vocab_size}")
+        self.tokens += total
+        self.longest = max(self.longest, int(lengths.max()))
+        self.token_counts += np.bincount(flat, minlength=self.vocab_size)
+        if self.ngrams is not None and total >= self.ngram:
+            self._add_ngrams(np, flat, lengths)
+
+    def _add_ngrams(self, np, flat, lengths) -> None:
+        n = self.ngram
+        windows = len(flat) - n + 1
+        document = np.repeat(np.arange(len(lengths)), lengths)
+        inside = document[:windows] == document[n - 1 :]  # n-grams never span documents
+        keys = flat[:windows].copy()
+        for offset in range(1, n):
+            keys = keys * self.vocab_size + flat[offset : offset + windows]
+        keys, counts = np.unique(keys[inside], return_counts=True)
+        if len(keys):
+            self.ngrams.add(keys, counts)
+
+    def merge(self, other: "CorpusStats") -> "CorpusStats":
+        """Add the statistics of *other*, computed with the same tokenizer and options."""
+
+        if (self.vocab_size, self.ngram, self.max_length) != (
+            other.vocab_size,
+            other.ngram,
+            other.max_length,
+        ):
+            raise ValueError("cannot merge statistics collected with different options")
+        if self.fingerprint and other.fingerprint and self.fingerprint != other.fingerprint:
+            raise ValueError("cannot merge statistics of different tokenizers")
+        self.token_counts += other.token_counts
+        self.length_counts += other.length_counts
+        if self.ngrams is not None:
+            self.ngrams.merge(other.ngrams)
+        self.documents += other.documents
+        self.tokens += other.tokens
+        self.chars += other.chars
+        self.longest = max(self.longest, other.longest)
+        self.fingerprint = self.fingerprint or other.fingerprint
+        return self
+
+    # ------------------------------------------------------------------
+    # Reporting
+    def length_percentiles(self, points: Iterable[float] = PERCENTILES) -> Dict[str, int]:
+        """Return nearest-rank document length percentiles in tokens."""
+
+        np = _import_numpy()
+        if not self.documents:
+            return {f"p{point:g}": 0 for point in points}
+        cumulative = np.cumsum(self.length_counts)
+        result = {}
+        for point in points:
+            rank = max(math.ceil(point / 100 * self.documents), 1)
+            length = int(np.searchsorted(cumulative, rank))
+            result[f"p{point:g}"] = self.longest if length >= self.max_length else length
+        return result
+
+    def ngram_ids(self, key: int) -> List[int]:
+        ids = []
+        for _ in range(self.ngram):
+            key, token_id = divmod(key, self.vocab_size)
+            ids.append(token_id)
+        return ids[::-1]
+
+    def summary(self, tokenizer: Optional[TokenizerAdapter] = None, top_k: int = 20) -> Dict[str, Any]:
+        """Return a JSON-serialisable report; *tokenizer* maps ids back to strings."""
+
+        np = _import_numpy()
+
+        def token(token_id: int) -> Optional[str]:
+            return tokenizer.id_to_token(token_id) if tokenizer is not None else None
+
+        used = int(np.count_nonzero(self.token_counts))
+        order = np.argsort(self.token_counts)[::-1][: min(top_k, used)]
+        report: Dict[str, Any] = {
+            "documents": self.documents,
+            "tokens": self.tokens,
+            "chars": self.chars,
+            "chars_per_token": round(self.chars / self.tokens, 4) if self.tokens else None,
+            "length": {
+                "mean": round(self.tokens / self.documents, 2) if self.documents else 0.0,
+                **self.length_percentiles(),
+                "max": self.longest,
+            },
+            "vocab": {
+                "size": self.vocab_size,
+                "used": used,
+                "coverage": round(used / self.vocab_size, 6),
+            },
+            "top_tokens": [
+                {
+                    "id": int(token_id),
+                    "token": token(int(token_id)),
+                    "count": int(self.token_counts[token_id]),
+                    "share": round(int(self.token_counts[token_id]) / self.tokens, 6),
+                }
+                for token_id in order
+            ],
+            "ngrams": None,
+        }
+        if self.ngrams is not None:
+            top = []
+            for key, count, error in self.ngrams.top(top_k):
+                ids = self.ngram_ids(key)
+                top.append(
+                    {
+                        "ids": ids,
+                        "tokens": [token(token_id) for token_id in ids],
+                        "count": count,
+                        "max_overcount": error,
+                    }
+                )
+            report["ngrams"] = {"n": self.ngram, "top": top}
+        return report
+
+    # ------------------------------------------------------------------
+    # Persistence
+    def save(self, path: str | Path) -> None:
+        """Write the statistics to an ``.npz`` file that :meth:`load` reads back."""
+
+        np = _import_numpy()
+        meta = {
+            "vocab_size": self.vocab_size,
+            "ngram": self.ngram,
+            "max_length": self.max_length,
+            "fingerprint": self.fingerprint,
+            "documents": self.documents,
+            "tokens": self.tokens,
+            "chars": self.chars,
+            "longest": self.longest,
+            "capacity": self.ngrams.capacity if self.ngrams else 0,
+            "ngram_floor": self.ngrams.floor if self.ngrams else 0,
+        }
+        keys = list(self.ngrams.counts) if self.ngrams else []
+        with open(path, "wb") as stream:
+            np.savez_compressed(
+                stream,
+                meta=np.array(json.dumps(meta)),
+                token_counts=self.token_counts,
+                length_counts=self.length_counts,
+                ngram_keys=np.array(keys, dtype=np.int64),
+                ngram_counts=np.array([self.ngrams.counts[key] for key in keys], dtype=np.int64),
+                ngram_errors=np.array([self.ngrams.errors[key] for key in keys], dtype=np.int64),
+            )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "CorpusStats":
+        np = _import_numpy()
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            stats = cls(
+                meta["vocab_size"],
+                ngram=meta["ngram"],
+                capacity=meta["capacity"] or 1,
+                max_length=meta["max_length"],
+                fingerprint=meta["fingerprint"],
+            )
+            stats.token_counts = data["token_counts"].astype(np.int64)
+            stats.length_counts = data["length_counts"].astype(np.int64)
+            if stats.ngrams is not None:
+                keys = data["ngram_keys"].tolist()
+                stats.ngrams.counts = dict(zip(keys, data["ngram_counts"].tolist()))
+                stats.ngrams.errors = dict(zip(keys, data["ngram_errors"].tolist()))
+                stats.ngrams.floor = meta["ngram_floor"]
+        for name in ("documents", "tokens", "chars", "longest"):
+            setattr(stats, name, meta[name])
+        return stats
+
+
+def iter_documents(
+    paths: Sequence[str],
+    *,
+    field: Optional[str] = None,
+    whole_files: bool = False,
+    shard: Tuple[int, int] = (0, 1),
+) -> Iterator[str]:
+    """Yield the documents of *paths*: one per line, per JSONL *field*, or per file.
+
+    Only documents whose position modulo ``shard[1]`` equals ``shard[0]`` are
+    yielded, so workers can split a corpus without coordinating.
+    """
+
+    index, shards = shard
+    position = -1
+    for path in paths:
+        if whole_files:
+            position += 1
+            if position % shards == index:
+                yield Path(path).read_text(encoding="utf-8")
+            continue
+        with open(path, "r", encoding="utf-8") as stream:
+            for line in stream:
+                line = line.rstrip("\r\n")
+                if not line.strip():
+                    continue
+                position += 1
+                if position % shards != index:
+                    continue
+                if field is None:
+                    yield line
+                    continue
+                value = json.loads(line).get(field)
+                if isinstance(value, str) and value:
+                    yield value
+
+
+def collect_stats(
+    tokenizer: TokenizerAdapter,
+    documents: Iterable[str],
+    *,
+    batch_size: int = 256,
+    ngram: int = 2,
+    capacity: int = 4096,
+    max_length: int = 65536,
+) -> CorpusStats:
+    """Stream *documents* through *tokenizer* in batches and accumulate statistics."""
+
+    stats = CorpusStats(
+        tokenizer.vocab_size(),
+        ngram=ngram,
+        capacity=capacity,
+        max_length=max_length,
+        fingerprint=tokenizer.fingerprint(),
+    )
+    batch: List[str] = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            stats.add_batch(tokenizer.encode_ids_batch(batch), sum(map(len, batch)))
+            batch = []
+    if batch:
+        stats.add_batch(tokenizer.encode_ids_batch(batch), sum(map(len, batch)))
+    return stats
+
+
+def _collect_shard(
+    registry_path: Optional[str],
+    model_id: str,
+    paths: Sequence[str],
+    reader: Dict[str, Any],
+    options: Dict[str, Any],
+) -> CorpusStats:
+    from ..catalog import load_catalog
+    from ..tokenizers.registry import TokenizerRegistry, get_tokenizer_for_model
+
+    catalog = load_catalog(Path(registry_path) if registry_path else None)
+    tokenizer = get_tokenizer_for_model(catalog.get(model_id), TokenizerRegistry())
+    return collect_stats(tokenizer, iter_documents(paths, **reader), **options)
+
+
+def collect_stats_parallel(
+    registry_path: Optional[str],
+    model_id: str,
+    paths: Sequence[str],
+    *,
+    workers: int,
+    field: Optional[str] = None,
+    whole_files: bool = False,
+    **options: Any,
+) -> CorpusStats:
+    """Collect statistics for *paths* in *workers* processes and merge the results.
+
+    Each worker reads the whole corpus but encodes only its shard of the
+    documents; the per-worker statistics are merged in shard order.
+    """
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _collect_shard,
+                registry_path,
+                model_id,
+                list(paths),
+                {"field": field, "whole_files": whole_files, "shard": (index, workers)},
+                options,
+            )
+            for index in range(workers)
+        ]
+        stats = futures[0].result()
+        for future in futures[1:]:
+            stats.merge(future.result())
+    return stats
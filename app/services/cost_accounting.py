@@ -0,0 +1,430 @@
+"""Streaming token and cost accounting over prompt/completion request logs."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from ..tokenizers.huggingface_tokenizer import MissingDependencyError, TokenizerDownloadError
+from .token_service import CPUBudgetExceeded, ModelNotFoundError, TokenService
+
+OTHER_GROUP = "__other__"
+UNKNOWN_DAY = "unknown"
+
+# Failures that make a whole model's records uncountable.
+_COUNT_ERRORS = (ModelNotFoundError, TokenizerDownloadError, MissingDependencyError)
+
+# Worker-local service built once per process by ``_init_worker``.
+_WORKER_SERVICE: TokenService | None = None
+
+
+@dataclass(frozen=True)
+class CostFields:
+    """Names of the log fields read by the pipeline."""
+
+    model: str = "model"
+    prompt: str = "prompt"
+    completion: str = "completion"
+    timestamp: str = "timestamp"
+    key: Optional[str] = None
+
+
+@dataclass
+class _GroupTotals:
+    records: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    input_cost: float = 0.0
+    output_cost: float = 0.0
+    unpriced_records: int = 0
+    inexact_records: int = 0
+
+    def add(self, other: "_GroupTotals") -> None:
+        self.records += other.records
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.input_cost += other.input_cost
+        self.output_cost += other.output_cost
+        self.unpriced_records += other.unpriced_records
+        self.inexact_records += other.inexact_records
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "records": self.records,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "input_cost": round(self.input_cost, 6),
+            "output_cost": round(self.output_cost, 6),
+            "total_cost": round(self.input_cost + self.output_cost, 6),
+            "unpriced_records": self.unpriced_records,
+            "inexact_records": self.inexact_records,
+        }
+
+
+class CostAggregator:
+    """Accumulate token and cost totals per ``(model, day, key)`` group.
+
+    Memory is bounded by *max_groups*: once that many distinct groups exist,
+    further new groups are folded into a single ``__other__`` bucket.
+    """
+
+    def __init__(self, max_groups: int = 100_000) -> None:
+        self._max_groups = max(int(max_groups), 1)
+        self._groups: Dict[Tuple[str, str, str], _GroupTotals] = {}
+        self.records = 0
+        self.errors = 0
+
+    def add(
+        self,
+        group: Tuple[str, str, str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        input_cost: Optional[float],
+        output_cost: Optional[float],
+        exact: bool = True,
+    ) -> None:
+        self.records += 1
+        totals = self._groups.get(group)
+        if totals is None:
+            if len(self._groups) >= self._max_groups:
+                group = (OTHER_GROUP, OTHER_GROUP, OTHER_GROUP)
+            totals = self._groups.setdefault(group, _GroupTotals())
+        totals.records += 1
+        totals.prompt_tokens += prompt_tokens
+        totals.completion_tokens += completion_tokens
+        if input_cost is None and output_cost is None:
+            totals.unpriced_records += 1
+        if not exact:
+            totals.inexact_records += 1
+        totals.input_cost += input_cost or 0.0
+        totals.output_cost += output_cost or 0.0
+
+    def add_error(self) -> None:
+        self.records += 1
+        self.errors += 1
+
+    def _rollup(self, index: int) -> Dict[str, Dict[str, Any]]:
+        rolled: Dict[str, _GroupTotals] = {}
+        for group, totals in self._groups.items():
+            rolled.setdefault(group[index], _GroupTotals()).add(totals)
+        return {name: totals.to_dict() for name, totals in sorted(rolled.items())}
+
+    def summary(self) -> Dict[str, Any]:
+        overall = _GroupTotals()
+        for totals in self._groups.values():
+            overall.add(totals)
+        return {
+            "records": self.records,
+            "errors": self.errors,
+            "totals": overall.to_dict(),
+            "by_model": self._rollup(0),
+            "by_day": self._rollup(1),
+            "by_key": self._rollup(2),
+            "groups": [
+                {"model": model, "day": day, "key": key, **totals.to_dict()}
+                for (model, day, key), totals in sorted(self._groups.items())
+            ],
+        }
+
+
+class MalformedRecord(dict):
+    """Stand-in for a log line that is not a JSON object, holding ``line`` and ``error``.
+
+    :class:`CostPipeline` counts it as an error instead of aborting the run.
+    """
+
+
+def iter_log_records(stream: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a JSONL or CSV *stream* without loading it whole.
+
+    JSONL lines that do not hold a JSON object are yielded as
+    :class:`MalformedRecord`.
+    """
+
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    if fmt != "jsonl":
+        raise ValueError(f"Unsupported log format {fmt!r}; expected 'jsonl' or 'csv'.")
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield MalformedRecord(line=number, error=f"invalid JSON: {exc}")
+            continue
+        if not isinstance(record, dict):
+            yield MalformedRecord(line=number, error="JSONL log lines must be objects.")
+            continue
+        yield record
+
+
+def detect_format(path: str | Path) -> str:
+    """Guess the log format from a file name, defaulting to JSONL."""
+
+    return "csv" if str(path).lower().endswith(".csv") else "jsonl"
+
+
+def record_day(value: Any) -> str:
+    """Return the UTC calendar day for an ISO-8601 string or epoch timestamp."""
+
+    if value in (None, ""):
+        return UNKNOWN_DAY
+    try:
+        numeric = isinstance(value, str) and value.replace(".", "", 1).isdigit()
+        if isinstance(value, (int, float)) or numeric:
+            seconds = float(value)
+            if seconds > 1e11:  # milliseconds
+                seconds /= 1000
+            return datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+        text = str(value).strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        parsed = datetime.fromisoformat(text)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return UNKNOWN_DAY
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.date().isoformat()
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _count_pairs(
+    service: TokenService, batch: List[Tuple[str, str, str] | None]
+) -> List[Tuple[int, int, bool] | str | None]:
+    """Count a batch with one encode call per model.
+
+    Each entry is ``(prompt_tokens, completion_tokens, exact)``, where
+    *exact* is false when either text held a long run and was counted
+    piecewise, or an error message when the record cannot be counted;
+    ``None`` entries of *batch* stay ``None``. A batch over the CPU budget
+    is recounted record by record so only the records that exceed it fail.
+    """
+
+    results: List[Tuple[int, int, bool] | str | None] = [None] * len(batch)
+    by_model: Dict[str, List[int]] = {}
+    for position, pair in enumerate(batch):
+        if pair is not None:
+            by_model.setdefault(pair[0], []).append(position)
+    for model_id, positions in by_model.items():
+        texts = [text for position in positions for text in batch[position][1:]]
+        try:
+            counts = service.count_tokens_many(model_id, texts)
+        except CPUBudgetExceeded:
+            for position in positions:
+                results[position] = _count_pair(service, *batch[position])
+            continue
+        except _COUNT_ERRORS as exc:
+            for position in positions:
+                results[position] = _count_error(model_id, exc)
+            continue
+        for offset, position in enumerate(positions):
+            results[position] = _pair_result(counts[2 * offset], counts[2 * offset + 1])
+    return results
+
+
+def _count_pair(
+    service: TokenService, model_id: str, prompt: str, completion: str
+) -> Tuple[int, int, bool] | str:
+    try:
+        prompt_count, completion_count = service.count_tokens_many(model_id, [prompt, completion])
+    except (CPUBudgetExceeded, *_COUNT_ERRORS) as exc:
+        return _count_error(model_id, exc)
+    return _pair_result(prompt_count, completion_count)
+
+
+def _pair_result(
+    prompt: Tuple[int, Dict[str, Any] | None], completion: Tuple[int, Dict[str, Any] | None]
+) -> Tuple[int, int, bool]:
+    return prompt[0], completion[0], prompt[1] is None and completion[1] is None
+
+
+def _count_error(model_id: str, exc: Exception) -> str:
+    if isinstance(exc, ModelNotFoundError):
+        return f"unknown model '{model_id}'"
+    return str(exc)
+
+
+def _init_worker(registry_path: str | None, count_index_path: str | None = None) -> None:
+    global _WORKER_SERVICE
+    from ..catalog import load_catalog
+    from .count_index import CountIndex
+
+    _WORKER_SERVICE = TokenService(
+        models=load_catalog(Path(registry_path) if registry_path else None),
+        count_index=CountIndex(count_index_path) if count_index_path else None,
+    )
+
+
+def _count_batch_in_worker(
+    batch: List[Tuple[str, str, str] | None]
+) -> List[Tuple[int, int, bool] | str | None]:
+    assert _WORKER_SERVICE is not None, "worker was not initialised"
+    return _count_pairs(_WORKER_SERVICE, batch)
+
+
+def _batched(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CostPipeline:
+    """Count prompt/completion tokens for log records and aggregate their cost.
+
+    Records are streamed in batches of *batch_size*; each batch is encoded
+    with one call per model. Records that cannot be counted (malformed
+    lines, unknown models, tokenizers that fail to load, texts over the CPU
+    budget) are counted as errors and annotated with an ``error`` message.
+    Records with long single-class runs are counted piecewise: they are
+    annotated ``exact: false`` and counted in ``inexact_records``. With
+    ``workers > 1`` batches are counted in a process pool; at most
+    ``2 * workers`` batches are in flight, so memory stays bounded
+    regardless of the log size and annotated records are still emitted in
+    input order. Workers open their own connection to the count index at
+    *count_index_path*, if given.
+    """
+
+    def __init__(
+        self,
+        service: TokenService,
+        *,
+        fields: CostFields | None = None,
+        registry_path: str | None = None,
+        count_index_path: str | None = None,
+        workers: int = 1,
+        batch_size: int = 256,
+        max_groups: int = 100_000,
+    ) -> None:
+        self._service = service
+        self._fields = fields or CostFields()
+        self._registry_path = registry_path
+        self._count_index_path = count_index_path
+        self._workers = max(int(workers), 1)
+        self._batch_size = max(int(batch_size), 1)
+        self.aggregator = CostAggregator(max_groups=max_groups)
+
+    def run(
+        self,
+        records: Iterable[Dict[str, Any]],
+        annotate: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """Process *records*, passing annotated copies to *annotate* if given."""
+
+        batches = _batched(records, self._batch_size)
+        if self._workers == 1:
+            for batch in batches:
+                self._consume(batch, _count_pairs(self._service, self._pairs(batch)), annotate)
+            return self.aggregator.summary()
+
+        pending: Deque[Tuple[List[Dict[str, Any]], Future]] = deque()
+        with ProcessPoolExecutor(
+            max_workers=self._workers,
+            initializer=_init_worker,
+            initargs=(self._registry_path, self._count_index_path),
+        ) as pool:
+            for batch in batches:
+                pending.append((batch, pool.submit(_count_batch_in_worker, self._pairs(batch))))
+                if len(pending) >= 2 * self._workers:
+                    done_batch, future = pending.popleft()
+                    self._consume(done_batch, future.result(), annotate)
+            while pending:
+                done_batch, future = pending.popleft()
+                self._consume(done_batch, future.result(), annotate)
+        return self.aggregator.summary()
+
+    def _pairs(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, str, str] | None]:
+        fields = self._fields
+        return [
+            None
+            if isinstance(record, MalformedRecord)
+            else (
+                _text(record.get(fields.model)),
+                _text(record.get(fields.prompt)),
+                _text(record.get(fields.completion)),
+            )
+            for record in batch
+        ]
+
+    def _consume(
+        self,
+        batch: List[Dict[str, Any]],
+        counts: List[Tuple[int, int, bool] | str | None],
+        annotate: Callable[[Dict[str, Any]], None] | None,
+    ) -> None:
+        fields = self._fields
+        for record, result in zip(batch, counts):
+            if result is None or isinstance(result, str):
+                self.aggregator.add_error()
+                if annotate:
+                    annotate(record if result is None else {**record, "error": result})
+                continue
+            model_id = _text(record.get(fields.model))
+            prompt_tokens, completion_tokens, exact = result
+            pricing = self._service.get_model(model_id).pricing
+            input_cost = pricing.input_cost(prompt_tokens) if pricing else None
+            output_cost = pricing.output_cost(completion_tokens) if pricing else None
+            day = record_day(record.get(fields.timestamp))
+            key = _text(record.get(fields.key)) if fields.key else ""
+            self.aggregator.add(
+                (model_id, day, key),
+                prompt_tokens,
+                completion_tokens,
+                input_cost,
+                output_cost,
+                exact,
+            )
+            if annotate:
+                annotate(
+                    {
+                        **record,
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "input_cost": None if input_cost is None else round(input_cost, 6),
+                        "output_cost": None if output_cost is None else round(output_cost, 6),
+                        "exact": exact,
+                    }
+                )
+
+
+def jsonl_writer(stream: io.TextIOBase) -> Callable[[Mapping[str, Any]], None]:
+    """Return a callback writing each annotated record as one JSON line."""
+
+    def write(record: Mapping[str, Any]) -> None:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write("\n")
+
+    return write
@@ -0,0 +1,321 @@
+"""Persistent token count index shared across processes and runs.
+
+Counts are keyed by the tokenizer fingerprint (hash of the tokenizer file
+plus encode options, see :meth:`TokenizerAdapter.fingerprint`) and a digest
+of the document, so an index can be shared by every model using the same
+tokenizer and survives registry edits that do not change the vocabulary.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokenizers (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS counts (
+    tokenizer INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    tokens INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (tokenizer, digest)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_last_used ON counts (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('hits', 0), ('misses', 0), ('evicted', 0);
+"""
+
+# SQLite's default limit on host parameters per statement is 999 on old builds.
+_MAX_PARAMS = 900
+# Eviction frees space down to this fraction of ``max_bytes``.
+_EVICT_TARGET = 0.8
+_EVICT_PASSES = 8
+
+
+def document_digest(text: str) -> bytes:
+    """Return the 128-bit digest identifying *text* in the index."""
+
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class CountIndex:
+    """SQLite-backed map from ``(tokenizer fingerprint, document)`` to a token count.
+
+    The database runs in WAL mode with a busy timeout, so any number of
+    processes may read while one of them writes; every thread uses its own
+    connection. Once the database holds more than *max_bytes* of live pages
+    (checked every *check_every* inserts), the least recently used entries are
+    evicted and the freed pages returned to the filesystem. Hits refresh an
+    entry's last-use time at most once per *touch_interval* seconds to keep
+    lookups read-only. Hit/miss counters are written with the next insert, on
+    :meth:`flush` and at most *flush_interval* seconds after a lookup.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        check_every: int = 1024,
+        touch_interval: int = 3600,
+        timeout: float = 30.0,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.path = Path(path).expanduser()
+        self.max_bytes = int(max_bytes)
+        self._check_every = max(int(check_every), 1)
+        self._touch_interval = int(touch_interval)
+        self._timeout = float(timeout)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tokenizer_ids: Dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._unflushed: List[int] = [0, 0]  # hits, misses not yet added to ``meta``
+        self._inserts_since_check = 0
+        self._flush_interval = float(flush_interval)
+        self._last_flush = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # executescript commits on its own; every statement is idempotent.
+        self._connection().executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Connections
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self._timeout, isolation_level=None)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def _tokenizer_id(self, fingerprint: str, create: bool) -> Optional[int]:
+        cached = self._tokenizer_ids.get(fingerprint)
+        if cached is not None:
+            return cached
+        conn = self._connection()
+        select = "SELECT id FROM tokenizers WHERE fingerprint = ?"
+        row = conn.execute(select, (fingerprint,)).fetchone()
+        if row is None:
+            if not create:
+                return None
+            with self._transaction() as tx:
+                tx.execute(
+                    "INSERT OR IGNORE INTO tokenizers (fingerprint) VALUES (?)", (fingerprint,)
+                )
+                row = tx.execute(select, (fingerprint,)).fetchone()
+        self._tokenizer_ids[fingerprint] = row[0]
+        return row[0]
+
+    # ------------------------------------------------------------------
+    # Lookups
+    def get(self, fingerprint: str, digest: bytes) -> Optional[int]:
+        return self.get_many(fingerprint, [digest]).get(digest)
+
+    def get_many(self, fingerprint: str, digests: Sequence[bytes]) -> Dict[bytes, int]:
+        """Return the stored counts for those of *digests* present in the index."""
+
+        found: Dict[bytes, int] = {}
+        stale: List[Tuple[int, int, bytes]] = []
+        tokenizer_id = self._tokenizer_id(fingerprint, create=False)
+        now = int(time.time())
+        if tokenizer_id is not None:
+            conn = self._connection()
+            unique = list(dict.fromkeys(digests))
+            for start in range(0, len(unique), _MAX_PARAMS):
+                chunk = unique[start : start + _MAX_PARAMS]
+                rows = conn.execute(
+                    "SELECT digest, tokens, last_used FROM counts WHERE tokenizer = ?"
+                    f" AND digest IN ({', '.join('?' * len(chunk))})",
+                    (tokenizer_id, *chunk),
+                )
+                for digest, tokens, last_used in rows:
+                    found[digest] = tokens
+                    if now - last_used >= self._touch_interval:
+                        stale.append((now, tokenizer_id, digest))
+        if stale:
+            with self._transaction() as tx:
+                tx.executemany(
+                    "UPDATE counts SET last_used = ? WHERE tokenizer = ? AND digest = ?", stale
+                )
+        hits = sum(1 for digest in digests if digest in found)
+        with self._lock:
+            self._hits += hits
+            self._misses += len(digests) - hits
+            self._unflushed[0] += hits
+            self._unflushed[1] += len(digests) - hits
+            due = time.monotonic() - self._last_flush >= self._flush_interval
+        if due:
+            self.flush()
+        return found
+
+    def put(self, fingerprint: str, digest: bytes, tokens: int) -> None:
+        self.put_many(fingerprint, [(digest, tokens)])
+
+    def put_many(self, fingerprint: str, items: Iterable[Tuple[bytes, int]]) -> None:
+        """Store ``(digest, tokens)`` pairs in a single transaction."""
+
+        tokenizer_id = self._tokenizer_id(fingerprint, create=True)
+        now = int(time.time())
+        rows = [(tokenizer_id, digest, int(tokens), now) for digest, tokens in items]
+        if not rows:
+            return
+        with self._lock:
+            hits, misses = self._unflushed
+            self._unflushed = [0, 0]
+            self._inserts_since_check += len(rows)
+            check = self._inserts_since_check >= self._check_every
+            if check:
+                self._inserts_since_check = 0
+        with self._transaction() as tx:
+            tx.executemany(
+                "INSERT OR REPLACE INTO counts (tokenizer, digest, tokens, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            _add_meta(tx, hits=hits, misses=misses)
+        if check:
+            self.evict()
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    def size_bytes(self) -> int:
+        """Return the bytes used by live pages (excluding free pages)."""
+
+        conn = self._connection()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """Drop least recently used entries until the index fits *max_bytes*.
+
+        Returns the number of evicted entries.
+        """
+
+        limit = self.max_bytes if max_bytes is None else int(max_bytes)
+        evicted = 0
+        # Half-empty B-tree pages are not freed, so a pass may fall short.
+        for _ in range(_EVICT_PASSES):
+            used = self.size_bytes()
+            if used <= limit:
+                break
+            with self._transaction() as tx:
+                entries = tx.execute("SELECT COUNT(*) FROM counts").fetchone()[0]
+                drop = min(entries, math.ceil(entries * (1 - _EVICT_TARGET * limit / used)))
+                if drop <= 0:
+                    break
+                removed = tx.execute(
+                    "DELETE FROM counts WHERE (tokenizer, digest) IN"
+                    " (SELECT tokenizer, digest FROM counts ORDER BY last_used LIMIT ?)",
+                    (drop,),
+                ).rowcount
+                _add_meta(tx, evicted=removed)
+            self._connection().execute("PRAGMA incremental_vacuum")
+            evicted += removed
+        return evicted
+
+    def compact(self) -> Dict[str, int]:
+        """Evict down to ``max_bytes``, then rebuild the file and truncate the WAL.
+
+        File sizes include the write-ahead log.
+        """
+
+        before = self._file_bytes()
+        evicted = self.evict()
+        conn = self._connection()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {
+            "evicted": evicted,
+            "file_bytes_before": before,
+            "file_bytes": self._file_bytes(),
+        }
+
+    def _file_bytes(self) -> int:
+        wal = self.path.with_name(self.path.name + "-wal")
+        return self.path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)
+
+    def stats(self) -> Dict[str, object]:
+        """Return hit-rate counters for this process and for the index lifetime."""
+
+        self.flush()
+        conn = self._connection()
+        meta = dict(conn.execute("SELECT name, value FROM meta"))
+        entries = conn.execute("SELECT COUNT(*) FROM counts").fetchone()[0]
+        tokenizers = conn.execute("SELECT COUNT(*) FROM tokenizers").fetchone()[0]
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        lifetime = meta["hits"] + meta["misses"]
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "tokenizers": tokenizers,
+            "size_bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "lifetime_hits": meta["hits"],
+            "lifetime_misses": meta["misses"],
+            "lifetime_hit_rate": meta["hits"] / lifetime if lifetime else 0.0,
+            "evicted": meta["evicted"],
+        }
+
+    def flush(self) -> None:
+        """Persist hit/miss counters that were not yet written."""
+
+        with self._lock:
+            hits, misses = self._unflushed
+            self._unflushed = [0, 0]
+            self._last_flush = time.monotonic()
+        if hits or misses:
+            with self._transaction() as tx:
+                _add_meta(tx, hits=hits, misses=misses)
+
+    def close(self) -> None:
+        self.flush()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _add_meta(conn: sqlite3.Connection, **deltas: int) -> None:
+    conn.executemany(
+        "UPDATE meta SET value = value + ? WHERE name = ?",
+        [(value, name) for name, value in deltas.items() if value],
+    )
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` on an autocommit connection."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self._conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,249 @@
+"""Fast token count estimation from character-class statistics.
+
+The estimate is a linear model over a handful of character-class counts
+(ASCII words, letters, digits, whitespace, punctuation, CJK and other
+non-ASCII characters). Counting is done on the UTF-8 bytes with
+``bytes.translate`` and compiled regular expressions, so it runs in C and
+never touches a tokenizer. Inputs larger than a threshold are sampled in
+evenly spaced windows, keeping the cost constant for multi-megabyte texts.
+
+Per-model coefficients are fitted offline by :func:`calibrate` against the
+real tokenizer and stored in ``model_registry.json``.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import statistics
+import string
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from ..models import EstimatorSpec
+from ..tokenizers.base import TokenizerAdapter
+from ..tokenizers.segmentation import content_defined_spans
+
+FEATURES = ("words", "ascii_letters", "digits", "whitespace", "punct", "cjk", "other")
+
+# Rough whole-vocabulary prior used until a model is calibrated.
+DEFAULT_ESTIMATOR = EstimatorSpec(
+    coefficients={
+        "intercept": 0.0,
+        "words": 1.0,
+        "ascii_letters": 0.02,
+        "digits": 0.4,
+        "whitespace": 0.05,
+        "punct": 0.9,
+        "cjk": 1.0,
+        "other": 0.6,
+    },
+    relative_error=0.3,
+)
+
+_Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.96, 0.99: 2.5758}
+
+_LETTERS = string.ascii_letters.encode("ascii")
+_DIGITS = string.digits.encode("ascii")
+_WHITESPACE = string.whitespace.encode("ascii")
+_PUNCT = string.punctuation.encode("ascii")
+_ASCII = bytes(range(128))
+_WORD = re.compile(rb"[A-Za-z]+")
+_CJK = re.compile(
+    "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+
+
+def _deleted(data: bytes, table: bytes) -> int:
+    return len(data) - len(data.translate(None, table))
+
+
+def char_features(text: str) -> Dict[str, float]:
+    """Return the character-class counts used by the estimator."""
+
+    data = text.encode("utf-8", "surrogatepass")
+    ascii_chars = _deleted(data, _ASCII)
+    non_ascii = len(text) - ascii_chars
+    cjk = _CJK.subn("", text)[1] if non_ascii else 0
+    return {
+        "words": float(_WORD.subn(b"", data)[1]),
+        "ascii_letters": float(_deleted(data, _LETTERS)),
+        "digits": float(_deleted(data, _DIGITS)),
+        "whitespace": float(_deleted(data, _WHITESPACE)),
+        "punct": float(_deleted(data, _PUNCT)),
+        "cjk": float(cjk),
+        "other": float(non_ascii - cjk),
+    }
+
+
+def _linear(coefficients: Dict[str, float], features: Dict[str, float]) -> float:
+    return sum(coefficients.get(name, 0.0) * value for name, value in features.items())
+
+
+@dataclass(frozen=True)
+class TokenEstimate:
+    """Estimated token count with a confidence interval."""
+
+    tokens: int
+    low: int
+    high: int
+    confidence: float
+    sampled: bool
+    calibrated: bool
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "low": self.low,
+            "high": self.high,
+            "confidence": self.confidence,
+            "sampled": self.sampled,
+            "calibrated": self.calibrated,
+        }
+
+
+def estimate_tokens(
+    text: str,
+    estimator: EstimatorSpec | None = None,
+    *,
+    confidence: float = 0.95,
+    sample_threshold: int = 262_144,
+    windows: int = 32,
+    window_chars: int = 4096,
+) -> TokenEstimate:
+    """Estimate the token count of *text* without tokenizing it.
+
+    Texts longer than *sample_threshold* characters are estimated from
+    *windows* evenly spaced windows of *window_chars* characters; the
+    spread between windows is added to the calibration error when building
+    the interval.
+    """
+
+    if confidence not in _Z_SCORES:
+        raise ValueError(
+            f"Unsupported confidence {confidence}; expected one of {sorted(_Z_SCORES)}."
+        )
+    calibrated = estimator is not None
+    spec = estimator or DEFAULT_ESTIMATOR
+    coefficients = spec.coefficients
+    intercept = coefficients.get("intercept", 0.0)
+    length = len(text)
+    if not text:
+        return TokenEstimate(0, 0, 0, confidence, False, calibrated)
+
+    sampling_error = 0.0
+    sampled = length > sample_threshold and windows > 1
+    if sampled:
+        step = (length - window_chars) / (windows - 1)
+        rates = []
+        for index in range(windows):
+            start = int(index * step)
+            window = text[start : start + window_chars]
+            rates.append(_linear(coefficients, char_features(window)) / max(len(window), 1))
+        mean_rate = statistics.fmean(rates)
+        body = mean_rate * length
+        coverage = min(windows * window_chars / length, 1.0)
+        spread = statistics.stdev(rates) / math.sqrt(windows)
+        sampling_error = spread * length * math.sqrt(1 - coverage)
+    else:
+        body = _linear(coefficients, char_features(text))
+
+    estimate = max(body + intercept, 0.0)
+    z = _Z_SCORES[confidence]
+    half_width = z * math.hypot(spec.relative_error * estimate, sampling_error)
+    return TokenEstimate(
+        tokens=int(round(estimate)),
+        low=max(int(math.floor(estimate - half_width)), 0),
+        high=int(math.ceil(estimate + half_width)),
+        confidence=confidence,
+        sampled=sampled,
+        calibrated=calibrated,
+    )
+
+
+# ----------------------------------------------------------------------
+# Calibration
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Solve ``matrix @ x = vector`` with Gaussian elimination and partial pivoting."""
+
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda index: abs(rows[index][column]))
+        if abs(rows[pivot][column]) < 1e-12:
+            continue
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for index in range(size):
+            if index != column:
+                factor = rows[index][column] / rows[column][column]
+                if factor:
+                    rows[index] = [a - factor * b for a, b in zip(rows[index], rows[column])]
+    return [
+        rows[index][size] / rows[index][index] if abs(rows[index][index]) >= 1e-12 else 0.0
+        for index in range(size)
+    ]
+
+
+def fit_estimator(
+    features: Sequence[Dict[str, float]],
+    token_counts: Sequence[int],
+    *,
+    ridge: float = 1e-6,
+) -> EstimatorSpec:
+    """Fit estimator coefficients by (lightly ridge-regularised) least squares."""
+
+    if len(features) != len(token_counts) or not features:
+        raise ValueError("Calibration needs the same non-zero number of samples and counts.")
+    names = ("intercept", *FEATURES)
+    rows = [[1.0, *(sample.get(name, 0.0) for name in FEATURES)] for sample in features]
+    size = len(names)
+    gram = [[sum(row[i] * row[j] for row in rows) for j in range(size)] for i in range(size)]
+    for index in range(1, size):
+        gram[index][index] += ridge * max(gram[index][index], 1.0)
+    moment = [sum(row[i] * count for row, count in zip(rows, token_counts)) for i in range(size)]
+    solution = _solve(gram, moment)
+    coefficients = {name: round(value, 6) for name, value in zip(names, solution)}
+
+    relative = [
+        (_linear(coefficients, sample) + coefficients["intercept"] - count) / count
+        for sample, count in zip(features, token_counts)
+        if count > 0
+    ]
+    relative_error = (
+        math.sqrt(statistics.fmean(value * value for value in relative)) if relative else 0.0
+    )
+    return EstimatorSpec(
+        coefficients=coefficients,
+        relative_error=round(relative_error, 6),
+        samples=len(features),
+    )
+
+
+def calibration_samples(texts: Iterable[str], sample_chars: int = 2048) -> Iterator[str]:
+    """Split corpus *texts* into samples of roughly *sample_chars* characters.
+
+    Samples are cut at pre-tokenizer-safe boundaries so their token counts
+    add up to the count of the whole text.
+    """
+
+    for text in texts:
+        for start, end in content_defined_spans(
+            text, min_size=max(sample_chars // 2, 1), max_size=max(sample_chars * 2, 1)
+        ):
+            if end > start:
+                yield text[start:end]
+
+
+def calibrate(
+    tokenizer: TokenizerAdapter,
+    texts: Iterable[str],
+    *,
+    sample_chars: int = 2048,
+) -> EstimatorSpec:
+    """Fit an estimator for *tokenizer* using the real token counts of *texts*."""
+
+    features: List[Dict[str, float]] = []
+    counts: List[int] = []
+    for sample in calibration_samples(texts, sample_chars):
+        features.append(char_features(sample))
+        counts.append(tokenizer.count_content_tokens(sample))
+    return fit_estimator(features, counts)
@@ -0,0 +1,80 @@
+"""Bounded least-recently-used cache shared by the service layer."""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe mapping that evicts the least recently used entry when full."""
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        if maxsize <= 0:
+            raise ValueError("LRUCache maxsize must be positive.")
+        self._maxsize = int(maxsize)
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the cache: its table, keys and values.
+
+        Tuples are counted with their elements; other objects shallowly.
+        """
+
+        with self._lock:
+            items = list(self._data.items())
+            total = sys.getsizeof(self._data)
+        for key, value in items:
+            total += _sizeof(key) + _sizeof(value)
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss counters."""
+
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self._maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+def _sizeof(obj: object) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        size += sum(sys.getsizeof(item) for item in obj)
+    return size
@@ -0,0 +1,169 @@
+"""Where the process memory goes, and whether it keeps growing.
+
+:func:`memory_report` backs ``GET /debug/memory`` and ``python -m app
+memory``: resident memory of the process, the growth measured around each
+tokenizer backend load, the size of the service's result caches and, when
+:mod:`tracemalloc` is tracing, the source lines holding the most Python
+memory. Native allocations made by the ``tokenizers`` library show up only
+in the resident figures.
+
+:func:`leak_check` calls :meth:`TokenService.calculate` in rounds and flags
+memory that grows after every round, once the tokenizer is loaded and the
+bounded caches have filled.
+"""
+
+from __future__ import annotations
+
+import gc
+import itertools
+import sys
+import tracemalloc
+from typing import Dict, Iterable, List
+
+from ..tokenizers.huggingface_tokenizer import resident_memory
+from .token_service import TokenService
+
+# Growth below this over a leak check is treated as allocator noise.
+DEFAULT_MIN_GROWTH = 1024 * 1024
+
+_SAMPLE_TEXT = (
+    "The quick brown fox jumps over the lazy dog. 敏捷的棕色狐狸跳过了懒狗。"
+    " Съешь же ещё этих мягких французских булок. 12345 + 67890 = 80235;"
+)
+
+
+def peak_resident_memory() -> int | None:
+    """Highest resident set size this process reached, in bytes."""
+
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def top_allocations(limit: int = 10) -> List[Dict[str, object]] | None:
+    """Return the *limit* source lines holding the most traced memory.
+
+    ``None`` when :mod:`tracemalloc` is not tracing (start the server with
+    ``--tracemalloc`` or set ``PYTHONTRACEMALLOC=1``).
+    """
+
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        )
+    )
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "bytes": stat.size,
+            "blocks": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def memory_report(service: TokenService, top: int = 0) -> Dict[str, object]:
+    """Describe the memory of this process and of *service*.
+
+    ``tokenizers`` lists each loaded backend once, with the model ids it
+    serves and ``rss_bytes``, the resident memory added while it loaded.
+    With *top*, the largest :mod:`tracemalloc` allocation sites are added.
+    """
+
+    tokenizers = service.metrics()["tokenizers"]
+    caches = service.cache_usage()
+    report: Dict[str, object] = {
+        "process": {
+            "rss_bytes": resident_memory(),
+            "peak_rss_bytes": peak_resident_memory(),
+            "tracemalloc": tracemalloc.is_tracing(),
+        },
+        "tokenizers": tokenizers,
+        "tokenizers_rss_bytes": sum(entry["rss_bytes"] or 0 for entry in tokenizers),
+        "caches": caches,
+        "caches_bytes": sum(cache["bytes"] for cache in caches.values()),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report["process"]["traced_bytes"] = current
+        report["process"]["traced_peak_bytes"] = peak
+    if top:
+        report["top_allocations"] = top_allocations(top)
+    return report
+
+
+def _grows(values: List[int | None], min_growth: int) -> bool:
+    if len(values) < 2 or any(value is None for value in values):
+        return False
+    steady = all(later >= earlier for earlier, later in zip(values, values[1:]))
+    return steady and values[-1] - values[0] >= min_growth
+
+
+def leak_check(
+    service: TokenService,
+    model_id: str,
+    texts: Iterable[str] | None = None,
+    *,
+    iterations: int = 1000,
+    rounds: int = 5,
+    mode: str = "exact",
+    min_growth: int = DEFAULT_MIN_GROWTH,
+) -> Dict[str, object]:
+    """Call ``calculate`` *iterations* times per round and watch memory.
+
+    A first, unmeasured round loads the tokenizer and fills the caches;
+    *texts* (a mixed-script sample by default) are cycled so bounded caches
+    reach their steady state. Resident and traced memory are sampled after
+    each later round, and a leak is suspected when either grew after every
+    round by at least *min_growth* bytes in total. :mod:`tracemalloc` is
+    started for the check if it is not already tracing.
+    """
+
+    if iterations < 1 or rounds < 2:
+        raise ValueError("'iterations' must be at least 1 and 'rounds' at least 2")
+    texts = [_SAMPLE_TEXT] if texts is None else list(texts)
+    if not texts:
+        raise ValueError("'texts' must not be empty")
+    cycle = itertools.cycle(texts)
+
+    def run_round() -> None:
+        for _ in range(iterations):
+            service.calculate(model_id, next(cycle), mode, include_tokens=False)
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        run_round()
+        samples = []
+        for _ in range(rounds):
+            run_round()
+            gc.collect()
+            samples.append(
+                {"rss_bytes": resident_memory(), "traced_bytes": tracemalloc.get_traced_memory()[0]}
+            )
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    rss = [sample["rss_bytes"] for sample in samples]
+    traced = [sample["traced_bytes"] for sample in samples]
+    measured_calls = iterations * (rounds - 1)
+    rss_growth = None if None in rss else rss[-1] - rss[0]
+    traced_growth = traced[-1] - traced[0]
+    return {
+        "model": model_id,
+        "calls": iterations * (rounds + 1),
+        "rounds": samples,
+        "rss_growth_bytes": rss_growth,
+        "traced_growth_bytes": traced_growth,
+        "traced_bytes_per_call": round(traced_growth / measured_calls, 1),
+        "leak_suspected": _grows(rss, min_growth) or _grows(traced, min_growth),
+    }
@@ -0,0 +1,165 @@
+"""Liveness, readiness and warm-up state for load balancers.
+
+A freshly started server answers ``/healthz`` at once but reports ready on
+``/readyz`` only when the tokenizers of its warm-up set are loaded, so the
+first users are not the ones paying for multi-second cold loads. Readiness
+also drops while the server is saturated, letting the balancer route new
+connections elsewhere until in-flight work drains.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .admission import AdmissionController
+from .token_service import TokenService
+
+# Saturated once in-flight admitted cost reaches this share of the cap.
+DEFAULT_SATURATION = 0.9
+# A model that failed to load is retried no sooner than this.
+_RETRY_SECONDS = 30.0
+
+
+class Readiness:
+    """Track warm-up progress and load, and decide whether to take traffic.
+
+    *warm* lists the models that must be loaded before the server is ready
+    (``None`` means every model in the catalog). Warm-up runs in a
+    background thread; a required model that stops being loaded, e.g.
+    after a registry reload evicted it, is loaded again on the next check,
+    and one that failed to load is retried every 30 seconds.
+    The server is saturated while *max_inflight* tokenization requests run
+    or, with *admission*, while the admitted in-flight cost is at least
+    *saturation* times its cap.
+    """
+
+    def __init__(
+        self,
+        service: TokenService,
+        *,
+        warm: Iterable[str] | None = (),
+        admission: Optional[AdmissionController] = None,
+        max_inflight: int | None = None,
+        saturation: float = DEFAULT_SATURATION,
+    ) -> None:
+        if max_inflight is not None and max_inflight < 1:
+            raise ValueError("'max_inflight' must be at least 1")
+        if not 0 < saturation <= 1:
+            raise ValueError("'saturation' must be in (0, 1]")
+        self._service = service
+        self._warm_all = warm is None
+        self._warm = [] if warm is None else list(dict.fromkeys(warm))
+        self._admission = admission
+        self._max_inflight = max_inflight
+        self._saturation = saturation
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._errors: Dict[str, Tuple[str, float]] = {}  # model -> (message, when)
+        self._warmer: threading.Thread | None = None
+
+    @property
+    def required(self) -> List[str]:
+        if self._warm_all:
+            return [model.model_id for model in self._service.catalog]
+        return list(self._warm)
+
+    def start_warming(self) -> None:
+        """Load missing required models in a background thread (no-op while one runs)."""
+
+        with self._lock:
+            if self._warmer is not None and self._warmer.is_alive():
+                return
+            self._warmer = threading.Thread(
+                target=self._load_missing, name="token-counter-warmup", daemon=True
+            )
+            self._warmer.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the current warm-up finishes; ``False`` on timeout."""
+
+        warmer = self._warmer
+        if warmer is not None:
+            warmer.join(timeout)
+            return not warmer.is_alive()
+        return True
+
+    def _load_missing(self) -> None:
+        loaded = self._loaded()
+        for model_id in self.required:
+            failed = self._errors.get(model_id)
+            if model_id in loaded or (failed and time.monotonic() - failed[1] < _RETRY_SECONDS):
+                continue
+            try:
+                self._service.warm(model_id)
+            except Exception as exc:  # noqa: BLE001 - reported on /readyz and /status
+                self._errors[model_id] = (f"{type(exc).__name__}: {exc}", time.monotonic())
+            else:
+                self._errors.pop(model_id, None)
+
+    def _loaded(self) -> set:
+        return {status["model"] for status in self._service.model_status() if status["loaded"]}
+
+    # ------------------------------------------------------------------
+    # In-flight tracking
+    def enter(self) -> None:
+        with self._lock:
+            self._inflight += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    def saturated(self) -> bool:
+        if self._max_inflight is not None and self._inflight >= self._max_inflight:
+            return True
+        if self._admission is not None:
+            metrics = self._admission.metrics()
+            return metrics["inflight_cost"] >= self._saturation * metrics["max_inflight_cost"]
+        return False
+
+    # ------------------------------------------------------------------
+    # Reports
+    def readiness(self) -> Dict[str, object]:
+        """Return ``{"ready": bool, ...}`` with the reasons when not ready."""
+
+        loaded = self._loaded()
+        missing = [model_id for model_id in self.required if model_id not in loaded]
+        reasons = []
+        if missing:
+            self.start_warming()
+            reasons.append("warming")
+        if self.saturated():
+            reasons.append("saturated")
+        report: Dict[str, object] = {
+            "ready": not reasons,
+            "reasons": reasons,
+            "warm": {"required": len(self.required), "loaded": len(self.required) - len(missing)},
+            "inflight": self._inflight,
+        }
+        if missing:
+            report["missing"] = missing
+        errors = {
+            model_id: self._errors[model_id][0] for model_id in missing if model_id in self._errors
+        }
+        if errors:
+            report["errors"] = errors
+        return report
+
+    def status(self) -> Dict[str, object]:
+        """Readiness plus the load state, memory estimate and last use of every model."""
+
+        report = self.readiness()
+        required = set(self.required)
+        models = self._service.model_status()
+        for model in models:
+            model["required"] = model["model"] in required
+            if model["model"] in self._errors and not model["loaded"]:
+                model["error"] = self._errors[model["model"]][0]
+        return {
+            **report,
+            "uptime_seconds": round(time.monotonic() - self._started, 3),
+            "models": models,
+        }
@@ -0,0 +1,239 @@
+"""Re-drive a captured workload and report latency distributions.
+
+Records from :func:`~app.services.capture.iter_capture` are sent at their
+captured offsets divided by *speed* (``0`` sends them back to back) to
+either a running server (:class:`HTTPTarget`, over TCP or a Unix socket) or
+a :class:`~app.services.token_service.TokenService` in this process
+(:class:`ServiceTarget`). The schedule is open-loop: a request's latency is
+measured from the moment it was due, so a target that falls behind shows
+the queueing its users would see, and ``lag`` reports how late requests
+were started.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import math
+import socket
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Tuple
+
+from ..tokenizers.huggingface_tokenizer import MissingDependencyError, TokenizerDownloadError
+from .capture import restore_payload
+from .token_service import ModelNotFoundError, TokenService
+
+_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class ServiceTarget:
+    """Call a :class:`TokenService` directly; returns the status a server would send."""
+
+    def __init__(self, service: TokenService) -> None:
+        self._service = service
+
+    def __call__(self, route: str, payload: Mapping[str, Any]) -> int:
+        service = self._service
+        model_id = payload.get("model") or payload.get("model_id")
+        try:
+            if route == "/tokenize":
+                service.calculate(
+                    model_id,
+                    payload.get("text", ""),
+                    payload.get("mode", "exact"),
+                    bool(payload.get("include_tokens", True)),
+                )
+            elif route == "/tokenize/batch":
+                service.calculate_many(
+                    model_id,
+                    payload["texts"],
+                    payload.get("mode", "exact"),
+                    bool(payload.get("include_tokens", True)),
+                )
+            elif route == "/tokenize/chat":
+                service.calculate_chat(
+                    model_id, payload["messages"], bool(payload.get("add_generation_prompt", True))
+                )
+            elif route == "/truncate":
+                service.truncate(
+                    model_id,
+                    payload.get("text", ""),
+                    int(payload["max_tokens"]),
+                    payload.get("strategy", "head"),
+                )
+            elif route == "/chunk":
+                for _ in service.chunk(
+                    model_id,
+                    payload.get("text", ""),
+                    max_tokens=int(payload.get("max_tokens", 512)),
+                    overlap=int(payload.get("overlap", 0)),
+                    snap=payload.get("snap", "none"),
+                ):
+                    pass
+            else:
+                return 404
+        except ModelNotFoundError:
+            return 404
+        except (KeyError, TypeError, ValueError):
+            return 400
+        except (MissingDependencyError, TokenizerDownloadError):
+            return 503
+        return 200
+
+
+class HTTPTarget:
+    """POST records to a server at *base_url*, or on the Unix socket *uds*.
+
+    Each replay thread keeps its own kept-alive connection.
+    """
+
+    def __init__(
+        self, base_url: str = "http://127.0.0.1:8000", *, uds: str | None = None, timeout=30.0
+    ) -> None:
+        parsed = urllib.parse.urlsplit(base_url)
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or 80
+        self._prefix = parsed.path.rstrip("/")
+        self._uds = uds
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+        if self._uds is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self._timeout)
+            sock.connect(self._uds)
+            conn.sock = sock
+        return conn
+
+    def __call__(self, route: str, payload: Mapping[str, Any]) -> int:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        for attempt in (0, 1):
+            conn = getattr(self._local, "conn", None)
+            fresh = conn is None
+            if fresh:
+                conn = self._local.conn = self._connect()
+            try:
+                conn.request("POST", self._prefix + route, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+                if fresh or attempt:  # only a stale kept-alive connection is retried
+                    raise
+                continue
+            if response.will_close:
+                conn.close()
+                self._local.conn = None
+            return response.status
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+def _schedule(records: Iterable[Mapping[str, Any]]) -> Iterable[Tuple[float, Mapping[str, Any]]]:
+    """Yield ``(offset, record)``; appended capture sessions continue after the last one."""
+
+    base = 0.0
+    previous = 0.0
+    for record in records:
+        offset = float(record.get("t", 0.0))
+        if offset < previous:  # a new session starts again from zero
+            base += previous
+        previous = offset
+        yield base + offset, record
+
+
+def _summary(latencies: List[float]) -> Dict[str, object]:
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+    summary: Dict[str, object] = {"count": len(ordered)}
+    for point in _PERCENTILES:
+        rank = max(math.ceil(point * len(ordered)) - 1, 0)
+        summary[f"p{round(point * 100)}_ms"] = round(ordered[rank] * 1000, 3)
+    summary["max_ms"] = round(ordered[-1] * 1000, 3)
+    summary["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 3)
+    return summary
+
+
+def replay(
+    records: Iterable[Mapping[str, Any]],
+    target: Callable[[str, Mapping[str, Any]], int],
+    *,
+    speed: float = 1.0,
+    concurrency: int = 8,
+    limit: int | None = None,
+) -> Dict[str, object]:
+    """Send *records* to *target* and return latency distributions.
+
+    *speed* scales the captured timing (``2`` replays twice as fast, ``0``
+    as fast as *concurrency* threads allow). Latencies are reported overall
+    and per route; non-2xx answers and exceptions are counted as errors.
+    """
+
+    if speed < 0:
+        raise ValueError("'speed' must not be negative")
+    if concurrency < 1:
+        raise ValueError("'concurrency' must be at least 1")
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {}
+    lags: List[float] = []
+    errors: Dict[str, int] = {}
+    models: Dict[str, int] = {}
+    slots = threading.BoundedSemaphore(concurrency * 4)  # bounds records held in memory
+
+    def run(due: float, route: str, payload: Mapping[str, Any]) -> None:
+        try:
+            started = time.perf_counter()
+            try:
+                status = target(route, restore_payload(payload))
+                outcome = None if 200 <= status < 300 else str(status)
+            except Exception as exc:  # noqa: BLE001 - counted, the replay goes on
+                outcome = type(exc).__name__
+            finished = time.perf_counter()
+            with lock:
+                lags.append(max(started - due, 0.0))
+                if outcome is None:
+                    latencies.setdefault(route, []).append(finished - due)
+                else:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+        finally:
+            slots.release()
+
+    sent = 0
+    origin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, record in _schedule(records):
+            if limit is not None and sent >= limit:
+                break
+            due = origin + (offset / speed if speed else 0.0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if not speed:
+                due = time.perf_counter()
+            payload = record.get("payload") or {}
+            model_id = str(payload.get("model") or payload.get("model_id") or "")
+            models[model_id] = models.get(model_id, 0) + 1
+            slots.acquire()
+            pool.submit(run, due, record["route"], payload)
+            sent += 1
+    elapsed = time.perf_counter() - origin
+
+    every = [latency for values in latencies.values() for latency in values]
+    return {
+        "requests": sent,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(sent / elapsed, 2) if elapsed > 0 else None,
+        "speed": speed,
+        "latency": _summary(every),
+        "routes": {route: _summary(values) for route, values in sorted(latencies.items())},
+        "lag": _summary(lags),
+        "errors": errors,
+        "models": dict(sorted(models.items(), key=lambda item: -item[1])),
+    }
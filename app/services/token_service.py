@@ -2,37 +2,719 @@
 
 from __future__ import annotations
 
-from typing import Dict, Iterable, List
+import hashlib
+import time
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
 
-from ..models import ModelSpec
+from ..catalog import ModelCatalog
+from ..models import ChatTemplate, ModelSpec
+from ..tokenizers.base import TokenizedText, TokenizerAdapter
 from ..tokenizers.registry import TokenizerRegistry, get_tokenizer_for_model
+from ..tokenizers.segmentation import (
+    DEFAULT_MAX_CHUNK,
+    DEFAULT_MAX_RUN,
+    content_defined_spans,
+    long_runs,
+    split_long_runs,
+)
+from .chunking import DEFAULT_WINDOW, SNAP_MODES, iter_chunks
+from .coalescer import BatchCoalescer
+from .count_index import CountIndex, document_digest
+from .estimation import estimate_tokens
+from .lru import LRUCache
+
+TRUNCATION_STRATEGIES = ("head", "tail", "middle")
+COUNTING_MODES = ("exact", "chunked", "estimate", "auto")
+
+_DEFAULT_CHAT_TEMPLATE = ChatTemplate()
 
 
 class ModelNotFoundError(KeyError):
     """Raised when a requested model is not registered."""
 
 
+class CPUBudgetExceeded(ValueError):
+    """Raised when encoding one request uses more CPU time than the service allows."""
+
+
+class _CPUBudget:
+    """CPU time spent by the calling thread since the request started."""
+
+    __slots__ = ("limit", "started")
+
+    def __init__(self, limit: float) -> None:
+        self.limit = limit
+        self.started = time.thread_time()
+
+    def check(self) -> None:
+        if time.thread_time() - self.started > self.limit:
+            raise CPUBudgetExceeded(
+                f"Request exceeded its CPU budget of {self.limit * 1000:g} ms."
+            )
+
+
 class TokenService:
     """High level API used by both CLI and HTTP interfaces."""
 
-    def __init__(self, models: Iterable[ModelSpec], registry: TokenizerRegistry | None = None) -> None:
-        self._models: Dict[str, ModelSpec] = {model.model_id: model for model in models}
+    def __init__(
+        self,
+        models: Iterable[ModelSpec],
+        registry: TokenizerRegistry | None = None,
+        *,
+        chat_cache_size: int = 4096,
+        chunk_cache_size: int = 65536,
+        coalescer: BatchCoalescer | None = None,
+        auto_exact_threshold: int = 16_384,
+        count_index: CountIndex | None = None,
+        max_run: int = DEFAULT_MAX_RUN,
+        cpu_budget: float | None = None,
+    ) -> None:
+        self._catalog = models if isinstance(models, ModelCatalog) else ModelCatalog(models)
         self._registry = registry or TokenizerRegistry()
+        self._chat_cache: LRUCache[Tuple[str, bytes], Tuple[int, int]] = LRUCache(chat_cache_size)
+        self._chunk_cache: LRUCache[Tuple[str, bytes], int] = LRUCache(chunk_cache_size)
+        self._coalescer = coalescer
+        self._auto_exact_threshold = int(auto_exact_threshold)
+        self._count_index = count_index
+        self._max_run = int(max_run)
+        self._cpu_budget = cpu_budget
+        self._last_used: Dict[str, float] = {}
+
+    @property
+    def catalog(self) -> ModelCatalog:
+        return self._catalog
+
+    def metrics(self) -> Dict[str, object]:
+        """Return cache and batching counters for monitoring."""
+
+        data: Dict[str, object] = {
+            "chat_cache": self._chat_cache.stats(),
+            "chunk_cache": self._chunk_cache.stats(),
+            "tokenizers": self._registry.loaded_backends(),
+        }
+        if self._coalescer is not None:
+            data["coalescer"] = self._coalescer.metrics.to_dict()
+        if self._count_index is not None:
+            data["count_index"] = self._count_index.stats()
+        return data
+
+    def cache_usage(self) -> Dict[str, Dict[str, int]]:
+        """Return the entries and approximate memory of each in-process result cache."""
+
+        usage = {}
+        for name, cache in (("chat_cache", self._chat_cache), ("chunk_cache", self._chunk_cache)):
+            usage[name] = {**cache.stats(), "bytes": cache.nbytes()}
+        return usage
+
+    def reload(self, models: Iterable[ModelSpec]) -> Dict[str, object]:
+        """Atomically replace the served models, keeping warm tokenizers.
+
+        The new catalog is swapped in with a single assignment, so in-flight
+        requests finish against the catalog they started with. Loaded
+        tokenizers are kept for models whose tokenizer spec is unchanged;
+        those of removed or reconfigured models are evicted.
+        """
+
+        catalog = models if isinstance(models, ModelCatalog) else ModelCatalog(models)
+        previous = self._catalog
+        self._catalog = catalog
+        evicted = self._registry.retain({model.model_id: model.tokenizer for model in catalog})
+
+        old_ids = {model.model_id for model in previous}
+        new_ids = {model.model_id for model in catalog}
+        changed = sorted(
+            model_id
+            for model_id in old_ids & new_ids
+            if previous.get(model_id) != catalog.get(model_id)
+        )
+        return {
+            "models": len(catalog),
+            "added": sorted(new_ids - old_ids),
+            "removed": sorted(old_ids - new_ids),
+            "changed": changed,
+            "evicted_tokenizers": sorted(evicted),
+        }
 
     def list_models(self) -> List[Dict[str, object]]:
-        return [model.to_dict() for model in self._models.values()]
+        return self._catalog.to_dicts()
 
     def get_model(self, model_id: str) -> ModelSpec:
-        try:
-            return self._models[model_id]
-        except KeyError as exc:  # pragma: no cover - defensive
-            raise ModelNotFoundError(model_id) from exc
+        model = self._catalog.get(model_id)
+        if model is None:
+            raise ModelNotFoundError(model_id)
+        return model
+
+    def _tokenizer(self, model: ModelSpec) -> TokenizerAdapter:
+        self._last_used[model.model_id] = time.time()
+        return get_tokenizer_for_model(model, self._registry)
+
+    def warm(self, model_id: str) -> None:
+        """Load the tokenizer of *model_id* now instead of on its first request."""
+
+        get_tokenizer_for_model(self.get_model(model_id), self._registry).load()
+
+    def is_loaded(self, model_id: str) -> bool:
+        """Whether the tokenizer now serving *model_id* is loaded.
+
+        Reflects reloads: a model whose tokenizer was replaced or evicted
+        reports ``False`` until it is loaded again.
+        """
+
+        tokenizer = get_tokenizer_for_model(self.get_model(model_id), self._registry)
+        return tokenizer.backend_info() is not None
+
+    def model_status(self) -> List[Dict[str, object]]:
+        """Return the load state, load time, memory cost and last use of every model.
+
+        ``rss_bytes`` is the resident memory added when the backend was
+        loaded; models listed in ``shared_with`` use the same backend, so
+        their memory is counted once.
+        """
+
+        infos = self._registry.backend_infos()
+        sharing: Dict[str, List[str]] = {}
+        for key, info in infos.items():
+            sharing.setdefault(info["fingerprint"], []).append(key)
+        now = time.time()
+        status = []
+        for model in self._catalog:
+            info = infos.get(model.model_id) or {}
+            last_used = self._last_used.get(model.model_id)
+            fingerprint = info.get("fingerprint")
+            status.append(
+                {
+                    "model": model.model_id,
+                    "loaded": bool(info),
+                    "load_seconds": info.get("load_seconds"),
+                    "rss_bytes": info.get("rss_bytes"),
+                    "file_bytes": info.get("file_bytes"),
+                    "shared_with": sorted(
+                        key for key in sharing.get(fingerprint, ()) if key != model.model_id
+                    ),
+                    "last_used": last_used,
+                    "idle_seconds": None if last_used is None else round(now - last_used, 3),
+                }
+            )
+        return status
+
+    def calculate(
+        self,
+        model_id: str,
+        text: str,
+        mode: str = "exact",
+        include_tokens: bool = True,
+    ) -> Dict[str, object]:
+        """Count the tokens of *text* for *model_id*.
+
+        ``exact`` encodes the whole text and returns the tokens. ``chunked``
+        splits the text into content-defined chunks and sums memoized
+        per-chunk counts; it yields the same count without the token list and
+        is much cheaper for near-duplicate documents. ``estimate`` never loads
+        the tokenizer and returns a calibrated estimate with a confidence
+        interval. ``auto`` counts exactly (without the token list) up to the
+        service's ``auto_exact_threshold`` characters and estimates above it;
+        the response reports the mode that was actually used. Without
+        *include_tokens*, ``exact`` only counts and returns ``tokens: None``.
+
+        Text holding a single-class run longer than the service's ``max_run``
+        (megabytes without whitespace, one repeated character) is always
+        counted piecewise with cuts inside the run; the response then has
+        ``tokens: None``, even with *include_tokens*, and a ``guard`` block
+        marking the count as inexact (``tokens_omitted`` records that tokens
+        were requested but not returned). With a ``cpu_budget``, count-only
+        work raises :class:`CPUBudgetExceeded` once the request has used it
+        up.
+        """
+
+        if mode not in COUNTING_MODES:
+            raise ValueError(
+                f"Unknown counting mode {mode!r}; expected one of {', '.join(COUNTING_MODES)}."
+            )
+        model = self.get_model(model_id)
+        if mode == "auto":
+            mode = "exact" if len(text) <= self._auto_exact_threshold else "estimate"
+            if mode == "exact":
+                tokenizer = self._tokenizer(model)
+                token_count, guard = self._count_texts(model, tokenizer, [text], self._budget())[0]
+                extra = {"guard": guard} if guard else {}
+                return self._count_response(model, "exact", token_count, None, extra)
+        if mode == "estimate":
+            estimate = estimate_tokens(text, model.estimator)
+            return self._count_response(
+                model, mode, estimate.tokens, None, {"estimate": estimate.to_dict()}
+            )
+
+        tokenizer = self._tokenizer(model)
+        budget = self._budget()
+        runs = self._long_runs(text)
+        extra: Dict[str, object] = {}
+        if mode == "chunked" or runs:
+            tokens = None
+            token_count, chunks, cached_chunks, forced = self._count_chunked(
+                model, tokenizer, text, budget
+            )
+            if mode == "chunked":
+                extra = {"chunks": chunks, "cached_chunks": cached_chunks}
+            if runs:
+                extra["guard"] = _guard(runs, forced, include_tokens and mode == "exact")
+        elif not include_tokens and (self._count_index is not None or budget is not None):
+            tokens = None
+            token_count, guard = self._count_texts(model, tokenizer, [text], budget)[0]
+            if guard:
+                extra["guard"] = guard
+        elif self._coalescer is not None:
+            tokens = self._coalescer.tokenize(model.tokenizer.identity(), tokenizer, text)
+            token_count = len(tokens)
+        elif include_tokens:
+            tokens = tokenizer.tokenize(text)
+            token_count = len(tokens)
+        else:
+            tokens = None
+            token_count = tokenizer.count_tokens(text)
+        if not include_tokens:
+            tokens = None
+        return self._count_response(model, mode, token_count, tokens, extra)
+
+    def calculate_many(
+        self,
+        model_id: str,
+        texts: Sequence[str],
+        mode: str = "exact",
+        include_tokens: bool = True,
+    ) -> List[Dict[str, object]]:
+        """Return :meth:`calculate` results for several *texts* of one model.
+
+        ``exact`` texts are encoded with a single ``tokenize_batch`` call;
+        count-only requests first consult the persistent count index. Texts
+        with long single-class runs are counted piecewise and carry a
+        ``guard`` block, as in :meth:`calculate`.
+        """
+
+        if mode != "exact":
+            return [self.calculate(model_id, text, mode, include_tokens) for text in texts]
+        model = self.get_model(model_id)
+        tokenizer = self._tokenizer(model)
+        budget = self._budget()
+        if not include_tokens:
+            return [
+                self._count_response(model, mode, count, None, {"guard": guard} if guard else {})
+                for count, guard in self._count_texts(model, tokenizer, texts, budget)
+            ]
+        results: List[Dict[str, object] | None] = [None] * len(texts)
+        plain: List[int] = []
+        for position, text in enumerate(texts):
+            runs = self._long_runs(text)
+            if runs:
+                token_count, _, _, forced = self._count_chunked(model, tokenizer, text, budget)
+                results[position] = self._count_response(
+                    model, mode, token_count, None, {"guard": _guard(runs, forced, True)}
+                )
+            else:
+                plain.append(position)
+        if plain:
+            batch = tokenizer.tokenize_batch([texts[position] for position in plain])
+            for position, tokens in zip(plain, batch):
+                results[position] = self._count_response(model, mode, len(tokens), tokens, {})
+        return results
+
+    def _count_response(
+        self,
+        model: ModelSpec,
+        mode: str,
+        token_count: int,
+        tokens: Sequence[object] | None,
+        extra: Dict[str, object],
+    ) -> Dict[str, object]:
+        return {
+            "model": self._model_dict(model),
+            "mode": mode,
+            "token_count": token_count,
+            "tokens": tokens,
+            **extra,
+            **self._usage(model, token_count),
+        }
+
+    def count_tokens(self, model_id: str, text: str) -> int:
+        """Return only the token count of *text*, skipping the response payload.
+
+        Counts of text with long single-class runs are approximate; use
+        :meth:`calculate` to learn whether a count was guarded.
+        """
+
+        model = self.get_model(model_id)
+        tokenizer = self._tokenizer(model)
+        return self._count_texts(model, tokenizer, [text], self._budget())[0][0]
+
+    def count_tokens_many(
+        self, model_id: str, texts: Sequence[str]
+    ) -> List[Tuple[int, Dict[str, object] | None]]:
+        """Return ``(count, guard)`` for *texts*, encoded together as one batch.
+
+        *guard* is ``None`` for exact counts and the ``guard`` block of
+        :meth:`calculate` for texts counted piecewise. The CPU budget, if
+        any, covers the whole batch.
+        """
+
+        model = self.get_model(model_id)
+        tokenizer = self._tokenizer(model)
+        return self._count_texts(model, tokenizer, texts, self._budget())
+
+    def _budget(self) -> _CPUBudget | None:
+        return _CPUBudget(self._cpu_budget) if self._cpu_budget else None
+
+    def _long_runs(self, text: str) -> List[Tuple[int, int]]:
+        return long_runs(text, self._max_run) if len(text) > self._max_run else []
+
+    def _count_texts(
+        self,
+        model: ModelSpec,
+        tokenizer: TokenizerAdapter,
+        texts: Sequence[str],
+        budget: _CPUBudget | None = None,
+    ) -> List[Tuple[int, Dict[str, object] | None]]:
+        """Return ``(count, guard)`` per text, using the persistent count index if configured.
+
+        *guard* is ``None`` for exact counts; only those are stored in the
+        index.
+        """
+
+        index = self._count_index
+        fingerprint = tokenizer.fingerprint() if index is not None else None
+        if index is None or fingerprint is None:
+            return self._count_uncached(model, tokenizer, texts, budget)
+        digests = [document_digest(text) for text in texts]
+        found: Dict[bytes, Tuple[int, Dict[str, object] | None]] = {
+            digest: (count, None) for digest, count in index.get_many(fingerprint, digests).items()
+        }
+        missing = [position for position, digest in enumerate(digests) if digest not in found]
+        if missing:
+            counts = self._count_uncached(
+                model, tokenizer, [texts[position] for position in missing], budget
+            )
+            fresh = {digests[position]: counted for position, counted in zip(missing, counts)}
+            index.put_many(
+                fingerprint,
+                [(digest, count) for digest, (count, guard) in fresh.items() if guard is None],
+            )
+            found.update(fresh)
+        return [found[digest] for digest in digests]
+
+    def _count_uncached(
+        self,
+        model: ModelSpec,
+        tokenizer: TokenizerAdapter,
+        texts: Sequence[str],
+        budget: _CPUBudget | None,
+    ) -> List[Tuple[int, Dict[str, object] | None]]:
+        """Count *texts* with the backend, in pieces where whole-text encoding is unsafe.
+
+        Texts containing long single-class runs are always counted piecewise
+        and get a ``guard`` block marking the count as inexact; with a CPU
+        budget, texts longer than a chunk are counted in (exact) pieces too,
+        so the budget can be checked between them.
+        """
+
+        counts: List[Tuple[int, Dict[str, object] | None]] = [(0, None)] * len(texts)
+        plain: List[int] = []
+        for position, text in enumerate(texts):
+            runs = self._long_runs(text)
+            if runs or (budget is not None and len(text) > DEFAULT_MAX_CHUNK):
+                count, _, _, forced = self._count_chunked(model, tokenizer, text, budget)
+                counts[position] = (count, _guard(runs, forced, False) if runs else None)
+            else:
+                plain.append(position)
+        if plain:
+            plain_counts = _count_plain(tokenizer, [texts[position] for position in plain])
+            for position, count in zip(plain, plain_counts):
+                counts[position] = (count, None)
+        return counts
+
+    def _count_chunked(
+        self,
+        model: ModelSpec,
+        tokenizer: TokenizerAdapter,
+        text: str,
+        budget: _CPUBudget | None = None,
+    ) -> Tuple[int, int, int, int]:
+        """Return ``(token_count, chunks, cached_chunks, forced_cuts)`` using the chunk memo.
+
+        Long single-class runs are cut every ``max_run`` characters so no
+        piece holds an oversized pre-token; a count with forced cuts is the
+        sum over those pieces rather than the exact count. Tokenizers that
+        cannot be split exactly count the rest of the text in one piece.
+        """
+
+        if not text:
+            return 0, 0, 0, 0
+        identity = model.tokenizer.identity()
+        total = 0
+        cached_chunks = 0
+        forced_cuts = 0
+        pieces = split_long_runs(text, _spans(tokenizer, text), self._max_run)
+        for start, end, forced in pieces:
+            chunk = text[start:end]
+            digest = hashlib.blake2b(chunk.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+            key = (identity, digest)
+            count = self._chunk_cache.get(key)
+            if count is None:
+                count = tokenizer.count_content_tokens(chunk)
+                self._chunk_cache.put(key, count)
+            else:
+                cached_chunks += 1
+            total += count
+            forced_cuts += forced
+            if budget is not None:
+                budget.check()
+        return total + tokenizer.special_tokens_count(), len(pieces), cached_chunks, forced_cuts
+
+    def truncate(
+        self,
+        model_id: str,
+        text: str,
+        max_tokens: int,
+        strategy: str = "head",
+    ) -> Dict[str, object]:
+        """Cut *text* so that it encodes to at most *max_tokens* tokens.
+
+        The cut points come from the offsets of a single encoding pass, so the
+        returned text always ends on a token boundary of the original input.
+        ``head`` keeps the beginning, ``tail`` the end and ``middle`` keeps
+        both ends while dropping the centre; the ends are joined by the gap
+        that followed the kept head (a space when there was none), and the
+        joined text is re-encoded so ``kept_tokens`` is its actual count.
+
+        Single-class runs longer than the service's ``max_run`` are encoded
+        in pieces and cut on those pieces' offsets; the response then has a
+        ``guard`` block, as the counts may differ from a single pass.
+        """
+
+        if strategy not in TRUNCATION_STRATEGIES:
+            raise ValueError(
+                f"Unknown truncation strategy {strategy!r};"
+                f" expected one of {', '.join(TRUNCATION_STRATEGIES)}."
+            )
+        max_tokens = int(max_tokens)
+        if max_tokens < 0:
+            raise ValueError("'max_tokens' must be a non-negative integer.")
 
-    def calculate(self, model_id: str, text: str) -> Dict[str, object]:
         model = self.get_model(model_id)
-        tokenizer = get_tokenizer_for_model(model, self._registry)
-        tokens = tokenizer.tokenize(text)
-        token_count = len(tokens)
+        tokenizer = self._tokenizer(model)
+        runs = self._long_runs(text)
+        encoding, forced = self._encode_guarded(tokenizer, text, runs)
+        token_count = len(encoding)
+
+        if token_count <= max_tokens:
+            truncated_text = text
+            kept = token_count
+        else:
+            special_count = sum(1 for index in range(token_count) if encoding.is_special(index))
+            limit = max_tokens
+            while True:
+                truncated_text, kept = _truncate_encoding(text, encoding, limit, strategy)
+                if strategy != "middle":
+                    break
+                # Head and tail meet at a seam that did not exist in the input: re-count.
+                kept = len(self._encode_guarded(tokenizer, truncated_text)[0])
+                if kept <= max_tokens or limit == special_count:
+                    break
+                limit = max(limit - (kept - max_tokens), special_count)
+
+        return {
+            "model": self._model_dict(model),
+            "text": truncated_text,
+            "strategy": strategy,
+            "max_tokens": max_tokens,
+            "token_count": token_count,
+            "kept_tokens": kept,
+            "dropped_tokens": token_count - kept,
+            "truncated": kept < token_count,
+            **({"guard": _guard(runs, forced, False)} if runs else {}),
+        }
+
+    def _encode_guarded(
+        self,
+        tokenizer: TokenizerAdapter,
+        text: str,
+        runs: List[Tuple[int, int]] | None = None,
+    ) -> Tuple[TokenizedText, int]:
+        """Return the encoding of *text* and its forced cuts.
+
+        Long single-class runs are encoded in ``max_run`` pieces whose
+        offsets are joined into one encoding; the post-processor's special
+        tokens lead it, once.
+        """
+
+        runs = self._long_runs(text) if runs is None else runs
+        if not runs:
+            return tokenizer.encode(text), 0
+        tokens: List[str] = []
+        offsets: List[Tuple[int, int]] = []
+        forced_cuts = 0
+        for start, end, forced in split_long_runs(text, [(0, len(text))], self._max_run):
+            encoding = tokenizer.encode(text[start:end])
+            for index in range(len(encoding)):
+                if not encoding.is_special(index):
+                    begin, finish = encoding.offsets[index]
+                    tokens.append(encoding.tokens[index])
+                    offsets.append((start + begin, start + finish))
+            forced_cuts += forced
+        specials = tokenizer.special_tokens_count()
+        encoding = TokenizedText(
+            [""] * specials + tokens,
+            [(0, 0)] * specials + offsets,
+            [1] * specials + [0] * len(tokens),
+        )
+        return encoding, forced_cuts
+
+    def chunk(
+        self,
+        model_id: str,
+        text: str | Iterable[str],
+        max_tokens: int = 512,
+        overlap: int = 0,
+        snap: str = "none",
+        window: int = DEFAULT_WINDOW,
+    ) -> Iterator[Dict[str, object]]:
+        """Split *text* into chunks of at most *max_tokens* tokens.
+
+        *text* is a string or an iterable of text blocks (such as an open
+        file); the input is encoded once, window by window, and chunks are
+        yielded as soon as they are complete, so memory does not grow with
+        the input. Consecutive chunks share *overlap* tokens. ``sentence``
+        and ``paragraph`` *snap* end chunks at such a break when one lies in
+        the second half of the budget. Arguments are validated before the
+        first chunk is requested. Long single-class runs are encoded in
+        pieces; chunks across such a cut carry a ``guard`` block.
+        """
+
+        if snap not in SNAP_MODES:
+            raise ValueError(
+                f"Unknown snap mode {snap!r}; expected one of {', '.join(SNAP_MODES)}."
+            )
+        max_tokens = int(max_tokens)
+        overlap = int(overlap)
+        if max_tokens <= 0:
+            raise ValueError("'max_tokens' must be a positive integer.")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("'overlap' must be non-negative and smaller than 'max_tokens'.")
+        model = self.get_model(model_id)
+        tokenizer = self._tokenizer(model)
+        blocks = (text,) if isinstance(text, str) else text
+        return iter_chunks(tokenizer, blocks, max_tokens, overlap, snap, window, self._max_run)
+
+    def calculate_chat(
+        self,
+        model_id: str,
+        messages: Sequence[Mapping[str, object]],
+        add_generation_prompt: bool = True,
+    ) -> Dict[str, object]:
+        """Count the tokens of a chat conversation rendered with the model's template.
+
+        Each message is rendered and counted on its own. Counts are memoized
+        under a digest of the whole rendered prefix up to that message, so
+        leading messages shared between calls (system prompts, few-shot
+        examples) are only tokenized once while any divergence invalidates
+        everything after it. Messages with long single-class runs are counted
+        piecewise and not memoized; the response then has a ``guard`` block.
+        """
+
+        model = self.get_model(model_id)
+        tokenizer = self._tokenizer(model)
+        template = model.chat_template or _DEFAULT_CHAT_TEMPLATE
+        identity = model.tokenizer.identity()
+
+        digest = hashlib.blake2b(template.prefix.encode("utf-8"), digest_size=16).digest()
+        template_tokens, special_tokens, _, guarded = self._chat_segment(
+            tokenizer, identity, digest, template.prefix
+        )
+        runs, forced_cuts = guarded
+
+        per_message: List[Dict[str, object]] = []
+        cached_messages = 0
+        for index, message in enumerate(messages):
+            role, content = _validate_message(index, message)
+            rendered = template.render_message(role, content)
+            digest = hashlib.blake2b(
+                digest + rendered.encode("utf-8"), digest_size=16
+            ).digest()
+            count, specials, cached, guarded = self._chat_segment(
+                tokenizer, identity, digest, rendered
+            )
+            runs += guarded[0]
+            forced_cuts += guarded[1]
+            special_tokens = special_tokens or specials
+            cached_messages += int(cached)
+            per_message.append({"role": role, "token_count": count, "cached": cached})
+
+        if add_generation_prompt and template.generation_prompt:
+            prompt_key = hashlib.blake2b(
+                b"generation:" + template.generation_prompt.encode("utf-8"), digest_size=16
+            ).digest()
+            count, specials, _, _ = self._chat_segment(
+                tokenizer, identity, prompt_key, template.generation_prompt
+            )
+            template_tokens += count
+            special_tokens = special_tokens or specials
+
+        token_count = (
+            sum(int(entry["token_count"]) for entry in per_message)
+            + template_tokens
+            + special_tokens
+        )
+        result = {
+            "model": self._model_dict(model),
+            "token_count": token_count,
+            "messages": per_message,
+            "template_tokens": template_tokens,
+            "special_tokens": special_tokens,
+            "cached_messages": cached_messages,
+        }
+        if runs:
+            result["guard"] = {"long_runs": runs, "forced_cuts": forced_cuts, "exact": False}
+        return {**result, **self._usage(model, token_count)}
+
+    def _chat_segment(
+        self,
+        tokenizer: TokenizerAdapter,
+        identity: str,
+        digest: bytes,
+        text: str,
+    ) -> Tuple[int, int, bool, Tuple[int, int]]:
+        """Return ``(content_tokens, special_tokens, cached, (long_runs, forced_cuts))``.
+
+        Tokens added by the tokenizer's post-processor (BOS/EOS) are reported
+        separately because they appear once per encoded conversation rather
+        than once per segment. Segments with long single-class runs are
+        counted piecewise and never cached, so a cache hit is always exact.
+        """
+
+        if not text:
+            return 0, 0, False, (0, 0)
+        runs = self._long_runs(text)
+        if runs:
+            pieces = split_long_runs(text, _spans(tokenizer, text), self._max_run)
+            count = sum(tokenizer.count_content_tokens(text[start:end]) for start, end, _ in pieces)
+            forced = sum(1 for _, _, cut in pieces if cut)
+            return count, tokenizer.special_tokens_count(), False, (len(runs), forced)
+        key = (identity, digest)
+        cached = self._chat_cache.get(key)
+        if cached is not None:
+            return cached[0], cached[1], True, (0, 0)
+        encoding = tokenizer.encode(text)
+        specials = sum(1 for index in range(len(encoding)) if encoding.is_special(index))
+        counts = (len(encoding) - specials, specials)
+        self._chat_cache.put(key, counts)
+        return counts[0], counts[1], False, (0, 0)
+
+    def _model_dict(self, model: ModelSpec) -> Dict[str, object]:
+        catalog = self._catalog
+        if catalog.get(model.model_id) is model:
+            return catalog.model_dict(model.model_id)
+        # The catalog was reloaded while this request was running.
+        return model.to_dict()
+
+    @staticmethod
+    def _usage(model: ModelSpec, token_count: int) -> Dict[str, object]:
         max_context = model.max_context
         usage_ratio = token_count / max_context if max_context else None
         overflow = max(token_count - max_context, 0) if max_context else 0
@@ -45,11 +727,116 @@ class TokenService:
                 pricing_info["estimated_input_cost"] = round((token_count / 1000) * input_price, 6)
 
         return {
-            "model": model.to_dict(),
-            "token_count": token_count,
-            "tokens": tokens,
             "max_context": max_context,
             "usage_ratio": usage_ratio,
             "overflow": overflow,
             "pricing": pricing_info,
         }
+
+
+def _guard(
+    runs: Sequence[Tuple[int, int]], forced: int, tokens_requested: bool
+) -> Dict[str, object]:
+    """Response block for a count taken piecewise across long single-class runs."""
+
+    guard: Dict[str, object] = {"long_runs": len(runs), "forced_cuts": forced, "exact": False}
+    if tokens_requested:
+        guard["tokens_omitted"] = True
+    return guard
+
+
+def _spans(tokenizer: TokenizerAdapter, text: str) -> List[Tuple[int, int]]:
+    """Content-defined chunks of *text*, or one span if *tokenizer* cannot be split exactly."""
+
+    if tokenizer.splits_at_safe_boundaries():
+        return content_defined_spans(text)
+    return [(0, len(text))]
+
+
+def _count_plain(tokenizer: TokenizerAdapter, texts: Sequence[str]) -> List[int]:
+    if len(texts) == 1:
+        return [tokenizer.count_tokens(texts[0])]
+    return [len(tokens) for tokens in tokenizer.tokenize_batch(list(texts))]
+
+
+def _validate_message(index: int, message: Mapping[str, object]) -> Tuple[str, str]:
+    if not isinstance(message, Mapping):
+        raise ValueError(f"Message {index} must be an object with 'role' and 'content'.")
+    role = message.get("role")
+    content = message.get("content", "")
+    if not isinstance(role, str) or not role:
+        raise ValueError(f"Message {index} must define a 'role'.")
+    if content is None:
+        content = ""
+    if not isinstance(content, str):
+        raise ValueError(f"Message {index} 'content' must be a string.")
+    return role, content
+
+
+def _truncate_encoding(
+    text: str,
+    encoding: TokenizedText,
+    max_tokens: int,
+    strategy: str,
+) -> Tuple[str, int]:
+    """Return the truncated text and the number of tokens it keeps."""
+
+    content = [index for index in range(len(encoding)) if not encoding.is_special(index)]
+    special_count = len(encoding) - len(content)
+    if max_tokens < special_count:
+        raise ValueError(
+            f"'max_tokens' must be at least {special_count}, the special tokens the tokenizer"
+            " adds to every encoding."
+        )
+    budget = max_tokens - special_count
+    offsets = [encoding.offsets[index] for index in content]
+
+    if strategy == "head":
+        head = _head_boundary(offsets, budget)
+        return text[: _end_of(offsets, head)], head + special_count
+    if strategy == "tail":
+        tail = _tail_boundary(offsets, budget)
+        return text[_start_of(offsets, tail, len(text)) :], (len(offsets) - tail) + special_count
+
+    head = _head_boundary(offsets, (budget + 1) // 2)
+    tail = _tail_boundary(offsets, budget - head)
+    tail = max(tail, head)
+    kept = head + (len(offsets) - tail)
+    head_end = _end_of(offsets, head)
+    tail_start = _start_of(offsets, tail, len(text))
+    seam = ""
+    if head and tail < len(offsets):
+        # Keep the gap that followed the head so its last token does not merge with the tail.
+        seam = text[head_end : offsets[head][0]] or " "
+    return text[:head_end] + seam + text[tail_start:], kept + special_count
+
+
+def _head_boundary(offsets: List[Tuple[int, int]], count: int) -> int:
+    """Largest ``n <= count`` such that the first *n* tokens end on a clean boundary.
+
+    Byte-level tokenizers may split one character across several tokens that
+    share the same offsets; cutting between them would keep the whole
+    character and re-encode to more tokens than reported.
+    """
+
+    count = min(count, len(offsets))
+    while 0 < count < len(offsets) and offsets[count][0] < offsets[count - 1][1]:
+        count -= 1
+    return count
+
+
+def _tail_boundary(offsets: List[Tuple[int, int]], count: int) -> int:
+    """Index of the first kept token when keeping at most *count* trailing tokens."""
+
+    start = len(offsets) - min(count, len(offsets))
+    while 0 < start < len(offsets) and offsets[start][0] < offsets[start - 1][1]:
+        start += 1
+    return start
+
+
+def _end_of(offsets: List[Tuple[int, int]], count: int) -> int:
+    return offsets[count - 1][1] if count else 0
+
+
+def _start_of(offsets: List[Tuple[int, int]], index: int, default: int) -> int:
+    return offsets[index][0] if index < len(offsets) else default
@@ -1,10 +1,11 @@
 """Tokenizer implementations for the LLM token counter."""
 
-from .base import TokenizerAdapter
+from .base import TokenizedText, TokenizerAdapter
 from .huggingface_tokenizer import HuggingFaceTokenizer
 from .registry import TokenizerRegistry, get_tokenizer_for_model
 
 __all__ = [
+    "TokenizedText",
     "TokenizerAdapter",
     "HuggingFaceTokenizer",
     "TokenizerRegistry",
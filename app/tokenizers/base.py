@@ -3,7 +3,27 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Sequence
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class TokenizedText:
+    """Tokens emitted for a text together with their character offsets."""
+
+    tokens: List[str]
+    offsets: List[Tuple[int, int]]
+    special_tokens_mask: List[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def is_special(self, index: int) -> bool:
+        """Return ``True`` when the token at *index* was injected by the tokenizer."""
+
+        if index < len(self.special_tokens_mask):
+            return bool(self.special_tokens_mask[index])
+        return False
 
 
 class TokenizerAdapter(ABC):
@@ -16,10 +36,87 @@ class TokenizerAdapter(ABC):
     def tokenize(self, text: str) -> Sequence[object]:
         """Split *text* into a sequence of tokens."""
 
+    def tokenize_batch(self, texts: Sequence[str]) -> List[Sequence[object]]:
+        """Tokenize several texts; adapters with a native batch API override this."""
+
+        return [self.tokenize(text) for text in texts]
+
+    def encode(self, text: str) -> TokenizedText:
+        """Return tokens and character offsets for *text*.
+
+        Adapters that cannot map tokens back onto the input should leave
+        this unimplemented; offset-based operations then report an error.
+        """
+
+        raise NotImplementedError(f"{self.__class__.__name__} does not expose token offsets")
+
+    def encode_ids_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        """Return vocabulary ids for each of *texts*.
+
+        Only adapters backed by a fixed vocabulary implement this, together
+        with :meth:`vocab_size` and :meth:`id_to_token`.
+        """
+
+        raise NotImplementedError(f"{self.__class__.__name__} does not expose token ids")
+
+    def vocab_size(self) -> int:
+        """Return the number of ids the tokenizer can emit, added tokens included."""
+
+        raise NotImplementedError(f"{self.__class__.__name__} does not expose token ids")
+
+    def id_to_token(self, token_id: int) -> Optional[str]:
+        """Return the token string for *token_id*, or ``None`` if it is unknown."""
+
+        raise NotImplementedError(f"{self.__class__.__name__} does not expose token ids")
+
     def count_tokens(self, text: str) -> int:
         """Return the number of tokens emitted for *text*."""
 
         return len(self.tokenize(text))
 
+    def special_tokens_count(self) -> int:
+        """Return how many tokens are added around every encoded input (BOS/EOS)."""
+
+        return 0
+
+    def count_content_tokens(self, text: str) -> int:
+        """Return the token count of *text* excluding post-processor special tokens."""
+
+        if not text:
+            return 0
+        return self.count_tokens(text) - self.special_tokens_count()
+
+    def splits_at_safe_boundaries(self) -> bool:
+        """Return whether pieces cut at safe boundaries encode like the whole text.
+
+        See :mod:`app.tokenizers.segmentation`. When ``False`` (the default),
+        chunked counting and windowed chunking encode the text in one pass
+        and only long single-class runs are still cut.
+        """
+
+        return False
+
+    def fingerprint(self) -> Optional[str]:
+        """Return a stable identity of the vocabulary and encode options.
+
+        Persistent count indexes key their entries on it; adapters returning
+        ``None`` (the default) are never indexed.
+        """
+
+        return None
+
+    def load(self) -> None:
+        """Do any lazy loading now, so the first request does not pay for it."""
+
+    def backend_info(self) -> Optional[Dict[str, object]]:
+        """Describe the loaded backend (``None`` while nothing is loaded).
+
+        Adapters backed by a file report its ``fingerprint``, ``file_bytes``,
+        the resident memory the load added (``rss_bytes``) and how long the
+        load took (``load_seconds``).
+        """
+
+        return None
+
     def __repr__(self) -> str:  # pragma: no cover - debug helper
         return f"{self.__class__.__name__}(name={self.name!r})"
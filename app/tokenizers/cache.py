@@ -0,0 +1,466 @@
+"""Inspection, verification and pruning of the tokenizer download cache.
+
+The cache holds ``<root>/<repo>/<revision>/<file>`` entries (see
+:func:`~app.tokenizers.huggingface_tokenizer.repo_cache_path`). Downloaded
+files are content-addressed: the bytes live once in ``<root>/blobs/<sha256>``
+and every repository/revision path that has the same content is a hard
+link to that blob, so model families sharing a tokenizer use one copy on
+disk. Next to them,
+``access.sqlite`` records the SHA-256 of every downloaded file and which
+processes use which file: a worker registers its host and pid when it loads
+a tokenizer and refreshes that record while the tokenizer stays in use.
+:func:`prune_cache` never removes a file held by a live process on this host
+or used by any host within ``active_window`` seconds.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+ACCESS_INDEX_NAME = "access.sqlite"
+BLOBS_DIR = "blobs"
+# Workers refresh their record of a loaded tokenizer this often.
+ACCESS_REFRESH_INTERVAL = 300.0
+# Files used within this window are in use even when the holder is unknown.
+DEFAULT_ACTIVE_WINDOW = 3 * ACCESS_REFRESH_INTERVAL
+# Leftover ``*.partial`` downloads older than this are removed by pruning.
+_STALE_PARTIAL_SECONDS = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT,
+    downloaded REAL
+);
+CREATE TABLE IF NOT EXISTS uses (
+    path TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, host, pid)
+);
+"""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists but belongs to another user
+        return True
+    except OSError:  # pragma: no cover - platforms without signal 0
+        return True
+    return True
+
+
+class AccessIndex:
+    """Per-cache-root record of file hashes and of which processes use which file.
+
+    Writes never raise: a read-only or locked cache must not fail requests,
+    so database errors are swallowed and reported as ``False``.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.path = self.root / ACCESS_INDEX_NAME
+        self._host = socket.gethostname()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def _key(self, path: Path) -> str:
+        return Path(path).relative_to(self.root).as_posix()
+
+    def _write(self, statement: str, parameters: Sequence[object]) -> bool:
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(statement, parameters)
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError):
+            return False
+        return True
+
+    def record_download(self, path: Path, sha256: str) -> bool:
+        return self._write(
+            "INSERT OR REPLACE INTO files (path, sha256, downloaded) VALUES (?, ?, ?)",
+            (self._key(path), sha256, time.time()),
+        )
+
+    def touch(self, path: Path) -> bool:
+        """Record that this process uses *path* now."""
+
+        return self._write(
+            "INSERT OR REPLACE INTO uses (path, host, pid, last_used) VALUES (?, ?, ?, ?)",
+            (self._key(path), self._host, os.getpid(), time.time()),
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Return ``{relative path: {sha256, last_used, holders}}`` from the index.
+
+        ``holders`` counts processes on this host that are still alive.
+        """
+
+        if not self.path.exists():
+            return {}
+        try:
+            connection = self._connect()
+            try:
+                files = connection.execute("SELECT path, sha256 FROM files").fetchall()
+                uses = connection.execute("SELECT path, host, pid, last_used FROM uses").fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return {}
+        info: Dict[str, Dict[str, object]] = {}
+        for key, sha256 in files:
+            info.setdefault(key, {"sha256": None, "last_used": None, "holders": 0})
+            info[key]["sha256"] = sha256
+        for key, host, pid, last_used in uses:
+            entry = info.setdefault(key, {"sha256": None, "last_used": None, "holders": 0})
+            entry["last_used"] = max(entry["last_used"] or 0.0, last_used)
+            if host == self._host and _pid_alive(pid):
+                entry["holders"] += 1
+        return info
+
+    def forget(self, keys: Iterable[str], dead_holders: bool = True) -> None:
+        """Drop the records of removed files and of processes that have exited."""
+
+        try:
+            connection = self._connect()
+            try:
+                for key in keys:
+                    connection.execute("DELETE FROM files WHERE path = ?", (key,))
+                    connection.execute("DELETE FROM uses WHERE path = ?", (key,))
+                if dead_holders:
+                    rows = connection.execute(
+                        "SELECT path, pid FROM uses WHERE host = ?", (self._host,)
+                    ).fetchall()
+                    for key, pid in rows:
+                        if not _pid_alive(pid):
+                            connection.execute(
+                                "DELETE FROM uses WHERE path = ? AND host = ? AND pid = ?",
+                                (key, self._host, pid),
+                            )
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            pass
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """One file in the cache together with what the access index knows about it."""
+
+    repo_id: str
+    revision: str
+    filename: str
+    path: str
+    size: int
+    modified: float
+    last_used: Optional[float]
+    holders: int
+    sha256: Optional[str]
+    partial: bool = False
+    # Name of the blob this file is a link to, if it is content-addressed.
+    blob: Optional[str] = None
+
+    @property
+    def storage_key(self) -> str:
+        """Identifies the bytes on disk: entries sharing a blob share a key."""
+
+        return f"blob:{self.blob}" if self.blob else self.path
+
+    def to_dict(self, now: float | None = None) -> Dict[str, object]:
+        now = time.time() if now is None else now
+        data = asdict(self)
+        data["age_days"] = round((now - self.modified) / 86400, 2)
+        last = self.last_used or self.modified
+        data["idle_days"] = round((now - last) / 86400, 2)
+        return data
+
+
+def scan_cache(root: str | Path) -> List[CacheEntry]:
+    """Return every file under *root*, oldest use first."""
+
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    index = AccessIndex(root).snapshot()
+    blobs = _blob_inodes(root)
+    entries = []
+    repo_dirs = (path for path in root.iterdir() if path.is_dir() and path.name != BLOBS_DIR)
+    for repo_dir in sorted(repo_dirs):
+        for revision_dir in sorted(path for path in repo_dir.iterdir() if path.is_dir()):
+            for path in sorted(path for path in revision_dir.rglob("*") if path.is_file()):
+                stat = path.stat()
+                key = path.relative_to(root).as_posix()
+                info = index.get(key, {})
+                entries.append(
+                    CacheEntry(
+                        repo_id=repo_dir.name.replace("__", "/"),
+                        revision=revision_dir.name,
+                        filename=path.relative_to(revision_dir).as_posix(),
+                        path=str(path),
+                        size=stat.st_size,
+                        modified=stat.st_mtime,
+                        last_used=info.get("last_used"),
+                        holders=int(info.get("holders", 0)),
+                        sha256=info.get("sha256"),
+                        partial=path.name.endswith(".partial"),
+                        blob=blobs.get((stat.st_dev, stat.st_ino)),
+                    )
+                )
+    entries.sort(key=lambda entry: entry.last_used or entry.modified)
+    return entries
+
+
+def cache_bytes(entries: Iterable[CacheEntry]) -> int:
+    """Bytes used on disk by *entries*, counting each shared blob once."""
+
+    return sum({entry.storage_key: entry.size for entry in entries}.values())
+
+
+def _blob_inodes(root: Path) -> Dict[tuple, str]:
+    blob_dir = root / BLOBS_DIR
+    if not blob_dir.is_dir():
+        return {}
+    inodes = {}
+    for blob in blob_dir.iterdir():
+        stat = blob.stat()
+        inodes[(stat.st_dev, stat.st_ino)] = blob.name
+    return inodes
+
+
+def link_blob(root: str | Path, path: str | Path, sha256: str) -> bool:
+    """Make *path* a hard link to ``<root>/blobs/<sha256>``.
+
+    The first file with a given hash becomes the blob; later files with the
+    same hash are replaced by links to it. Returns ``False`` when the file
+    system does not support hard links, in which case *path* stays a plain
+    file.
+    """
+
+    path = Path(path)
+    blob = Path(root) / BLOBS_DIR / sha256
+    try:
+        blob.parent.mkdir(exist_ok=True)
+        try:
+            os.link(path, blob)
+            return True
+        except FileExistsError:
+            pass
+        if os.path.samefile(blob, path):
+            return True
+        # Link then rename so readers never see the path missing.
+        staged = path.with_name(f"{path.name}.{os.getpid()}.link.partial")
+        staged.unlink(missing_ok=True)
+        os.link(blob, staged)
+        os.replace(staged, path)
+    except OSError:
+        return False
+    return True
+
+
+def dedupe_cache(root: str | Path, *, workers: int = 4) -> Dict[str, object]:
+    """Content-address files stored before blobs existed (or copied in by hand)."""
+
+    root = Path(root)
+    entries = [entry for entry in scan_cache(root) if not entry.partial and not entry.blob]
+    before = cache_bytes(scan_cache(root))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        digests = list(pool.map(lambda entry: _sha256(entry.path), entries))
+    index = AccessIndex(root)
+    linked = 0
+    for entry, digest in zip(entries, digests):
+        if entry.sha256 is None:
+            index.record_download(Path(entry.path), digest)
+        linked += link_blob(root, entry.path, digest)
+    after = cache_bytes(scan_cache(root))
+    return {"root": str(root), "linked": linked, "bytes_before": before, "bytes_after": after}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for block in iter(lambda: stream.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _default_loader(path: str) -> None:
+    """Parse *path* with the ``tokenizers`` package when it is installed."""
+
+    try:
+        from tokenizers import Tokenizer  # type: ignore
+    except ModuleNotFoundError:
+        return
+    Tokenizer.from_file(path)
+
+
+def verify_cache(
+    root: str | Path,
+    *,
+    workers: int = 4,
+    remove: bool = False,
+    loader: Callable[[str], None] | None = _default_loader,
+) -> List[Dict[str, object]]:
+    """Hash and parse every cached file in parallel.
+
+    A file is corrupt when its hash differs from the one recorded at
+    download time, when a ``.json`` file is not valid JSON, or when *loader*
+    (``tokenizers.Tokenizer.from_file`` if available) rejects it. With
+    *remove*, corrupt files not held by a live process are deleted so the
+    next load downloads them again.
+    """
+
+    entries = [entry for entry in scan_cache(root) if not entry.partial]
+
+    def check(entry: CacheEntry) -> Dict[str, object]:
+        result: Dict[str, object] = {"path": entry.path, "size": entry.size, "ok": True}
+        try:
+            digest = _sha256(entry.path)
+            result["sha256"] = digest
+            if entry.sha256 and digest != entry.sha256:
+                raise ValueError(f"hash mismatch (recorded {entry.sha256})")
+            if entry.filename.endswith(".json"):
+                with open(entry.path, "rb") as stream:
+                    json.loads(stream.read().decode("utf-8"))
+                if loader is not None and entry.filename.endswith("tokenizer.json"):
+                    loader(entry.path)
+        except Exception as exc:  # noqa: BLE001 - any failure marks the file corrupt
+            result["ok"] = False
+            result["error"] = f"{type(exc).__name__}: {exc}"
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(check, entries))
+    if remove:
+        removed = []
+        for entry, result in zip(entries, results):
+            if not result["ok"] and not entry.holders:
+                Path(entry.path).unlink(missing_ok=True)
+                result["removed"] = True
+                removed.append(Path(entry.path).relative_to(root).as_posix())
+        if removed:
+            AccessIndex(root).forget(removed)
+            _remove_unused_blobs(Path(root))
+            _remove_empty_dirs(Path(root))
+    return results
+
+
+def prune_cache(
+    root: str | Path,
+    *,
+    max_bytes: int | None = None,
+    max_age: float | None = None,
+    active_window: float = DEFAULT_ACTIVE_WINDOW,
+    dry_run: bool = False,
+    now: float | None = None,
+) -> Dict[str, object]:
+    """Delete least recently used files until the cache fits the budgets.
+
+    Files idle for longer than *max_age* seconds are removed, then the
+    oldest remaining ones until at most *max_bytes* are left. Files held by
+    a live process on this host or used within *active_window* seconds are
+    kept even when that leaves the cache over budget. Stale partial
+    downloads are always removed.
+    """
+
+    root = Path(root)
+    now = time.time() if now is None else now
+    entries = scan_cache(root)
+    total = cache_bytes(entries)
+    references: Dict[str, int] = {}
+    for entry in entries:
+        references[entry.storage_key] = references.get(entry.storage_key, 0) + 1
+    removed: List[CacheEntry] = []
+    kept_in_use: List[CacheEntry] = []
+    remaining = total
+
+    def remove(entry: CacheEntry) -> None:
+        nonlocal remaining
+        removed.append(entry)
+        references[entry.storage_key] -= 1
+        if not references[entry.storage_key]:  # a blob is freed with its last link
+            remaining -= entry.size
+
+    for entry in entries:  # least recently used first
+        last = entry.last_used or entry.modified
+        if entry.partial:
+            if now - entry.modified > _STALE_PARTIAL_SECONDS:
+                remove(entry)
+            continue
+        expired = max_age is not None and now - last > max_age
+        over_budget = max_bytes is not None and remaining > max_bytes
+        if not (expired or over_budget):
+            continue
+        if entry.holders or now - last < active_window:
+            kept_in_use.append(entry)
+            continue
+        remove(entry)
+
+    if not dry_run:
+        for entry in removed:
+            Path(entry.path).unlink(missing_ok=True)
+        AccessIndex(root).forget([Path(entry.path).relative_to(root).as_posix() for entry in removed])
+        _remove_unused_blobs(root)
+        _remove_empty_dirs(root)
+    return {
+        "root": str(root),
+        "dry_run": dry_run,
+        "files": len(entries),
+        "bytes_before": total,
+        "bytes_after": remaining,
+        "removed": [entry.path for entry in removed],
+        "removed_bytes": total - remaining,
+        "kept_in_use": [entry.path for entry in kept_in_use],
+    }
+
+
+def warm_cache(tokenizers: Dict[str, object], *, load: bool = False) -> Dict[str, object]:
+    """Download (and with *load*, parse) the files of *tokenizers*, keyed by model id."""
+
+    report: Dict[str, object] = {}
+    for model_id, tokenizer in tokenizers.items():
+        try:
+            path = tokenizer.resolve_tokenizer_file()
+            if load:
+                tokenizer.vocab_size()
+        except Exception as exc:  # noqa: BLE001 - reported per model
+            report[model_id] = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            continue
+        report[model_id] = {"ok": True, "path": str(path), "size": path.stat().st_size}
+    return report
+
+
+def _remove_unused_blobs(root: Path) -> None:
+    blob_dir = root / BLOBS_DIR
+    if not blob_dir.is_dir():
+        return
+    for blob in blob_dir.iterdir():
+        if blob.stat().st_nlink <= 1:
+            blob.unlink(missing_ok=True)
+
+
+def _remove_empty_dirs(root: Path) -> None:
+    for path in sorted(root.rglob("*"), key=lambda item: len(item.parts), reverse=True):
+        if path.is_dir():
+            try:
+                path.rmdir()
+            except OSError:
+                pass
@@ -2,17 +2,66 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
+import tempfile
+import threading
+import time
 import urllib.error
 import urllib.request
-from dataclasses import dataclass
+import weakref
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import Callable, Dict, Iterable, List, Sequence
 
-from .base import TokenizerAdapter
+from .base import TokenizedText, TokenizerAdapter
+from .cache import ACCESS_REFRESH_INTERVAL, AccessIndex, link_blob
+from .segmentation import next_safe_boundary
 
 _DEFAULT_USER_AGENT = "token-counter-llm/0.1"
+_CACHE_DIR_NAME = "token-counter-llm"
+_DEFAULT_ENDPOINT = "https://huggingface.co"
+# Tokenizer files shipped with a deployment by ``python -m app bundle``.
+_DEFAULT_BUNDLE_DIR = Path(__file__).resolve().parents[2] / "tokenizer_bundle"
+# Texts of at least this many characters are encoded as parallel segments.
+DEFAULT_PARALLEL_THRESHOLD = 1 << 20
+
+
+def default_cache_dir() -> Path:
+    """Return the writable cache root, honouring ``TOKEN_COUNTER_CACHE_DIR``."""
+
+    configured = os.getenv("TOKEN_COUNTER_CACHE_DIR")
+    if configured:
+        return Path(configured).expanduser()
+    return Path.home() / ".cache" / _CACHE_DIR_NAME
+
+
+def default_bundle_dir() -> Path:
+    """Return the read-only bundle root, honouring ``TOKEN_COUNTER_BUNDLE_DIR``."""
+
+    configured = os.getenv("TOKEN_COUNTER_BUNDLE_DIR")
+    return Path(configured).expanduser() if configured else _DEFAULT_BUNDLE_DIR
+
+
+def default_endpoint() -> str:
+    """Return the hub base URL, honouring ``HF_ENDPOINT`` (for example a peer mirror)."""
+
+    return (os.getenv("HF_ENDPOINT") or _DEFAULT_ENDPOINT).rstrip("/")
+
+
+def repo_cache_path(root: Path, repo_id: str, revision: str, filename: str) -> Path:
+    """Return the ``<root>/<repo>/<revision>/<file>`` location used by caches and bundles."""
+
+    return root / repo_id.replace("/", "__") / revision / filename
+
+
+def _is_writable_dir(path: Path) -> bool:
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(path, os.W_OK)
 
 
 class MissingDependencyError(RuntimeError):
@@ -36,12 +85,233 @@ def _import_hf_tokenizer():
     return HFTokenizer
 
 
+def _encoding_attr(encoding, name: str):
+    value = getattr(encoding, name, None)
+    if callable(value):  # pragma: no cover - compatibility guard
+        value = value()
+    return value
+
+
+def _encoding_tokens(encoding) -> list:
+    tokens = _encoding_attr(encoding, "tokens")
+    if tokens is None:
+        raise RuntimeError("The Hugging Face backend did not return token data.")
+    return list(tokens)
+
+
+def _encoding_length(encoding) -> int:
+    try:
+        return len(encoding)
+    except TypeError:
+        return len(_encoding_tokens(encoding))
+
+
+def default_parallel_workers() -> int:
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+class _StitchedEncoding:
+    """Encodings of consecutive segments presented as one ``Encoding``.
+
+    Segment offsets are shifted by the segment's start; special tokens added
+    by the post-processor sit in *prefix* and *suffix*. Attributes are built
+    on first access, so counting never materialises the token lists.
+    """
+
+    def __init__(self, parts: Sequence[tuple], prefix=None, suffix=None) -> None:
+        self._parts = parts
+        self._prefix = prefix
+        self._suffix = suffix
+
+    def __len__(self) -> int:
+        affixes = sum(
+            len(affix["special_tokens_mask"]) for affix in (self._prefix, self._suffix) if affix
+        )
+        return affixes + sum(_encoding_length(encoding) for _, encoding in self._parts)
+
+    def _join(self, name: str, shift: bool = False) -> list:
+        values = []
+        if self._prefix is not None:
+            values.extend(self._prefix[name])
+        for start, encoding in self._parts:
+            part = _encoding_attr(encoding, name)
+            if part is None:
+                return None
+            if shift:
+                values.extend((start + int(begin), start + int(end)) for begin, end in part)
+            else:
+                values.extend(part)
+        if self._suffix is not None:
+            values.extend(self._suffix[name])
+        return values
+
+    @property
+    def tokens(self):
+        return self._join("tokens")
+
+    @property
+    def ids(self):
+        return self._join("ids")
+
+    @property
+    def offsets(self):
+        return self._join("offsets", shift=True)
+
+    @property
+    def special_tokens_mask(self):
+        return self._join("special_tokens_mask")
+
+
+# Pre-tokenizers whose pieces never span an alphanumeric/whitespace boundary,
+# so encodes cut at ``segmentation`` safe boundaries match a single pass.
+_SPLITTABLE_PRE_TOKENIZERS = frozenset({"ByteLevel", "Whitespace", "WhitespaceSplit"})
+
+
+def _pre_tokenizer_config(pre_tokenizer) -> dict | None:
+    try:
+        state = json.loads(pre_tokenizer.__getstate__())
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _splittable(backend) -> bool:
+    """Whether *backend*'s pre-tokenizer makes safe-boundary splits exact.
+
+    True for byte-level pre-tokenizers, alone or inside a ``Sequence`` (as
+    in Qwen and DeepSeek), and for whitespace splitting. Others, such as the
+    Metaspace pre-tokenizer of SentencePiece conversions, may mark each
+    piece's start, so their texts are always encoded in a single pass.
+    """
+
+    pre_tokenizer = getattr(backend, "pre_tokenizer", None)
+    if pre_tokenizer is None:
+        return False
+    config = _pre_tokenizer_config(pre_tokenizer)
+    if config is None:
+        return type(pre_tokenizer).__name__ in _SPLITTABLE_PRE_TOKENIZERS
+    if config.get("type") == "Sequence":
+        members = config.get("pretokenizers") or ()
+        return any(
+            isinstance(member, dict) and member.get("type") == "ByteLevel" for member in members
+        )
+    return config.get("type") in _SPLITTABLE_PRE_TOKENIZERS
+
+
+def resident_memory() -> int | None:
+    """Resident set size of this process in bytes, or ``None`` where unavailable."""
+
+    try:
+        with open("/proc/self/statm", "rb") as stream:
+            pages = int(stream.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class _SharedBackend:
+    backend: object
+    fingerprint: str
+    path: str
+    file_bytes: int
+    # RSS growth measured while the backend was built.
+    rss_bytes: int | None
+    splittable: bool
+    holders: "weakref.WeakSet[HuggingFaceTokenizer]" = field(default_factory=weakref.WeakSet)
+
+
+class _BackendPool:
+    """Backends shared by every tokenizer with the same fingerprint.
+
+    Registry entries for model sizes, chat/base variants and fine-tunes often
+    point at byte-identical files; each unique file and option set is parsed
+    once per process. Entries are also keyed by the loader, so subclasses
+    that build backends differently never share one. An entry is dropped
+    when its last tokenizer is garbage collected (for example after a
+    registry reload evicts it).
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[tuple, _SharedBackend] = {}
+        # Reentrant: garbage collection may run ``_release`` while it is held.
+        self._lock = threading.RLock()
+        # Loads run one at a time so each RSS delta belongs to one backend.
+        self._load_lock = threading.Lock()
+
+    def acquire(
+        self,
+        tokenizer: "HuggingFaceTokenizer",
+        fingerprint: str,
+        path: Path,
+        factory: Callable[[Path], object],
+    ) -> _SharedBackend:
+        key = (fingerprint, getattr(factory, "__func__", factory))
+        entry = self._lookup(key)
+        if entry is None:
+            with self._load_lock:
+                entry = self._lookup(key)
+                if entry is None:
+                    before = resident_memory()
+                    backend = factory(path)
+                    after = resident_memory()
+                    entry = _SharedBackend(
+                        backend=backend,
+                        fingerprint=fingerprint,
+                        path=str(path),
+                        file_bytes=path.stat().st_size,
+                        rss_bytes=None if before is None or after is None else after - before,
+                        splittable=_splittable(backend),
+                    )
+                    with self._lock:
+                        self._entries[key] = entry
+        with self._lock:
+            entry.holders.add(tokenizer)
+        weakref.finalize(tokenizer, self._release, key)
+        return entry
+
+    def _lookup(self, key: tuple) -> _SharedBackend | None:
+        with self._lock:
+            return self._entries.get(key)
+
+    def _release(self, key: tuple) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not any(True for _ in entry.holders):
+                del self._entries[key]
+
+    def report(self) -> List[Dict[str, object]]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return [
+            {
+                "fingerprint": entry.fingerprint,
+                "path": entry.path,
+                "file_bytes": entry.file_bytes,
+                "rss_bytes": entry.rss_bytes,
+                "tokenizers": len(entry.holders),
+            }
+            for entry in entries
+        ]
+
+
+_BACKENDS = _BackendPool()
+
+
+def shared_backends() -> List[Dict[str, object]]:
+    """Describe the tokenizer backends loaded in this process, one per unique file."""
+
+    return _BACKENDS.report()
+
+
 @dataclass(frozen=True)
 class _TokenizerLocation:
     """Resolved location of the cached tokenizer file."""
 
     path: Path
     from_cache: bool
+    # Download cache the file lives in; ``None`` for bundled and local files.
+    cache_root: Path | None = None
 
 
 class HuggingFaceTokenizer(TokenizerAdapter):
@@ -55,6 +325,7 @@ class HuggingFaceTokenizer(TokenizerAdapter):
         revision: str = "main",
         tokenizer_file: str = "tokenizer.json",
         cache_dir: str | Path | None = None,
+        bundle_dir: str | Path | None = None,
         local_files_only: bool = False,
         local_tokenizer_path: str | Path | None = None,
         add_special_tokens: bool = False,
@@ -62,6 +333,9 @@ class HuggingFaceTokenizer(TokenizerAdapter):
         download_timeout: float = 30.0,
         auth_token: str | None = None,
         auth_token_env: str | Sequence[str] | None = None,
+        parallel_threshold: int = DEFAULT_PARALLEL_THRESHOLD,
+        parallel_workers: int | None = None,
+        endpoint: str | None = None,
     ) -> None:
         super().__init__(name=name)
         if not repo_id:
@@ -70,20 +344,44 @@ class HuggingFaceTokenizer(TokenizerAdapter):
         self._repo_id = repo_id
         self._revision = revision or "main"
         self._tokenizer_file = tokenizer_file or "tokenizer.json"
-        self._cache_root = Path(cache_dir).expanduser() if cache_dir else Path.home() / ".cache" / "token-counter-llm"
+        self._cache_root = Path(cache_dir).expanduser() if cache_dir else default_cache_dir()
+        self._bundle_root = Path(bundle_dir).expanduser() if bundle_dir else default_bundle_dir()
         self._local_files_only = bool(local_files_only)
         self._local_tokenizer_path = Path(local_tokenizer_path).expanduser() if local_tokenizer_path else None
         self._add_special_tokens = bool(add_special_tokens)
         self._user_agent = user_agent or _DEFAULT_USER_AGENT
         self._download_timeout = float(download_timeout)
+        self._endpoint = endpoint.rstrip("/") if endpoint else default_endpoint()
         self._auth_token = self._resolve_auth_token(auth_token, auth_token_env)
         self._backend = None
+        self._backend_lock = threading.Lock()
+        self._access: tuple[AccessIndex, Path] | None = None
+        self._shared: _SharedBackend | None = None
+        self._load_seconds: float | None = None
+        self._access_refreshed = 0.0
+        self._special_tokens_count: int | None = None
+        self._fingerprint: str | None = None
+        self._parallel_threshold = int(parallel_threshold)
+        workers = default_parallel_workers() if parallel_workers is None else parallel_workers
+        if workers < 1:
+            raise ValueError("'parallel_workers' must be at least 1")
+        self._parallel_workers = int(workers)
+        self._special_affixes: tuple | None = None
 
     # ------------------------------------------------------------------
     # Helpers
-    def _safe_repo_dir(self) -> Path:
-        safe = self._repo_id.replace("/", "__")
-        return self._cache_root / safe / self._revision
+    def _cache_roots(self) -> list[Path]:
+        """Writable cache candidates: the configured root, then the temp directory.
+
+        Serverless platforms mount the home directory read-only (or not at
+        all) while ``/tmp`` stays writable for the lifetime of the instance.
+        """
+
+        roots = [self._cache_root]
+        tmp_root = Path(tempfile.gettempdir()) / _CACHE_DIR_NAME
+        if tmp_root != self._cache_root:
+            roots.append(tmp_root)
+        return roots
 
     def _ensure_local_tokenizer(self) -> _TokenizerLocation:
         if self._local_tokenizer_path:
@@ -93,21 +391,36 @@ class HuggingFaceTokenizer(TokenizerAdapter):
                 )
             return _TokenizerLocation(self._local_tokenizer_path, from_cache=False)
 
-        target_dir = self._safe_repo_dir()
-        target_path = target_dir / self._tokenizer_file
-        if target_path.exists():
-            return _TokenizerLocation(target_path, from_cache=True)
+        bundled = repo_cache_path(self._bundle_root, self._repo_id, self._revision, self._tokenizer_file)
+        if bundled.exists():
+            return _TokenizerLocation(bundled, from_cache=True)
+
+        roots = self._cache_roots()
+        for root in roots:
+            cached = repo_cache_path(root, self._repo_id, self._revision, self._tokenizer_file)
+            if cached.exists():
+                return _TokenizerLocation(cached, from_cache=True, cache_root=root)
 
         if self._local_files_only:
             raise TokenizerDownloadError(
                 "Local files only was requested but tokenizer file is missing."
             )
 
-        target_dir.mkdir(parents=True, exist_ok=True)
-        return _TokenizerLocation(self._download_tokenizer_file(target_path), from_cache=False)
+        for root in roots:
+            target_path = repo_cache_path(root, self._repo_id, self._revision, self._tokenizer_file)
+            if _is_writable_dir(target_path.parent):
+                path = self._download_tokenizer_file(target_path)
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+                AccessIndex(root).record_download(path, digest)
+                link_blob(root, path, digest)
+                return _TokenizerLocation(path, from_cache=False, cache_root=root)
+        raise TokenizerDownloadError(
+            "No writable cache directory is available for the tokenizer download"
+            f" (tried {', '.join(str(root) for root in roots)})."
+        )
 
     def _download_tokenizer_file(self, target_path: Path) -> Path:
-        url = f"https://huggingface.co/{self._repo_id}/resolve/{self._revision}/{self._tokenizer_file}"
+        url = f"{self._endpoint}/{self._repo_id}/resolve/{self._revision}/{self._tokenizer_file}"
         headers = {"User-Agent": self._user_agent}
         if self._auth_token:
             headers["Authorization"] = f"Bearer {self._auth_token}"
@@ -136,33 +449,256 @@ class HuggingFaceTokenizer(TokenizerAdapter):
                 "Downloaded tokenizer file is not valid JSON."
             )
 
-        target_path.write_bytes(data)
+        # Write then rename so concurrent workers never load a partial file.
+        partial = target_path.with_name(f"{target_path.name}.{os.getpid()}.partial")
+        partial.write_bytes(data)
+        os.replace(partial, target_path)
         return target_path
 
+    def resolve_tokenizer_file(self) -> Path:
+        """Return the local path of the tokenizer file, downloading it if needed."""
+
+        return self._ensure_local_tokenizer().path
+
+    @property
+    def source(self) -> Dict[str, str]:
+        """Repository coordinates of the tokenizer file."""
+
+        return {
+            "repo_id": self._repo_id,
+            "revision": self._revision,
+            "tokenizer_file": self._tokenizer_file,
+        }
+
+    def fingerprint(self) -> str:
+        """Hash of the tokenizer file contents plus the encode options.
+
+        Only the file is read, so a persistent index can be consulted without
+        building the backend.
+        """
+
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            with self.resolve_tokenizer_file().open("rb") as stream:
+                for block in iter(lambda: stream.read(1 << 20), b""):
+                    digest.update(block)
+            special = int(self._add_special_tokens)
+            self._fingerprint = f"sha256:{digest.hexdigest()}:special={special}"
+        return self._fingerprint
+
     def _create_backend(self, tokenizer_path: Path):
         hf_tokenizer_cls = _import_hf_tokenizer()
         return hf_tokenizer_cls.from_file(str(tokenizer_path))
 
     def _get_backend(self):
         if self._backend is None:
-            location = self._ensure_local_tokenizer()
-            self._backend = self._create_backend(location.path)
+            with self._backend_lock:
+                if self._backend is None:
+                    started = time.perf_counter()
+                    location = self._ensure_local_tokenizer()
+                    self._shared = _BACKENDS.acquire(
+                        self, self.fingerprint(), location.path, self._create_backend
+                    )
+                    self._backend = self._shared.backend
+                    self._load_seconds = time.perf_counter() - started
+                    if location.cache_root is not None:
+                        self._access = (AccessIndex(location.cache_root), location.path)
+                        self._refresh_access()
+        elif self._access is not None:
+            if time.monotonic() - self._access_refreshed > ACCESS_REFRESH_INTERVAL:
+                self._refresh_access()
         return self._backend
 
+    def _refresh_access(self) -> None:
+        """Record in the cache's access index that this process uses the file.
+
+        ``python -m app cache prune`` keeps files with a live holder or a
+        recent record, so long-running workers refresh it periodically.
+        """
+
+        self._access_refreshed = time.monotonic()
+        index, path = self._access
+        index.touch(path)
+
+    def load(self) -> None:
+        self._get_backend()
+
+    def backend_info(self) -> Dict[str, object] | None:
+        """Describe the loaded backend; tokenizers with one fingerprint share it.
+
+        ``load_seconds`` covers this tokenizer's load, download included, and
+        is close to zero when the backend was already loaded for another model.
+        """
+
+        shared = self._shared
+        if shared is None:
+            return None
+        return {
+            "fingerprint": shared.fingerprint,
+            "file_bytes": shared.file_bytes,
+            "rss_bytes": shared.rss_bytes,
+            "load_seconds": self._load_seconds,
+        }
+
+    def splits_at_safe_boundaries(self) -> bool:
+        """Decided from the backend's pre-tokenizer once, when it is loaded."""
+
+        self._get_backend()
+        return self._shared.splittable
+
+    def parallel_segments(self, text: str) -> list[tuple[int, int]] | None:
+        """Return ``(start, end)`` segments for a parallel encode of *text*.
+
+        Texts shorter than ``parallel_threshold`` (or any text when the
+        threshold is 0 or a single worker is configured) return ``None``.
+        Segments are cut at the first pre-tokenizer-safe boundary after each
+        equal share of the text, so encoding them separately yields the same
+        tokens as one pass; text without such boundaries, or any text when
+        the pre-tokenizer is not byte-level, is not split.
+        """
+
+        workers = self._parallel_workers
+        threshold = self._parallel_threshold
+        if workers < 2 or threshold <= 0 or len(text) < threshold:
+            return None
+        if not self.splits_at_safe_boundaries():
+            return None
+        share = len(text) // workers
+        segments = []
+        start = 0
+        for index in range(1, workers):
+            cut = next_safe_boundary(text, max(index * share, start + 1))
+            if cut is None:
+                break
+            if cut > start:
+                segments.append((start, cut))
+                start = cut
+        segments.append((start, len(text)))
+        return segments if len(segments) > 1 else None
+
+    def _affixes(self) -> tuple:
+        """Special tokens the post-processor puts before and after a single sequence."""
+
+        if self._special_affixes is None:
+            probe = self._get_backend().encode("a", add_special_tokens=True)
+            mask = list(_encoding_attr(probe, "special_tokens_mask") or ())
+            fields = {
+                name: list(_encoding_attr(probe, name) or ())
+                for name in ("tokens", "ids", "offsets", "special_tokens_mask")
+            }
+            if len(mask) != _encoding_length(probe) or 0 not in mask:
+                raise RuntimeError("The Hugging Face backend did not return a special tokens mask.")
+            head = mask.index(0)
+            tail = len(mask) - mask[::-1].index(0)
+            self._special_affixes = (
+                {name: values[:head] for name, values in fields.items()},
+                {name: values[tail:] for name, values in fields.items()},
+            )
+        return self._special_affixes
+
     # ------------------------------------------------------------------
     # TokenizerAdapter API
+    def _encode(self, text: str, add_special_tokens: bool | None = None):
+        backend = self._get_backend()
+        special = self._add_special_tokens if add_special_tokens is None else add_special_tokens
+        segments = self.parallel_segments(text)
+        if segments is None:
+            return backend.encode(text, add_special_tokens=special)
+        pieces = [text[start:end] for start, end in segments]
+        encode_batch = getattr(backend, "encode_batch", None)
+        if encode_batch is None:  # pragma: no cover - compatibility guard
+            encodings = [backend.encode(piece, add_special_tokens=False) for piece in pieces]
+        else:
+            # ``encode_batch`` releases the GIL and encodes the segments on the
+            # backend's own thread pool.
+            encodings = encode_batch(pieces, add_special_tokens=False)
+        parts = [(start, encoding) for (start, _), encoding in zip(segments, encodings)]
+        prefix, suffix = self._affixes() if special else (None, None)
+        return _StitchedEncoding(parts, prefix, suffix)
+
     def tokenize(self, text: str) -> Sequence[str]:
         if not text:
             return []
 
+        return _encoding_tokens(self._encode(text))
+
+    def _encode_batch(self, texts: Sequence[str]) -> list:
+        """Encode the non-empty *texts* in one backend call; empty ones map to ``None``."""
+
+        results: list = [None] * len(texts)
+        pending = [index for index, text in enumerate(texts) if text]
+        if not pending:
+            return results
         backend = self._get_backend()
-        encoding = backend.encode(text, add_special_tokens=self._add_special_tokens)
-        tokens = getattr(encoding, "tokens", None)
-        if callable(tokens):  # pragma: no cover - compatibility guard
-            tokens = tokens()
-        if tokens is None:
-            raise RuntimeError("The Hugging Face backend did not return token data.")
-        return list(tokens)
+        encode_batch = getattr(backend, "encode_batch", None)
+        if encode_batch is None:  # pragma: no cover - compatibility guard
+            encodings = [self._encode(texts[index]) for index in pending]
+        else:
+            encodings = encode_batch(
+                [texts[index] for index in pending], add_special_tokens=self._add_special_tokens
+            )
+        for index, encoding in zip(pending, encodings):
+            results[index] = encoding
+        return results
+
+    def tokenize_batch(self, texts: Sequence[str]) -> list[list[str]]:
+        return [
+            _encoding_tokens(encoding) if encoding is not None else []
+            for encoding in self._encode_batch(texts)
+        ]
+
+    def encode_ids_batch(self, texts: Sequence[str]) -> list[list[int]]:
+        results = []
+        for encoding in self._encode_batch(texts):
+            ids = _encoding_attr(encoding, "ids") if encoding is not None else []
+            if ids is None:
+                raise RuntimeError("The Hugging Face backend did not return token ids.")
+            results.append(list(ids))
+        return results
+
+    def vocab_size(self) -> int:
+        return int(self._get_backend().get_vocab_size(with_added_tokens=True))
+
+    def id_to_token(self, token_id: int) -> str | None:
+        return self._get_backend().id_to_token(int(token_id))
+
+    def count_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        return _encoding_length(self._encode(text))
+
+    def special_tokens_count(self) -> int:
+        if not self._add_special_tokens:
+            return 0
+        if self._special_tokens_count is None:
+            backend = self._get_backend()
+            self._special_tokens_count = _encoding_length(
+                backend.encode("", add_special_tokens=True)
+            )
+        return self._special_tokens_count
+
+    def count_content_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        return _encoding_length(self._encode(text, add_special_tokens=False))
+
+    def encode(self, text: str) -> TokenizedText:
+        if not text:
+            return TokenizedText(tokens=[], offsets=[], special_tokens_mask=[])
+
+        encoding = self._encode(text)
+        tokens = _encoding_tokens(encoding)
+        offsets = _encoding_attr(encoding, "offsets")
+        if offsets is None or len(offsets) != len(tokens):
+            raise RuntimeError("The Hugging Face backend did not return offset data.")
+        special_mask = _encoding_attr(encoding, "special_tokens_mask")
+        if special_mask is None or len(special_mask) != len(tokens):
+            special_mask = [0] * len(tokens)
+        return TokenizedText(
+            tokens=tokens,
+            offsets=[(int(start), int(end)) for start, end in offsets],
+            special_tokens_mask=[int(flag) for flag in special_mask],
+        )
 
     # ------------------------------------------------------------------
     # Authentication helpers
@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from typing import Dict
+import threading
+from typing import Dict, List, Mapping, Tuple
 
 from ..models import ModelSpec, TokenizerSpec
 from .base import TokenizerAdapter
@@ -17,17 +18,24 @@ class TokenizerRegistry:
     """Factory responsible for building tokenizers from specifications."""
 
     def __init__(self) -> None:
-        self._cache: Dict[str, TokenizerAdapter] = {}
+        self._cache: Dict[str, Tuple[TokenizerSpec, TokenizerAdapter]] = {}
+        self._lock = threading.Lock()
 
     def get_tokenizer(self, spec: TokenizerSpec, cache_key: str | None = None) -> TokenizerAdapter:
-        """Return a tokenizer instance for *spec* (cached by *cache_key* if given)."""
+        """Return a tokenizer instance for *spec* (cached by *cache_key* if given).
 
-        key = cache_key or f"{spec.type}:{hash(frozenset(spec.options.items()))}"
-        if key in self._cache:
-            return self._cache[key]
+        A cached entry is only reused while its spec is unchanged, so a key
+        whose configuration was edited gets a fresh tokenizer.
+        """
+
+        key = cache_key or f"{spec.type}:{spec.identity()}"
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == spec:
+            return cached[1]
 
         tokenizer = self._create_tokenizer(spec)
-        self._cache[key] = tokenizer
+        with self._lock:
+            self._cache[key] = (spec, tokenizer)
         return tokenizer
 
     def _create_tokenizer(self, spec: TokenizerSpec) -> TokenizerAdapter:
@@ -46,10 +54,57 @@ class TokenizerRegistry:
     def invalidate(self, cache_key: str | None = None) -> None:
         """Remove cached tokenizers."""
 
-        if cache_key is None:
-            self._cache.clear()
-        else:
-            self._cache.pop(cache_key, None)
+        with self._lock:
+            if cache_key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(cache_key, None)
+
+    def retain(self, specs: Mapping[str, TokenizerSpec]) -> List[str]:
+        """Keep cached tokenizers whose key maps to an identical spec in *specs*.
+
+        Entries for keys that disappeared or whose spec changed are evicted;
+        everything else keeps its loaded backend. Returns the evicted keys.
+        """
+
+        with self._lock:
+            evicted = [
+                key for key, (spec, _) in self._cache.items() if specs.get(key) != spec
+            ]
+            for key in evicted:
+                del self._cache[key]
+        return evicted
+
+    def cached_keys(self) -> List[str]:
+        """Return the keys of tokenizers currently held by the registry."""
+
+        return list(self._cache)
+
+    def backend_infos(self) -> Dict[str, Dict[str, object]]:
+        """Return the ``backend_info()`` of every loaded tokenizer by cache key."""
+
+        with self._lock:
+            items = list(self._cache.items())
+        infos = {}
+        for key, (_, tokenizer) in items:
+            info = tokenizer.backend_info()
+            if info is not None:
+                infos[key] = info
+        return infos
+
+    def loaded_backends(self) -> List[Dict[str, object]]:
+        """Group loaded tokenizers by the backend they share.
+
+        Each entry lists the cache keys (model ids) served by one backend
+        together with its file size and the resident memory it added.
+        """
+
+        groups: Dict[str, Dict[str, object]] = {}
+        for key, info in self.backend_infos().items():
+            shared = {name: value for name, value in info.items() if name != "load_seconds"}
+            group = groups.setdefault(info["fingerprint"], {**shared, "keys": []})
+            group["keys"].append(key)
+        return sorted(groups.values(), key=lambda group: group["fingerprint"])
 
 
 def get_tokenizer_for_model(model: ModelSpec, registry: TokenizerRegistry) -> TokenizerAdapter:
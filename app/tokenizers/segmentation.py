@@ -0,0 +1,157 @@
+"""Split text at positions where tokenization is context free.
+
+Byte-level BPE tokenizers (GPT-2, Qwen, DeepSeek) first split text with a
+regular expression pre-tokenizer and only merge inside the resulting pieces.
+No pre-token starts with a letter or digit and continues into following
+whitespace, so cutting *between an alphanumeric character and a whitespace
+character* never changes the pre-tokens on either side. Encoding the pieces
+separately and summing their counts therefore matches a single-pass encode,
+as long as tokens added by the post-processor (BOS/EOS) are accounted for
+once.
+
+A long run of one character class (letters, digits, whitespace or other
+symbols) becomes a single pre-token, and merging inside it is superlinear in
+its length. :func:`split_long_runs` detects such runs and cuts them into
+pieces of bounded length; these forced cuts are not safe, so counts summed
+across them are flagged as approximate.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Iterator, List, Tuple
+
+_SAFE_BOUNDARY = re.compile(r"(?<=[^\W_])(?=\s)")
+
+DEFAULT_MIN_CHUNK = 1024
+DEFAULT_MAX_CHUNK = 8192
+DEFAULT_CHUNK_MASK = 0x3F
+DEFAULT_HASH_WINDOW = 32
+DEFAULT_MAX_RUN = 4096
+
+# Character classes that pre-tokenizers keep together: letters, digits,
+# whitespace and everything else.
+_RUN_PATTERNS = tuple(
+    re.compile(f"(?:{cls})*") for cls in (r"[^\W\d_]", r"\d", r"\s", r"[^\w\s]|_")
+)
+
+
+def safe_boundaries(text: str, start: int = 0, end: int | None = None) -> Iterator[int]:
+    """Yield cut positions in ``text[start:end]`` that are safe for pre-tokenizers."""
+
+    stop = len(text) if end is None else end
+    for match in _SAFE_BOUNDARY.finditer(text, start, stop):
+        position = match.start()
+        if 0 < position < len(text):
+            yield position
+
+
+def next_safe_boundary(text: str, start: int) -> int | None:
+    """Return the first safe cut position at or after *start*, if any."""
+
+    match = _SAFE_BOUNDARY.search(text, max(start, 1))
+    return match.start() if match else None
+
+
+def content_defined_spans(
+    text: str,
+    *,
+    min_size: int = DEFAULT_MIN_CHUNK,
+    max_size: int = DEFAULT_MAX_CHUNK,
+    mask: int = DEFAULT_CHUNK_MASK,
+    window: int = DEFAULT_HASH_WINDOW,
+) -> List[Tuple[int, int]]:
+    """Return ``(start, end)`` spans covering *text*, cut at content-defined points.
+
+    Candidate cut points are the safe boundaries from :func:`safe_boundaries`.
+    A candidate becomes a cut when the hash of the *window* characters
+    preceding it has its *mask* bits cleared, which is the same decision a
+    rolling hash over that window would make. Because the decision only looks
+    at nearby content, an edit moves at most the cuts around it: chunks
+    before and after the edit keep their exact text and can be reused.
+    Chunks are at least *min_size* characters (except the last) and a cut
+    is forced at the first candidate past *max_size*.
+    """
+
+    if min_size <= 0 or max_size < min_size:
+        raise ValueError("Chunk sizes must satisfy 0 < min_size <= max_size.")
+
+    spans: List[Tuple[int, int]] = []
+    length = len(text)
+    last = 0
+    while length - last > min_size:
+        cut = None
+        position = last + min_size
+        while True:
+            candidate = next_safe_boundary(text, position)
+            if candidate is None:
+                break
+            if candidate - last >= max_size:
+                cut = candidate
+                break
+            sample = text[max(candidate - window, last) : candidate].encode("utf-8", "surrogatepass")
+            if zlib.crc32(sample) & mask == 0:
+                cut = candidate
+                break
+            position = candidate + 1
+        if cut is None:
+            break
+        spans.append((last, cut))
+        last = cut
+    if last < length or not spans:
+        spans.append((last, length))
+    return spans
+
+
+def long_runs(
+    text: str, max_run: int = DEFAULT_MAX_RUN, start: int = 0, end: int | None = None
+) -> List[Tuple[int, int]]:
+    """Return ``(start, end)`` of single-class runs longer than *max_run* characters.
+
+    A run longer than *max_run* fully contains one of the blocks of
+    ``max_run // 2`` characters aligned at *start*, so only blocks are tested;
+    on ordinary text each test stops after a few characters.
+    """
+
+    stop = len(text) if end is None else end
+    block = max(max_run // 2, 1)
+    runs: List[Tuple[int, int]] = []
+    for pattern in _RUN_PATTERNS:
+        position = start
+        while position + block <= stop:
+            if pattern.match(text, position, position + block).end() < position + block:
+                position += block
+                continue
+            run_end = pattern.match(text, position, stop).end()
+            window = text[max(position - block, start) : position][::-1]
+            run_start = position - pattern.match(window).end()
+            if run_end - run_start > max_run:
+                runs.append((run_start, run_end))
+            position = run_end
+    return sorted(runs)
+
+
+def split_long_runs(
+    text: str,
+    spans: List[Tuple[int, int]],
+    max_run: int = DEFAULT_MAX_RUN,
+) -> List[Tuple[int, int, bool]]:
+    """Cut long single-class runs inside *spans* every *max_run* characters.
+
+    Returns ``(start, end, forced)`` pieces covering the same text; *forced*
+    marks a piece ending at a cut inside a run. Spans without long runs are
+    returned unchanged.
+    """
+
+    pieces: List[Tuple[int, int, bool]] = []
+    for span_start, span_end in spans:
+        position = span_start
+        for run_start, run_end in long_runs(text, max_run, span_start, span_end):
+            cut = run_start + max_run
+            while cut < run_end:
+                pieces.append((position, cut, True))
+                position = cut
+                cut += max_run
+        pieces.append((position, span_end, False))
+    return pieces
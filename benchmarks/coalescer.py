@@ -0,0 +1,132 @@
+"""Throughput/latency tradeoff of the micro-batching request coalescer.
+
+Runs concurrent ``TokenService.calculate`` calls from many threads, first
+without a coalescer and then with each configured window, and reports
+requests per second together with p50/p99 latency.
+
+Usage::
+
+    python benchmarks/coalescer.py --model openai-gpt2 --threads 32 --windows 0.5 1 2
+    python benchmarks/coalescer.py --synthetic  # no tokenizers install or network needed
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.catalog import load_catalog  # noqa: E402
+from app.services.coalescer import BatchCoalescer  # noqa: E402
+from app.services.token_service import TokenService  # noqa: E402
+from app.tokenizers.base import TokenizerAdapter  # noqa: E402
+from app.tokenizers.registry import TokenizerRegistry  # noqa: E402
+
+
+class SyntheticTokenizer(TokenizerAdapter):
+    """Whitespace tokenizer with a fixed per-call overhead, like an FFI round trip."""
+
+    def __init__(self, overhead_us: float) -> None:
+        super().__init__(name="synthetic")
+        self._overhead = overhead_us / 1e6
+
+    def _pay_overhead(self) -> None:
+        deadline = time.perf_counter() + self._overhead
+        while time.perf_counter() < deadline:
+            pass
+
+    def tokenize(self, text):
+        self._pay_overhead()
+        return text.split()
+
+    def tokenize_batch(self, texts):
+        self._pay_overhead()
+        return [text.split() for text in texts]
+
+
+class SyntheticRegistry(TokenizerRegistry):
+    def __init__(self, overhead_us: float) -> None:
+        super().__init__()
+        self._tokenizer = SyntheticTokenizer(overhead_us)
+
+    def get_tokenizer(self, spec, cache_key=None):
+        return self._tokenizer
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _run(service, model, text, threads, requests):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        local = []
+        barrier.wait()
+        for _ in range(requests):
+            tick = time.perf_counter()
+            service.calculate(model, text)
+            local.append(time.perf_counter() - tick)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "requests_per_s": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="openai-gpt2")
+    parser.add_argument("--text", default="How many tokens does this short prompt use?")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per thread")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic tokenizer")
+    parser.add_argument("--synthetic-overhead-us", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog()
+
+    def build(coalescer):
+        registry = (
+            SyntheticRegistry(args.synthetic_overhead_us) if args.synthetic else TokenizerRegistry()
+        )
+        service = TokenService(models=catalog, registry=registry, coalescer=coalescer)
+        service.calculate(args.model, args.text)  # load the tokenizer outside the timing
+        return service
+
+    results = {"baseline": _run(build(None), args.model, args.text, args.threads, args.requests)}
+    for window in args.windows:
+        coalescer = BatchCoalescer(window_ms=window, max_batch=args.max_batch)
+        service = build(coalescer)
+        stats = _run(service, args.model, args.text, args.threads, args.requests)
+        stats["mean_batch_size"] = round(coalescer.metrics.to_dict()["mean_batch_size"], 2)
+        results[f"window_{window}ms"] = stats
+
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
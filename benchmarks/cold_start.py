@@ -0,0 +1,104 @@
+"""Measure cold and warm invocation latency of the ``api/tokenize.py`` handler.
+
+Each cold sample runs in a fresh interpreter, mirroring a new serverless
+instance: the time covers importing the handler, building the service,
+resolving the tokenizer file (bundle, ``/tmp`` or network) and encoding the
+first request. Warm samples reuse the same interpreter.
+
+Usage::
+
+    python benchmarks/cold_start.py --model openai-gpt2 --runs 5
+    TOKEN_COUNTER_BUNDLE_DIR=/nonexistent python benchmarks/cold_start.py  # no bundle
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_PROBE = r"""
+import io, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from api.tokenize import handler
+
+
+def invoke(body):
+    request = handler.__new__(handler)
+    request.rfile = io.BytesIO(body)
+    request.wfile = io.BytesIO()
+    request.headers = {{"Content-Length": str(len(body))}}
+    request.path = "/tokenize"
+    request.command = "POST"
+    request.request_version = "HTTP/1.1"
+    request.requestline = "POST /tokenize HTTP/1.1"
+    request.client_address = ("127.0.0.1", 0)
+    request.close_connection = True
+    request.do_POST()
+    status = request.wfile.getvalue().split(b" ", 2)[1]
+    if status != b"200":
+        raise SystemExit(request.wfile.getvalue().decode("utf-8", "replace"))
+
+
+body = json.dumps({{"model": {model!r}, "text": {text!r}}}).encode("utf-8")
+invoke(body)
+cold = time.perf_counter() - start
+warm = []
+for _ in range({warm_runs}):
+    tick = time.perf_counter()
+    invoke(body)
+    warm.append(time.perf_counter() - tick)
+print(json.dumps({{"cold": cold, "warm": warm}}))
+"""
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="openai-gpt2")
+    parser.add_argument("--text", default="Hello world, how many tokens is this?")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start")
+    parser.add_argument("--warm-runs", type=int, default=50, help="Invocations per interpreter")
+    args = parser.parse_args(argv)
+
+    probe = _PROBE.format(root=str(ROOT), model=args.model, text=args.text, warm_runs=args.warm_runs)
+    cold, warm = [], []
+    for _ in range(args.runs):
+        tick = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+        process_total = time.perf_counter() - tick
+        if completed.returncode != 0:
+            sys.stderr.write(completed.stderr or completed.stdout)
+            return completed.returncode
+        sample = json.loads(completed.stdout.strip().splitlines()[-1])
+        cold.append(sample["cold"])
+        warm.extend(sample["warm"])
+        print(
+            f"cold invocation {sample['cold'] * 1000:.1f} ms"
+            f" (process {process_total * 1000:.1f} ms)",
+            file=sys.stderr,
+        )
+
+    json.dump({"cold": _summary(cold), "warm": _summary(warm)}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+"""Latency of encoding one large document as parallel segments.
+
+Encodes a single document with ``HuggingFaceTokenizer`` once per worker
+count, reports the median latency and speedup over one worker, and checks
+that every run returns the same tokens and offsets as the single-pass
+encode.
+
+``--synthetic`` swaps in a backend whose per-character cost runs outside the
+GIL (as the Rust ``tokenizers`` backend does), so the scaling is visible
+without a ``tokenizers`` install or network access.
+
+Usage::
+
+    python benchmarks/parallel_encode.py --model openai-gpt2 --size 2000000 --workers 1 2 4 8
+    python benchmarks/parallel_encode.py --synthetic
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.catalog import load_catalog  # noqa: E402
+from app.tokenizers.huggingface_tokenizer import HuggingFaceTokenizer  # noqa: E402
+
+
+class _Encoding:
+    def __init__(self, text: str) -> None:
+        self.tokens = text.split()
+        self.offsets = []
+        position = 0
+        for token in self.tokens:
+            start = text.index(token, position)
+            position = start + len(token)
+            self.offsets.append((start, position))
+        self.special_tokens_mask = [0] * len(self.tokens)
+
+
+class SyntheticBackend:
+    """Whitespace tokenizer that hashes its input *rounds* times with the GIL released."""
+
+    def __init__(self, rounds: int) -> None:
+        self._rounds = rounds
+
+    def encode(self, text, add_special_tokens=False):
+        data = text.encode("utf-8")
+        for _ in range(self._rounds):
+            hashlib.sha256(data).digest()  # hashlib releases the GIL for large inputs
+        return _Encoding(text)
+
+    def encode_batch(self, texts, add_special_tokens=False):
+        with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+            return list(pool.map(self.encode, texts))
+
+
+class SyntheticTokenizer(HuggingFaceTokenizer):
+    def __init__(self, rounds: int, **options) -> None:
+        self._tokenizer_file_handle = tempfile.NamedTemporaryFile(suffix=".json")
+        super().__init__(
+            name="synthetic",
+            repo_id="synthetic/model",
+            local_tokenizer_path=self._tokenizer_file_handle.name,
+            **options,
+        )
+        self._backend = SyntheticBackend(rounds)
+
+
+def document(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ("the", "token", "counter", "measures", "prompts", "quickly", "and", "well", "42")
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(words) + rng.choice((" ", " ", " ", "\n", ". "))
+        parts.append(word)
+        length += len(word)
+    return "".join(parts)[:size]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="openai-gpt2")
+    parser.add_argument("--size", type=int, default=2_000_000, help="Document characters")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic backend")
+    parser.add_argument("--synthetic-rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    text = document(args.size)
+
+    def build(workers):
+        options = {"parallel_threshold": 1, "parallel_workers": workers}
+        if args.synthetic:
+            return SyntheticTokenizer(args.synthetic_rounds, **options)
+        spec = load_catalog().get(args.model).tokenizer
+        spec_options = dict(spec.options)
+        name = spec_options.pop("name", args.model)
+        return HuggingFaceTokenizer(name=name, **spec_options, **options)
+
+    reference = None
+    baseline = None
+    results = {}
+    for workers in args.workers:
+        tokenizer = build(workers)
+        tokenizer.count_tokens("warm up")  # load the backend outside the timing
+        timings = []
+        for _ in range(args.repeat):
+            tick = time.perf_counter()
+            encoded = tokenizer.encode(text)
+            timings.append(time.perf_counter() - tick)
+        if reference is None:
+            reference = encoded
+        latency = statistics.median(timings)
+        baseline = baseline or latency
+        segments = tokenizer.parallel_segments(text)
+        results[workers] = {
+            "segments": len(segments) if segments else 1,
+            "p50_ms": round(latency * 1000, 2),
+            "speedup": round(baseline / latency, 2),
+            "identical": encoded == reference,
+        }
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+"""Time per byte of token counting on adversarial inputs, with and without the guard.
+
+The corpus holds inputs that form huge single pre-tokens (megabytes without
+whitespace, one repeated character or emoji, long whitespace, digit and
+punctuation runs) next to ordinary prose and a random base64 blob as
+controls. Each case is counted through ``TokenService.calculate`` with the
+run guard enabled (the default) and disabled (``max_run`` larger than the
+input), reporting microseconds per byte.
+
+``--synthetic`` replaces the tokenizer with one whose merge cost grows with
+the square of each pre-token's length, the way naive BPE does, so the
+effect is visible without a ``tokenizers`` install or network access.
+
+Usage::
+
+    python benchmarks/pathological.py --model openai-gpt2 --size 1000000
+    python benchmarks/pathological.py --synthetic --size 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.catalog import load_catalog  # noqa: E402
+from app.services.token_service import TokenService  # noqa: E402
+from app.tokenizers.base import TokenizerAdapter  # noqa: E402
+from app.tokenizers.registry import TokenizerRegistry  # noqa: E402
+
+_PRE_TOKEN = re.compile(r"[^\W\d_]+|\d+|\s+|(?:[^\w\s]|_)+")
+
+
+def pathological_corpus(size: int, seed: int = 0) -> Dict[str, str]:
+    """Return named inputs of about *size* characters each."""
+
+    rng = random.Random(seed)
+    letters = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(size))
+    prose = " ".join(
+        rng.choice(("the", "token", "counter", "measures", "prompts", "quickly", "and", "well"))
+        for _ in range(size // 6)
+    )
+    blob = base64.b64encode(rng.randbytes(size * 3 // 4)).decode("ascii")
+    return {
+        "prose": prose[:size],
+        "base64": blob[:size],
+        "no_whitespace": letters,
+        "repeated_char": "a" * size,
+        "repeated_emoji": "\U0001F600" * size,
+        "digits": "7" * size,
+        "punctuation": "!?" * (size // 2),
+        "whitespace": " " * size,
+    }
+
+
+class QuadraticTokenizer(TokenizerAdapter):
+    """Emits one token per 4 characters of each pre-token at O(length²) cost."""
+
+    def __init__(self) -> None:
+        super().__init__(name="quadratic")
+
+    def count_tokens(self, text: str) -> int:
+        count = 0
+        for match in _PRE_TOKEN.finditer(text):
+            length = match.end() - match.start()
+            for _ in range(length * length // 4096):  # one pass per merge, like naive BPE
+                pass
+            count += -(-length // 4)
+        return count
+
+    def tokenize(self, text: str):
+        return [None] * self.count_tokens(text)
+
+
+class SyntheticRegistry(TokenizerRegistry):
+    def __init__(self) -> None:
+        super().__init__()
+        self._tokenizer = QuadraticTokenizer()
+
+    def get_tokenizer(self, spec, cache_key=None):
+        return self._tokenizer
+
+
+def time_per_byte(service: TokenService, model: str, text: str) -> Dict[str, object]:
+    """Count *text* once and return the elapsed and CPU microseconds per UTF-8 byte."""
+
+    size = len(text.encode("utf-8"))
+    tick = time.perf_counter()
+    cpu_tick = time.thread_time()
+    result = service.calculate(model, text, include_tokens=False)
+    cpu = time.thread_time() - cpu_tick
+    elapsed = time.perf_counter() - tick
+    return {
+        "us_per_byte": round(elapsed * 1e6 / size, 4),
+        "cpu_us_per_byte": round(cpu * 1e6 / size, 4),
+        "token_count": result["token_count"],
+        "guard": result.get("guard"),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="openai-gpt2")
+    parser.add_argument("--size", type=int, default=200_000, help="Characters per case")
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument(
+        "--skip-unguarded", action="store_true", help="Only measure with the guard enabled"
+    )
+    args = parser.parse_args(argv)
+
+    def make_service(max_run=None):
+        registry = SyntheticRegistry() if args.synthetic else TokenizerRegistry()
+        options = {} if max_run is None else {"max_run": max_run}
+        return TokenService(models=load_catalog(), registry=registry, **options)
+
+    guarded = make_service()
+    unguarded = make_service(max_run=args.size * 4 + 1)
+    guarded.calculate(args.model, "warm up")  # load the tokenizer outside the timing
+    unguarded.calculate(args.model, "warm up")
+    results = {}
+    for name, text in pathological_corpus(args.size).items():
+        results[name] = {"guarded": time_per_byte(guarded, args.model, text)}
+        if not args.skip_unguarded:
+            results[name]["unguarded"] = time_per_byte(unguarded, args.model, text)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""Per-request latency of the HTTP API over loopback TCP and a Unix socket.
+
+Starts the server in-process on both transports and issues sequential
+``POST /tokenize`` calls, once with a fresh connection per request (the
+old HTTP/1.0 behaviour) and once over a single kept-alive connection.
+The default ``estimate`` mode keeps tokenization out of the measurement;
+pass ``--mode exact`` to include it.
+
+Usage::
+
+    python benchmarks/uds_vs_tcp.py --requests 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.catalog import load_catalog  # noqa: E402
+from app.server import UnixSocketHTTPServer, _build_handler  # noqa: E402
+from app.services.token_service import TokenService  # noqa: E402
+from app.tokenizers.registry import TokenizerRegistry  # noqa: E402
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path: str, timeout: float = 10) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _measure(connect, body, requests, keep_alive):
+    headers = {"Content-Type": "application/json"}
+    latencies = []
+    conn = connect() if keep_alive else None
+    for _ in range(requests):
+        tick = time.perf_counter()
+        current = conn or connect()
+        current.request("POST", "/tokenize", body=body, headers=headers)
+        response = current.getresponse()
+        response.read()
+        if not keep_alive:
+            current.close()
+        latencies.append(time.perf_counter() - tick)
+        if response.status != 200:
+            raise SystemExit(f"request failed with HTTP {response.status}")
+    if conn is not None:
+        conn.close()
+    ordered = sorted(latencies)
+    return {
+        "p50_us": round(statistics.median(ordered) * 1e6, 1),
+        "p99_us": round(_percentile(ordered, 0.99) * 1e6, 1),
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="openai-gpt2")
+    parser.add_argument("--text", default="How many tokens does this short prompt use?")
+    parser.add_argument("--mode", default="estimate")
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    service = TokenService(models=load_catalog(), registry=TokenizerRegistry())
+    service.calculate(args.model, args.text, mode=args.mode)  # warm up outside the timing
+    handlers = []
+    for nodelay in (True, False):  # TCP_NODELAY only applies to the TCP server
+        handler = _build_handler(service)
+        handler.protocol_version = "HTTP/1.1"
+        handler.disable_nagle_algorithm = nodelay
+        handlers.append(handler)
+    body = json.dumps({"model": args.model, "text": args.text, "mode": args.mode})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        uds_path = str(Path(workdir) / "counter.sock")
+        servers = [
+            ThreadingHTTPServer(("127.0.0.1", 0), handlers[0]),
+            UnixSocketHTTPServer(uds_path, handlers[1]),
+        ]
+        for server in servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = servers[0].server_address[1]
+
+        def tcp():
+            return HTTPConnection("127.0.0.1", port, timeout=10)
+
+        def uds():
+            return UnixHTTPConnection(uds_path)
+
+        results = {}
+        try:
+            for name, connect in (("tcp", tcp), ("uds", uds)):
+                for keep_alive in (False, True):
+                    label = f"{name}_{'keepalive' if keep_alive else 'new_connection'}"
+                    results[label] = _measure(connect, body, args.requests, keep_alive)
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
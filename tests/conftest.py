@@ -1,5 +1,7 @@
 import importlib.util
+import re
 import sys
+import zlib
 from pathlib import Path
 
 import pytest
@@ -10,27 +12,69 @@ if str(ROOT) not in sys.path:
 
 
 class _DummyEncoding:
-    def __init__(self, tokens):
+    def __init__(self, tokens, offsets, special_tokens_mask, ids):
         self.tokens = tokens
+        self.offsets = offsets
+        self.special_tokens_mask = special_tokens_mask
+        self.ids = ids
+
+
+class _DummyPreTokenizer:
+    def __getstate__(self):
+        return b'{"type": "WhitespaceSplit"}'
 
 
 class _DummyBackend:
+    """Whitespace tokenizer mimicking the ``tokenizers.Encoding`` surface.
+
+    Ids are a stable hash of the token, so every process agrees on them.
+    """
+
+    VOCAB_SIZE = 1 << 16
+    pre_tokenizer = _DummyPreTokenizer()
+
+    def __init__(self):
+        self._tokens = {0: "<bos>", 1: "<eos>"}
+
+    def _id(self, token):
+        if token in ("<bos>", "<eos>"):
+            return 0 if token == "<bos>" else 1
+        token_id = 2 + zlib.crc32(token.encode("utf-8")) % (self.VOCAB_SIZE - 2)
+        self._tokens[token_id] = token
+        return token_id
+
+    def get_vocab_size(self, with_added_tokens: bool = True):
+        return self.VOCAB_SIZE
+
+    def id_to_token(self, token_id):
+        return self._tokens.get(token_id)
+
     def encode(self, text, add_special_tokens: bool = False):
-        normalized = " ".join(text.replace("\n", " ").split())
-        core = normalized.split(" ") if normalized else []
-        tokens = list(core)
+        matches = list(re.finditer(r"\S+", text))
+        tokens = [match.group() for match in matches]
+        offsets = [match.span() for match in matches]
+        special_mask = [0] * len(tokens)
         if add_special_tokens:
             tokens = ["<bos>", *tokens, "<eos>"]
-        return _DummyEncoding(tokens)
+            offsets = [(0, 0), *offsets, (0, 0)]
+            special_mask = [1, *special_mask, 1]
+        return _DummyEncoding(tokens, offsets, special_mask, [self._id(token) for token in tokens])
+
+    def encode_batch(self, texts, add_special_tokens: bool = False):
+        return [self.encode(text, add_special_tokens=add_special_tokens) for text in texts]
 
 
 @pytest.fixture(autouse=True)
-def _stub_hf_tokenizer(monkeypatch, request):
+def _stub_hf_tokenizer(monkeypatch, request, tmp_path):
     """Provide a lightweight stub when optional deps are missing.
 
     Auto-activates unless the test is marked with @pytest.mark.no_stub_hf
-    or if the real `tokenizers` package is available.
+    or if the real `tokenizers` package is available. Downloads, the access
+    index and blob links always go to a per-test cache directory, never the
+    developer's real cache.
     """
+    monkeypatch.setenv("TOKEN_COUNTER_CACHE_DIR", str(tmp_path / "token-cache"))
+
     # allow tests to opt out with: @pytest.mark.no_stub_hf
     if request.node.get_closest_marker("no_stub_hf"):
         return
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import socket
+import threading
+from http import HTTPStatus
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.catalog import load_catalog
+from app.client import AsyncTokenCounterClient, TokenCounterClient, TokenCounterError
+from app.server import _build_handler
+from app.services.admission import AdmissionController, AdmissionLimits, Rejection, Ticket
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(**limits):
+    clock = _Clock()
+    return AdmissionController(AdmissionLimits(**limits), clock=clock), clock
+
+
+@pytest.fixture
+def server():
+    started = []
+
+    def start(admission, **options):
+        service = TokenService(models=load_catalog(), registry=TokenizerRegistry())
+        handler = _build_handler(service, admission=admission, **options)
+        handler.protocol_version = "HTTP/1.1"
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        started.append((httpd, thread))
+        return httpd.server_address[1]
+
+    yield start
+    for httpd, thread in started:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def test_global_cap_sheds_with_retry_after():
+    controller, _ = _controller(max_inflight_cost=100, client_concurrency=10)
+    first = controller.admit("a", 80)
+    assert isinstance(first, Ticket)
+    rejected = controller.admit("b", 30)
+    assert isinstance(rejected, Rejection)
+    assert (rejected.status, rejected.reason, rejected.retry_after) == (
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        "overloaded",
+        1,
+    )
+    controller.release(first)
+    # Nothing in flight: even a request above the cap is admitted.
+    assert isinstance(controller.admit("b", 150), Ticket)
+
+
+def test_model_weights_scale_cost():
+    controller, _ = _controller(max_inflight_cost=100, model_weights={"slow": 4.0})
+    assert controller.cost(10, "slow") == 40
+    assert controller.cost(10, "other") == 10
+    controller.admit("a", 20, "slow")
+    assert isinstance(controller.admit("a", 30, "slow"), Rejection)
+    assert isinstance(controller.admit("a", 20, "fast"), Ticket)
+
+
+def test_per_client_concurrency_and_byte_rate():
+    controller, clock = _controller(
+        client_concurrency=2, client_bytes_per_second=100, client_burst_bytes=200
+    )
+    tickets = [controller.admit("a", 10), controller.admit("a", 10)]
+    rejected = controller.admit("a", 10)
+    assert rejected.status == HTTPStatus.TOO_MANY_REQUESTS
+    assert rejected.reason == "client_concurrency"
+    assert isinstance(controller.admit("b", 10), Ticket)  # other clients are unaffected
+    for ticket in tickets:
+        controller.release(ticket)
+
+    # 20 of the 200-byte burst are spent; a 500-byte body needs a full bucket.
+    rejected = controller.admit("a", 500)
+    assert (rejected.reason, rejected.retry_after) == ("client_rate", 1)
+    clock.now += 0.2
+    controller.release(controller.admit("a", 500))
+    # The oversized request left the bucket 300 bytes in debt: 301 bytes at 100/s.
+    assert controller.admit("a", 1).retry_after == 4
+    clock.now += 4
+    assert isinstance(controller.admit("a", 1), Ticket)
+
+    metrics = controller.metrics()
+    assert metrics["rejected"]["client_rate"] == 2
+    assert metrics["rejected"]["client_concurrency"] == 1
+    assert metrics["admitted"] == 5
+
+
+def test_oversized_body_is_rejected_without_retry():
+    controller, _ = _controller(max_body_bytes=1000)
+    rejected = controller.admit("a", 1001)
+    assert (rejected.status, rejected.retry_after) == (HTTPStatus.REQUEST_ENTITY_TOO_LARGE, None)
+    assert controller.metrics()["rejected_bytes"] == 1001
+
+
+def test_negative_body_size_is_invalid_not_free():
+    controller, _ = _controller(max_body_bytes=1000)
+    rejected = controller.admit("a", -1)
+    assert (rejected.status, rejected.reason) == (HTTPStatus.BAD_REQUEST, "invalid_length")
+    assert controller.metrics()["admitted_bytes"] == 0
+
+
+@pytest.mark.parametrize(
+    "length_header, status",
+    [(b"Content-Length: -1\r\n", b"400"), (b"Content-Length: lots\r\n", b"400"), (b"", b"411")],
+)
+def test_server_requires_a_valid_content_length(server, length_header, status):
+    controller = AdmissionController(AdmissionLimits(max_body_bytes=1000))
+    port = server(controller)
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as conn:
+        # No body follows: reading "until EOF" for -1 would hang instead of answering.
+        conn.sendall(b"POST /tokenize HTTP/1.1\r\nHost: x\r\n" + length_header + b"\r\n")
+        response = conn.makefile("rb").read()
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 " + status)
+    assert b"Connection: close" in head
+    assert "Content-Length" in json.loads(body)["error"]
+    assert controller.metrics()["admitted"] == 0
+
+
+def test_server_rejects_before_reading_body(server):
+    controller = AdmissionController(AdmissionLimits(max_body_bytes=1024 * 1024))
+    port = server(controller)
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as conn:
+        # Announce a 50 MB body but never send it: the answer must not wait for it.
+        conn.sendall(
+            b"POST /tokenize?model=deepseek-chat HTTP/1.1\r\nHost: x\r\n"
+            b"Content-Length: 52428800\r\n\r\n"
+        )
+        response = conn.makefile("rb").read()
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 413")
+    assert b"Connection: close" in head
+    assert json.loads(body)["reason"] == "too_large"
+
+
+def test_server_sheds_per_client_and_reports_metrics(server):
+    controller = AdmissionController(
+        AdmissionLimits(client_bytes_per_second=1, client_burst_bytes=200)
+    )
+    port = server(controller, client_header="X-Client-Id")
+    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+    body = json.dumps({"model": "deepseek-chat", "text": "word " * 20})
+    try:
+        conn.request("POST", "/tokenize", body=body, headers={"X-Client-Id": "tenant-a"})
+        conn.getresponse().read()
+        conn.request("POST", "/tokenize", body=body, headers={"X-Client-Id": "tenant-a"})
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+        assert response.status == 429
+        assert int(response.getheader("Retry-After")) >= 1
+        assert payload["reason"] == "client_rate"
+
+        # A small rejected body is drained, so the connection stays usable.
+        conn.request("POST", "/tokenize", body=body, headers={"X-Client-Id": "tenant-b"})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200
+        conn.request("GET", "/metrics")
+        metrics = json.loads(conn.getresponse().read())["admission"]
+    finally:
+        conn.close()
+    assert metrics["admitted"] == 2
+    assert metrics["rejected"]["client_rate"] == 1
+    assert metrics["inflight"] == 0
+
+
+def test_clients_send_the_model_so_weighted_models_are_shed_sooner(server):
+    def admitted_before_rejection(model, use_async):
+        controller = AdmissionController(
+            AdmissionLimits(
+                client_bytes_per_second=1, client_burst_bytes=2000, model_weights={"qwen-2-7b": 4}
+            )
+        )
+        url = f"http://127.0.0.1:{server(controller)}"
+        text = "word " * 40
+        admitted = 0
+        if use_async:
+
+            async def run():
+                nonlocal admitted
+                async with AsyncTokenCounterClient(url, retries=0) as client:
+                    while True:
+                        await client.count(model, text)
+                        admitted += 1
+
+            with pytest.raises(TokenCounterError) as rejected:
+                asyncio.run(run())
+        else:
+            with TokenCounterClient(url, retries=0) as client:
+                with pytest.raises(TokenCounterError) as rejected:
+                    while True:
+                        client.count(model, text)
+                        admitted += 1
+        assert rejected.value.status == 429
+        return admitted
+
+    for use_async in (False, True):
+        plain = admitted_before_rejection("deepseek-chat", use_async)
+        weighted = admitted_before_rejection("qwen-2-7b", use_async)
+        assert weighted < plain
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from app.catalog import load_catalog
+from app.services.async_service import AsyncTokenService
+from app.services.token_service import ModelNotFoundError, TokenService
+from app.tokenizers import huggingface_tokenizer as hf_module
+from app.tokenizers.registry import TokenizerRegistry
+
+MODEL = "deepseek-chat"
+
+
+class GatedService(TokenService):
+    """Blocks like a native encode (releasing the GIL) until the gate opens."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate = threading.Event()
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def calculate(self, *args, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            # Only the event loop opens the gate: if a call blocked the loop, this would time out.
+            assert self.gate.wait(10), "the event loop was blocked"
+            return super().calculate(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def _service(cls=TokenService):
+    return cls(models=load_catalog(), registry=TokenizerRegistry())
+
+
+def test_event_loop_stays_responsive_under_load():
+    gated = _service(GatedService)
+
+    async def run():
+        async with AsyncTokenService(gated, max_workers=4) as service:
+            await service.load(MODEL)
+            texts = [f"prompt number {index}" for index in range(40)]
+            work = asyncio.gather(*(service.calculate(MODEL, text) for text in texts))
+            # The loop keeps running coroutines while four calls block their workers.
+            while gated.running < 4:
+                await asyncio.sleep(0.001)
+            for _ in range(20):
+                await asyncio.sleep(0)
+            assert gated.running == 4
+            gated.gate.set()
+            return await work
+
+    results = asyncio.run(run())
+    assert [result["token_count"] for result in results] == [3] * 40
+    assert gated.most_running == 4
+
+
+def test_reload_invalidates_loaded_tokenizers():
+    service = _service()
+    warms = []
+    warm = service.warm
+    service.warm = lambda model_id: warms.append(model_id) or warm(model_id)
+
+    async def run():
+        async with AsyncTokenService(service) as async_service:
+            await async_service.count_tokens(MODEL, "a b")
+            await async_service.count_tokens(MODEL, "a b c")
+            models = list(load_catalog())
+            changed = next(model for model in models if model.model_id == MODEL)
+            spec = replace(
+                changed.tokenizer, options={**changed.tokenizer.options, "parallel_workers": 1}
+            )
+            service.reload(
+                [replace(model, tokenizer=spec) if model is changed else model for model in models]
+            )
+            assert not service.is_loaded(MODEL)
+            await async_service.count_tokens(MODEL, "a b")
+            assert service.is_loaded(MODEL)
+
+    asyncio.run(run())
+    assert warms == [MODEL, MODEL]
+
+
+def test_tokenizer_load_is_single_flight(monkeypatch):
+    loads = []
+    create = hf_module.HuggingFaceTokenizer._create_backend
+
+    def slow_create(self, path):
+        loads.append(threading.get_ident())
+        time.sleep(0.1)
+        return create(self, path)
+
+    monkeypatch.setattr(hf_module.HuggingFaceTokenizer, "_create_backend", slow_create)
+    service = _service()
+    warms = []
+    warm = service.warm
+    service.warm = lambda model_id: warms.append(model_id) or warm(model_id)
+
+    async def run():
+        async with AsyncTokenService(service, max_workers=4) as async_service:
+            counts = await asyncio.gather(
+                *(async_service.count_tokens(MODEL, "a b c") for _ in range(10))
+            )
+            estimate = await async_service.calculate("qwen-2-7b", "a b c", mode="estimate")
+            return counts, estimate
+
+    counts, estimate = asyncio.run(run())
+    assert counts == [3] * 10
+    assert warms == [MODEL] and len(loads) == 1
+    assert estimate["mode"] == "estimate"
+
+
+def test_cancellation_and_timeouts():
+    started = []
+
+    class BlockingService(TokenService):
+        def calculate(self, model_id, text, *args, **kwargs):
+            started.append(text)
+            if text == "block":
+                time.sleep(0.2)
+            return super().calculate(model_id, text, *args, **kwargs)
+
+    async def run():
+        service = AsyncTokenService(_service(BlockingService), max_workers=1)
+        await service.load(MODEL)
+        blocking = asyncio.ensure_future(service.calculate(MODEL, "block"))
+        queued = asyncio.ensure_future(service.calculate(MODEL, "never runs"))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        with pytest.raises(asyncio.TimeoutError):
+            await service.calculate(MODEL, "too late", timeout=0.05)
+        with pytest.raises(ModelNotFoundError):
+            await service.calculate("missing-model", "text")
+        assert (await blocking)["token_count"] == 1
+        assert (await service.calculate(MODEL, "after that"))["token_count"] == 2
+        await service.close()
+        return queued
+
+    queued = asyncio.run(run())
+    assert queued.cancelled()
+    assert started == ["block", "after that"]
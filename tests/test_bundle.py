@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from app.bundle import build_bundle
+from app.models import ModelSpec, TokenizerSpec
+from app.tokenizers.huggingface_tokenizer import HuggingFaceTokenizer, TokenizerDownloadError
+
+
+def _model(model_id, repo_id, cache_dir):
+    spec = TokenizerSpec(
+        type="huggingface",
+        options={
+            "repo_id": repo_id,
+            "cache_dir": str(cache_dir),
+            "bundle_dir": str(cache_dir / "none"),
+        },
+    )
+    return ModelSpec(model_id, model_id, "test", "test", 0, spec)
+
+
+def test_build_bundle_copies_files_once_and_writes_manifest(tmp_path):
+    cache = tmp_path / "cache"
+    models = [
+        _model("a", "org/shared", cache),
+        _model("b", "org/shared", cache),
+        _model("c", "org/other", cache),
+    ]
+    manifest = build_bundle(models, tmp_path / "bundle")
+
+    assert set(manifest["files"]) == {
+        "org__shared/main/tokenizer.json",
+        "org__other/main/tokenizer.json",
+    }
+    assert manifest["files"]["org__shared/main/tokenizer.json"]["models"] == ["a", "b"]
+    stored = json.loads((tmp_path / "bundle" / "manifest.json").read_text(encoding="utf-8"))
+    assert stored == manifest
+    assert (tmp_path / "bundle" / "org__other" / "main" / "tokenizer.json").exists()
+
+
+def test_build_bundle_can_skip_missing_tokenizers(tmp_path):
+    spec = TokenizerSpec(
+        type="huggingface",
+        options={"repo_id": "org/gated", "cache_dir": str(tmp_path), "local_files_only": True},
+    )
+    models = [ModelSpec("gated", "gated", "test", "test", 0, spec)]
+    with pytest.raises(TokenizerDownloadError):
+        build_bundle(models, tmp_path / "bundle")
+    manifest = build_bundle(models, tmp_path / "bundle", allow_missing=True)
+    assert manifest["missing"][0]["model"] == "gated"
+
+
+def test_bundle_is_preferred_over_cache_and_network(tmp_path, monkeypatch):
+    bundle = tmp_path / "bundle"
+    bundled = bundle / "org__model" / "main" / "tokenizer.json"
+    bundled.parent.mkdir(parents=True)
+    bundled.write_text("{}", encoding="utf-8")
+
+    def fail_download(self, target_path):  # pragma: no cover - must not be called
+        raise AssertionError("bundle should avoid downloads")
+
+    monkeypatch.setattr(HuggingFaceTokenizer, "_download_tokenizer_file", fail_download)
+    tokenizer = HuggingFaceTokenizer(
+        name="bundled", repo_id="org/model", cache_dir=tmp_path / "cache", bundle_dir=bundle
+    )
+    assert tokenizer.resolve_tokenizer_file() == bundled
+    assert tokenizer.tokenize("bundled text") == ["bundled", "text"]
+
+
+def test_read_only_cache_falls_back_to_tmp(tmp_path, monkeypatch):
+    from app.tokenizers import huggingface_tokenizer as hf_module
+
+    read_only = tmp_path / "readonly"
+    writable = hf_module._is_writable_dir
+    monkeypatch.setattr(
+        hf_module,
+        "_is_writable_dir",
+        lambda path: not path.is_relative_to(read_only) and writable(path),
+    )
+    monkeypatch.setattr(hf_module.tempfile, "gettempdir", lambda: str(tmp_path / "tmp"))
+    tokenizer = HuggingFaceTokenizer(
+        name="ro", repo_id="org/model", cache_dir=read_only, bundle_dir=tmp_path / "none"
+    )
+    path = tokenizer.resolve_tokenizer_file()
+    assert path == tmp_path / "tmp" / "token-counter-llm" / "org__model" / "main" / "tokenizer.json"
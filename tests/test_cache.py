@@ -0,0 +1,132 @@
+import io
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import redirect_stdout
+
+import app.__main__ as cli
+from app.tokenizers.cache import (
+    AccessIndex,
+    cache_bytes,
+    dedupe_cache,
+    prune_cache,
+    scan_cache,
+    verify_cache,
+)
+from app.tokenizers.huggingface_tokenizer import HuggingFaceTokenizer, repo_cache_path
+
+DAY = 86400
+
+
+def _seed(root, repo_id, content=b"{}", age_days=0):
+    path = repo_cache_path(root, repo_id, "main", "tokenizer.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    stamp = time.time() - age_days * DAY
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_loaded_tokenizers_are_recorded_and_never_pruned(tmp_path):
+    tokenizer = HuggingFaceTokenizer(
+        name="active", repo_id="org/active", cache_dir=tmp_path, bundle_dir=tmp_path / "none"
+    )
+    assert tokenizer.tokenize("warm it up") == ["warm", "it", "up"]
+    idle = _seed(tmp_path, "org/idle", b'{"idle": true}', age_days=30)
+    exited = _seed(tmp_path, "org/exited", age_days=30)
+    # A worker on this host that has exited no longer protects its file.
+    with sqlite3.connect(tmp_path / "access.sqlite") as connection:
+        connection.execute(
+            "INSERT INTO uses VALUES (?, ?, ?, ?)",
+            (exited.relative_to(tmp_path).as_posix(), socket.gethostname(), 2**22 + 7, 0.0),
+        )
+    partial = repo_cache_path(tmp_path, "org/active", "main", "tokenizer.json.99.partial")
+    partial.write_bytes(b"{")
+    os.utime(partial, (time.time() - DAY, time.time() - DAY))
+
+    entries = {entry.repo_id: entry for entry in scan_cache(tmp_path) if not entry.partial}
+    active = entries["org/active"]
+    assert (active.holders, active.revision, active.filename) == (1, "main", "tokenizer.json")
+    assert active.sha256 is not None and active.last_used is not None
+    assert entries["org/idle"].holders == 0 and entries["org/idle"].last_used is None
+
+    preview = prune_cache(tmp_path, max_bytes=0, dry_run=True)
+    assert idle.exists() and sorted(preview["removed"]) == sorted(
+        [str(idle), str(exited), str(partial)]
+    )
+    assert preview["kept_in_use"] == [active.path]
+
+    report = prune_cache(tmp_path, max_bytes=0)
+    assert not idle.exists() and not exited.exists() and not partial.exists()
+    assert not idle.parent.parent.exists()
+    assert (report["bytes_after"], report["kept_in_use"]) == (active.size, [active.path])
+    assert [entry.repo_id for entry in scan_cache(tmp_path)] == ["org/active"]
+
+
+def test_prune_by_age_and_budget_keeps_recent_files(tmp_path):
+    old = _seed(tmp_path, "org/old", b"x" * 100, age_days=40)
+    middle = _seed(tmp_path, "org/middle", b"x" * 100, age_days=10)
+    recent = _seed(tmp_path, "org/recent", b"x" * 100, age_days=2)
+
+    report = prune_cache(tmp_path, max_age=30 * DAY)
+    assert report["removed"] == [str(old)]
+    report = prune_cache(tmp_path, max_bytes=150)
+    assert report["removed"] == [str(middle)] and recent.exists()
+    # A recorded use counts as activity even when the file itself is old.
+    AccessIndex(tmp_path).touch(recent)
+    assert prune_cache(tmp_path, max_age=DAY)["removed"] == [] and recent.exists()
+
+
+def test_verify_reports_and_removes_corrupt_files(tmp_path):
+    good = _seed(tmp_path, "org/good", b'{"model": {}}')
+    broken = _seed(tmp_path, "org/broken", b'{"model": ')
+    tampered = _seed(tmp_path, "org/tampered", b'{"a": 1}')
+    AccessIndex(tmp_path).record_download(tampered, "0" * 64)
+
+    results = {item["path"]: item for item in verify_cache(tmp_path, workers=3, loader=None)}
+    assert results[str(good)]["ok"]
+    assert "JSONDecodeError" in results[str(broken)]["error"]
+    assert "hash mismatch" in results[str(tampered)]["error"]
+
+    verify_cache(tmp_path, remove=True, loader=None)
+    assert good.exists() and not broken.exists() and not tampered.exists()
+
+
+def test_cli_cache_warm_and_list(tmp_path):
+    def run(*args):
+        with io.StringIO() as buffer:
+            with redirect_stdout(buffer):
+                assert cli.main(["cache", *args, "--cache-dir", str(tmp_path)]) == 0
+            return json.loads(buffer.getvalue())
+
+    warmed = run("warm", "--model", "deepseek-chat")
+    assert warmed["models"]["deepseek-chat"]["ok"]
+    listed = run("list")
+    assert listed["files"] == 1
+    assert listed["entries"][0]["path"] == warmed["models"]["deepseek-chat"]["path"]
+    assert run("verify")["corrupt"] == []
+    # The file was just downloaded, so it counts as in use.
+    pruned = run("prune", "--max-mb", "0")
+    assert (pruned["removed"], pruned["kept_in_use"]) == ([], [listed["entries"][0]["path"]])
+
+
+def test_identical_downloads_share_one_blob(tmp_path):
+    paths = []
+    for repo_id in ("org/base", "org/chat"):
+        tokenizer = HuggingFaceTokenizer(
+            name=repo_id, repo_id=repo_id, cache_dir=tmp_path, bundle_dir=tmp_path / "none"
+        )
+        paths.append(tokenizer.resolve_tokenizer_file())
+    assert os.path.samefile(*paths)
+    # Files copied in by hand are linked by dedupe.
+    copied = _seed(tmp_path, "org/copied", paths[0].read_bytes(), age_days=30)
+    report = dedupe_cache(tmp_path)
+    assert (report["linked"], report["bytes_before"] - report["bytes_after"]) == (1, 2)
+
+    entries = scan_cache(tmp_path)
+    assert len({entry.blob for entry in entries}) == 1 and cache_bytes(entries) == 2
+    # The blob is removed together with its last link.
+    assert prune_cache(tmp_path, max_bytes=0, active_window=0)["bytes_after"] == 0
+    assert not copied.exists() and not (tmp_path / "blobs").exists()
@@ -0,0 +1,115 @@
+import json
+import threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.catalog import load_catalog
+from app.server import _build_handler
+from app.services.capture import (
+    CaptureWriter,
+    iter_capture,
+    redact_text,
+    restore_payload,
+    restore_text,
+    text_script,
+)
+from app.services.replay import HTTPTarget, ServiceTarget, replay
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+MODEL = "deepseek-chat"
+
+
+def _service():
+    return TokenService(models=load_catalog(), registry=TokenizerRegistry())
+
+
+@pytest.fixture
+def server():
+    started = []
+
+    def start(service, capture=None):
+        handler = _build_handler(service, capture=capture)
+        handler.protocol_version = "HTTP/1.1"
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        started.append((httpd, thread))
+        return httpd.server_address[1]
+
+    yield start
+    for httpd, thread in started:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def test_redacted_text_restores_to_same_size_and_script():
+    text = "统计一下这段中文文本的词元数量。" * 40
+    for mode in ("truncate", "hash"):
+        logged = redact_text(text, mode, truncate_chars=10)
+        assert logged["n"] == len(text) and logged["script"] == "cjk"
+        restored = restore_text(json.loads(json.dumps(logged)))
+        assert len(restored) == len(text) and text_script(restored) == "cjk"
+        assert restore_text(logged) == restored
+    assert restore_text(redact_text(text, "truncate", 10)).startswith(text[:10])
+    assert "sha" in redact_text(text, "hash") and "head" not in redact_text(text, "hash")
+    assert redact_text("short", "truncate", 10) == "short"
+    assert redact_text(text, "full") == text
+
+
+def test_hash_mode_is_keyed_and_null_content_survives_restore():
+    text = "a guessable prompt"
+    key = b"k" * 32
+    assert redact_text(text, "hash", key=key) == redact_text(text, "hash", key=key)
+    assert redact_text(text, "hash", key=key)["sha"] != redact_text(text, "hash", key=b"x")["sha"]
+    assert redact_text(text, "hash")["sha"] != redact_text(text, "hash")["sha"]
+
+    payload = {"messages": [{"role": "assistant", "content": None}, {"role": "user", "content": 3}]}
+    assert restore_payload(payload) == payload
+
+
+def test_server_capture_and_replay(server, tmp_path):
+    log = tmp_path / "capture.jsonl.gz"
+    capture = CaptureWriter(log, text_mode="hash", flush_interval=0.05)
+    port = server(_service(), capture)
+    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+    requests = [
+        ("/tokenize?mode=chunked", {"model": MODEL, "text": "hello world " * 20}),
+        ("/tokenize/batch", {"model": MODEL, "texts": ["one two", "three"]}),
+        ("/truncate", {"model": MODEL, "text": "a b c d e f", "max_tokens": 3}),
+        ("/tokenize", {"model": "no-such-model", "text": "x"}),
+    ]
+    for path, payload in requests:
+        conn.request("POST", path, body=json.dumps(payload))
+        conn.getresponse().read()
+    body = b"one two three four five"
+    conn.request(
+        "POST", f"/chunk?model={MODEL}&max_tokens=4", body, {"Content-Type": "text/plain"}
+    )
+    conn.getresponse().read()
+    conn.request("GET", "/metrics")
+    assert json.loads(conn.getresponse().read())["capture"]["captured"] == 5
+    conn.close()
+    capture.close()
+
+    records = list(iter_capture(log))
+    routes = [path.partition("?")[0] for path, _ in requests]
+    assert [record["route"] for record in records] == routes + ["/chunk"]
+    assert records[0]["payload"]["text"]["n"] == len("hello world " * 20)
+    assert records[0]["payload"]["mode"] == "chunked"
+    assert "hello" not in json.dumps(records)
+    assert records[-1]["payload"]["text"] == {"n": len(body)}
+    assert all(a["t"] <= b["t"] for a, b in zip(records, records[1:]))
+
+    report = replay(records, ServiceTarget(_service()), speed=0)
+    assert report["requests"] == 5 and report["errors"] == {"404": 1}
+    assert report["latency"]["count"] == 4
+    assert set(report["routes"]) == {"/tokenize", "/tokenize/batch", "/truncate", "/chunk"}
+    assert report["latency"]["p50_ms"] <= report["latency"]["p99_ms"] <= report["latency"]["max_ms"]
+
+    report = replay(records + records, HTTPTarget(f"http://127.0.0.1:{port}"), limit=6, speed=50)
+    assert report["requests"] == 6 and report["errors"] == {"404": 1}
+    assert report["routes"]["/tokenize"]["count"] == 2
@@ -0,0 +1,59 @@
+import gzip
+import json
+import os
+import shutil
+from http import HTTPStatus
+from pathlib import Path
+
+from app.catalog import ModelCatalog, load_catalog, models_response
+from app.config import load_registry
+
+REGISTRY = Path(__file__).resolve().parents[1] / "app" / "resources" / "model_registry.json"
+
+
+def test_payload_matches_to_dict_output():
+    models = load_registry()
+    catalog = ModelCatalog(models)
+    body = json.loads(catalog.payload.body.decode("utf-8"))
+    assert body == {"models": [model.to_dict() for model in models]}
+    assert gzip.decompress(catalog.payload.gzip_body) == catalog.payload.body
+    assert catalog.payload.etag.startswith('"') and catalog.payload.etag != catalog.payload.gzip_etag
+
+
+def test_select_uses_indexes():
+    catalog = ModelCatalog(load_registry())
+    assert catalog.select(families=["QWEN"]) == ["qwen-2-7b"]
+    assert catalog.select(families=["qwen", "gpt"]) == ["openai-gpt2", "qwen-2-7b"]
+    assert catalog.select(ids=["deepseek-chat"], providers=["deepseek"]) == ["deepseek-chat"]
+    assert catalog.select(ids=["deepseek-chat"], families=["gpt"]) == []
+
+
+def test_models_response_filters_and_revalidates():
+    catalog = ModelCatalog(load_registry())
+    response = models_response(catalog, {"family": ["gpt,qwen"]})
+    assert response.status == HTTPStatus.OK
+    ids = [model["id"] for model in json.loads(response.body)["models"]]
+    assert ids == ["openai-gpt2", "qwen-2-7b"]
+
+    cached = models_response(catalog, {"family": ["gpt,qwen"]}, if_none_match=response.headers["ETag"])
+    assert cached.status == HTTPStatus.NOT_MODIFIED
+    assert cached.body == b""
+
+    compressed = models_response(catalog, {}, accept_encoding="br, gzip;q=0.8")
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.body) == catalog.payload.body
+
+
+def test_load_catalog_reuses_parse_until_file_changes(tmp_path):
+    registry = tmp_path / "registry.json"
+    shutil.copy(REGISTRY, registry)
+    first = load_catalog(registry)
+    assert load_catalog(registry) is first
+
+    data = json.loads(registry.read_text(encoding="utf-8"))
+    registry.write_text(json.dumps(data[:1]), encoding="utf-8")
+    stat = registry.stat()
+    os.utime(registry, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = load_catalog(registry)
+    assert second is not first
+    assert len(second) == 1
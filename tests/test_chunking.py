@@ -0,0 +1,130 @@
+import io
+import json
+import threading
+from contextlib import redirect_stdout
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import app.__main__ as cli
+from app.catalog import load_catalog
+from app.server import _build_handler
+from app.services.chunking import iter_windows
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+MODEL = "deepseek-chat"
+DOCUMENT = (
+    "The first sentence is short. The second one runs a little longer than that!\n\n"
+    "A new paragraph starts here. It keeps going with several more words.\n"
+) * 40
+
+
+def _service():
+    return TokenService(models=load_catalog(), registry=TokenizerRegistry())
+
+
+@pytest.fixture
+def port():
+    handler = _build_handler(_service())
+    handler.protocol_version = "HTTP/1.1"
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def test_chunks_respect_budget_and_overlap():
+    service = _service()
+    chunks = list(service.chunk(MODEL, DOCUMENT, max_tokens=16, overlap=4))
+    total = service.count_tokens(MODEL, DOCUMENT)
+
+    assert all(chunk["token_count"] <= 16 for chunk in chunks)
+    assert all(chunk["text"] == DOCUMENT[chunk["start"] : chunk["end"]] for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current["token_start"] == previous["token_start"] + previous["token_count"] - 4
+    last = chunks[-1]
+    assert last["token_start"] + last["token_count"] == total
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+
+
+@pytest.mark.parametrize(
+    "snap, budget, ending", [("sentence", 24, (".", "!")), ("paragraph", 40, ("!",))]
+)
+def test_snapped_chunks_end_at_breaks(snap, budget, ending):
+    chunks = list(_service().chunk(MODEL, DOCUMENT, max_tokens=budget, snap=snap))
+    assert all(chunk["text"].endswith(ending) for chunk in chunks[:-1])
+    assert all(budget // 2 <= chunk["token_count"] <= budget for chunk in chunks[:-1])
+
+
+def test_streamed_blocks_match_single_string():
+    service = _service()
+    whole = list(service.chunk(MODEL, DOCUMENT, max_tokens=20, overlap=5, window=4096))
+    blocks = (DOCUMENT[start : start + 777] for start in range(0, len(DOCUMENT), 777))
+    streamed = list(service.chunk(MODEL, blocks, max_tokens=20, overlap=5, window=512))
+    assert streamed == whole
+
+    windows = list(iter_windows(iter(["a b " * 300]), window=100))
+    assert "".join(text for _, text in windows) == "a b " * 300
+    assert all(not text[-1].isspace() for _, text in windows[:-1])
+
+
+def test_chunk_validates_arguments():
+    service = _service()
+    with pytest.raises(ValueError):
+        service.chunk(MODEL, DOCUMENT, max_tokens=8, overlap=8)
+    with pytest.raises(ValueError):
+        service.chunk(MODEL, DOCUMENT, snap="chapter")
+    assert list(service.chunk(MODEL, "   ")) == []
+
+
+def test_server_streams_ndjson(port):
+    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        body = json.dumps({"model": MODEL, "text": DOCUMENT, "max_tokens": 32, "overlap": 8})
+        conn.request("POST", "/chunk", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        assert response.status == 200
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        from_json = [json.loads(line) for line in response.read().splitlines()]
+
+        # Raw text bodies are chunked while they are read; options come from the query.
+        conn.request(
+            "POST",
+            "/chunk?model=deepseek-chat&max_tokens=32&overlap=8",
+            body=DOCUMENT.encode("utf-8"),
+            headers={"Content-Type": "text/plain; charset=utf-8"},
+        )
+        from_text = [json.loads(line) for line in conn.getresponse().read().splitlines()]
+
+        conn.request(
+            "POST",
+            "/chunk?model=deepseek-chat&max_tokens=many",
+            body=DOCUMENT.encode("utf-8"),
+            headers={"Content-Type": "text/plain"},
+        )
+        rejected = conn.getresponse()
+        assert rejected.status == 400
+        rejected.read()
+        # The unread body was drained, so the connection is still usable.
+        conn.request("POST", "/chunk", body=json.dumps({"model": "nope", "text": "x"}))
+        assert conn.getresponse().status == 404
+    finally:
+        conn.close()
+    assert from_json == from_text
+    assert from_json == list(_service().chunk(MODEL, DOCUMENT, max_tokens=32, overlap=8))
+
+
+def test_cli_chunk_streams_file(tmp_path):
+    document = tmp_path / "doc.txt"
+    document.write_text(DOCUMENT, encoding="utf-8")
+    with io.StringIO() as buffer:
+        with redirect_stdout(buffer):
+            args = ["chunk", "--model", MODEL, "--file", str(document), "--max-tokens", "50"]
+            assert cli.main(args) == 0
+        lines = [json.loads(line) for line in buffer.getvalue().splitlines()]
+    assert lines == list(_service().chunk(MODEL, DOCUMENT, max_tokens=50))
@@ -24,6 +24,23 @@ class CliTests(unittest.TestCase):
             payload = json.loads(buffer.getvalue())
             self.assertEqual(payload["model"]["id"], "openai-gpt2")
 
+    def test_cli_truncate(self):
+        with io.StringIO() as buffer:
+            with redirect_stdout(buffer):
+                exit_code = cli.main([
+                    "truncate",
+                    "--model",
+                    "openai-gpt2",
+                    "--max-tokens",
+                    "1",
+                    "--text",
+                    "Hello world",
+                ])
+            self.assertEqual(exit_code, 0)
+            payload = json.loads(buffer.getvalue())
+            self.assertEqual(payload["text"], "Hello")
+            self.assertEqual(payload["kept_tokens"], 1)
+
     def test_cli_models_lists_entries(self):
         with io.StringIO() as buffer:
             with redirect_stdout(buffer):
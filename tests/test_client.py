@@ -0,0 +1,277 @@
+import asyncio
+import gc
+import threading
+import time
+from http import HTTPStatus
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.catalog import load_catalog
+from app.client import (
+    AsyncTokenCounterClient,
+    TokenCounterClient,
+    TokenCounterError,
+    _InflightBatcher,
+)
+from app.server import UnixSocketHTTPServer, _build_handler
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+
+def _service():
+    return TokenService(models=load_catalog(), registry=TokenizerRegistry())
+
+
+def _start(server):
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def server_factory():
+    started = []
+
+    def factory(handler=None, service=None):
+        service = service or _service()
+        handler = handler or _build_handler(service)
+        handler.protocol_version = "HTTP/1.1"
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        started.append((server, _start(server)))
+        return f"http://127.0.0.1:{server.server_address[1]}", service
+
+    yield factory
+    for server, thread in started:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_sync_client_counts_and_reuses_connections(server_factory):
+    url, _ = server_factory()
+    with TokenCounterClient(url, pool_size=2) as client:
+        assert client.count("deepseek-chat", "Hello world") == 2
+        result = client.tokenize("deepseek-chat", "Hello world", include_tokens=True)
+        assert result["tokens"] == ["Hello", "world"]
+        assert client.tokenize("deepseek-chat", "Hello world")["tokens"] is None
+        assert client._pool is not None and len(client._pool._idle) == 1
+
+
+def test_sync_client_reports_errors(server_factory):
+    url, _ = server_factory()
+    client = TokenCounterClient(url)
+    with pytest.raises(TokenCounterError) as excinfo:
+        client.count("missing-model", "Hello")
+    assert excinfo.value.status == 404
+    with pytest.raises(TokenCounterError) as excinfo:
+        client.tokenize("deepseek-chat", "Hello", mode="bogus")
+    assert excinfo.value.status == 400
+
+
+def test_models_are_revalidated_with_etag(server_factory):
+    url, _ = server_factory()
+    client = TokenCounterClient(url)
+    first = client.models()
+    assert {model["id"] for model in first} >= {"openai-gpt2", "deepseek-chat"}
+    assert client.models() is first  # served from the 304 revalidation
+    assert [model["id"] for model in client.models(family="qwen")] == ["qwen-2-7b"]
+
+
+def test_concurrent_calls_are_batched(server_factory):
+    url, service = server_factory()
+    batch_sizes = []
+    original = service.calculate_many
+
+    def slow_calculate_many(*args, **kwargs):
+        batch_sizes.append(len(kwargs["texts"]))
+        time.sleep(0.05)
+        return original(*args, **kwargs)
+
+    service.calculate_many = slow_calculate_many
+    client = TokenCounterClient(url)
+    texts = [" ".join(["word"] * (index + 1)) for index in range(12)]
+    results = [None] * len(texts)
+
+    def worker(index):
+        results[index] = client.count("deepseek-chat", texts[index])
+
+    client.count("deepseek-chat", "warm up")  # occupies the lane while workers queue
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == list(range(1, len(texts) + 1))
+    assert batch_sizes and max(batch_sizes) > 1
+
+
+def test_inflight_batcher_groups_waiting_calls():
+    release = threading.Event()
+    batches = []
+
+    def send(texts):
+        batches.append(list(texts))
+        if len(batches) == 1:
+            release.wait(2)
+        return [text.upper() for text in texts]
+
+    batcher = _InflightBatcher(max_batch=3)
+    results = {}
+
+    def call(text):
+        results[text] = batcher.submit("key", text, send)
+
+    first = threading.Thread(target=call, args=("a",))
+    first.start()
+    while not batches:
+        time.sleep(0.001)
+    others = [threading.Thread(target=call, args=(text,)) for text in "bcde"]
+    for thread in others:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [first, *others]:
+        thread.join()
+    assert results == {text: text.upper() for text in "abcde"}
+    assert batches[0] == ["a"]
+    assert sorted(sum(batches[1:], [])) == list("bcde")
+    assert max(len(batch) for batch in batches) == 3
+
+
+def test_falls_back_without_batch_route(server_factory):
+    service = _service()
+    base = _build_handler(service)
+
+    class LegacyHandler(base):
+        def _handle_tokenize_batch(self, payload):
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "unknown endpoint"})
+
+    url, _ = server_factory(LegacyHandler, service)
+    client = TokenCounterClient(url)
+    results = client.tokenize_many("deepseek-chat", ["a b", "c", "d e f"])
+    assert [result["token_count"] for result in results] == [2, 1, 3]
+    assert client._batch_supported is False
+
+
+def test_retries_unavailable_responses(server_factory):
+    service = _service()
+    base = _build_handler(service)
+    failures = {"left": 2}
+
+    class FlakyHandler(base):
+        def _handle_tokenize(self, payload):
+            if failures["left"]:
+                failures["left"] -= 1
+                self._send_bytes(HTTPStatus.SERVICE_UNAVAILABLE, {"Retry-After": "0"}, b"{}")
+                return
+            super()._handle_tokenize(payload)
+
+    url, _ = server_factory(FlakyHandler, service)
+    assert TokenCounterClient(url, retries=2).count("deepseek-chat", "one two") == 2
+    failures["left"] = 5
+    with pytest.raises(TokenCounterError) as excinfo:
+        TokenCounterClient(url, retries=1).count("deepseek-chat", "one two")
+    assert excinfo.value.status == 503
+
+
+def test_large_responses_are_gzipped(server_factory):
+    url, _ = server_factory()
+    conn = HTTPConnection(url.removeprefix("http://"), timeout=5)
+    try:
+        body = '{"model": "deepseek-chat", "text": "%s"}' % ("word " * 1000)
+        conn.request("POST", "/tokenize", body=body, headers={"Accept-Encoding": "gzip"})
+        response = conn.getresponse()
+        response.read()
+        assert response.getheader("Content-Encoding") == "gzip"
+    finally:
+        conn.close()
+    result = TokenCounterClient(url).tokenize(
+        "deepseek-chat", "word " * 1000, include_tokens=True
+    )
+    assert len(result["tokens"]) == 1000
+
+
+def test_client_over_unix_socket(tmp_path):
+    path = str(tmp_path / "counter.sock")
+    handler = _build_handler(_service())
+    handler.protocol_version = "HTTP/1.1"
+    server = UnixSocketHTTPServer(path, handler)
+    thread = _start(server)
+    try:
+        client = TokenCounterClient(uds=path)
+        assert [client.count("deepseek-chat", "a b c") for _ in range(3)] == [3, 3, 3]
+
+        async def run():
+            async with AsyncTokenCounterClient(uds=path) as async_client:
+                return await async_client.count("deepseek-chat", "a b c d")
+
+        assert asyncio.run(run()) == 4
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_in_process_client_matches_http(server_factory):
+    url, _ = server_factory()
+    local = TokenCounterClient.in_process()
+    remote = TokenCounterClient(url)
+    text = "Hello world, again"
+    assert local.tokenize("deepseek-chat", text) == remote.tokenize("deepseek-chat", text)
+    assert local.truncate("deepseek-chat", "a b c d", 2)["text"] == "a b"
+    assert local.chat("qwen-2-7b", [{"role": "user", "content": "hi"}])["token_count"] > 0
+    with pytest.raises(TokenCounterError) as excinfo:
+        local.count("missing-model", "Hello")
+    assert excinfo.value.status == 404
+
+
+def test_async_client_batches_concurrent_calls(server_factory):
+    url, service = server_factory()
+    batch_sizes = []
+    original = service.calculate_many
+
+    def counting_calculate_many(*args, **kwargs):
+        batch_sizes.append(len(kwargs["texts"]))
+        return original(*args, **kwargs)
+
+    service.calculate_many = counting_calculate_many
+
+    async def run():
+        async with AsyncTokenCounterClient(url) as client:
+            texts = [" ".join(["word"] * (index + 1)) for index in range(10)]
+            counts = await asyncio.gather(*(client.count("deepseek-chat", text) for text in texts))
+            models = await client.models()
+            with pytest.raises(TokenCounterError):
+                await client.count("missing-model", "Hello")
+            return counts, models
+
+    counts, models = asyncio.run(run())
+    assert counts == list(range(1, 11))
+    assert models
+    assert batch_sizes == [10]  # every call was queued before the first send
+
+
+def test_async_in_process_client():
+    async def run():
+        client = AsyncTokenCounterClient.in_process()
+        return await asyncio.gather(
+            client.count("deepseek-chat", "a b"), client.count("deepseek-chat", "c d e")
+        )
+
+    assert asyncio.run(run()) == [2, 3]
+
+
+def test_async_client_holds_drain_tasks_until_close():
+    async def run():
+        client = AsyncTokenCounterClient.in_process()
+        calls = [asyncio.ensure_future(client.count("deepseek-chat", "a b")) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert len(client._drains) == 1
+        gc.collect()  # the loop itself only holds the drain task weakly
+        await client.close()
+        assert not client._drains
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(run()) == [2, 2, 2]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from app.config import load_registry
+from app.services.coalescer import BatchCoalescer
+from app.services.token_service import TokenService
+from app.tokenizers.base import TokenizerAdapter
+
+
+class RecordingTokenizer(TokenizerAdapter):
+    def __init__(self, fail=False):
+        super().__init__(name="recording")
+        self.batches = []
+        self.fail = fail
+
+    def tokenize(self, text):
+        return text.split()
+
+    def tokenize_batch(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("backend exploded")
+        return [self.tokenize(text) for text in texts]
+
+
+def _run_concurrently(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = target(index)
+        except Exception as exc:  # noqa: BLE001 - collected for assertions
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_are_batched_and_results_routed_back():
+    tokenizer = RecordingTokenizer()
+    coalescer = BatchCoalescer(window_ms=50, max_batch=64)
+    results, errors = _run_concurrently(
+        16, lambda index: coalescer.tokenize("k", tokenizer, f"text number {index}")
+    )
+    assert not errors
+    assert results == [["text", "number", str(index)] for index in range(16)]
+    assert len(tokenizer.batches) < 16
+    metrics = coalescer.metrics.to_dict()
+    assert metrics["items"] == 16
+    assert metrics["batches"] == len(tokenizer.batches)
+    assert metrics["max_queue_delay_ms"] >= 0
+
+
+def test_full_batch_flushes_before_window():
+    tokenizer = RecordingTokenizer()
+    coalescer = BatchCoalescer(window_ms=5000, max_batch=4)
+    started = time.perf_counter()
+    _, errors = _run_concurrently(4, lambda index: coalescer.tokenize("k", tokenizer, "a b"))
+    assert not errors
+    assert time.perf_counter() - started < 2
+    assert [len(batch) for batch in tokenizer.batches] == [4]
+
+
+def test_errors_reach_every_caller():
+    tokenizer = RecordingTokenizer(fail=True)
+    coalescer = BatchCoalescer(window_ms=20)
+    _, errors = _run_concurrently(3, lambda index: coalescer.tokenize("k", tokenizer, "x"))
+    assert len(errors) == 3
+    assert all("backend exploded" in str(error) for error in errors)
+
+
+def test_large_texts_bypass_batching():
+    tokenizer = RecordingTokenizer()
+    coalescer = BatchCoalescer(window_ms=1, max_text_chars=8)
+    assert coalescer.tokenize("k", tokenizer, "much longer than eight") == ["much", "longer", "than", "eight"]
+    assert tokenizer.batches == []
+    assert coalescer.metrics.to_dict()["bypassed"] == 1
+
+
+def test_service_uses_coalescer_for_exact_counts():
+    service = TokenService(models=load_registry(), coalescer=BatchCoalescer(window_ms=0))
+    result = service.calculate("openai-gpt2", "Hello coalesced world")
+    assert result["tokens"] == ["Hello", "coalesced", "world"]
+    assert service.metrics()["coalescer"]["items"] == 1
+
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        BatchCoalescer(max_batch=0)
@@ -0,0 +1,129 @@
+import io
+import json
+from collections import Counter
+from contextlib import redirect_stdout
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import app.__main__ as cli  # noqa: E402
+from app.catalog import load_catalog  # noqa: E402
+from app.services.corpus_stats import (  # noqa: E402
+    CorpusStats,
+    NGramSketch,
+    collect_stats,
+    iter_documents,
+)
+from app.tokenizers.registry import TokenizerRegistry, get_tokenizer_for_model  # noqa: E402
+
+CORPUS = [
+    "the cat sat on the mat",
+    "the cat ran",
+    "a dog sat on the cat",
+    "the end",
+]
+
+
+def _tokenizer():
+    return get_tokenizer_for_model(load_catalog().get("deepseek-chat"), TokenizerRegistry())
+
+
+def _run(*argv):
+    with io.StringIO() as buffer:
+        with redirect_stdout(buffer):
+            assert cli.main(list(argv)) == 0
+        return json.loads(buffer.getvalue())
+
+
+def test_collect_stats_counts_tokens_lengths_and_bigrams():
+    tokenizer = _tokenizer()
+    stats = collect_stats(tokenizer, iter(CORPUS), batch_size=3)
+    summary = stats.summary(tokenizer, top_k=3)
+
+    assert summary["documents"] == 4
+    assert summary["tokens"] == 17
+    assert summary["chars"] == sum(map(len, CORPUS))
+    assert summary["length"] == {"mean": 4.25, "p50": 3, "p90": 6, "p99": 6, "max": 6}
+    top = summary["top_tokens"][0]
+    assert (top["token"], top["count"], top["share"]) == ("the", 5, 0.294118)
+    assert summary["vocab"]["used"] == 9
+
+    bigrams = {tuple(item["tokens"]): item["count"] for item in summary["ngrams"]["top"]}
+    assert bigrams[("the", "cat")] == 3
+    assert all(item["max_overcount"] == 0 for item in summary["ngrams"]["top"])
+    # "ran a" would only appear by joining the second and third documents.
+    keys = {tuple(stats.ngram_ids(key)) for key in stats.ngrams.counts}
+    assert tuple(tokenizer.encode_ids_batch(["ran a"])[0]) not in keys
+
+
+def test_sketch_keeps_heavy_hitters_within_capacity():
+    rng = np.random.default_rng(7)
+    stream = np.concatenate([rng.integers(10, 10_000, 20_000), np.repeat([1, 2, 3], 500)])
+    rng.shuffle(stream)
+    sketch = NGramSketch(capacity=64)
+    for batch in np.array_split(stream, 40):
+        keys, counts = np.unique(batch, return_counts=True)
+        sketch.add(keys, counts)
+    exact = Counter(stream.tolist())
+
+    assert len(sketch.counts) <= 64
+    assert {key for key, _, _ in sketch.top(3)} == {1, 2, 3}
+    for key, count, error in sketch.top(3):
+        assert count - error <= exact[key] <= count
+
+
+def test_partial_statistics_merge_to_the_whole():
+    tokenizer = _tokenizer()
+    whole = collect_stats(tokenizer, iter(CORPUS))
+    left = collect_stats(tokenizer, iter(CORPUS[:2]))
+    right = collect_stats(tokenizer, iter(CORPUS[2:]))
+    merged = left.merge(right)
+
+    assert np.array_equal(merged.token_counts, whole.token_counts)
+    assert np.array_equal(merged.length_counts, whole.length_counts)
+    assert merged.ngrams.counts == whole.ngrams.counts
+    with pytest.raises(ValueError):
+        merged.merge(CorpusStats(merged.vocab_size, ngram=3))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    tokenizer = _tokenizer()
+    stats = collect_stats(tokenizer, iter(CORPUS))
+    stats.save(tmp_path / "stats.npz")
+    loaded = CorpusStats.load(tmp_path / "stats.npz")
+
+    assert loaded.summary(tokenizer) == stats.summary(tokenizer)
+    assert loaded.fingerprint == stats.fingerprint
+
+
+def test_iter_documents_shards_lines_and_jsonl(tmp_path):
+    plain = tmp_path / "corpus.txt"
+    plain.write_text("one\n\ntwo\nthree\nfour\n", encoding="utf-8")
+    rows = tmp_path / "corpus.jsonl"
+    rows.write_text('{"text": "a b"}\n{"text": ""}\n{"text": "c"}\n', encoding="utf-8")
+
+    assert list(iter_documents([str(plain)], shard=(1, 2))) == ["two", "four"]
+    assert list(iter_documents([str(rows)], field="text")) == ["a b", "c"]
+    assert list(iter_documents([str(plain), str(rows)], whole_files=True, shard=(0, 2))) == [
+        plain.read_text(encoding="utf-8")
+    ]
+
+
+def test_cli_stats_parallel_matches_single_process(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("\n".join(CORPUS * 5) + "\n", encoding="utf-8")
+    args = ("stats", "--model", "deepseek-chat", str(corpus), "--top-k", "5")
+
+    single = _run(*args, "--save", str(tmp_path / "single.npz"))
+    parallel = _run(*args, "--workers", "2")
+    assert parallel["documents"] == single["documents"] == 20
+    assert parallel["length"] == single["length"]
+    assert [item["count"] for item in parallel["top_tokens"]] == [
+        item["count"] for item in single["top_tokens"]
+    ]
+
+    merged = _run(
+        "stats", "--model", "deepseek-chat", "--merge", *[str(tmp_path / "single.npz")] * 2
+    )
+    assert merged["tokens"] == 2 * single["tokens"]
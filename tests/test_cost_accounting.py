@@ -0,0 +1,165 @@
+import io
+import json
+from contextlib import redirect_stdout
+
+import app.__main__ as cli
+from app.config import load_registry
+from app.services.cost_accounting import (
+    CostAggregator,
+    CostFields,
+    CostPipeline,
+    iter_log_records,
+    record_day,
+)
+from app.services.token_service import CPUBudgetExceeded, TokenService
+from app.tokenizers.huggingface_tokenizer import MissingDependencyError, TokenizerDownloadError
+
+
+def _service():
+    return TokenService(models=load_registry())
+
+
+def test_pipeline_aggregates_input_and_output_cost():
+    records = [
+        {
+            "model": "openai-gpt2",
+            "prompt": "one two three",
+            "completion": "four",
+            "timestamp": "2024-05-01T10:00:00Z",
+        },
+        {"model": "openai-gpt2", "prompt": "five", "completion": "six seven", "timestamp": 1714608000},
+        {"model": "qwen-2-7b", "prompt": "unpriced", "completion": "", "timestamp": "2024-05-02"},
+        {"model": "missing", "prompt": "x", "completion": "y"},
+    ]
+    annotated = []
+    summary = CostPipeline(_service(), batch_size=2).run(records, annotate=annotated.append)
+
+    assert summary["records"] == 4
+    assert summary["errors"] == 1
+    gpt2 = summary["by_model"]["openai-gpt2"]
+    assert gpt2["prompt_tokens"] == 4
+    assert gpt2["completion_tokens"] == 3
+    assert gpt2["input_cost"] == round(4 / 1000 * 0.0004, 6)
+    assert gpt2["output_cost"] == round(3 / 1000 * 0.0016, 6)
+    assert summary["by_model"]["qwen-2-7b"]["unpriced_records"] == 1
+    assert set(summary["by_day"]) == {"2024-05-01", "2024-05-02"}
+    assert [record.get("prompt_tokens") for record in annotated] == [3, 1, 1, None]
+    assert "error" in annotated[-1]
+
+
+def test_pipeline_groups_by_custom_key():
+    records = [
+        {"model": "openai-gpt2", "prompt": "a b", "completion": "c", "tenant": "acme"},
+        {"model": "openai-gpt2", "prompt": "a", "completion": "c", "tenant": "globex"},
+        {"model": "openai-gpt2", "prompt": "a", "completion": "", "tenant": "acme"},
+    ]
+    summary = CostPipeline(_service(), fields=CostFields(key="tenant")).run(records)
+    assert summary["by_key"]["acme"]["records"] == 2
+    assert summary["by_key"]["acme"]["prompt_tokens"] == 3
+    assert summary["by_key"]["globex"]["records"] == 1
+
+
+def test_pipeline_process_pool_matches_in_process():
+    records = [
+        {"model": "openai-gpt2", "prompt": f"prompt {i} " * (i % 5), "completion": "done"}
+        for i in range(50)
+    ]
+    serial = CostPipeline(_service(), batch_size=7).run(records)
+    parallel = CostPipeline(_service(), batch_size=7, workers=2).run(records)
+    assert parallel["totals"] == serial["totals"]
+
+
+def test_pipeline_counts_failed_records_as_errors_and_batches_per_model():
+    service = _service()
+    count_many = service.count_tokens_many
+    calls = []
+
+    def spy(model_id, texts):
+        calls.append((model_id, len(texts)))
+        if model_id == "qwen-2-7b":
+            raise TokenizerDownloadError("download failed")
+        if model_id == "deepseek-chat":
+            raise MissingDependencyError("tokenizers is not installed")
+        if any("huge" in text for text in texts):
+            raise CPUBudgetExceeded("Request exceeded its CPU budget of 1 ms.")
+        return count_many(model_id, texts)
+
+    service.count_tokens_many = spy
+    log = io.StringIO(
+        "\n".join(
+            [
+                json.dumps({"model": "openai-gpt2", "prompt": "a b", "completion": "c"}),
+                "{not json",
+                json.dumps({"model": "qwen-2-7b", "prompt": "x", "completion": "y"}),
+                json.dumps({"model": "deepseek-chat", "prompt": "x", "completion": "y"}),
+                json.dumps({"model": "openai-gpt2", "prompt": "huge", "completion": ""}),
+                "[1, 2]",
+                json.dumps({"model": "openai-gpt2", "prompt": "d", "completion": "e f"}),
+            ]
+        )
+    )
+    annotated = []
+    summary = CostPipeline(service, batch_size=7).run(
+        iter_log_records(log, "jsonl"), annotate=annotated.append
+    )
+
+    assert summary["records"] == 7 and summary["errors"] == 5
+    assert summary["by_model"]["openai-gpt2"]["prompt_tokens"] == 3
+    assert summary["by_model"]["openai-gpt2"]["completion_tokens"] == 3
+    assert [record.get("line") for record in annotated] == [None, 2, None, None, None, 6, None]
+    assert annotated[2]["error"] == "download failed"
+    assert annotated[3]["error"] == "tokenizers is not installed"
+    assert "CPU budget" in annotated[4]["error"]
+    # One call per model for the batch, then one per record after the budget ran out.
+    assert calls == [("openai-gpt2", 6)] + [("openai-gpt2", 2)] * 3 + [
+        ("qwen-2-7b", 2),
+        ("deepseek-chat", 2),
+    ]
+
+
+def test_pipeline_flags_records_counted_piecewise():
+    service = TokenService(models=load_registry(), max_run=100)
+    records = [
+        {"model": "openai-gpt2", "prompt": "a b", "completion": "c"},
+        {"model": "openai-gpt2", "prompt": "x" * 1000, "completion": "done"},
+    ]
+    annotated = []
+    summary = CostPipeline(service).run(records, annotate=annotated.append)
+    assert [record["exact"] for record in annotated] == [True, False]
+    assert summary["totals"]["inexact_records"] == 1
+    assert summary["by_model"]["openai-gpt2"]["inexact_records"] == 1
+
+
+def test_aggregator_bounds_distinct_groups():
+    aggregator = CostAggregator(max_groups=2)
+    for index in range(5):
+        aggregator.add(("m", "d", str(index)), 1, 1, None, None)
+    summary = aggregator.summary()
+    assert len(summary["groups"]) == 3
+    assert summary["totals"]["records"] == 5
+
+
+def test_csv_records_and_timestamps():
+    stream = io.StringIO("model,prompt,completion\nopenai-gpt2,hi there,ok\n")
+    assert list(iter_log_records(stream, "csv")) == [
+        {"model": "openai-gpt2", "prompt": "hi there", "completion": "ok"}
+    ]
+    assert record_day("2024-01-02T23:30:00-02:00") == "2024-01-03"
+    assert record_day("not a date") == "unknown"
+
+
+def test_cli_cost_writes_summary_and_annotations(tmp_path):
+    log = tmp_path / "requests.jsonl"
+    log.write_text(
+        json.dumps({"model": "openai-gpt2", "prompt": "a b c", "completion": "d"}) + "\n",
+        encoding="utf-8",
+    )
+    annotated = tmp_path / "annotated.jsonl"
+    with io.StringIO() as buffer:
+        with redirect_stdout(buffer):
+            exit_code = cli.main(["cost", str(log), "--annotate", str(annotated)])
+        summary = json.loads(buffer.getvalue())
+    assert exit_code == 0
+    assert summary["totals"]["prompt_tokens"] == 3
+    record = json.loads(annotated.read_text(encoding="utf-8"))
+    assert record["completion_tokens"] == 1
@@ -0,0 +1,149 @@
+import io
+import json
+import multiprocessing
+import sqlite3
+from contextlib import redirect_stdout
+
+import pytest
+
+import app.__main__ as cli
+from app.catalog import load_catalog
+from app.services.count_index import CountIndex, document_digest
+from app.services.token_service import TokenService
+from app.tokenizers import huggingface_tokenizer as hf_module
+from app.tokenizers.registry import TokenizerRegistry
+
+
+def _fill(path, worker, count):
+    index = CountIndex(path)
+    for start in range(0, count, 50):
+        index.put_many(
+            "tok",
+            [(document_digest(f"{worker}-{n}"), n) for n in range(start, start + 50)],
+        )
+    index.close()
+
+
+def test_put_get_and_hit_rate(tmp_path):
+    index = CountIndex(tmp_path / "counts.db")
+    digests = [document_digest(text) for text in ("a", "b", "c")]
+    index.put_many("tok", [(digests[0], 1), (digests[1], 2)])
+    assert index.get_many("tok", digests) == {digests[0]: 1, digests[1]: 2}
+    assert index.get("other-tokenizer", digests[0]) is None
+
+    stats = index.stats()
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+
+    # Lifetime counters survive reopening the index.
+    index.close()
+    reopened = CountIndex(tmp_path / "counts.db")
+    assert reopened.get("tok", digests[1]) == 2
+    stats = reopened.stats()
+    assert stats["hits"] == 1
+    assert (stats["lifetime_hits"], stats["lifetime_misses"]) == (3, 2)
+
+
+def test_concurrent_processes_share_the_index(tmp_path):
+    path = str(tmp_path / "counts.db")
+    CountIndex(path).close()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_fill, args=(path, worker, 200)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+    index = CountIndex(path)
+    assert index.stats()["entries"] == 800
+    assert index.get("tok", document_digest("3-199")) == 199
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    path = tmp_path / "counts.db"
+    index = CountIndex(path, max_bytes=10**9)
+    old = [(document_digest(f"old-{n}"), n) for n in range(2000)]
+    new = [(document_digest(f"new-{n}"), n) for n in range(2000)]
+    index.put_many("tok", old)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE counts SET last_used = last_used - 86400")
+    index.put_many("tok", new)
+
+    used = index.size_bytes()
+    evicted = index.evict(max_bytes=used * 3 // 4)
+    assert evicted > 0
+    assert index.size_bytes() <= used * 3 // 4
+    assert index.get("tok", new[-1][0]) == new[-1][1]
+    assert index.get("tok", old[0][0]) is None
+    assert index.stats()["evicted"] == evicted
+
+    result = index.compact()
+    assert result["file_bytes"] <= result["file_bytes_before"]
+
+
+def test_service_reuses_counts_without_loading_tokenizer(tmp_path, monkeypatch):
+    path = tmp_path / "counts.db"
+    text = "one two three four"
+    first = TokenService(models=load_catalog(), count_index=CountIndex(path))
+    assert first.count_tokens("deepseek-chat", text) == 4
+    batch = first.calculate_many("deepseek-chat", ["a b", "c"], include_tokens=False)
+    assert [result["token_count"] for result in batch] == [2, 1]
+
+    def no_backend(self, path):
+        raise AssertionError("tokenizer backend should not be loaded")
+
+    monkeypatch.setattr(hf_module.HuggingFaceTokenizer, "_create_backend", no_backend)
+    second = TokenService(
+        models=load_catalog(), registry=TokenizerRegistry(), count_index=CountIndex(path)
+    )
+    assert second.count_tokens("deepseek-chat", text) == 4
+    result = second.calculate("deepseek-chat", text, include_tokens=False)
+    assert result["token_count"] == 4 and result["tokens"] is None
+    counts = second.calculate_many("deepseek-chat", ["c", "a b"], include_tokens=False)
+    assert [result["token_count"] for result in counts] == [1, 2]
+    assert second.metrics()["count_index"]["hit_rate"] == 1.0
+
+
+def test_fingerprint_tracks_encode_options(tmp_path):
+    plain = hf_module.HuggingFaceTokenizer(
+        name="a", repo_id="org/repo", cache_dir=tmp_path, add_special_tokens=False
+    )
+    special = hf_module.HuggingFaceTokenizer(
+        name="b", repo_id="org/repo", cache_dir=tmp_path, add_special_tokens=True
+    )
+    assert plain.fingerprint().startswith("sha256:")
+    assert plain.fingerprint() != special.fingerprint()
+
+
+def test_cli_count_and_index_stats(tmp_path):
+    path = str(tmp_path / "counts.db")
+
+    def run(*argv):
+        with io.StringIO() as buffer:
+            with redirect_stdout(buffer):
+                assert cli.main(list(argv)) == 0
+            return json.loads(buffer.getvalue())
+
+    for _ in range(2):
+        payload = run("count", "--model", "deepseek-chat", "--text", "a b c", "--index", path)
+        assert payload["token_count"] == 3
+        assert payload["tokens"] is None
+    stats = run("index", "stats", path)
+    assert stats["entries"] == 1
+    assert (stats["lifetime_hits"], stats["lifetime_misses"]) == (1, 1)
+    assert run("index", "compact", path)["evicted"] == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cost_pipeline_uses_index(tmp_path, workers):
+    from app.services.cost_accounting import CostPipeline
+
+    path = str(tmp_path / "counts.db")
+    records = [{"model": "deepseek-chat", "prompt": "a b", "completion": "c"}] * 4
+    service = TokenService(models=load_catalog(), count_index=CountIndex(path))
+    summary = CostPipeline(
+        service, count_index_path=path, workers=workers, batch_size=2
+    ).run(records)
+    assert summary["totals"]["prompt_tokens"] == 8
+    assert CountIndex(path).stats()["entries"] == 2
@@ -0,0 +1,129 @@
+import io
+import json
+import random
+import shutil
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import pytest
+
+import app.__main__ as cli
+from app.catalog import load_catalog
+from app.config import load_registry
+from app.models import EstimatorSpec
+from app.services.estimation import (
+    FEATURES,
+    calibrate,
+    char_features,
+    estimate_tokens,
+    fit_estimator,
+)
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry, get_tokenizer_for_model
+
+REGISTRY = Path(__file__).resolve().parents[1] / "app" / "resources" / "model_registry.json"
+
+
+def _corpus(seed, words=3000):
+    rng = random.Random(seed)
+    vocab = ["alpha", "beta", "gamma", "it's", "42", "3.14", "你好", "end.", "(x)", "\n"]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def test_char_features_counts_classes():
+    features = char_features("Hi 42, 你好!")
+    assert features["words"] == 1
+    assert features["ascii_letters"] == 2
+    assert features["digits"] == 2
+    assert features["punct"] == 2
+    assert features["cjk"] == 2
+    assert features["other"] == 0
+
+
+def test_fit_recovers_known_coefficients():
+    rng = random.Random(0)
+    truth = {"words": 1.3, "digits": 0.5, "punct": 0.8}
+    samples, counts = [], []
+    for _ in range(60):
+        sample = {name: float(rng.randint(0, 500)) for name in FEATURES}
+        samples.append(sample)
+        counts.append(round(3 + sum(weight * sample[name] for name, weight in truth.items())))
+    spec = fit_estimator(samples, counts)
+    for name, weight in truth.items():
+        assert spec.coefficients[name] == pytest.approx(weight, abs=0.01)
+    assert spec.relative_error < 0.01
+    assert spec.samples == 60
+
+
+def test_calibrated_interval_contains_true_count():
+    service = TokenService(models=load_registry(), registry=TokenizerRegistry())
+    tokenizer = get_tokenizer_for_model(service.get_model("deepseek-chat"), TokenizerRegistry())
+    estimator = calibrate(tokenizer, [_corpus(1), _corpus(2)], sample_chars=512)
+
+    text = _corpus(3)
+    estimate = estimate_tokens(text, estimator)
+    actual = tokenizer.count_content_tokens(text)
+    assert estimate.calibrated
+    assert estimate.low <= actual <= estimate.high
+
+
+def test_large_inputs_are_sampled():
+    text = _corpus(4, words=120_000)
+    estimator = EstimatorSpec(
+        coefficients={"words": 1.0, "cjk": 0.5, "punct": 1.0}, relative_error=0.0
+    )
+    full = estimate_tokens(text, estimator, sample_threshold=len(text) + 1)
+    sampled = estimate_tokens(text, estimator, sample_threshold=10_000)
+    assert sampled.sampled and not full.sampled
+    assert sampled.tokens == pytest.approx(full.tokens, rel=0.05)
+    assert sampled.low <= full.tokens <= sampled.high
+
+
+def test_estimate_mode_does_not_load_tokenizer():
+    registry = TokenizerRegistry()
+    service = TokenService(models=load_catalog(), registry=registry)
+    result = service.calculate("deepseek-chat", "Hello world " * 100, mode="estimate")
+    assert result["mode"] == "estimate"
+    assert result["tokens"] is None
+    assert result["estimate"]["low"] <= result["token_count"] <= result["estimate"]["high"]
+    assert registry.cached_keys() == []
+
+
+def test_auto_mode_switches_on_length():
+    service = TokenService(
+        models=load_catalog(), registry=TokenizerRegistry(), auto_exact_threshold=100
+    )
+    short = service.calculate("deepseek-chat", "Hello world", mode="auto")
+    assert short["mode"] == "exact"
+    assert short["token_count"] == 2
+    long = service.calculate("deepseek-chat", "Hello world " * 50, mode="auto")
+    assert long["mode"] == "estimate"
+    assert "estimate" in long
+
+
+def test_cli_calibrate_writes_registry(tmp_path):
+    registry = tmp_path / "registry.json"
+    shutil.copyfile(REGISTRY, registry)
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text(_corpus(5), encoding="utf-8")
+
+    with io.StringIO() as buffer:
+        with redirect_stdout(buffer):
+            exit_code = cli.main([
+                "--registry",
+                str(registry),
+                "calibrate",
+                "--model",
+                "deepseek-chat",
+                "--corpus",
+                str(corpus),
+                "--write",
+            ])
+        payload = json.loads(buffer.getvalue())
+    assert exit_code == 0
+    assert payload["written"] == str(registry)
+
+    model = {spec.model_id: spec for spec in load_registry(registry)}["deepseek-chat"]
+    assert model.estimator is not None
+    assert model.estimator.to_dict() == payload["estimator"]
+    assert registry.read_text(encoding="utf-8").startswith("[\n  {")
@@ -136,4 +136,80 @@ def test_download_error_forbidden_mentions_token(monkeypatch, tmp_path):
         tokenizer.tokenize("test")
 
     message = str(exc_info.value)
-    assert "Hugging Face access token" in message
\ No newline at end of file
+    assert "Hugging Face access token" in message
+
+def _parallel_tokenizer(tmp_path, **options):
+    tokenizer_path = tmp_path / "tokenizer.json"
+    tokenizer_path.write_text("{}", encoding="utf-8")
+    return HuggingFaceTokenizer(
+        name="stub-hf", repo_id="example/model", local_tokenizer_path=tokenizer_path, **options
+    )
+
+
+@pytest.mark.parametrize("special", [False, True])
+def test_parallel_encode_matches_single_pass(tmp_path, special):
+    text = " ".join(f"word{index}\n" if index % 7 else "  x" for index in range(5000))
+    single = _parallel_tokenizer(tmp_path, add_special_tokens=special, parallel_workers=1)
+    parallel = _parallel_tokenizer(
+        tmp_path, add_special_tokens=special, parallel_threshold=1000, parallel_workers=4
+    )
+
+    segments = parallel.parallel_segments(text)
+    assert len(segments) == 4
+    assert segments[0][0] == 0 and segments[-1][1] == len(text)
+    assert all(left[1] == right[0] for left, right in zip(segments, segments[1:]))
+
+    assert parallel.encode(text) == single.encode(text)
+    assert parallel.tokenize(text) == single.tokenize(text)
+    assert parallel.count_tokens(text) == single.count_tokens(text)
+    assert parallel.count_content_tokens(text) == single.count_content_tokens(text)
+
+
+def test_parallel_encode_skips_short_or_unsplittable_text(tmp_path):
+    tokenizer = _parallel_tokenizer(tmp_path, parallel_threshold=1000, parallel_workers=4)
+    assert tokenizer.parallel_segments("short text") is None
+    assert tokenizer.parallel_segments("x" * 5000) is None
+    disabled = _parallel_tokenizer(tmp_path, parallel_threshold=0)
+    assert disabled.parallel_segments("a " * 5000) is None
+    with pytest.raises(ValueError):
+        _parallel_tokenizer(tmp_path, parallel_workers=0)
+
+
+class _PreTokenizer:
+    def __init__(self, state):
+        self._state = state
+
+    def __getstate__(self):
+        return self._state.encode("utf-8")
+
+
+def test_only_byte_level_pre_tokenizers_are_split(monkeypatch, tmp_path):
+    from app.config import load_registry
+    from app.services.token_service import TokenService
+
+    pre_tokenizers = {
+        '{"type": "ByteLevel", "add_prefix_space": false}': True,
+        '{"type": "Sequence", "pretokenizers": [{"type": "Split"}, {"type": "ByteLevel"}]}': True,
+        '{"type": "Metaspace", "replacement": "\\u2581"}': False,
+        '{"type": "Sequence", "pretokenizers": [{"type": "Metaspace"}]}': False,
+    }
+    create_backend = HuggingFaceTokenizer._create_backend
+    text = " ".join(f"word{index}" for index in range(5000))
+    for state, splittable in pre_tokenizers.items():
+
+        def with_pre_tokenizer(self, path, state=state):
+            backend = create_backend(self, path)
+            backend.pre_tokenizer = _PreTokenizer(state)
+            return backend
+
+        monkeypatch.setattr(HuggingFaceTokenizer, "_create_backend", with_pre_tokenizer)
+        tokenizer = _parallel_tokenizer(tmp_path, parallel_threshold=1000, parallel_workers=4)
+        assert tokenizer.splits_at_safe_boundaries() is splittable
+        assert (tokenizer.parallel_segments(text) is not None) is splittable
+
+        service = TokenService(models=load_registry())
+        chunked = service.calculate("deepseek-chat", text, mode="chunked")
+        assert chunked["token_count"] == 5000
+        assert (chunked["chunks"] > 1) is splittable
+        chunks = list(service.chunk("deepseek-chat", text, max_tokens=4000))
+        assert [chunk["token_count"] for chunk in chunks] == [4000, 1000]
@@ -0,0 +1,83 @@
+import json
+import threading
+import tracemalloc
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+from app.catalog import load_catalog
+from app.server import _build_handler
+from app.services.memory import leak_check
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+MODEL = "deepseek-chat"
+
+
+def _service(cls=TokenService):
+    return cls(models=load_catalog(), registry=TokenizerRegistry())
+
+
+def test_debug_memory_endpoint():
+    service = _service()
+    service.calculate_chat(MODEL, [{"role": "user", "content": "hello there"}])
+    handler = _build_handler(service, admin_token="secret")
+    handler.protocol_version = "HTTP/1.1"
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    conn = HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+    auth = {"Authorization": "Bearer secret"}
+    tracemalloc.start()
+    try:
+        conn.request("GET", "/debug/memory?top=3")
+        response = conn.getresponse()
+        assert (response.status, response.read()) == (401, b'{"error": "invalid admin token"}')
+        conn.request("GET", "/debug/memory?top=3", headers=auth)
+        report = json.loads(conn.getresponse().read())
+        conn.request("GET", "/debug/memory?top=many", headers=auth)
+        assert conn.getresponse().status == 400
+    finally:
+        tracemalloc.stop()
+        conn.close()
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+    assert report["process"]["tracemalloc"] and report["process"]["traced_bytes"] > 0
+    assert [MODEL] == [key for entry in report["tokenizers"] for key in entry["keys"]]
+    assert report["caches"]["chat_cache"]["size"] >= 1
+    assert report["caches_bytes"] >= report["caches"]["chat_cache"]["bytes"] > 0
+    assert 0 < len(report["top_allocations"]) <= 3
+    assert {"location", "bytes", "blocks"} <= set(report["top_allocations"][0])
+
+
+def test_debug_memory_is_hidden_without_admin_token():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _build_handler(_service()))
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        conn = HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+        conn.request("GET", "/debug/memory", headers={"Authorization": "Bearer anything"})
+        assert conn.getresponse().status == 404
+        conn.close()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def test_leak_check_flags_growth_only_when_unbounded():
+    result = leak_check(_service(), MODEL, iterations=200, rounds=4, min_growth=256 * 1024)
+    assert result["calls"] == 1000 and len(result["rounds"]) == 4
+    assert not result["leak_suspected"]
+
+    class LeakyService(TokenService):
+        retained = []
+
+        def calculate(self, *args, **kwargs):
+            self.retained.append(bytearray(2048))
+            return super().calculate(*args, **kwargs)
+
+    result = leak_check(_service(LeakyService), MODEL, iterations=200, rounds=4)
+    LeakyService.retained.clear()
+    assert result["leak_suspected"] and result["traced_bytes_per_call"] >= 2048
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.mirror import _build_mirror_handler, parse_range, parse_resolve_path
+from app.tokenizers.huggingface_tokenizer import HuggingFaceTokenizer, repo_cache_path
+
+CONTENT = json.dumps({"model": {"type": "BPE", "merges": ["a b"] * 500}}).encode("utf-8")
+URL = "/example/model/resolve/main/tokenizer.json"
+
+
+@pytest.fixture
+def mirror():
+    started = []
+
+    def start(root, **options):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), _build_mirror_handler([root], **options))
+        thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        started.append((httpd, thread))
+        return httpd.server_address[1]
+
+    yield start
+    for httpd, thread in started:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def _seed(root):
+    path = repo_cache_path(root, "example/model", "main", "tokenizer.json")
+    path.parent.mkdir(parents=True)
+    path.write_bytes(CONTENT)
+    return path
+
+
+def _get(port, path, headers=None, method="GET"):
+    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_parse_resolve_path_and_range():
+    assert parse_resolve_path(URL) == ("example/model", "main", "tokenizer.json")
+    assert parse_resolve_path("/gpt2/resolve/v1/sub/vocab.txt?download=1") == (
+        "gpt2",
+        "v1",
+        "sub/vocab.txt",
+    )
+    assert parse_resolve_path("/a/b/c/resolve/main/x") is None
+    assert parse_resolve_path("/a/b/resolve/main/../../etc/passwd") is None
+    assert parse_resolve_path("/a/b/resolve/%2e%2e/x") is None
+    assert parse_resolve_path("/models") is None
+
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=100-", 100) is False
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range(None, 100) is None
+
+
+def test_mirror_serves_files_with_etag_and_ranges(tmp_path, mirror):
+    _seed(tmp_path)
+    port = mirror(tmp_path)
+    etag = f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+    status, headers, body = _get(port, URL)
+    assert (status, body, headers["ETag"]) == (200, CONTENT, etag)
+    assert headers["Accept-Ranges"] == "bytes"
+
+    status, headers, body = _get(port, URL, {"If-None-Match": etag})
+    assert (status, body) == (304, b"")
+
+    status, headers, body = _get(port, URL, {"Range": "bytes=10-19"})
+    assert (status, body) == (206, CONTENT[10:20])
+    assert headers["Content-Range"] == f"bytes 10-19/{len(CONTENT)}"
+
+    # A stale If-Range validator returns the whole file instead of a fragment.
+    status, _, body = _get(port, URL, {"Range": "bytes=10-19", "If-Range": '"old"'})
+    assert (status, body) == (200, CONTENT)
+
+    status, headers, _ = _get(port, URL, {"Range": f"bytes={len(CONTENT)}-"})
+    assert status == 416
+    assert headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+    status, headers, body = _get(port, URL, method="HEAD")
+    assert (status, body, int(headers["Content-Length"])) == (200, b"", len(CONTENT))
+    assert _get(port, "/example/missing/resolve/main/tokenizer.json")[0] == 404
+
+
+@pytest.mark.no_stub_hf
+def test_tokenizer_downloads_through_chained_mirrors(tmp_path, mirror, monkeypatch):
+    origin = tmp_path / "origin"
+    _seed(origin)
+    hub_port = mirror(origin)
+    peer_cache = tmp_path / "peer"
+    peer_cache.mkdir()
+    peer_port = mirror(peer_cache, upstream=f"http://127.0.0.1:{hub_port}")
+
+    node_cache = tmp_path / "node"
+    tokenizer = HuggingFaceTokenizer(
+        name="mirrored",
+        repo_id="example/model",
+        cache_dir=node_cache,
+        bundle_dir=tmp_path / "no-bundle",
+        endpoint=f"http://127.0.0.1:{peer_port}/",
+    )
+    path = tokenizer.resolve_tokenizer_file()
+    assert path.read_bytes() == CONTENT
+    # The peer kept a copy, so it no longer needs the hub.
+    assert repo_cache_path(peer_cache, "example/model", "main", "tokenizer.json").exists()
+
+    monkeypatch.setenv("HF_ENDPOINT", f"http://127.0.0.1:{peer_port}")
+    other = HuggingFaceTokenizer(
+        name="env", repo_id="example/model", cache_dir=tmp_path / "other", bundle_dir=tmp_path
+    )
+    assert other.resolve_tokenizer_file().read_bytes() == CONTENT
+    assert _get(peer_port, "/example/absent/resolve/main/tokenizer.json")[0] == 404
@@ -0,0 +1,148 @@
+import re
+
+import pytest
+
+from app.catalog import load_catalog
+from app.services.count_index import CountIndex
+from app.services.token_service import CPUBudgetExceeded, TokenService
+from app.tokenizers.registry import TokenizerRegistry
+from benchmarks.pathological import (
+    QuadraticTokenizer,
+    SyntheticRegistry,
+    pathological_corpus,
+    time_per_byte,
+)
+
+MODEL = "deepseek-chat"
+_RUN = re.compile(r"[^\W\d_]+|\d+|\s+|(?:[^\w\s]|_)+")
+
+
+class _SpyTokenizer(QuadraticTokenizer):
+    def __init__(self):
+        super().__init__()
+        self.longest = 0
+
+    def count_tokens(self, text):
+        runs = (len(run) for run in _RUN.findall(text))
+        self.longest = max([self.longest, *runs])
+        return super().count_tokens(text)
+
+
+class _SpyRegistry(SyntheticRegistry):
+    def __init__(self):
+        super().__init__()
+        self._tokenizer = _SpyTokenizer()
+
+
+def _service(registry=None, **options):
+    return TokenService(
+        models=load_catalog(), registry=registry or SyntheticRegistry(), **options
+    )
+
+
+def test_guard_cuts_cpu_time_on_pathological_inputs():
+    size = 256 * 1024
+    guarded = _service(max_run=1024)
+    unguarded = _service(max_run=size * 4 + 1)
+    for name, text in pathological_corpus(size).items():
+        result = time_per_byte(guarded, MODEL, text)
+        assert (result["guard"] is None) == (name in {"prose", "base64"}), name
+        if result["guard"] is None:
+            continue
+        baseline = time_per_byte(unguarded, MODEL, text)
+        # Compare CPU time, not wall time, so a busy machine does not skew the ratio;
+        # the unguarded cost grows with the input, the guarded one does not.
+        assert result["cpu_us_per_byte"] * 2 < baseline["cpu_us_per_byte"], name
+
+
+def test_guard_only_applies_to_long_runs():
+    service = _service(registry=TokenizerRegistry(), max_run=64)
+    prose = "the quick brown fox " * 100
+    plain = service.calculate(MODEL, prose)
+    assert "guard" not in plain
+    assert plain["token_count"] == len(plain["tokens"])
+
+    guarded = service.calculate(MODEL, prose + "x" * 1000)
+    assert guarded["tokens"] is None
+    assert guarded["guard"] == {
+        "long_runs": 1,
+        "forced_cuts": 15,
+        "exact": False,
+        "tokens_omitted": True,
+    }
+    count_only = service.calculate(MODEL, prose + "x" * 1000, include_tokens=False)
+    assert count_only["guard"] == {"long_runs": 1, "forced_cuts": 15, "exact": False}
+
+
+def test_every_counting_path_flags_guarded_counts(tmp_path):
+    text = "a" * 1000 + " b"
+    index = CountIndex(tmp_path / "counts.db")
+    service = _service(registry=TokenizerRegistry(), max_run=100, count_index=index)
+    expected = service.calculate(MODEL, text)
+    assert expected["guard"]["exact"] is False
+
+    batch = service.calculate_many(MODEL, [text, "plain words"])
+    assert batch[0]["token_count"] == expected["token_count"] and batch[0]["tokens"] is None
+    assert batch[0]["guard"] == expected["guard"]
+    assert "guard" not in batch[1] and batch[1]["tokens"] == ["plain", "words"]
+
+    for result in (
+        service.calculate(MODEL, text, mode="auto"),
+        service.calculate(MODEL, text, include_tokens=False),
+        *service.calculate_many(MODEL, [text], include_tokens=False),
+    ):
+        assert result["token_count"] == expected["token_count"]
+        assert result["guard"]["exact"] is False and "tokens_omitted" not in result["guard"]
+    assert service.count_tokens(MODEL, text) == expected["token_count"]
+    # Only exact counts are persisted.
+    assert index.stats()["entries"] == 0
+    service.count_tokens(MODEL, "plain words")
+    assert index.stats()["entries"] == 1
+
+
+def test_backend_never_sees_an_oversized_run():
+    registry = _SpyRegistry()
+    service = _service(registry=registry, max_run=512)
+    service.count_tokens(MODEL, "word " * 2000 + "a" * 100_000)
+    service.calculate(MODEL, "7" * 50_000, mode="chunked")
+    assert registry._tokenizer.longest == 512
+
+
+def test_cpu_budget_stops_count_only_requests():
+    service = _service(max_run=1 << 30, cpu_budget=0.001)
+    text = " ".join(["a" * 60_000] * 20)
+    with pytest.raises(CPUBudgetExceeded):
+        service.count_tokens(MODEL, text)
+    with pytest.raises(ValueError):
+        service.calculate(MODEL, text, include_tokens=False)
+    assert service.count_tokens(MODEL, "small request") == 5
+
+
+def test_truncate_chat_and_chunk_never_encode_a_long_run_whole():
+    service = _service(registry=TokenizerRegistry(), max_run=100)
+    tokenizer = service._tokenizer(service.get_model(MODEL))
+    encode = tokenizer.encode
+    longest = []
+    tokenizer.encode = lambda text: longest.extend(map(len, _RUN.findall(text))) or encode(text)
+    text = "word " + "a" * 1000 + " end"
+    for strategy, kept in (("head", "word " + "a" * 400), ("tail", "a" * 400 + " end")):
+        result = service.truncate(MODEL, text, 5, strategy)
+        assert (result["text"], result["kept_tokens"]) == (kept, 5)
+        assert result["token_count"] == 12
+        assert result["guard"] == {"long_runs": 1, "forced_cuts": 9, "exact": False}
+    middle = service.truncate(MODEL, text, 5, "middle")
+    assert middle["text"] == "word " + "a" * 200 + " " + "a" * 100 + " end"
+    assert middle["kept_tokens"] == 5
+    assert max(longest) <= 100
+    messages = [{"role": "user", "content": "hi " + "b" * 1000}]
+    for _ in range(2):
+        chat = service.calculate_chat(MODEL, messages)
+        assert chat["guard"] == {"long_runs": 1, "forced_cuts": 9, "exact": False}
+        assert chat["cached_messages"] == 0
+
+    text = "one two three " + "z" * 1000 + " four five"
+    chunks = list(service.chunk(MODEL, text, max_tokens=4))
+    assert "".join(chunk["text"] for chunk in chunks).replace(" ", "") == text.replace(" ", "")
+    guarded = [chunk for chunk in chunks if "guard" in chunk]
+    assert guarded and all(set(chunk["text"]) == {"z"} for chunk in guarded)
+    assert "guard" not in chunks[0] and "guard" not in chunks[-1]
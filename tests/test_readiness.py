@@ -0,0 +1,120 @@
+import json
+import threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.catalog import load_catalog
+from app.server import _build_handler
+from app.services.admission import AdmissionController, AdmissionLimits
+from app.services.readiness import Readiness
+from app.services.token_service import TokenService
+from app.tokenizers import huggingface_tokenizer as hf_module
+from app.tokenizers.registry import TokenizerRegistry
+
+MODEL = "deepseek-chat"
+
+
+def _service():
+    return TokenService(models=load_catalog(), registry=TokenizerRegistry())
+
+
+@pytest.fixture
+def serve():
+    started = []
+
+    def start(service, readiness):
+        handler = _build_handler(service, readiness=readiness)
+        handler.protocol_version = "HTTP/1.1"
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        started.append((httpd, thread))
+        return httpd.server_address[1]
+
+    yield start
+    for httpd, thread in started:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def _request(port, method, path, body=None):
+    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request(method, path, body=body)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_ready_only_after_warm_up(serve, monkeypatch):
+    release = threading.Event()
+    create = hf_module.HuggingFaceTokenizer._create_backend
+
+    def slow_create(self, path):
+        release.wait(5)
+        return create(self, path)
+
+    monkeypatch.setattr(hf_module.HuggingFaceTokenizer, "_create_backend", slow_create)
+    service = _service()
+    readiness = Readiness(service, warm=[MODEL])
+    port = serve(service, readiness)
+    readiness.start_warming()
+
+    assert _request(port, "GET", "/healthz") == (200, {"status": "ok"})
+    status, report = _request(port, "GET", "/readyz")
+    assert (status, report["reasons"], report["missing"]) == (503, ["warming"], [MODEL])
+
+    release.set()
+    assert readiness.wait(5)
+    status, report = _request(port, "GET", "/readyz")
+    assert (status, report["ready"], report["warm"]) == (200, True, {"required": 1, "loaded": 1})
+
+    other = next(model.model_id for model in service.catalog if model.model_id != MODEL)
+    body = json.dumps({"model": other, "text": "hello there", "include_tokens": False})
+    assert _request(port, "POST", "/tokenize", body)[0] == 200
+    status, document = _request(port, "GET", "/status")
+    models = {entry["model"]: entry for entry in document["models"]}
+    warmed = models[MODEL]
+    assert warmed["loaded"] and warmed["required"] and warmed["last_used"] is None
+    assert warmed["load_seconds"] > 0 and warmed["file_bytes"] > 0
+    assert models[other]["loaded"] and not models[other]["required"]
+    assert models[other]["last_used"] is not None
+    assert document["ready"] and document["uptime_seconds"] >= 0
+
+
+def test_failed_warm_up_is_reported(monkeypatch):
+    def broken(self, path):
+        raise hf_module.MissingDependencyError("tokenizers is not installed")
+
+    service = _service()
+    readiness = Readiness(service, warm=[MODEL])
+    with monkeypatch.context() as patch:
+        patch.setattr(hf_module.HuggingFaceTokenizer, "_create_backend", broken)
+        readiness.start_warming()
+        assert readiness.wait(5)
+    report = readiness.readiness()
+    assert not report["ready"] and "MissingDependencyError" in report["errors"][MODEL]
+    entry = next(entry for entry in readiness.status()["models"] if entry["model"] == MODEL)
+    assert not entry["loaded"] and "error" in entry
+
+
+def test_saturation_flips_readiness():
+    service = _service()
+    readiness = Readiness(service, max_inflight=2)
+    readiness.enter()
+    assert readiness.readiness()["ready"]
+    readiness.enter()
+    assert readiness.readiness()["reasons"] == ["saturated"]
+    readiness.leave()
+    assert readiness.readiness()["ready"]
+
+    admission = AdmissionController(AdmissionLimits(max_inflight_cost=1000))
+    readiness = Readiness(service, admission=admission)
+    ticket = admission.admit("client", 950)
+    assert readiness.readiness()["reasons"] == ["saturated"]
+    admission.release(ticket)
+    assert readiness.readiness()["ready"]
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import threading
+from http import HTTPStatus
+from http.client import HTTPConnection
+from http.server import HTTPServer
+from pathlib import Path
+
+import pytest
+
+from app.catalog import load_catalog
+from app.reload import RegistryReloader
+from app.server import _build_handler
+from app.services.token_service import ModelNotFoundError, TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+REGISTRY = Path(__file__).resolve().parents[1] / "app" / "resources" / "model_registry.json"
+
+
+def _write(path, entries):
+    path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+    stat = path.stat()
+    # Make sure the mtime moves even on filesystems with coarse timestamps.
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def registry_file(tmp_path):
+    target = tmp_path / "registry.json"
+    shutil.copy(REGISTRY, target)
+    return target
+
+
+def _entries(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_reload_keeps_unchanged_tokenizers_and_evicts_changed(registry_file):
+    registry = TokenizerRegistry()
+    service = TokenService(models=load_catalog(registry_file), registry=registry)
+    for model_id in ("openai-gpt2", "deepseek-chat", "qwen-2-7b"):
+        service.calculate(model_id, "warm up")
+    gpt2 = registry.get_tokenizer(service.get_model("openai-gpt2").tokenizer, "openai-gpt2")
+
+    entries = [entry for entry in _entries(registry_file) if entry["id"] != "deepseek-chat"]
+    for entry in entries:
+        if entry["id"] == "qwen-2-7b":
+            entry["tokenizer"]["options"]["revision"] = "v2"
+    entries.append({**entries[0], "id": "gpt2-copy"})
+    _write(registry_file, entries)
+
+    result = RegistryReloader(service, registry_file).reload()
+
+    assert result["added"] == ["gpt2-copy"]
+    assert result["removed"] == ["deepseek-chat"]
+    assert result["changed"] == ["qwen-2-7b"]
+    assert result["evicted_tokenizers"] == ["deepseek-chat", "qwen-2-7b"]
+    assert registry.cached_keys() == ["openai-gpt2"]
+    assert registry.get_tokenizer(service.get_model("openai-gpt2").tokenizer, "openai-gpt2") is gpt2
+    with pytest.raises(ModelNotFoundError):
+        service.get_model("deepseek-chat")
+
+
+def test_reload_if_changed_ignores_invalid_file(registry_file):
+    service = TokenService(models=load_catalog(registry_file))
+    reloader = RegistryReloader(service, registry_file)
+    assert reloader.reload_if_changed() is None
+
+    _write(registry_file, [{"display_name": "no id"}])
+    assert reloader.reload_if_changed() is None
+    assert reloader.last_error
+    assert service.get_model("openai-gpt2")
+
+
+def test_admin_reload_endpoint_requires_token(registry_file):
+    service = TokenService(models=load_catalog(registry_file))
+    reloader = RegistryReloader(service, registry_file)
+    handler = _build_handler(service, reloader=reloader, admin_token="s3cret")
+    httpd = HTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        _write(registry_file, _entries(registry_file)[:1])
+
+        def post(headers):
+            conn = HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+            try:
+                conn.request("POST", "/admin/reload", body=b"", headers=headers)
+                response = conn.getresponse()
+                return response.status, json.loads(response.read().decode("utf-8"))
+            finally:
+                conn.close()
+
+        status, _ = post({"Authorization": "Bearer wrong"})
+        assert status == HTTPStatus.UNAUTHORIZED
+        status, body = post({"Authorization": "Bearer s3cret"})
+        assert status == HTTPStatus.OK
+        assert body["models"] == 1
+        assert [model["id"] for model in service.list_models()] == ["openai-gpt2"]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
@@ -0,0 +1,98 @@
+import random
+import re
+
+import pytest
+
+from app.tokenizers.segmentation import (
+    content_defined_spans,
+    long_runs,
+    safe_boundaries,
+    split_long_runs,
+)
+
+# GPT-2 pre-tokenizer pattern expressed with the stdlib ``re`` character classes.
+_GPT2_PATTERN = re.compile(
+    r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+"""
+)
+
+
+def _pretokens(text):
+    return _GPT2_PATTERN.findall(text)
+
+
+def _corpus(seed, words=4000):
+    rng = random.Random(seed)
+    vocab = ["alpha", "beta", "it's", "42", "3.14", "你好", "end.", "(x)", "\n", "\n\n", "  ", "\t"]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def test_safe_boundaries_preserve_gpt2_pretokens():
+    text = _corpus(1)
+    cuts = list(safe_boundaries(text))
+    assert cuts
+    pieces = []
+    last = 0
+    for cut in cuts:
+        pieces.extend(_pretokens(text[last:cut]))
+        last = cut
+    pieces.extend(_pretokens(text[last:]))
+    assert pieces == _pretokens(text)
+
+
+def test_content_defined_spans_cover_text():
+    text = _corpus(2)
+    spans = content_defined_spans(text, min_size=64, max_size=512)
+    assert "".join(text[start:end] for start, end in spans) == text
+    assert all(end - start >= 64 for start, end in spans[:-1])
+    assert len(spans) > 1
+
+
+def test_content_defined_spans_resynchronise_after_edit():
+    text = _corpus(3)
+    middle = len(text) // 2
+    edited = text[:middle] + " inserted paragraph " + text[middle:]
+    original = {text[start:end] for start, end in content_defined_spans(text, min_size=64)}
+    changed = [
+        edited[start:end]
+        for start, end in content_defined_spans(edited, min_size=64)
+        if edited[start:end] not in original
+    ]
+    assert 1 <= len(changed) <= 3
+
+
+def test_content_defined_spans_validates_sizes():
+    with pytest.raises(ValueError):
+        content_defined_spans("text", min_size=10, max_size=5)
+
+
+def _reference_runs(text, max_run):
+    classes = (r"[^\W\d_]", r"\d", r"\s", r"[^\w\s]|_")
+    runs = []
+    for cls in classes:
+        for match in re.finditer(f"(?:{cls})+", text):
+            if match.end() - match.start() > max_run:
+                runs.append(match.span())
+    return sorted(runs)
+
+
+def test_long_runs_match_reference():
+    rng = random.Random(4)
+    for _ in range(300):
+        max_run = rng.randint(1, 24)
+        text = "".join(rng.choice("ab7 !_\U0001F600\n") * rng.randint(0, 60) for _ in range(20))
+        assert long_runs(text, max_run) == _reference_runs(text, max_run)
+
+
+def test_split_long_runs_bounds_pretokens():
+    text = _corpus(5, words=200) + "x" * 5000 + " " + "!" * 3000 + _corpus(6, words=200)
+    spans = content_defined_spans(text, min_size=64, max_size=512)
+    pieces = split_long_runs(text, spans, max_run=1000)
+    assert "".join(text[start:end] for start, end, _ in pieces) == text
+    runs = long_runs(text, 1000)
+    assert len(runs) == 2
+    expected = sum((end - start - 1) // 1000 for start, end in runs)
+    assert sum(forced for _, _, forced in pieces) == expected
+    longest = max(len(token) for start, end, _ in pieces for token in _pretokens(text[start:end]))
+    assert longest <= 1001
+    # Spans without long runs are left alone.
+    assert split_long_runs(text, spans[:1], max_run=1000) == [(*spans[0], False)]
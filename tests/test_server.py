@@ -1,4 +1,6 @@
+import gzip
 import json
+import socket
 import threading
 import time
 import unittest
@@ -92,11 +94,84 @@ class ServerIntegrationTests(unittest.TestCase):
         data = json.loads(body.decode("utf-8"))
         self.assertIn("requires authentication", data["error"])
 
+    def test_truncate_endpoint_returns_cut_text(self):
+        payload = json.dumps(
+            {"model": "openai-gpt2", "text": "one two three", "max_tokens": 2, "strategy": "tail"}
+        ).encode("utf-8")
+        status, _, body, _ = self._request(
+            "POST",
+            "/truncate",
+            body=payload,
+            headers={"Content-Type": "application/json"},
+        )
+        self.assertEqual(status, 200)
+        data = json.loads(body.decode("utf-8"))
+        self.assertEqual(data["text"], "two three")
+        self.assertEqual(data["dropped_tokens"], 1)
+
+    def test_truncate_endpoint_validates_budget(self):
+        payload = json.dumps({"model": "openai-gpt2", "text": "one"}).encode("utf-8")
+        status, _, _, _ = self._request("POST", "/truncate", body=payload)
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+
+    def test_chat_endpoint_counts_messages(self):
+        payload = json.dumps(
+            {"model": "qwen-2-7b", "messages": [{"role": "user", "content": "Hi there"}]}
+        ).encode("utf-8")
+        status, _, body, _ = self._request("POST", "/tokenize/chat", body=payload)
+        self.assertEqual(status, 200)
+        data = json.loads(body.decode("utf-8"))
+        self.assertEqual(len(data["messages"]), 1)
+        self.assertGreater(data["token_count"], data["messages"][0]["token_count"])
+
+    def test_models_endpoint_supports_etag_revalidation(self):
+        conn = HTTPConnection("127.0.0.1", type(self).port, timeout=5)
+        try:
+            conn.request("GET", "/models?family=qwen")
+            response = conn.getresponse()
+            body = json.loads(response.read().decode("utf-8"))
+            etag = response.getheader("ETag")
+            self.assertEqual([model["id"] for model in body["models"]], ["qwen-2-7b"])
+
+            conn.request("GET", "/models?family=qwen", headers={"If-None-Match": etag})
+            response = conn.getresponse()
+            self.assertEqual(response.status, HTTPStatus.NOT_MODIFIED)
+            self.assertEqual(response.read(), b"")
+        finally:
+            conn.close()
+
+    def test_models_endpoint_serves_gzip(self):
+        status, _, body, _ = self._request("GET", "/models", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        data = json.loads(gzip.decompress(body).decode("utf-8"))
+        self.assertEqual(len(data["models"]), len(type(self).service.list_models()))
+
+    def test_metrics_endpoint_reports_cache_stats(self):
+        status, _, body, _ = self._request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        data = json.loads(body.decode("utf-8"))
+        self.assertIn("chunk_cache", data)
+
     def test_options_request_returns_cors_headers(self):
         status, _, _, cors = self._request("OPTIONS", "/tokenize")
         self.assertEqual(status, 204)
         self.assertEqual(cors, "*")
 
+    def test_unknown_post_route_does_not_buffer_large_bodies(self):
+        for length in (b"52428800", b"-1", b"lots"):
+            with socket.create_connection(("127.0.0.1", type(self).port), timeout=5) as conn:
+                # The announced body never arrives: the answer must not wait for it.
+                conn.sendall(
+                    b"POST /no-such-route HTTP/1.1\r\nHost: x\r\nContent-Length: "
+                    + length
+                    + b"\r\n\r\n"
+                )
+                response = conn.makefile("rb").read()
+            self.assertIn(b" 404 ", response.partition(b"\r\n")[0])
+
+        status, _, body, _ = self._request("POST", "/no-such-route", b"small body")
+        self.assertEqual(status, 404)
+
 
 if __name__ == "__main__":
     unittest.main()
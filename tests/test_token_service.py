@@ -1,10 +1,27 @@
 import unittest
 
 from app.config import load_registry
-from app.services.token_service import TokenService
+from app.models import ModelSpec, TokenizerSpec
+from app.services.token_service import TokenService, _truncate_encoding
+from app.tokenizers.base import TokenizedText, TokenizerAdapter
 from app.tokenizers.registry import TokenizerRegistry
 
 
+class _CharTokenizer(TokenizerAdapter):
+    """One token per character, so a seam between head and tail costs a token."""
+
+    def tokenize(self, text):
+        return list(text)
+
+    def encode(self, text):
+        return TokenizedText(list(text), [(index, index + 1) for index in range(len(text))])
+
+
+class _CharRegistry(TokenizerRegistry):
+    def _create_tokenizer(self, spec):
+        return _CharTokenizer("chars")
+
+
 class TokenServiceTests(unittest.TestCase):
     def setUp(self):
         models = load_registry()
@@ -27,6 +44,143 @@ class TokenServiceTests(unittest.TestCase):
         self.assertEqual(result["tokens"], ["Hello", "world"])
         self.assertEqual(result["token_count"], 2)
 
+    def test_truncate_head_cuts_at_token_boundary(self):
+        result = self.service.truncate("openai-gpt2", "one two  three four", max_tokens=2)
+        self.assertEqual(result["text"], "one two")
+        self.assertEqual(result["kept_tokens"], 2)
+        self.assertEqual(result["dropped_tokens"], 2)
+        self.assertTrue(result["truncated"])
+
+    def test_truncate_tail_and_middle(self):
+        text = "a b c d e f"
+        tail = self.service.truncate("openai-gpt2", text, max_tokens=2, strategy="tail")
+        self.assertEqual(tail["text"], "e f")
+        middle = self.service.truncate("openai-gpt2", text, max_tokens=3, strategy="middle")
+        self.assertEqual(middle["text"], "a b f")
+        recount = self.service.count_tokens("openai-gpt2", middle["text"])
+        self.assertEqual(middle["kept_tokens"], recount)
+        self.assertLessEqual(recount, 3)
+
+    def test_truncate_middle_counts_the_seam(self):
+        service = TokenService(models=load_registry(), registry=_CharRegistry())
+        result = service.truncate("openai-gpt2", "abcdef", max_tokens=3, strategy="middle")
+        self.assertEqual(result["text"], "a f")
+        self.assertEqual(result["kept_tokens"], 3)
+
+    def test_truncate_within_budget_returns_original(self):
+        result = self.service.truncate("openai-gpt2", "short text", max_tokens=10)
+        self.assertEqual(result["text"], "short text")
+        self.assertFalse(result["truncated"])
+        self.assertEqual(result["dropped_tokens"], 0)
+
+    def test_truncate_rejects_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            self.service.truncate("openai-gpt2", "text", max_tokens=1, strategy="random")
+
+    def test_truncate_encoding_reserves_special_tokens(self):
+        encoding = TokenizedText(
+            tokens=["<bos>", "a", "b", "c", "<eos>"],
+            offsets=[(0, 0), (0, 1), (2, 3), (4, 5), (0, 0)],
+            special_tokens_mask=[1, 0, 0, 0, 1],
+        )
+        text, kept = _truncate_encoding("a b c", encoding, 3, "head")
+        self.assertEqual(text, "a")
+        self.assertEqual(kept, 3)
+
+    def test_truncate_encoding_never_splits_a_character(self):
+        # Byte-level tokenizers emit several tokens sharing one character span.
+        encoding = TokenizedText(
+            tokens=["x", "\xf0\x9f", "\x98\x80", "y"],
+            offsets=[(0, 1), (1, 2), (1, 2), (2, 3)],
+        )
+        text, kept = _truncate_encoding("x\U0001F600y", encoding, 2, "head")
+        self.assertEqual(text, "x")
+        self.assertEqual(kept, 1)
+
+    def test_calculate_chat_applies_model_template(self):
+        messages = [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "Hello there"},
+        ]
+        result = self.service.calculate_chat("qwen-2-7b", messages)
+        rendered = "".join(
+            f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages
+        ) + "<|im_start|>assistant\n"
+        expected = self.service.calculate("qwen-2-7b", rendered)["token_count"]
+        self.assertEqual(result["token_count"], expected)
+        self.assertEqual([m["token_count"] for m in result["messages"]], [3, 3])
+
+    def test_calculate_chat_reuses_shared_leading_messages(self):
+        system = {"role": "system", "content": "You are a helpful assistant."}
+        first = self.service.calculate_chat(
+            "qwen-2-7b", [system, {"role": "user", "content": "first question"}]
+        )
+        second = self.service.calculate_chat(
+            "qwen-2-7b", [system, {"role": "user", "content": "second question"}]
+        )
+        self.assertEqual(first["cached_messages"], 0)
+        self.assertEqual(second["cached_messages"], 1)
+        self.assertTrue(second["messages"][0]["cached"])
+        self.assertFalse(second["messages"][1]["cached"])
+
+    def test_calculate_chat_does_not_reuse_after_divergence(self):
+        tail = {"role": "user", "content": "same tail"}
+        self.service.calculate_chat("qwen-2-7b", [{"role": "system", "content": "A"}, tail])
+        result = self.service.calculate_chat("qwen-2-7b", [{"role": "system", "content": "B"}, tail])
+        self.assertEqual(result["cached_messages"], 0)
+
+    def test_calculate_chat_rejects_invalid_messages(self):
+        with self.assertRaises(ValueError):
+            self.service.calculate_chat("qwen-2-7b", [{"content": "missing role"}])
+
+    def test_chunked_mode_matches_exact_count(self):
+        text = "\n\n".join(f"Paragraph {i} with some words, numbers 12{i} and 你好." for i in range(400))
+        exact = self.service.calculate("openai-gpt2", text)
+        chunked = self.service.calculate("openai-gpt2", text, mode="chunked")
+        self.assertEqual(chunked["token_count"], exact["token_count"])
+        self.assertIsNone(chunked["tokens"])
+        self.assertGreater(chunked["chunks"], 1)
+
+    def test_chunked_mode_reuses_unchanged_chunks(self):
+        paragraphs = [f"Section {i}: boilerplate footer text repeated here." for i in range(400)]
+        original = "\n\n".join(paragraphs)
+        paragraphs[200] = "Section 200: this paragraph was rewritten entirely."
+        edited = "\n\n".join(paragraphs)
+        self.service.calculate("openai-gpt2", original, mode="chunked")
+        result = self.service.calculate("openai-gpt2", edited, mode="chunked")
+        self.assertEqual(result["token_count"], self.service.calculate("openai-gpt2", edited)["token_count"])
+        self.assertGreaterEqual(result["cached_chunks"], result["chunks"] - 2)
+
+    def test_chunked_mode_counts_special_tokens_once(self):
+        spec = TokenizerSpec(
+            type="huggingface",
+            options={"repo_id": "openai-community/gpt2", "add_special_tokens": True},
+        )
+        model = ModelSpec("special", "Special", "test", "test", 0, spec)
+        service = TokenService(models=[model])
+        text = " ".join(f"word{i}" for i in range(3000))
+        exact = service.calculate("special", text)["token_count"]
+        self.assertEqual(exact, 3002)
+        self.assertEqual(service.calculate("special", text, mode="chunked")["token_count"], exact)
+
+    def test_truncate_rejects_budget_below_special_tokens(self):
+        spec = TokenizerSpec(
+            type="huggingface",
+            options={"repo_id": "openai-community/gpt2", "add_special_tokens": True},
+        )
+        service = TokenService(models=[ModelSpec("special", "Special", "test", "test", 0, spec)])
+        with self.assertRaises(ValueError):
+            service.truncate("special", "a b c", max_tokens=1)
+        result = service.truncate("special", "a b c", max_tokens=2)
+        self.assertEqual((result["text"], result["kept_tokens"]), ("", 2))
+        result = service.truncate("special", "a b c", max_tokens=3)
+        self.assertEqual(result["text"], "a")
+        self.assertLessEqual(service.calculate("special", result["text"])["token_count"], 3)
+
+    def test_calculate_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.service.calculate("openai-gpt2", "text", mode="fast")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,5 @@
+import gc
+
 import pytest
 
 from app.models import TokenizerSpec
@@ -19,3 +21,52 @@ def test_registry_rejects_non_hf_tokenizer():
     registry = TokenizerRegistry()
     with pytest.raises(UnknownTokenizerError):
         registry.get_tokenizer(spec)
+
+
+def test_identical_tokenizer_files_share_one_backend(tmp_path, monkeypatch):
+    from app.tokenizers import huggingface_tokenizer as hf_module
+
+    content = f'{{"model": "{tmp_path.name}"}}'
+    for repo in ("org__base", "org__chat", "org__tuned"):
+        path = tmp_path / repo / "main" / "tokenizer.json"
+        path.parent.mkdir(parents=True)
+        path.write_text(content if repo != "org__tuned" else "{}", encoding="utf-8")
+
+    builds = []
+    create = hf_module.HuggingFaceTokenizer._create_backend
+
+    def counting_create(self, path):
+        builds.append(path)
+        return create(self, path)
+
+    monkeypatch.setattr(hf_module.HuggingFaceTokenizer, "_create_backend", counting_create)
+
+    def spec(repo_id, **options):
+        return TokenizerSpec(
+            type="huggingface",
+            options={"repo_id": repo_id, "cache_dir": str(tmp_path), **options},
+        )
+
+    registry = TokenizerRegistry()
+    specs = {
+        "base": spec("org/base"),
+        "chat": spec("org/chat"),
+        "chat-special": spec("org/chat", add_special_tokens=True),
+        "tuned": spec("org/tuned"),
+    }
+    for key, tokenizer_spec in specs.items():
+        registry.get_tokenizer(tokenizer_spec, cache_key=key).count_tokens("a b")
+    assert len(builds) == 3
+
+    groups = {tuple(group["keys"]): group for group in registry.loaded_backends()}
+    assert set(groups) == {("base", "chat"), ("chat-special",), ("tuned",)}
+    shared = groups[("base", "chat")]
+    assert shared["file_bytes"] == len(content)
+    assert shared["fingerprint"] in {item["fingerprint"] for item in hf_module.shared_backends()}
+
+    # Evicting every model that uses a backend releases it.
+    registry.retain({"tuned": specs["tuned"]})
+    gc.collect()
+    remaining = {item["fingerprint"] for item in hf_module.shared_backends()}
+    assert shared["fingerprint"] not in remaining
+    assert groups[("tuned",)]["fingerprint"] in remaining
@@ -0,0 +1,96 @@
+import json
+import os
+import socket
+import stat
+import threading
+from http.client import HTTPConnection
+
+import pytest
+
+from app.catalog import load_catalog
+from app.server import UnixSocketHTTPServer, _build_handler
+from app.services.token_service import TokenService
+from app.tokenizers.registry import TokenizerRegistry
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+class _UnixConnection(HTTPConnection):
+    def __init__(self, path, timeout=5):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+@pytest.fixture
+def uds_server(tmp_path):
+    path = str(tmp_path / "counter.sock")
+    service = TokenService(models=load_catalog(), registry=TokenizerRegistry())
+    handler = _build_handler(service)
+    handler.protocol_version = "HTTP/1.1"
+    httpd = UnixSocketHTTPServer(path, handler, mode=0o600)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def test_uds_serves_requests_over_one_connection(uds_server):
+    assert stat.S_IMODE(os.stat(uds_server).st_mode) == 0o600
+    conn = _UnixConnection(uds_server)
+    try:
+        for text in ("Hello world", "one two three"):
+            body = json.dumps({"model": "deepseek-chat", "text": text})
+            conn.request("POST", "/tokenize", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+            assert response.status == 200
+            assert payload["token_count"] == len(text.split())
+        conn.request("POST", "/unknown", body=b"{}")
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 404
+        conn.request("GET", "/models")
+        response = conn.getresponse()
+        assert response.status == 200
+        assert len(json.loads(response.read())["models"]) == 3
+    finally:
+        conn.close()
+
+
+def test_socket_is_removed_on_close(tmp_path):
+    path = str(tmp_path / "counter.sock")
+    httpd = UnixSocketHTTPServer(path, _build_handler(TokenService(models=load_catalog())))
+    assert os.path.exists(path)
+    httpd.server_close()
+    assert not os.path.exists(path)
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / "counter.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()  # leaves the file behind with nobody listening
+
+    httpd = UnixSocketHTTPServer(path, _build_handler(TokenService(models=load_catalog())))
+    httpd.server_close()
+
+
+def test_socket_in_use_is_not_stolen(uds_server):
+    with pytest.raises(OSError, match="in use"):
+        UnixSocketHTTPServer(uds_server, _build_handler(TokenService(models=load_catalog())))
+    assert os.path.exists(uds_server)
+
+
+def test_regular_file_is_not_replaced(tmp_path):
+    path = tmp_path / "counter.sock"
+    path.write_text("keep me", encoding="utf-8")
+    with pytest.raises(FileExistsError):
+        UnixSocketHTTPServer(path, _build_handler(TokenService(models=load_catalog())))
+    assert path.read_text(encoding="utf-8") == "keep me"
@@ -42,3 +42,11 @@ def test_send_empty_returns_no_body():
     _shared.send_empty(handler)
     assert handler.status == HTTPStatus.NO_CONTENT.value
     assert handler.wfile.getvalue() == b""
+
+
+def test_send_ndjson_writes_one_line_per_item():
+    handler = DummyHandler()
+    _shared.send_ndjson(handler, [{"index": 0}, {"index": 1}])
+    lines = handler.wfile.getvalue().decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [{"index": 0}, {"index": 1}]
+    assert ("Content-Type", "application/x-ndjson; charset=utf-8") in handler.headers